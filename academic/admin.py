@@ -3,7 +3,7 @@ from .models import (
     AcademicYear, Level, Subject, ClassRoom, TeacherAssignment, 
     Enrollment, Timetable, Attendance, Grade, Period, Document, DocumentAccess,
     Session, SessionAttendance, DailyAttendanceSummary, SessionDocument, 
-    SessionAssignment, SessionNote
+    SessionAssignment, SessionNote, StudentAcademicRollup
 )
 
 
@@ -140,6 +140,19 @@ class PeriodAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+@admin.register(StudentAcademicRollup)
+class StudentAcademicRollupAdmin(admin.ModelAdmin):
+    list_display = ('student', 'subject', 'period', 'grade_count', 'min_score', 'max_score', 'last_grade_date')
+    list_filter = ('period', 'subject')
+    search_fields = ('student__user__first_name', 'student__user__last_name', 'student__matricule')
+    list_select_related = ('student__user', 'subject', 'period__academic_year')
+    # Table dérivée des notes : lecture seule
+    readonly_fields = [field.name for field in StudentAcademicRollup._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = ('title', 'subject', 'teacher', 'document_type', 'classroom', 'file_size_mb', 'is_public', 'is_accessible', 'created_at')
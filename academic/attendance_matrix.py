@@ -0,0 +1,89 @@
+"""
+Matrice des présences séances × élèves
+
+Charge en une requête toutes les présences (SessionAttendance) d'un
+ensemble de séances et d'élèves, rangées dans un tableau dense (une ligne
+par séance, une colonne par élève) : une cellule se lit par deux accès
+d'index, sans requête.
+
+prefetch_attendance_matrix attache la matrice aux séances ; le filtre de
+template get_student_attendance la lit au lieu de faire une requête par
+cellule.
+"""
+from .models import SessionAttendance
+
+# Attribut des séances portant la matrice préchargée
+MATRIX_ATTRIBUTE = '_attendance_matrix'
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+class AttendanceMatrix:
+    """Présences de `sessions` × `students` (objets ou identifiants)"""
+
+    def __init__(self, sessions, students, attendances=()):
+        self.session_ids = list(dict.fromkeys(_pk(session) for session in sessions))
+        self.student_ids = list(dict.fromkeys(_pk(student) for student in students))
+        self._session_index = {pk: index for index, pk in enumerate(self.session_ids)}
+        self._student_index = {pk: index for index, pk in enumerate(self.student_ids)}
+        self._cells = [[None] * len(self.student_ids) for _ in self.session_ids]
+        for attendance in attendances:
+            row = self._session_index.get(attendance.session_id)
+            column = self._student_index.get(attendance.student_id)
+            if row is not None and column is not None:
+                self._cells[row][column] = attendance
+
+    @classmethod
+    def load(cls, sessions, students):
+        """Charge les présences des séances et élèves indiqués (une requête, aucune si l'un est vide)"""
+        matrix = cls(sessions, students)
+        if matrix.session_ids and matrix.student_ids:
+            attendances = SessionAttendance.objects.filter(
+                session_id__in=matrix.session_ids, student_id__in=matrix.student_ids
+            )
+            matrix = cls(matrix.session_ids, matrix.student_ids, attendances)
+        return matrix
+
+    def covers(self, session, student):
+        """Vrai si la cellule fait partie de la matrice (présence connue, éventuellement absente)"""
+        return _pk(session) in self._session_index and _pk(student) in self._student_index
+
+    def get(self, session, student):
+        """Présence de l'élève à la séance, ou None"""
+        row = self._session_index.get(_pk(session))
+        column = self._student_index.get(_pk(student))
+        if row is None or column is None:
+            return None
+        return self._cells[row][column]
+
+    def row(self, session):
+        """Présences d'une séance, dans l'ordre de student_ids"""
+        return list(self._cells[self._session_index[_pk(session)]])
+
+    def column(self, student):
+        """Présences d'un élève, dans l'ordre de session_ids"""
+        column = self._student_index[_pk(student)]
+        return [cells[column] for cells in self._cells]
+
+    def __len__(self):
+        """Nombre de présences enregistrées"""
+        return sum(1 for cells in self._cells for attendance in cells if attendance is not None)
+
+
+def prefetch_attendance_matrix(sessions, students):
+    """
+    Charge la matrice des présences et l'attache à chaque séance
+
+    `sessions` est évalué (liste ou queryset) : passer ensuite au template
+    les mêmes instances.
+
+    Returns:
+        AttendanceMatrix
+    """
+    sessions = list(sessions)
+    matrix = AttendanceMatrix.load(sessions, students)
+    for session in sessions:
+        setattr(session, MATRIX_ATTRIBUTE, matrix)
+    return matrix
@@ -0,0 +1,122 @@
+"""
+Génération des bulletins de fin de période
+
+Chaque classe est calculée d'un bloc par build_class_bulletins (notes de la
+classe chargées en une requête), puis chaque bulletin est rendu en HTML dans
+MEDIA_ROOT/bulletins/<période>/<classe>/<matricule>.html.
+
+Les classes sont indépendantes : generate_bulletins les répartit entre
+plusieurs processus (ProcessPoolExecutor), une classe par tâche.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .grading import build_class_bulletins
+from .models import ClassRoom, Period
+
+logger = logging.getLogger(__name__)
+
+BULLETIN_TEMPLATE = 'academic/bulletin_document.html'
+
+
+def bulletin_root():
+    """Dossier racine des bulletins générés"""
+    return Path(getattr(settings, 'BULLETIN_ROOT', Path(settings.MEDIA_ROOT) / 'bulletins'))
+
+
+def bulletin_directory(period, classroom, root=None):
+    """Dossier des bulletins d'une classe pour une période"""
+    root = Path(root) if root else bulletin_root()
+    return root / f'{period.pk}-{slugify(period.name)}' / f'{classroom.pk}-{slugify(classroom.name)}'
+
+
+def write_class_bulletins(classroom_id, period_id, root=None):
+    """
+    Calcule et écrit les bulletins d'une classe
+
+    Fonction de niveau module : c'est l'unité de travail des processus.
+
+    Returns:
+        tuple: (classroom_id, nombre de bulletins écrits)
+    """
+    classroom = ClassRoom.objects.select_related('level', 'academic_year').get(pk=classroom_id)
+    period = Period.objects.select_related('academic_year').get(pk=period_id)
+    report = build_class_bulletins(classroom, period)
+    directory = bulletin_directory(period, classroom, root)
+    directory.mkdir(parents=True, exist_ok=True)
+    generated_at = timezone.now()
+    for bulletin in report.bulletins:
+        html = render_to_string(BULLETIN_TEMPLATE, {
+            'report': report,
+            'bulletin': bulletin,
+            'generated_at': generated_at,
+        })
+        filename = f'{slugify(bulletin.student.matricule) or bulletin.student.pk}.html'
+        (directory / filename).write_text(html, encoding='utf-8')
+    return classroom_id, len(report.bulletins)
+
+
+def _init_worker():
+    """Prépare Django dans un processus de travail (nouvelles connexions)"""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def generate_bulletins(period, classrooms=None, workers=None, root=None, on_done=None):
+    """
+    Génère les bulletins d'une période pour plusieurs classes
+
+    Args:
+        period: période des bulletins
+        classrooms: classes à traiter (défaut : toutes les classes de
+            l'année scolaire de la période)
+        workers: nombre de processus (défaut : nombre de CPU) ; 1 traite les
+            classes dans le processus courant
+        root: dossier racine de sortie (défaut : MEDIA_ROOT/bulletins)
+        on_done: appelé avec (classroom_id, nombre) après chaque classe
+
+    Returns:
+        dict: {classroom_id: nombre de bulletins écrits} ; une classe en
+        échec est journalisée et absente du résultat
+    """
+    if classrooms is None:
+        classrooms = ClassRoom.objects.filter(academic_year_id=period.academic_year_id)
+    classroom_ids = [getattr(classroom, 'pk', classroom) for classroom in classrooms]
+    workers = min(workers or os.cpu_count() or 1, len(classroom_ids) or 1)
+
+    results = {}
+
+    def record(classroom_id, run):
+        try:
+            classroom_id, count = run()
+        except Exception:
+            logger.exception("Échec de la génération des bulletins de la classe %s", classroom_id)
+            return
+        results[classroom_id] = count
+        if on_done:
+            on_done(classroom_id, count)
+
+    if workers <= 1:
+        for classroom_id in classroom_ids:
+            record(classroom_id, lambda: write_class_bulletins(classroom_id, period.pk, root))
+        return results
+
+    # Les processus ne doivent pas hériter des connexions ouvertes
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(write_class_bulletins, classroom_id, period.pk, root): classroom_id
+            for classroom_id in classroom_ids
+        }
+        for future in as_completed(futures):
+            record(futures[future], future.result)
+    return results
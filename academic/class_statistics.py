@@ -0,0 +1,176 @@
+"""
+Statistiques des notes d'une classe
+
+Moyennes (en pourcentage), effectifs et dernières notes de chaque élève en
+deux requêtes quelle que soit la taille de la classe :
+- un agrégat groupé par élève : sur les cumuls (StudentAcademicRollup), ou
+  sur les notes quand un type d'évaluation est demandé ;
+- une requête avec fonction de fenêtre (ROW_NUMBER par élève) pour les
+  dernières notes.
+
+Les résultats sont mis en cache par (classe, matière, type d'évaluation).
+Chaque classe a un numéro de version incrémenté à chaque écriture d'une
+note de la classe (academic.signals) ; un changement de classe d'un élève
+incrémente la génération globale. Avec un cache propre à chaque processus
+(LocMemCache), ces incréments ne touchent que le processus qui écrit :
+statistiques, versions et génération n'y sont alors gardées que quelques
+secondes (voir core.caching).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Value, When, Window
+from django.db.models.functions import Cast, RowNumber
+
+from core.caching import cache_timeout
+
+from .models import Grade, StudentAcademicRollup
+
+CLASS_STATS_CACHE_PREFIX = 'academic:class_stats'
+CLASS_STATS_CACHE_TIMEOUT = 3600
+GENERATION_KEY = f'{CLASS_STATS_CACHE_PREFIX}:generation'
+
+# Nombre de dernières notes par élève
+RECENT_GRADES = 3
+
+RECENT_GRADE_FIELDS = (
+    'id', 'student_id', 'subject__name', 'evaluation_name', 'evaluation_type',
+    'score', 'max_score', 'date',
+)
+
+# Pourcentage d'une note, calculé en SQL (même règle que Grade.percentage)
+PERCENTAGE = Case(
+    When(max_score__gt=0, then=Cast('score', FloatField()) * Value(100.0) / Cast('max_score', FloatField())),
+    default=Value(0.0),
+    output_field=FloatField(),
+)
+
+
+def class_grades_queryset(classroom, subject_id=None, evaluation_type=None):
+    """Notes des élèves de la classe, filtrées par matière / type d'évaluation"""
+    grades = Grade.objects.filter(student__current_class=classroom)
+    if subject_id:
+        grades = grades.filter(subject_id=subject_id)
+    if evaluation_type:
+        grades = grades.filter(evaluation_type=evaluation_type)
+    return grades
+
+
+def compute_class_statistics(classroom, subject_id=None, evaluation_type=None, recent=RECENT_GRADES):
+    """
+    Calcule les statistiques de la classe (deux requêtes, sans cache)
+
+    Returns:
+        dict: {
+            'students': {student_id: {'average', 'grades_count', 'recent_grades'}},
+            'class_average': moyenne des moyennes des élèves (0 sans note),
+        }
+        Les dernières notes sont des dictionnaires (RECENT_GRADE_FIELDS + 'percentage').
+    """
+    grades = class_grades_queryset(classroom, subject_id, evaluation_type).order_by()
+
+    if evaluation_type:
+        # Les cumuls ne distinguent pas les types d'évaluation
+        rows = grades.values('student_id').annotate(average=Avg(PERCENTAGE), grades_count=Count('id'))
+    else:
+        rollups = StudentAcademicRollup.objects.filter(student__current_class=classroom)
+        if subject_id:
+            rollups = rollups.filter(subject_id=subject_id)
+        rows = [
+            {'student_id': student_id, 'average': totals['average_percentage'], 'grades_count': totals['grade_count']}
+            for student_id, totals in rollups.totals_by_student().items()
+        ]
+    students = {
+        row['student_id']: {
+            'average': row['average'],
+            'grades_count': row['grades_count'],
+            'recent_grades': [],
+        }
+        for row in rows
+    }
+
+    recent_rows = grades.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('student_id')],
+            order_by=[F('date').desc(), F('id').desc()],
+        ),
+        percentage=PERCENTAGE,
+    ).filter(position__lte=recent).values(*RECENT_GRADE_FIELDS, 'percentage').order_by('student_id', 'position')
+    for row in recent_rows:
+        students[row['student_id']]['recent_grades'].append(row)
+
+    averages = [stats['average'] for stats in students.values()]
+    return {
+        'students': students,
+        'class_average': sum(averages) / len(averages) if averages else 0,
+    }
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), cache_timeout(None))
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _version_key(classroom_id):
+    return f'{CLASS_STATS_CACHE_PREFIX}:version:{classroom_id}'
+
+
+def _version(classroom_id):
+    key = _version_key(classroom_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), cache_timeout(None))
+        version = cache.get(key)
+    return version
+
+
+def get_class_statistics(classroom, subject_id=None, evaluation_type=None):
+    """
+    Statistiques de la classe, depuis le cache si elles sont à jour
+
+    Voir compute_class_statistics pour le format.
+    """
+    classroom_id = getattr(classroom, 'pk', classroom)
+    key = (
+        f'{CLASS_STATS_CACHE_PREFIX}:{_generation()}:{classroom_id}:{_version(classroom_id)}:'
+        f'{subject_id or "*"}:{evaluation_type or "*"}'
+    )
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_class_statistics(classroom_id, subject_id, evaluation_type)
+        cache.set(key, stats, cache_timeout(CLASS_STATS_CACHE_TIMEOUT))
+    return stats
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), cache_timeout(None))
+
+
+def _invalidate_classrooms(classroom_ids):
+    for classroom_id in classroom_ids:
+        _bump(_version_key(classroom_id))
+
+
+def invalidate_class_statistics(classroom_ids=None):
+    """
+    Invalide les statistiques des classes indiquées (toutes si None)
+
+    L'invalidation est répétée après le commit, au cas où une lecture
+    concurrente aurait recalculé les statistiques avant la validation.
+    """
+    if classroom_ids is None:
+        _bump(GENERATION_KEY)
+        transaction.on_commit(lambda: _bump(GENERATION_KEY))
+        return
+    classroom_ids = {classroom_id for classroom_id in classroom_ids if classroom_id}
+    if classroom_ids:
+        _invalidate_classrooms(classroom_ids)
+        transaction.on_commit(lambda: _invalidate_classrooms(classroom_ids))
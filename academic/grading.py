@@ -0,0 +1,380 @@
+"""
+Calcul vectorisé des moyennes des élèves
+
+Toutes les notes d'un élève sont chargées en une seule requête
+(values_list), puis les moyennes par période et par matière, les effectifs,
+les meilleures notes, les moyennes de période et la moyenne annuelle sont
+calculés en un passage avec des réductions groupées NumPy (bincount).
+
+Le bulletin, la fiche enfant des parents et le détail des notes de l'élève
+utilisent le même résultat (StudentGradeReport).
+
+Les bulletins de classe (ClassBulletins) chargent toutes les notes d'une
+classe sur une période en une requête et calculent moyennes, statistiques
+de classe et rangs sur une matrice élèves x matières.
+"""
+import warnings
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+from django.db.models import Q
+
+from accounts.models import Student
+
+from .models import Grade, StudentAcademicRollup, Subject
+
+EVALUATION_TYPE_LABELS = dict(Grade.EVALUATION_TYPE_CHOICES)
+
+
+class GradeRow(NamedTuple):
+    """Note chargée par values_list (mêmes noms d'attributs que Grade)"""
+    id: int
+    subject_id: int
+    evaluation_name: str
+    evaluation_type: str
+    score: object
+    max_score: object
+    coefficient: object
+    date: object
+    comments: str
+    created_at: object
+
+    def get_evaluation_type_display(self):
+        return EVALUATION_TYPE_LABELS.get(self.evaluation_type, self.evaluation_type)
+
+
+GRADE_ROW_FIELDS = GradeRow._fields
+
+
+class SubjectStats(NamedTuple):
+    """Statistiques d'une matière (sur toutes les notes ou une période)"""
+    subject: object
+    count: int
+    average: float            # moyenne simple des notes
+    weighted_average: float   # moyenne pondérée par les coefficients des notes
+    best_score: float
+
+
+class StudentGradeReport:
+    """
+    Moyennes d'un élève calculées en un passage vectorisé
+
+    Attributs principaux :
+        subjects: matières notées, triées par nom
+        periods: périodes fournies (triées par date de début)
+        subject_stats: {subject_id: SubjectStats} sur toutes les notes
+        period_stats: [{subject_id: SubjectStats}] pour chaque période
+        period_averages: moyenne générale de chaque période (pondérée par
+            le coefficient des matières, 0 sans note)
+        annual_average: moyenne des périodes ayant une moyenne
+        general_average: moyenne simple de toutes les notes
+    """
+
+    def __init__(self, rows, subjects, periods=()):
+        # Notes les plus récentes en premier
+        self.rows = sorted(rows, key=lambda row: row.created_at, reverse=True)
+        self.subjects = sorted(subjects.values(), key=lambda subject: subject.name)
+        self.periods = sorted(periods, key=lambda period: period.start_date)
+        self._compute()
+
+    @property
+    def total_evaluations(self):
+        return len(self.rows)
+
+    def grades_for(self, subject_id, period_index=None):
+        """Notes d'une matière (d'une période si indiquée), plus récentes d'abord"""
+        if period_index is None:
+            return self._rows_by_subject.get(subject_id, [])
+        return self._rows_by_period_subject.get((period_index, subject_id), [])
+
+    def _compute(self):
+        rows = self.rows
+        subject_ids = np.array([subject.pk for subject in self.subjects], dtype=np.int64)
+        n_subjects = len(subject_ids)
+        n_periods = len(self.periods)
+
+        scores = np.fromiter((row.score for row in rows), dtype=np.float64, count=len(rows))
+        coefficients = np.fromiter((row.coefficient for row in rows), dtype=np.float64, count=len(rows))
+        # Index de matière (subject_ids est trié par nom : recherche via argsort)
+        order = np.argsort(subject_ids)
+        raw_subjects = np.fromiter((row.subject_id for row in rows), dtype=np.int64, count=len(rows))
+        subject_index = order[np.searchsorted(subject_ids[order], raw_subjects)] if rows else raw_subjects
+
+        overall = self._grouped(subject_index, scores, coefficients, n_subjects)
+        self.subject_stats = {
+            int(subject_ids[index]): self._stats(index, *overall)
+            for index in np.flatnonzero(overall[0])
+        }
+        self.general_average = round(float(scores.mean()), 2) if rows else 0
+
+        # Index de période : dernière période commencée à la date de la note,
+        # si la note est antérieure à sa fin (-1 sinon)
+        if n_periods and rows:
+            starts = np.array([period.start_date.toordinal() for period in self.periods])
+            ends = np.array([period.end_date.toordinal() for period in self.periods])
+            dates = np.fromiter((row.date.toordinal() for row in rows), dtype=np.int64, count=len(rows))
+            period_index = np.searchsorted(starts, dates, side='right') - 1
+            inside = (period_index >= 0) & (dates <= ends[np.maximum(period_index, 0)])
+            period_index = np.where(inside, period_index, -1)
+        else:
+            period_index = np.full(len(rows), -1, dtype=np.int64)
+
+        mask = period_index >= 0
+        cells = self._grouped(
+            period_index[mask] * n_subjects + subject_index[mask],
+            scores[mask], coefficients[mask], n_periods * n_subjects
+        )
+        self.period_stats = []
+        subject_coefficients = np.array([float(subject.coefficient) for subject in self.subjects])
+        period_averages = np.zeros(n_periods)
+        for p in range(n_periods):
+            window = slice(p * n_subjects, (p + 1) * n_subjects)
+            counts = cells[0][window]
+            graded = counts > 0
+            self.period_stats.append({
+                int(subject_ids[index]): self._stats(index, *(array[window] for array in cells))
+                for index in np.flatnonzero(graded)
+            })
+            # Moyenne de période : moyennes de matière arrondies, pondérées par
+            # le coefficient de chaque matière
+            averages = np.round(cells[3][window][graded], 2)
+            weights = subject_coefficients[graded]
+            if weights.sum() > 0:
+                period_averages[p] = (averages * weights).sum() / weights.sum()
+        period_averages = np.round(period_averages, 2)
+        self.period_averages = [float(value) for value in period_averages]
+
+        with_average = period_averages[period_averages > 0]
+        self.annual_average = round(float(with_average.mean()), 2) if len(with_average) else 0
+
+        self._rows_by_subject = defaultdict(list)
+        self._rows_by_period_subject = defaultdict(list)
+        for row, p in zip(rows, period_index.tolist()):
+            self._rows_by_subject[row.subject_id].append(row)
+            if p >= 0:
+                self._rows_by_period_subject[(p, row.subject_id)].append(row)
+
+    @staticmethod
+    def _grouped(keys, scores, coefficients, size):
+        """Effectif, moyenne simple, meilleure note et moyenne pondérée par groupe"""
+        counts = np.bincount(keys, minlength=size)
+        sums = np.bincount(keys, weights=scores, minlength=size)
+        weighted = np.bincount(keys, weights=scores * coefficients, minlength=size)
+        weights = np.bincount(keys, weights=coefficients, minlength=size)
+        best = np.zeros(size)
+        if len(keys):
+            np.maximum.at(best, keys, scores)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+            weighted_averages = np.where(weights > 0, weighted / np.where(weights > 0, weights, 1), 0.0)
+        return counts, averages, best, weighted_averages
+
+    def _stats(self, index, counts, averages, best, weighted_averages):
+        return SubjectStats(
+            subject=self.subjects[index],
+            count=int(counts[index]),
+            average=round(float(averages[index]), 2),
+            weighted_average=round(float(weighted_averages[index]), 2),
+            best_score=float(best[index]),
+        )
+
+
+def build_student_grade_report(student, periods=(), date_from=None, date_to=None):
+    """
+    Charge les notes d'un élève (une requête) et calcule toutes ses moyennes
+
+    Args:
+        periods: périodes du bulletin (itérable de Period)
+        date_from, date_to: bornes optionnelles sur la date des notes
+    """
+    grades = Grade.objects.filter(student=student).order_by()
+    if date_from:
+        grades = grades.filter(date__gte=date_from)
+    if date_to:
+        grades = grades.filter(date__lte=date_to)
+    rows = [GradeRow(*values) for values in grades.values_list(*GRADE_ROW_FIELDS)]
+    subject_ids = {row.subject_id for row in rows}
+    subjects = Subject.objects.in_bulk(subject_ids) if subject_ids else {}
+    return StudentGradeReport(rows, subjects, periods)
+
+
+def average_scores_by_student(student_ids):
+    """
+    Moyenne simple des notes de plusieurs élèves (une requête sur les cumuls)
+
+    Returns:
+        dict: {student_id: moyenne} pour les élèves ayant des notes
+    """
+    totals = StudentAcademicRollup.objects.filter(student_id__in=student_ids).totals_by_student()
+    return {student_id: row['average'] for student_id, row in totals.items()}
+
+
+class SubjectResult(NamedTuple):
+    """Résultat d'un élève dans une matière, comparé à la classe"""
+    subject: object
+    count: int
+    average: float          # moyenne pondérée par les coefficients des notes
+    rank: int
+    class_average: float
+    class_min: float
+    class_max: float
+
+
+class StudentBulletin(NamedTuple):
+    """Bulletin d'un élève pour une période"""
+    student: object
+    subjects: list          # [SubjectResult] des matières notées, par nom
+    general_average: object  # None sans note
+    rank: object             # None sans note
+    class_size: int
+
+
+def _competition_ranks(values):
+    """
+    Rangs « 1, 2, 2, 4 » par colonne (valeur la plus haute = 1), NaN ignorés
+
+    Args:
+        values: tableau (élèves x colonnes) pouvant contenir des NaN
+    """
+    ahead = (values[None, :, :] > values[:, None, :]).sum(axis=1)
+    return np.where(np.isnan(values), 0, ahead + 1).astype(np.int64)
+
+
+class ClassBulletins:
+    """
+    Bulletins de tous les élèves d'une classe pour une période
+
+    Les moyennes par élève et par matière, les moyennes générales, les
+    statistiques de classe (moyenne, minimum, maximum) et les rangs sont
+    calculés sur une matrice élèves x matières en un passage vectorisé.
+    La moyenne générale suit la règle du bulletin (StudentGradeReport) :
+    moyennes de matière arrondies, pondérées par le coefficient des matières.
+    """
+
+    def __init__(self, classroom, period, students, subjects, rows):
+        self.classroom = classroom
+        self.period = period
+        self.students = sorted(
+            students, key=lambda student: (student.user.last_name, student.user.first_name, student.pk)
+        )
+        self.subjects = sorted(subjects.values(), key=lambda subject: subject.name)
+        self._compute(rows)
+
+    def for_student(self, student_id):
+        """Bulletin d'un élève de la classe (None s'il n'en fait pas partie)"""
+        return self._by_student.get(student_id)
+
+    def _compute(self, rows):
+        n_students = len(self.students)
+        n_subjects = len(self.subjects)
+        student_position = {student.pk: index for index, student in enumerate(self.students)}
+        subject_position = {subject.pk: index for index, subject in enumerate(self.subjects)}
+
+        keys = np.fromiter(
+            (student_position[student_id] * n_subjects + subject_position[subject_id]
+             for student_id, subject_id, _, _ in rows),
+            dtype=np.int64, count=len(rows)
+        )
+        scores = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+        coefficients = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+        counts, _, _, weighted_averages = StudentGradeReport._grouped(
+            keys, scores, coefficients, n_students * n_subjects
+        )
+        counts = counts.reshape(n_students, n_subjects)
+        averages = np.round(weighted_averages.reshape(n_students, n_subjects), 2)
+        averages[counts == 0] = np.nan
+        graded = ~np.isnan(averages)
+
+        # Statistiques de classe par matière (élèves notés seulement)
+        with warnings.catch_warnings():
+            # Matière sans note : NaN, sans avertissement
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.subject_averages = np.round(np.nanmean(averages, axis=0), 2)
+            self.subject_min = np.nanmin(averages, axis=0)
+            self.subject_max = np.nanmax(averages, axis=0)
+        subject_ranks = _competition_ranks(averages)
+
+        # Moyenne générale : pondérée par le coefficient des matières notées
+        subject_coefficients = np.array([float(subject.coefficient) for subject in self.subjects])
+        weights = np.where(graded, subject_coefficients, 0.0)
+        weight_totals = weights.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            general = np.where(
+                weight_totals > 0,
+                np.nansum(np.where(graded, averages, 0.0) * weights, axis=1) / weight_totals,
+                np.nan
+            )
+        general = np.round(general, 2)
+        general_ranks = _competition_ranks(general[:, None])[:, 0]
+
+        ranked = general[~np.isnan(general)]
+        self.class_average = round(float(ranked.mean()), 2) if len(ranked) else None
+        self.min_average = float(ranked.min()) if len(ranked) else None
+        self.max_average = float(ranked.max()) if len(ranked) else None
+
+        self.bulletins = []
+        for s, student in enumerate(self.students):
+            subjects = [
+                SubjectResult(
+                    subject=self.subjects[j],
+                    count=int(counts[s, j]),
+                    average=float(averages[s, j]),
+                    rank=int(subject_ranks[s, j]),
+                    class_average=float(self.subject_averages[j]),
+                    class_min=float(self.subject_min[j]),
+                    class_max=float(self.subject_max[j]),
+                )
+                for j in np.flatnonzero(graded[s])
+            ]
+            has_average = not np.isnan(general[s])
+            self.bulletins.append(StudentBulletin(
+                student=student,
+                subjects=subjects,
+                general_average=float(general[s]) if has_average else None,
+                rank=int(general_ranks[s]) if has_average else None,
+                class_size=n_students,
+            ))
+        self._by_student = {bulletin.student.pk: bulletin for bulletin in self.bulletins}
+        # Classement : rang puis nom, élèves sans note en dernier
+        self.bulletins.sort(key=lambda bulletin: (bulletin.rank is None, bulletin.rank or 0))
+
+    @property
+    def subject_summary(self):
+        """Statistiques de classe par matière notée"""
+        return [
+            {
+                'subject': subject,
+                'class_average': float(self.subject_averages[j]),
+                'class_min': float(self.subject_min[j]),
+                'class_max': float(self.subject_max[j]),
+            }
+            for j, subject in enumerate(self.subjects)
+            if not np.isnan(self.subject_averages[j])
+        ]
+
+
+def build_class_bulletins(classroom, period):
+    """
+    Bulletins de toute une classe pour une période (trois requêtes)
+
+    Les notes de la classe sur la période sont chargées en une requête ;
+    l'effectif comprend les élèves de la classe (classe actuelle ou
+    inscription active) et ceux qui y ont été notés.
+    """
+    rows = list(
+        Grade.objects.filter(
+            classroom=classroom,
+            date__gte=period.start_date,
+            date__lte=period.end_date,
+        ).order_by().values_list('student_id', 'subject_id', 'score', 'coefficient')
+    )
+    graded_ids = {row[0] for row in rows}
+    students = Student.objects.filter(
+        Q(current_class=classroom)
+        | Q(enrollments__classroom=classroom, enrollments__is_active=True)
+        | Q(pk__in=graded_ids)
+    ).distinct().select_related('user')
+    subject_ids = {row[1] for row in rows}
+    subjects = Subject.objects.in_bulk(subject_ids) if subject_ids else {}
+    return ClassBulletins(classroom, period, list(students), subjects, rows)
@@ -0,0 +1,169 @@
+"""
+Benchmark du calcul des moyennes du bulletin
+
+Compare l'ancien calcul du bulletin (requêtes par période et par matière,
+cumul en flottants Python) au calcul vectorisé de academic.grading pour un
+élève fictif (12 matières, 3 périodes par défaut). Les données de test sont
+créées dans une transaction annulée à la fin : la base n'est pas modifiée.
+
+Usage:
+    python manage.py benchmark_grade_aggregation
+    python manage.py benchmark_grade_aggregation --subjects 12 --periods 3 --grades 6 --repeat 20
+"""
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from academic.grading import build_student_grade_report
+from academic.models import AcademicYear, ClassRoom, Grade, Level, Period, Subject
+from accounts.models import Student, Teacher
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_report_averages(student, periods):
+    """
+    Ancien calcul du bulletin (référence) : une série de requêtes par période
+    et par matière
+
+    Returns:
+        tuple: ({(period_id, subject_id): moyenne}, [moyennes de période], moyenne annuelle)
+    """
+    subject_averages = {}
+    period_averages = []
+    for period in periods:
+        period_grades = Grade.objects.filter(
+            student=student,
+            date__gte=period.start_date,
+            date__lte=period.end_date
+        )
+        subjects_data = {}
+        for subject in Subject.objects.filter(grades__in=period_grades).distinct():
+            total_weighted = 0
+            total_coef = 0
+            for grade in period_grades.filter(subject=subject):
+                total_weighted += float(grade.score * grade.coefficient)
+                total_coef += float(grade.coefficient)
+            average = (total_weighted / total_coef) if total_coef > 0 else 0
+            subjects_data[subject.pk] = (round(average, 2), subject.coefficient)
+            subject_averages[(period.pk, subject.pk)] = round(average, 2)
+        if subjects_data:
+            weighted = sum(average * float(coef) for average, coef in subjects_data.values())
+            coefs = sum(float(coef) for _, coef in subjects_data.values())
+            period_averages.append(round(weighted / coefs if coefs > 0 else 0, 2))
+        else:
+            period_averages.append(0)
+    with_average = [value for value in period_averages if value > 0]
+    annual = round(sum(with_average) / len(with_average), 2) if with_average else 0
+    return subject_averages, period_averages, annual
+
+
+def engine_report_averages(student, periods):
+    """Mêmes résultats à partir de academic.grading"""
+    report = build_student_grade_report(student, periods)
+    subject_averages = {
+        (report.periods[index].pk, subject_id): stats.weighted_average
+        for index, period_stats in enumerate(report.period_stats)
+        for subject_id, stats in period_stats.items()
+    }
+    return subject_averages, report.period_averages, report.annual_average
+
+
+def seed_student(n_subjects=12, n_periods=3, grades_per_cell=4, seed=42):
+    """Crée un élève avec `grades_per_cell` notes par matière et par période"""
+    rng = random.Random(seed)
+    year = AcademicYear.objects.create(
+        name='BENCH-GRADES', start_date=date(2030, 9, 1), end_date=date(2031, 7, 31)
+    )
+    level = Level.objects.create(name='BENCH', order=99)
+    classroom = ClassRoom.objects.create(name='BENCH', level=level, academic_year=year)
+    teacher = Teacher.objects.create(
+        user=User.objects.create_user(email='bench.teacher@example.com', password=None, role='TEACHER')
+    )
+    student = Student.objects.create(
+        user=User.objects.create_user(email='bench.student@example.com', password=None, role='STUDENT'),
+        current_class=classroom
+    )
+    subjects = [
+        Subject.objects.create(
+            name=f'Matière {index:02d}', code=f'BENCH{index:02d}',
+            coefficient=Decimal(rng.choice(['1.0', '2.0', '3.0']))
+        )
+        for index in range(n_subjects)
+    ]
+    span = (year.end_date - year.start_date).days // n_periods
+    periods = [
+        Period.objects.create(
+            name=f'Période {index + 1}', academic_year=year,
+            start_date=year.start_date + timedelta(days=index * span),
+            end_date=year.start_date + timedelta(days=(index + 1) * span - 1),
+        )
+        for index in range(n_periods)
+    ]
+    grades = []
+    for period in periods:
+        for subject in subjects:
+            for index in range(grades_per_cell):
+                grades.append(Grade(
+                    student=student, subject=subject, teacher=teacher, classroom=classroom,
+                    evaluation_name=f'Évaluation {index + 1}', evaluation_type='TEST',
+                    score=Decimal(rng.randint(0, 40)) / 2,
+                    coefficient=Decimal(rng.choice(['1.0', '2.0'])),
+                    date=period.start_date + timedelta(days=rng.randint(0, span - 1)),
+                ))
+    Grade.objects.bulk_create(grades)
+    return student, periods
+
+
+def _measure(func, repeat, *args):
+    with CaptureQueriesContext(connection) as queries:
+        result = func(*args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    return result, len(queries.captured_queries), elapsed
+
+
+class Command(BaseCommand):
+    help = "Compare l'ancien calcul des moyennes du bulletin au calcul vectorisé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subjects', type=int, default=12)
+        parser.add_argument('--periods', type=int, default=3)
+        parser.add_argument('--grades', type=int, default=4, help='Notes par matière et par période')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                student, periods = seed_student(options['subjects'], options['periods'], options['grades'])
+                self.stdout.write(
+                    f"Élève fictif : {options['subjects']} matières, {options['periods']} périodes, "
+                    f"{Grade.objects.filter(student=student).count()} notes"
+                )
+                legacy, legacy_queries, legacy_ms = _measure(
+                    legacy_report_averages, options['repeat'], student, periods
+                )
+                engine, engine_queries, engine_ms = _measure(
+                    engine_report_averages, options['repeat'], student, periods
+                )
+                self.stdout.write(f"  ancien calcul    : {legacy_queries} requêtes, {legacy_ms:.1f} ms")
+                self.stdout.write(f"  calcul vectorisé : {engine_queries} requêtes, {engine_ms:.1f} ms")
+                if legacy == engine:
+                    self.stdout.write(self.style.SUCCESS('✓ Moyennes identiques'))
+                else:
+                    self.stdout.write(self.style.WARNING('⚠ Écarts entre les deux calculs'))
+                raise _Rollback
+        except _Rollback:
+            pass
@@ -0,0 +1,67 @@
+"""
+Management command pour générer les bulletins d'une période
+
+Les bulletins de chaque classe (moyennes, statistiques de classe, rangs) sont
+calculés d'un bloc puis écrits en HTML ; les classes sont réparties entre
+plusieurs processus.
+
+Usage:
+    python manage.py generate_bulletins                     # Période courante, toutes les classes
+    python manage.py generate_bulletins --period 3 --classroom 12 --classroom 14
+    python manage.py generate_bulletins --workers 8 --output-dir /srv/bulletins
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from academic.bulletins import bulletin_root, generate_bulletins
+from academic.models import ClassRoom, Period
+
+
+class Command(BaseCommand):
+    help = "Génère les bulletins d'une période pour une ou plusieurs classes (en parallèle)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', type=int, help='ID de la période (défaut : période courante)')
+        parser.add_argument(
+            '--classroom', type=int, action='append', dest='classrooms',
+            help="ID d'une classe (répétable ; défaut : toutes les classes de l'année)",
+        )
+        parser.add_argument('--workers', type=int, help='Nombre de processus (défaut : nombre de CPU)')
+        parser.add_argument('--output-dir', help='Dossier de sortie (défaut : MEDIA_ROOT/bulletins)')
+
+    def handle(self, *args, **options):
+        if options['period']:
+            period = Period.objects.select_related('academic_year').filter(pk=options['period']).first()
+        else:
+            period = Period.objects.select_related('academic_year').filter(is_current=True).first()
+        if period is None:
+            raise CommandError('Période introuvable (utilisez --period).')
+
+        classrooms = None
+        if options['classrooms']:
+            classrooms = list(ClassRoom.objects.filter(pk__in=options['classrooms']))
+            missing = set(options['classrooms']) - {classroom.pk for classroom in classrooms}
+            if missing:
+                raise CommandError(f"Classe(s) introuvable(s) : {', '.join(map(str, sorted(missing)))}")
+
+        self.stdout.write(f'Bulletins de la période « {period} »')
+        start = time.perf_counter()
+
+        def report(classroom_id, count):
+            self.stdout.write(f'  classe {classroom_id} : {count} bulletin(s)')
+
+        results = generate_bulletins(
+            period, classrooms=classrooms, workers=options['workers'],
+            root=options['output_dir'], on_done=report,
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {sum(results.values())} bulletin(s) pour {len(results)} classe(s) en {elapsed:.1f} s '
+            f"dans {options['output_dir'] or bulletin_root()}"
+        ))
+        expected = len(classrooms) if classrooms is not None else ClassRoom.objects.filter(
+            academic_year_id=period.academic_year_id
+        ).count()
+        if len(results) < expected:
+            raise CommandError(f'{expected - len(results)} classe(s) en échec (voir les journaux).')
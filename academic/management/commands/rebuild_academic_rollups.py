@@ -0,0 +1,51 @@
+"""
+Management command pour reconstruire les cumuls de notes (StudentAcademicRollup)
+
+Les cumuls sont maintenus à chaque écriture de note ; cette commande les
+recalcule à partir de la table Grade, par lots d'élèves (après un import en
+masse, une correction manuelle en base, etc.).
+
+Usage:
+    python manage.py rebuild_academic_rollups
+    python manage.py rebuild_academic_rollups --chunk-size 500
+    python manage.py rebuild_academic_rollups --student 12 --student 15
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from academic.rollups import rebuild_all_rollups, rebuild_student_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les cumuls de notes par élève, matière et période'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help="Nombre d'élèves recalculés par lot (défaut: 200)",
+        )
+        parser.add_argument(
+            '--student',
+            type=int,
+            action='append',
+            dest='students',
+            help="ID d'un élève à recalculer (répétable ; défaut : tous les élèves)",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['students']:
+            cells = rebuild_student_rollups(options['students'])
+            students = len(options['students'])
+        else:
+            def progress(done, cells):
+                self.stdout.write(f'  {done} élève(s) traité(s), {cells} cumul(s)')
+
+            students, cells = rebuild_all_rollups(options['chunk_size'], on_chunk=progress)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {cells} cumul(s) recalculé(s) pour {students} élève(s) en {time.perf_counter() - start:.1f} s'
+        ))
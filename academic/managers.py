@@ -3,7 +3,9 @@ Managers personnalisés pour le filtrage des données selon les rôles (RBAC)
 Module Academic
 """
 from django.db import models
-from django.db.models import Q
+from django.db.models import Max, Min, Q, Sum
+
+from core.scopes import get_access_scope
 
 
 class GradeQuerySet(models.QuerySet):
@@ -11,22 +13,23 @@ class GradeQuerySet(models.QuerySet):
     
     def filter_for_teacher(self, teacher_user):
         """Filtre les notes pour un enseignant - seulement ses notes"""
-        if hasattr(teacher_user, 'teacher_profile'):
-            return self.filter(teacher=teacher_user.teacher_profile)
+        scope = get_access_scope(teacher_user)
+        if scope.teacher_id:
+            return self.filter(teacher_id=scope.teacher_id)
         return self.none()
     
     def filter_for_student(self, student_user):
         """Filtre les notes pour un élève - seulement ses notes"""
-        if hasattr(student_user, 'student_profile'):
-            return self.filter(student=student_user.student_profile)
+        scope = get_access_scope(student_user)
+        if scope.student_id:
+            return self.filter(student_id=scope.student_id)
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Filtre les notes pour un parent - notes de ses enfants"""
-        if hasattr(parent_user, 'parent_profile'):
-            # Récupérer les enfants du parent
-            children = parent_user.parent_profile.children.all()
-            return self.filter(student__in=children)
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
+            return self.filter(student_id__in=scope.student_ids)
         return self.none()
     
     def filter_for_role(self, user):
@@ -67,30 +70,24 @@ class ClassRoomQuerySet(models.QuerySet):
     
     def filter_for_teacher(self, teacher_user):
         """Filtre les classes pour un enseignant - seulement ses classes assignées"""
-        if hasattr(teacher_user, 'teacher_profile'):
+        scope = get_access_scope(teacher_user)
+        if scope.teacher_id:
             # Classes où l'enseignant a des attributions
-            return self.filter(
-                teacherassignment__teacher=teacher_user.teacher_profile
-            ).distinct()
+            return self.filter(id__in=scope.classroom_ids)
         return self.none()
     
     def filter_for_student(self, student_user):
         """Filtre les classes pour un élève - seulement ses classes"""
-        if hasattr(student_user, 'student_profile'):
-            return self.filter(
-                enrollments__student=student_user.student_profile,
-                enrollments__is_active=True
-            ).distinct()
+        scope = get_access_scope(student_user)
+        if scope.student_id:
+            return self.filter(id__in=scope.classroom_ids)
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Filtre les classes pour un parent - classes de ses enfants"""
-        if hasattr(parent_user, 'parent_profile'):
-            children = parent_user.parent_profile.children.all()
-            return self.filter(
-                enrollments__student__in=children,
-                enrollments__is_active=True
-            ).distinct()
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
+            return self.filter(id__in=scope.classroom_ids)
         return self.none()
     
     def filter_for_role(self, user):
@@ -131,28 +128,30 @@ class EnrollmentQuerySet(models.QuerySet):
     
     def filter_for_teacher(self, teacher_user):
         """Filtre les inscriptions pour un enseignant - élèves de ses classes"""
-        if hasattr(teacher_user, 'teacher_profile'):
+        scope = get_access_scope(teacher_user)
+        if scope.teacher_id:
             return self.filter(
-                classroom__teacherassignment__teacher=teacher_user.teacher_profile,
+                classroom_id__in=scope.classroom_ids,
                 withdrawal_date__isnull=True
-            ).distinct()
+            )
         return self.none()
     
     def filter_for_student(self, student_user):
         """Filtre les inscriptions pour un élève - ses propres inscriptions"""
-        if hasattr(student_user, 'student_profile'):
+        scope = get_access_scope(student_user)
+        if scope.student_id:
             return self.filter(
-                student=student_user.student_profile,
+                student_id=scope.student_id,
                 withdrawal_date__isnull=True
             )
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Filtre les inscriptions pour un parent - inscriptions de ses enfants"""
-        if hasattr(parent_user, 'parent_profile'):
-            children = parent_user.parent_profile.children.all()
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
             return self.filter(
-                student__in=children,
+                student_id__in=scope.student_ids,
                 withdrawal_date__isnull=True
             )
         return self.none()
@@ -188,3 +187,47 @@ class EnrollmentManager(models.Manager):
     
     def for_role(self, user):
         return self.get_queryset().filter_for_role(user)
+
+
+class StudentAcademicRollupQuerySet(models.QuerySet):
+    """QuerySet des cumuls de notes (StudentAcademicRollup)"""
+
+    def totals_by_student(self):
+        """
+        Cumuls regroupés par élève (une requête sur la table des cumuls)
+
+        Returns:
+            dict: {student_id: {'grade_count', 'score_sum', 'weighted_score_sum',
+            'coefficient_sum', 'percentage_sum', 'min_score', 'max_score',
+            'last_grade_date', 'average', 'weighted_average', 'average_percentage'}}
+        """
+        rows = self.order_by().values('student_id').annotate(
+            total_grades=Sum('grade_count'),
+            total_score=Sum('score_sum'),
+            total_weighted=Sum('weighted_score_sum'),
+            total_coefficients=Sum('coefficient_sum'),
+            total_percentage=Sum('percentage_sum'),
+            lowest=Min('min_score'),
+            highest=Max('max_score'),
+            last_date=Max('last_grade_date'),
+        )
+        totals = {}
+        for row in rows:
+            count = row['total_grades'] or 0
+            if not count:
+                continue
+            coefficients = row['total_coefficients'] or 0
+            totals[row['student_id']] = {
+                'grade_count': count,
+                'score_sum': row['total_score'],
+                'weighted_score_sum': row['total_weighted'],
+                'coefficient_sum': coefficients,
+                'percentage_sum': row['total_percentage'],
+                'min_score': row['lowest'],
+                'max_score': row['highest'],
+                'last_grade_date': row['last_date'],
+                'average': float(row['total_score']) / count,
+                'weighted_average': float(row['total_weighted']) / float(coefficients) if coefficients else None,
+                'average_percentage': row['total_percentage'] / count,
+            }
+        return totals
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:45
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, IntegerField, Max, Min, Sum, Value, When
+from django.db.models.functions import Cast
+
+
+def populate_rollups(apps, schema_editor):
+    """Calcule les cumuls à partir des notes existantes, par lots d'élèves"""
+    Grade = apps.get_model('academic', 'Grade')
+    Period = apps.get_model('academic', 'Period')
+    Student = apps.get_model('accounts', 'Student')
+    StudentAcademicRollup = apps.get_model('academic', 'StudentAcademicRollup')
+
+    periods = Period.objects.order_by('start_date', 'pk').values_list('pk', 'start_date', 'end_date')
+    rollup_period = Case(
+        *[When(date__gte=start, date__lte=end, then=Value(pk)) for pk, start, end in periods],
+        default=Value(None),
+        output_field=IntegerField(),
+    )
+    percentage = Case(
+        When(max_score__gt=0, then=Cast('score', FloatField()) * Value(100.0) / Cast('max_score', FloatField())),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(student_ids), 200):
+        rows = Grade.objects.filter(student_id__in=student_ids[start:start + 200]).order_by().annotate(
+            rollup_period=rollup_period
+        ).values('student_id', 'subject_id', 'rollup_period').annotate(
+            total_grades=Count('id'),
+            total_score=Sum('score'),
+            total_weighted=Sum(F('score') * F('coefficient'), output_field=models.DecimalField(max_digits=14, decimal_places=3)),
+            total_coefficients=Sum('coefficient'),
+            total_percentage=Sum(percentage),
+            lowest=Min('score'),
+            highest=Max('score'),
+            last_date=Max('date'),
+        )
+        StudentAcademicRollup.objects.bulk_create([
+            StudentAcademicRollup(
+                student_id=row['student_id'],
+                subject_id=row['subject_id'],
+                period_id=row['rollup_period'],
+                grade_count=row['total_grades'],
+                score_sum=row['total_score'],
+                weighted_score_sum=row['total_weighted'],
+                coefficient_sum=row['total_coefficients'],
+                percentage_sum=row['total_percentage'],
+                min_score=row['lowest'],
+                max_score=row['highest'],
+                last_grade_date=row['last_date'],
+            )
+            for row in rows
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_initial'),
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAcademicRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de notes')),
+                ('score_sum', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12, verbose_name='Somme des notes')),
+                ('weighted_score_sum', models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=14, verbose_name='Somme des notes x coefficients')),
+                ('coefficient_sum', models.DecimalField(decimal_places=1, default=Decimal('0'), max_digits=10, verbose_name='Somme des coefficients')),
+                ('percentage_sum', models.FloatField(default=0, verbose_name='Somme des pourcentages')),
+                ('min_score', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Note minimale')),
+                ('max_score', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Note maximale')),
+                ('last_grade_date', models.DateField(blank=True, null=True, verbose_name='Date de la dernière note')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('period', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='academic_rollups', to='academic.period', verbose_name='Période')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='academic_rollups', to='accounts.student', verbose_name='Élève')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='academic_rollups', to='academic.subject', verbose_name='Matière')),
+            ],
+            options={
+                'verbose_name': 'Cumul de notes',
+                'verbose_name_plural': 'Cumuls de notes',
+                'constraints': [models.UniqueConstraint(fields=('student', 'subject', 'period'), name='unique_rollup_student_subject_period'), models.UniqueConstraint(condition=models.Q(('period__isnull', True)), fields=('student', 'subject'), name='unique_rollup_student_subject_no_period')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
+from functools import partial
+from typing import NamedTuple
 
 # Import des managers RBAC
-from .managers import GradeManager, ClassRoomManager, EnrollmentManager
+from .managers import GradeManager, ClassRoomManager, EnrollmentManager, StudentAcademicRollupQuerySet
 
 User = get_user_model()
 
@@ -249,6 +251,20 @@ class Attendance(models.Model):
         return f"{self.student.user.full_name} - {self.date} - {self.get_status_display()}"
 
 
+class GradeRollupState(NamedTuple):
+    student_id: int
+    subject_id: int
+    date: object
+    score: Decimal
+    max_score: Decimal
+    coefficient: Decimal
+
+
+ROLLUP_STATE_FIELDS = frozenset(
+    ('student_id', 'subject_id', 'date', 'score', 'max_score', 'coefficient')
+)
+
+
 class Grade(models.Model):
     """Note/Évaluation"""
     EVALUATION_TYPE_CHOICES = [
@@ -302,6 +318,20 @@ class Grade(models.Model):
         """Note pondérée par le coefficient"""
         return self.score * self.coefficient
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État chargé, réutilisé par les signaux pour mettre à jour les cumuls sans relire la base
+        if ROLLUP_STATE_FIELDS.issubset(field_names):
+            instance._loaded_rollup_state = instance.get_rollup_state()
+        return instance
+
+    def get_rollup_state(self):
+        """Valeurs de la note prises en compte dans StudentAcademicRollup"""
+        return GradeRollupState(
+            self.student_id, self.subject_id, self.date, self.score, self.max_score, self.coefficient
+        )
+
 
 class Document(models.Model):
     """Document pédagogique pour une matière"""
@@ -446,6 +476,60 @@ class Period(models.Model):
         super().save(*args, **kwargs)
 
 
+class StudentAcademicRollup(models.Model):
+    """
+    Cumuls des notes d'un élève par matière et par période
+
+    Table dérivée de Grade, maintenue par écarts à chaque création,
+    modification ou suppression de note (academic.rollups) et reconstruite
+    par la commande rebuild_academic_rollups. Les notes hors de toute
+    période sont cumulées avec period = None.
+    """
+    student = models.ForeignKey('accounts.Student', on_delete=models.CASCADE, related_name='academic_rollups', verbose_name='Élève')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='academic_rollups', verbose_name='Matière')
+    period = models.ForeignKey(Period, on_delete=models.CASCADE, null=True, blank=True, related_name='academic_rollups', verbose_name='Période')
+
+    grade_count = models.PositiveIntegerField(default=0, verbose_name='Nombre de notes')
+    score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'), verbose_name='Somme des notes')
+    weighted_score_sum = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal('0'), verbose_name='Somme des notes x coefficients')
+    coefficient_sum = models.DecimalField(max_digits=10, decimal_places=1, default=Decimal('0'), verbose_name='Somme des coefficients')
+    percentage_sum = models.FloatField(default=0, verbose_name='Somme des pourcentages')
+    min_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name='Note minimale')
+    max_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name='Note maximale')
+    last_grade_date = models.DateField(null=True, blank=True, verbose_name='Date de la dernière note')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StudentAcademicRollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Cumul de notes'
+        verbose_name_plural = 'Cumuls de notes'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'subject', 'period'], name='unique_rollup_student_subject_period'
+            ),
+            # NULL n'est pas comparé par la contrainte ci-dessus
+            models.UniqueConstraint(
+                fields=['student', 'subject'], condition=models.Q(period__isnull=True),
+                name='unique_rollup_student_subject_no_period'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject_id} - {self.period_id}: {self.grade_count} note(s)"
+
+    @property
+    def average(self):
+        """Moyenne simple des notes"""
+        return self.score_sum / self.grade_count if self.grade_count else None
+
+    @property
+    def weighted_average(self):
+        """Moyenne pondérée par les coefficients des notes"""
+        return self.weighted_score_sum / self.coefficient_sum if self.coefficient_sum else None
+
+
 class Session(models.Model):
     """Session de cours - Instance d'un créneau d'emploi du temps"""
     SESSION_STATUS_CHOICES = [
@@ -624,6 +708,72 @@ class SessionAttendance(models.Model):
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.session.date} - {self.get_status_display()}"
 
+    # Champs saisis lors de l'appel
+    ROLL_CALL_FIELDS = ['status', 'arrival_time', 'notes']
+
+    @classmethod
+    def bulk_record(cls, session, roll_call, recorded_by, existing=None):
+        """
+        Enregistre l'appel complet d'une session en masse
+
+        L'appel soumis est comparé aux présences déjà chargées : les nouvelles
+        lignes sont insérées par un seul bulk_create, les lignes modifiées
+        mises à jour par un seul bulk_update, le tout dans une transaction.
+        Les résumés quotidiens sont recalculés une seule fois pour tout le lot.
+
+        Args:
+            session: Session concernée
+            roll_call: dict {student_id: {'status': ..., 'arrival_time': ..., 'notes': ...}}
+            recorded_by: utilisateur qui prend l'appel
+            existing: dict {student_id: SessionAttendance} déjà chargé (optionnel)
+
+        Returns:
+            tuple: (présences créées, présences mises à jour)
+        """
+        with DailySummaryBatch():
+            if existing is None:
+                existing = {
+                    attendance.student_id: attendance
+                    for attendance in cls.objects.filter(session=session).order_by()
+                }
+
+            now = timezone.now()
+            to_create = []
+            to_update = []
+            for student_id, values in roll_call.items():
+                attendance = existing.get(student_id)
+                if attendance is None:
+                    to_create.append(cls(
+                        session=session,
+                        student_id=student_id,
+                        recorded_by=recorded_by,
+                        **values
+                    ))
+                    continue
+
+                if all(getattr(attendance, field) == value for field, value in values.items()):
+                    continue
+                for field, value in values.items():
+                    setattr(attendance, field, value)
+                attendance.recorded_by = recorded_by
+                attendance.recorded_at = now
+                attendance.updated_at = now
+                to_update.append(attendance)
+
+            if to_create:
+                cls.objects.bulk_create(to_create)
+            if to_update:
+                cls.objects.bulk_update(
+                    to_update,
+                    cls.ROLL_CALL_FIELDS + ['recorded_by', 'recorded_at', 'updated_at']
+                )
+
+            # bulk_create / bulk_update n'émettent pas post_save
+            for attendance in to_create + to_update:
+                schedule_daily_summary_update(attendance.student_id, session.date)
+
+        return to_create, to_update
+
     @property
     def is_late(self):
         """Vérifie si l'étudiant est arrivé en retard"""
@@ -683,78 +833,139 @@ class DailyAttendanceSummary(models.Model):
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.date} - {self.get_daily_status_display()}"
 
-    @classmethod
-    def calculate_for_student_date(cls, student, date):
-        """Calcule et met à jour le résumé pour un étudiant et une date donnée"""
-        # Récupérer toutes les présences de session pour cette date
-        session_attendances = SessionAttendance.objects.filter(
-            student=student,
-            session__date=date
-        ).select_related('session')
-        
-        if not session_attendances.exists():
-            # Pas de sessions ce jour-là, supprimer le résumé s'il existe
-            cls.objects.filter(student=student, date=date).delete()
-            return None
-        
-        # Calculer les statistiques
-        total_sessions = session_attendances.count()
-        present_sessions = session_attendances.filter(status='PRESENT').count()
-        absent_sessions = session_attendances.filter(status='ABSENT').count()
-        late_sessions = session_attendances.filter(status='LATE').count()
-        excused_sessions = session_attendances.filter(status='EXCUSED').count()
-        
-        # Calculer le taux de présence (présent + en retard = présent)
-        effective_present = present_sessions + late_sessions
-        attendance_rate = (effective_present / total_sessions * 100) if total_sessions > 0 else 0
-        
-        # Déterminer le statut journalier
+    # Champs recalculés à partir des présences de session
+    COMPUTED_FIELDS = [
+        'total_sessions', 'present_sessions', 'absent_sessions',
+        'late_sessions', 'excused_sessions', 'daily_status',
+        'attendance_rate', 'first_arrival_time', 'total_late_minutes',
+        'justification_provided', 'last_updated',
+    ]
+
+    @staticmethod
+    def get_daily_status(attendance_rate):
+        """Détermine le statut journalier à partir du taux de présence"""
         if attendance_rate == 100:
-            daily_status = 'FULLY_PRESENT'
+            return 'FULLY_PRESENT'
         elif attendance_rate >= 75:
-            daily_status = 'PARTIALLY_PRESENT'
+            return 'PARTIALLY_PRESENT'
         elif attendance_rate >= 25:
-            daily_status = 'MOSTLY_ABSENT'
-        else:
-            daily_status = 'FULLY_ABSENT'
-        
-        # Calculer les détails supplémentaires
-        arrival_times = session_attendances.filter(
-            arrival_time__isnull=False
-        ).values_list('arrival_time', flat=True)
-        first_arrival_time = min(arrival_times) if arrival_times else None
-        
-        # Calculer le total des minutes de retard
-        total_late_minutes = 0
-        for attendance in session_attendances.filter(status='LATE'):
-            if attendance.minutes_late:
-                total_late_minutes += attendance.minutes_late
-        
-        # Vérifier si une justification a été fournie
-        justification_provided = session_attendances.filter(
-            justification__isnull=False,
-            justification__gt=''
-        ).exists()
-        
-        # Créer ou mettre à jour le résumé
-        summary, created = cls.objects.update_or_create(
-            student=student,
-            date=date,
-            defaults={
-                'total_sessions': total_sessions,
-                'present_sessions': present_sessions,
-                'absent_sessions': absent_sessions,
-                'late_sessions': late_sessions,
-                'excused_sessions': excused_sessions,
-                'daily_status': daily_status,
+            return 'MOSTLY_ABSENT'
+        return 'FULLY_ABSENT'
+
+    @classmethod
+    def calculate_for_student_date(cls, student, date):
+        """Calcule et met à jour le résumé pour un étudiant et une date donnée"""
+        student_id = getattr(student, 'pk', student)
+        return cls.recalculate_bulk([(student_id, date)]).get((student_id, date))
+
+    @classmethod
+    def recalculate_bulk(cls, pairs):
+        """
+        Recalcule les résumés d'un ensemble de couples (élève, date)
+
+        Toutes les statistiques sont obtenues par un seul agrégat conditionnel
+        groupé par (élève, date), plus une requête pour les minutes de retard.
+        Les résumés sont ensuite écrits par bulk_create / bulk_update et ceux
+        qui n'ont plus de présences sont supprimés.
+
+        Args:
+            pairs: itérable de couples (élève ou id d'élève, date)
+
+        Returns:
+            dict: {(student_id, date): résumé} pour les couples ayant des présences
+        """
+        pairs = {(getattr(student, 'pk', student), day) for student, day in pairs}
+        if not pairs:
+            return {}
+
+        student_ids = {student_id for student_id, _ in pairs}
+        dates = {day for _, day in pairs}
+        attendances = SessionAttendance.objects.filter(
+            student_id__in=student_ids,
+            session__date__in=dates
+        )
+
+        # Statistiques par (élève, date) en une seule requête
+        rows = attendances.values('student_id', 'session__date').annotate(
+            total=models.Count('id'),
+            present=models.Count('id', filter=models.Q(status='PRESENT')),
+            absent=models.Count('id', filter=models.Q(status='ABSENT')),
+            late=models.Count('id', filter=models.Q(status='LATE')),
+            excused=models.Count('id', filter=models.Q(status='EXCUSED')),
+            first_arrival=models.Min('arrival_time'),
+            justified=models.Count('id', filter=models.Q(justification__gt='')),
+        ).order_by()
+        stats = {
+            (row['student_id'], row['session__date']): row
+            for row in rows
+            if (row['student_id'], row['session__date']) in pairs
+        }
+
+        # Minutes de retard (différence d'heures calculée en Python, portable)
+        late_minutes = {}
+        late_rows = attendances.filter(
+            status='LATE',
+            arrival_time__isnull=False,
+            arrival_time__gt=models.F('session__timetable__start_time')
+        ).values_list(
+            'student_id', 'session__date', 'arrival_time', 'session__timetable__start_time'
+        ).order_by()
+        for student_id, day, arrival_time, start_time in late_rows:
+            delta = (
+                (arrival_time.hour * 3600 + arrival_time.minute * 60 + arrival_time.second)
+                - (start_time.hour * 3600 + start_time.minute * 60 + start_time.second)
+            )
+            key = (student_id, day)
+            late_minutes[key] = late_minutes.get(key, 0) + int(delta / 60)
+
+        existing = {
+            (summary.student_id, summary.date): summary
+            for summary in cls.objects.filter(student_id__in=student_ids, date__in=dates).order_by()
+            if (summary.student_id, summary.date) in pairs
+        }
+
+        now = timezone.now()
+        summaries = {}
+        to_create = []
+        to_update = []
+        for key, row in stats.items():
+            effective_present = row['present'] + row['late']
+            attendance_rate = effective_present / row['total'] * 100
+            values = {
+                'total_sessions': row['total'],
+                'present_sessions': row['present'],
+                'absent_sessions': row['absent'],
+                'late_sessions': row['late'],
+                'excused_sessions': row['excused'],
+                'daily_status': cls.get_daily_status(attendance_rate),
                 'attendance_rate': Decimal(str(round(attendance_rate, 2))),
-                'first_arrival_time': first_arrival_time,
-                'total_late_minutes': total_late_minutes,
-                'justification_provided': justification_provided,
+                'first_arrival_time': row['first_arrival'],
+                'total_late_minutes': late_minutes.get(key, 0),
+                'justification_provided': row['justified'] > 0,
+                'last_updated': now,
             }
-        )
-        
-        return summary
+            summary = existing.get(key)
+            if summary is None:
+                summary = cls(student_id=key[0], date=key[1], **values)
+                to_create.append(summary)
+            else:
+                for field, value in values.items():
+                    setattr(summary, field, value)
+                to_update.append(summary)
+            summaries[key] = summary
+
+        if to_create:
+            cls.objects.bulk_create(to_create)
+        if to_update:
+            cls.objects.bulk_update(to_update, cls.COMPUTED_FIELDS)
+
+        # Plus de sessions ces jours-là : supprimer les résumés obsolètes
+        stale_ids = [summary.pk for key, summary in existing.items() if key not in stats]
+        if stale_ids:
+            cls.objects.filter(pk__in=stale_ids).delete()
+
+        daily_summaries_updated.send(sender=cls, pairs=pairs)
+        return summaries
 
     @property
     def is_problematic(self):
@@ -964,20 +1175,82 @@ class SessionNote(models.Model):
 # ===== SIGNAUX POUR LA MISE À JOUR AUTOMATIQUE DES RÉSUMÉS =====
 
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.dispatch import receiver, Signal
+
+# Émis après chaque recalcul groupé (argument `pairs` : couples (student_id, date))
+daily_summaries_updated = Signal()
+
+
+class DailySummaryBatch:
+    """
+    Lot de couples (élève, date) recalculés en un seul passage groupé
+
+    Ouvert par `with DailySummaryBatch():` (une transaction) : les présences
+    modifiées dans le bloc s'y ajoutent, et le lot est recalculé au commit.
+    Le lot est rattaché à la connexion le temps du bloc et en est retiré à la
+    sortie, que la transaction soit validée ou annulée (rien n'est alors
+    planifié). Les couples ajoutés dans un point de sauvegarde annulé sont
+    recalculés quand même, sans effet : le recalcul relit la base.
+    """
+
+    attribute = 'daily_summary_batch'
+
+    def __init__(self):
+        self.pairs = set()
+        self._atomic = transaction.atomic()
+        self._connection = None
+        self._outer = False
+
+    @classmethod
+    def current(cls):
+        return getattr(transaction.get_connection(), cls.attribute, None)
+
+    def add(self, student_id, date):
+        self.pairs.add((student_id, date))
+
+    def __enter__(self):
+        self._atomic.__enter__()
+        self._connection = transaction.get_connection()
+        # Un lot déjà ouvert (bloc imbriqué) reçoit aussi les couples de celui-ci
+        self._outer = self.current() is None
+        if self._outer:
+            setattr(self._connection, self.attribute, self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._outer:
+            delattr(self._connection, self.attribute)
+            if exc_type is None and self.pairs:
+                pairs, self.pairs = self.pairs, set()
+                transaction.on_commit(partial(DailyAttendanceSummary.recalculate_bulk, pairs))
+        return self._atomic.__exit__(exc_type, exc_value, traceback)
+
+
+def schedule_daily_summary_update(student_id, date):
+    """
+    Planifie le recalcul du résumé d'un élève pour une date
+
+    Dans un DailySummaryBatch, le couple rejoint le lot ; dans une autre
+    transaction, le recalcul est différé au commit ; sinon il est immédiat.
+    """
+    batch = DailySummaryBatch.current()
+    if batch is not None:
+        batch.add(student_id, date)
+        return
+
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(DailyAttendanceSummary.recalculate_bulk, [(student_id, date)]))
+        return
+
+    DailyAttendanceSummary.recalculate_bulk([(student_id, date)])
+
 
 @receiver(post_save, sender=SessionAttendance)
 def update_daily_summary_on_attendance_save(sender, instance, **kwargs):
     """Met à jour le résumé quotidien quand une présence de session est sauvegardée"""
-    DailyAttendanceSummary.calculate_for_student_date(
-        student=instance.student,
-        date=instance.session.date
-    )
+    schedule_daily_summary_update(instance.student_id, instance.session.date)
 
 @receiver(post_delete, sender=SessionAttendance)
 def update_daily_summary_on_attendance_delete(sender, instance, **kwargs):
     """Met à jour le résumé quotidien quand une présence de session est supprimée"""
-    DailyAttendanceSummary.calculate_for_student_date(
-        student=instance.student,
-        date=instance.session.date
-    )
+    schedule_daily_summary_update(instance.student_id, instance.session.date)
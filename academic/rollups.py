@@ -0,0 +1,217 @@
+"""
+Maintenance des cumuls de notes (StudentAcademicRollup)
+
+Chaque note compte dans une cellule (élève, matière, période) ; la période
+est la première, par date de début, qui contient la date de la note (None
+hors de toute période).
+
+- add_grade / remove_grade appliquent l'écart d'une note avec des
+  expressions F() (pas de relecture des notes, pas de course entre deux
+  écritures). Au retrait, minimum, maximum et date de la dernière note sont
+  recalculés dans la même requête UPDATE (sous-requêtes sur la cellule).
+- rebuild_student_rollups recalcule toutes les cellules d'un groupe
+  d'élèves en une agrégation ; rebuild_all_rollups traite tous les élèves
+  par lots.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DateField, DecimalField, F, IntegerField, Max, Min, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Greatest, Least
+
+from accounts.models import Student
+
+from .class_statistics import PERCENTAGE
+from .models import Grade, Period, StudentAcademicRollup
+
+
+def load_periods():
+    """Périodes (id, début, fin) dans l'ordre de rattachement des notes"""
+    return list(Period.objects.order_by('start_date', 'pk').values_list('pk', 'start_date', 'end_date'))
+
+
+def period_id_for(day, periods):
+    """Période d'une date (None hors de toute période)"""
+    for period_id, start_date, end_date in periods:
+        if start_date <= day <= end_date:
+            return period_id
+    return None
+
+
+def _percentage(state):
+    return float(state.score) * 100 / float(state.max_score) if state.max_score else 0.0
+
+
+def _cell(state, period_id):
+    return StudentAcademicRollup.objects.filter(
+        student_id=state.student_id, subject_id=state.subject_id, period_id=period_id
+    )
+
+
+def _cell_grades(state, period_id, periods):
+    """Notes de la cellule (élève, matière, période), en sous-requête"""
+    grades = Grade.objects.filter(student_id=state.student_id, subject_id=state.subject_id)
+    if period_id is not None:
+        bounds = {pk: (start_date, end_date) for pk, start_date, end_date in periods}
+        start_date, end_date = bounds[period_id]
+        grades = grades.filter(date__gte=start_date, date__lte=end_date)
+        # Une période antérieure qui chevauche celle-ci garde ses notes
+        for pk, other_start, other_end in periods:
+            if pk == period_id:
+                break
+            grades = grades.exclude(date__gte=other_start, date__lte=other_end)
+    else:
+        for _, start_date, end_date in periods:
+            grades = grades.exclude(date__gte=start_date, date__lte=end_date)
+    return grades.order_by().values('student_id')
+
+
+def add_grade(state, periods):
+    """Ajoute une note (GradeRollupState) à sa cellule"""
+    if state.student_id is None or state.subject_id is None or state.date is None:
+        return
+    period_id = period_id_for(state.date, periods)
+    score, coefficient = Decimal(state.score), Decimal(state.coefficient)
+    rollup, created = StudentAcademicRollup.objects.get_or_create(
+        student_id=state.student_id, subject_id=state.subject_id, period_id=period_id,
+        defaults={
+            'grade_count': 1,
+            'score_sum': score,
+            'weighted_score_sum': score * coefficient,
+            'coefficient_sum': coefficient,
+            'percentage_sum': _percentage(state),
+            'min_score': score,
+            'max_score': score,
+            'last_grade_date': state.date,
+        }
+    )
+    if created:
+        return
+    score_value = Value(score, output_field=DecimalField(max_digits=5, decimal_places=2))
+    StudentAcademicRollup.objects.filter(pk=rollup.pk).update(
+        grade_count=F('grade_count') + 1,
+        score_sum=F('score_sum') + score,
+        weighted_score_sum=F('weighted_score_sum') + score * coefficient,
+        coefficient_sum=F('coefficient_sum') + coefficient,
+        percentage_sum=F('percentage_sum') + _percentage(state),
+        min_score=Least('min_score', score_value),
+        max_score=Greatest('max_score', score_value),
+        last_grade_date=Greatest('last_grade_date', Value(state.date, output_field=DateField())),
+    )
+
+
+def remove_grade(state, periods):
+    """Retire une note (GradeRollupState) de sa cellule ; supprime la cellule vide"""
+    if state.student_id is None or state.subject_id is None or state.date is None:
+        return
+    period_id = period_id_for(state.date, periods)
+    score, coefficient = Decimal(state.score), Decimal(state.coefficient)
+    remaining = _cell_grades(state, period_id, periods)
+    cell = _cell(state, period_id)
+    cell.update(
+        grade_count=F('grade_count') - 1,
+        score_sum=F('score_sum') - score,
+        weighted_score_sum=F('weighted_score_sum') - score * coefficient,
+        coefficient_sum=F('coefficient_sum') - coefficient,
+        percentage_sum=F('percentage_sum') - _percentage(state),
+        min_score=Subquery(remaining.annotate(value=Min('score')).values('value')),
+        max_score=Subquery(remaining.annotate(value=Max('score')).values('value')),
+        last_grade_date=Subquery(remaining.annotate(value=Max('date')).values('value')),
+    )
+    cell.filter(grade_count__lte=0).delete()
+
+
+def apply_grade_change(old_state, new_state, periods=None):
+    """Répercute la création (old_state None), la modification ou la suppression (new_state None) d'une note"""
+    if old_state == new_state:
+        return
+    periods = load_periods() if periods is None else periods
+    with transaction.atomic():
+        if old_state is not None:
+            remove_grade(old_state, periods)
+        if new_state is not None:
+            add_grade(new_state, periods)
+
+
+def rebuild_student_rollups(student_ids, periods=None):
+    """
+    Recalcule toutes les cellules des élèves indiqués (une agrégation)
+
+    Returns:
+        int: nombre de cellules écrites
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return 0
+    periods = load_periods() if periods is None else periods
+    # Même règle que period_id_for : première période (par date de début) contenant la note
+    rollup_period = Case(
+        *[When(date__gte=start_date, date__lte=end_date, then=Value(pk)) for pk, start_date, end_date in periods],
+        default=Value(None),
+        output_field=IntegerField(),
+    )
+    rows = Grade.objects.filter(student_id__in=student_ids).order_by().annotate(
+        rollup_period=rollup_period
+    ).values('student_id', 'subject_id', 'rollup_period').annotate(
+        total_grades=Count('id'),
+        total_score=Sum('score'),
+        total_weighted=Sum(F('score') * F('coefficient'), output_field=DecimalField(max_digits=14, decimal_places=3)),
+        total_coefficients=Sum('coefficient'),
+        total_percentage=Sum(PERCENTAGE),
+        lowest=Min('score'),
+        highest=Max('score'),
+        last_date=Max('date'),
+    )
+    rollups = [
+        StudentAcademicRollup(
+            student_id=row['student_id'],
+            subject_id=row['subject_id'],
+            period_id=row['rollup_period'],
+            grade_count=row['total_grades'],
+            score_sum=row['total_score'],
+            weighted_score_sum=row['total_weighted'],
+            coefficient_sum=row['total_coefficients'],
+            percentage_sum=row['total_percentage'],
+            min_score=row['lowest'],
+            max_score=row['highest'],
+            last_grade_date=row['last_date'],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        StudentAcademicRollup.objects.filter(student_id__in=student_ids).delete()
+        StudentAcademicRollup.objects.bulk_create(rollups, batch_size=500)
+    return len(rollups)
+
+
+def rebuild_all_rollups(chunk_size=200, on_chunk=None):
+    """
+    Recalcule les cumuls de tous les élèves, par lots de `chunk_size` élèves
+
+    Args:
+        on_chunk: appelé avec (élèves traités, cellules écrites) après chaque lot
+
+    Returns:
+        tuple: (nombre d'élèves, nombre de cellules)
+    """
+    periods = load_periods()
+    student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+    # Cumuls d'élèves supprimés entre-temps (normalement supprimés en cascade)
+    StudentAcademicRollup.objects.exclude(student_id__in=Student.objects.values('pk')).delete()
+    total = 0
+    for start in range(0, len(student_ids), chunk_size):
+        chunk = student_ids[start:start + chunk_size]
+        total += rebuild_student_rollups(chunk, periods)
+        if on_chunk:
+            on_chunk(start + len(chunk), total)
+    return len(student_ids), total
+
+
+def rebuild_rollups_between(start_date, end_date):
+    """Recalcule les cumuls des élèves notés entre deux dates (périodes modifiées)"""
+    student_ids = Grade.objects.filter(
+        date__gte=start_date, date__lte=end_date
+    ).order_by().values_list('student_id', flat=True).distinct()
+    return rebuild_student_rollups(student_ids)
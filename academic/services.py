@@ -0,0 +1,50 @@
+"""
+Services métier du module Academic
+
+Fonctions réutilisables par les vues pour les opérations d'écriture groupées.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from .models import SessionAttendance
+
+
+def record_roll_call(session, students, data, recorded_by, existing=None):
+    """
+    Enregistre l'appel d'une session à partir des données soumises
+
+    Le nombre de requêtes est constant quelle que soit la taille de la classe :
+    un bulk_create, un bulk_update, un recalcul groupé des résumés quotidiens
+    et la mise à jour de la session.
+
+    Args:
+        session: Session dont on prend l'appel
+        students: élèves de la classe (itérable de Student)
+        data: données du formulaire (`status_<id>`, `arrival_time_<id>`, `notes_<id>`)
+        recorded_by: utilisateur qui prend l'appel
+        existing: dict {student_id: SessionAttendance} déjà chargé (optionnel)
+
+    Returns:
+        tuple: (présences créées, présences mises à jour)
+    """
+    roll_call = {}
+    for student in students:
+        arrival_time = data.get(f'arrival_time_{student.pk}') or None
+        roll_call[student.pk] = {
+            'status': data.get(f'status_{student.pk}', 'ABSENT'),
+            'arrival_time': parse_time(arrival_time) if arrival_time else None,
+            'notes': data.get(f'notes_{student.pk}', ''),
+        }
+
+    with transaction.atomic():
+        created, updated = SessionAttendance.bulk_record(
+            session, roll_call, recorded_by, existing=existing
+        )
+
+        # Marquer l'appel comme effectué
+        session.attendance_taken = True
+        session.attendance_taken_at = timezone.now()
+        session.save(update_fields=['attendance_taken', 'attendance_taken_at', 'updated_at'])
+
+    return created, updated
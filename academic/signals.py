@@ -0,0 +1,106 @@
+"""
+Signaux du module academic
+
+- Invalidation des statistiques de classe mises en cache (class_statistics)
+  quand une note est écrite ou qu'un élève change de classe. Une nouvelle
+  classe reçoit sa propre version (un identifiant peut être réutilisé).
+- Maintien des cumuls de notes (StudentAcademicRollup) à chaque écriture
+  d'une note, et recalcul des élèves concernés quand une période change.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Student
+
+from .class_statistics import invalidate_class_statistics
+from .models import ClassRoom, Grade, Period
+from .rollups import apply_grade_change, rebuild_rollups_between
+
+
+def _grade_classrooms(grade):
+    """Classe de la note et classe actuelle de l'élève (filtre de class_grades)"""
+    if Grade.student.is_cached(grade):
+        current_class_id = grade.student.current_class_id
+    else:
+        current_class_id = Student.objects.filter(pk=grade.student_id).values_list(
+            'current_class_id', flat=True
+        ).first()
+    return {grade.classroom_id, current_class_id}
+
+
+@receiver(post_save, sender=Grade, dispatch_uid='academic_class_stats_grade_save')
+@receiver(post_delete, sender=Grade, dispatch_uid='academic_class_stats_grade_delete')
+def invalidate_class_statistics_on_grade_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_class_statistics(_grade_classrooms(instance))
+
+
+@receiver(post_save, sender=Student, dispatch_uid='academic_class_stats_student_save')
+def invalidate_class_statistics_on_student_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Un élève qui change de classe emporte ses notes : ancienne classe inconnue, tout est invalidé"""
+    if raw or created:
+        return
+    if update_fields is None or 'current_class' in update_fields:
+        invalidate_class_statistics()
+
+
+@receiver(post_save, sender=ClassRoom, dispatch_uid='academic_class_stats_classroom_save')
+def invalidate_class_statistics_on_classroom_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        invalidate_class_statistics([instance.pk])
+
+
+@receiver(pre_save, sender=Grade, dispatch_uid='academic_rollup_grade_pre_save')
+def capture_grade_rollup_state(sender, instance, raw=False, **kwargs):
+    """État de la note avant la sauvegarde (chargé avec l'instance si possible)"""
+    if raw or instance._state.adding:
+        instance._previous_rollup_state = None
+        return
+    state = getattr(instance, '_loaded_rollup_state', None)
+    if state is None:
+        previous = Grade.objects.filter(pk=instance.pk).first()
+        state = previous.get_rollup_state() if previous else None
+    instance._previous_rollup_state = state
+
+
+@receiver(post_save, sender=Grade, dispatch_uid='academic_rollup_grade_save')
+def update_rollups_on_grade_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_state = instance.get_rollup_state()
+    apply_grade_change(None if created else getattr(instance, '_previous_rollup_state', None), new_state)
+    instance._loaded_rollup_state = new_state
+
+
+@receiver(post_delete, sender=Grade, dispatch_uid='academic_rollup_grade_delete')
+def update_rollups_on_grade_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_loaded_rollup_state', None) or instance.get_rollup_state()
+    apply_grade_change(state, None)
+
+
+@receiver(pre_save, sender=Period, dispatch_uid='academic_rollup_period_pre_save')
+def capture_period_bounds(sender, instance, raw=False, **kwargs):
+    instance._previous_bounds = None
+    if not raw and not instance._state.adding:
+        instance._previous_bounds = Period.objects.filter(pk=instance.pk).values_list(
+            'start_date', 'end_date'
+        ).first()
+
+
+@receiver(post_save, sender=Period, dispatch_uid='academic_rollup_period_save')
+def rebuild_rollups_on_period_save(sender, instance, created, raw=False, **kwargs):
+    """Les notes couvertes par la période (avant et après modification) changent de cellule"""
+    if raw:
+        return
+    bounds = (instance.start_date, instance.end_date)
+    previous = getattr(instance, '_previous_bounds', None)
+    if previous == bounds:
+        return
+    if previous:
+        bounds = (min(bounds[0], previous[0]), max(bounds[1], previous[1]))
+    rebuild_rollups_between(*bounds)
+
+
+@receiver(post_delete, sender=Period, dispatch_uid='academic_rollup_period_delete')
+def rebuild_rollups_on_period_delete(sender, instance, **kwargs):
+    rebuild_rollups_between(instance.start_date, instance.end_date)
@@ -1,4 +1,5 @@
 from django import template
+from academic.attendance_matrix import MATRIX_ATTRIBUTE
 from academic.models import SessionAttendance
 
 register = template.Library()
@@ -14,7 +15,16 @@ def subtract(value, arg):
 
 @register.filter
 def get_student_attendance(session, student):
-    """Récupère la présence d'un étudiant pour une session donnée"""
+    """
+    Récupère la présence d'un étudiant pour une session donnée
+
+    Sans requête si la vue a préchargé la matrice des présences
+    (academic.attendance_matrix.prefetch_attendance_matrix), sinon une
+    requête par appel.
+    """
+    matrix = getattr(session, MATRIX_ATTRIBUTE, None)
+    if matrix is not None and matrix.covers(session, student):
+        return matrix.get(session, student)
     try:
         return SessionAttendance.objects.get(session=session, student=student)
     except SessionAttendance.DoesNotExist:
@@ -0,0 +1,142 @@
+"""
+Tests pour la matrice des présences (academic.attendance_matrix)
+"""
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Student, Teacher
+from .attendance_matrix import AttendanceMatrix, prefetch_attendance_matrix
+from .models import (
+    AcademicYear, ClassRoom, Enrollment, Level, Period, Session, SessionAttendance, Subject, Timetable,
+)
+
+User = get_user_model()
+
+GRID_TEMPLATE = Template(
+    '{% load academic_extras %}'
+    '{% for session in sessions %}{% for student in students %}'
+    '{% with attendance=session|get_student_attendance:student %}{{ attendance.status|default:"-" }} {% endwith %}'
+    '{% endfor %}{% endfor %}'
+)
+
+STATUSES = ['PRESENT', 'ABSENT', 'LATE', 'EXCUSED']
+
+
+class AttendanceMatrixTest(TestCase):
+    """Tests pour le chargement et la lecture de la matrice"""
+
+    @classmethod
+    def setUpTestData(cls):
+        academic_year = AcademicYear.objects.create(
+            name="2024-2025", start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        level = Level.objects.create(name="6ème", order=6)
+        cls.classroom = ClassRoom.objects.create(name="6ème A", level=level, academic_year=academic_year)
+        subject = Subject.objects.create(name="Mathématiques", code="MATH")
+        cls.teacher_user = User.objects.create_user(email="teacher@example.com", password="x", role="TEACHER")
+        teacher = Teacher.objects.create(user=cls.teacher_user, employee_id="TEA20240001")
+        cls.timetable = Timetable.objects.create(
+            classroom=cls.classroom, subject=subject, teacher=teacher,
+            weekday=1, start_time=time(8), end_time=time(9)
+        )
+        cls.period = Period.objects.create(
+            name="Trimestre 1", academic_year=academic_year,
+            start_date=date(2024, 9, 1), end_date=date(2024, 12, 20)
+        )
+        cls.students = [
+            Student.objects.create(
+                user=User.objects.create_user(
+                    email=f"student{index}@example.com", password="testpass123", role="STUDENT"
+                ),
+                matricule=f"STU2024{index:04d}", current_class=cls.classroom
+            )
+            for index in range(6)
+        ]
+        Enrollment.objects.create(student=cls.students[0], classroom=cls.classroom, academic_year=academic_year)
+        cls.sessions = [
+            Session.objects.create(
+                timetable=cls.timetable, period=cls.period, date=date(2024, 9, 2) + timedelta(weeks=index),
+                status='COMPLETED'
+            )
+            for index in range(8)
+        ]
+        # Pas de présence pour la dernière case de chaque ligne
+        for row, session in enumerate(cls.sessions):
+            for column, student in enumerate(cls.students[:-1]):
+                SessionAttendance.objects.create(
+                    session=session, student=student, status=STATUSES[(row + column) % 4],
+                    recorded_by=cls.teacher_user
+                )
+
+    def test_dense_lookup(self):
+        """Une requête ; cellules, lignes et colonnes lues sans requête"""
+        with CaptureQueriesContext(connection) as ctx:
+            matrix = AttendanceMatrix.load(self.sessions[:3], self.students)
+            self.assertEqual(matrix.get(self.sessions[1], self.students[2]).status, STATUSES[3])
+            self.assertIsNone(matrix.get(self.sessions[1], self.students[-1]))
+            self.assertEqual(
+                [attendance.status for attendance in matrix.column(self.students[0].pk)],
+                STATUSES[:3]
+            )
+            self.assertIsNone(matrix.row(self.sessions[0])[-1])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(len(matrix), 15)
+        self.assertTrue(matrix.covers(self.sessions[0], self.students[-1]))
+        self.assertFalse(matrix.covers(self.sessions[5], self.students[0]))
+
+    def _render_grid(self, n_sessions, n_students):
+        sessions = list(Session.objects.filter(pk__in=[s.pk for s in self.sessions[:n_sessions]]).order_by('date'))
+        students = self.students[:n_students]
+        with CaptureQueriesContext(connection) as ctx:
+            prefetch_attendance_matrix(sessions, students)
+            output = GRID_TEMPLATE.render(Context({'sessions': sessions, 'students': students}))
+        return output.split(), len(ctx.captured_queries)
+
+    def test_filter_queries_constant(self):
+        """Le filtre lit la matrice : une requête quelle que soit la taille de la grille"""
+        small, small_queries = self._render_grid(2, 2)
+        large, large_queries = self._render_grid(8, 6)
+        self.assertEqual(small_queries, 1)
+        self.assertEqual(large_queries, 1)
+        self.assertEqual(small, ['PRESENT', 'ABSENT', 'ABSENT', 'LATE'])
+        self.assertEqual(len(large), 48)
+        self.assertEqual(large[5], '-')
+
+    def test_filter_without_matrix(self):
+        """Sans matrice préchargée, le filtre fait une requête par cellule"""
+        with CaptureQueriesContext(connection) as ctx:
+            output = GRID_TEMPLATE.render(Context({'sessions': self.sessions[:1], 'students': self.students[-2:]}))
+        self.assertEqual(output.split(), ['PRESENT', '-'])
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_student_sessions_view(self):
+        """La liste des séances de l'élève ne fait pas une requête par séance"""
+        self.client.login(email="student0@example.com", password="testpass123")
+        url = reverse('academic:student_sessions') + '?period=all'
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return response, len(ctx.captured_queries)
+
+        Session.objects.filter(pk__in=[session.pk for session in self.sessions[2:]]).delete()
+        response, few = count_queries()
+        self.assertContains(response, 'Présent(e)')
+        for index in range(2, 8):
+            session = Session.objects.create(
+                timetable=self.timetable, period=self.period, date=date(2024, 9, 2) + timedelta(weeks=index),
+                status='COMPLETED'
+            )
+            SessionAttendance.objects.create(
+                session=session, student=self.students[0], status='LATE', recorded_by=self.teacher_user
+            )
+        response, many = count_queries()
+        self.assertContains(response, 'En retard')
+        self.assertEqual(few, many)
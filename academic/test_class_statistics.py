@@ -0,0 +1,149 @@
+"""
+Tests pour les statistiques de classe (academic.class_statistics)
+"""
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Student, Teacher
+from core.caching import LOCAL_CACHE_TTL
+from . import class_statistics
+from .class_statistics import compute_class_statistics, get_class_statistics
+from .models import AcademicYear, ClassRoom, Grade, Level, Subject
+
+User = get_user_model()
+
+
+class ClassStatisticsTest(TestCase):
+    """Tests pour les moyennes, effectifs et dernières notes d'une classe"""
+
+    def setUp(self):
+        academic_year = AcademicYear.objects.create(
+            name="2024-2025",
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 7, 31),
+            is_current=True
+        )
+        level = Level.objects.create(name="6ème", order=6)
+        self.classroom = ClassRoom.objects.create(name="6ème A", level=level, academic_year=academic_year)
+        self.other_classroom = ClassRoom.objects.create(name="6ème B", level=level, academic_year=academic_year)
+        self.math = Subject.objects.create(name="Mathématiques", code="MATH")
+        self.french = Subject.objects.create(name="Français", code="FR")
+        teacher_user = User.objects.create_user(
+            email="teacher@example.com", password="testpass123", role="TEACHER"
+        )
+        self.teacher = Teacher.objects.create(user=teacher_user, employee_id="TEA20240001")
+        self.students = self._create_students(2)
+
+    def _create_students(self, count, offset=0):
+        return [
+            Student.objects.create(
+                user=User.objects.create_user(
+                    email=f"student{i}@example.com", password="testpass123",
+                    first_name="Élève", last_name=f"{i}", role="STUDENT"
+                ),
+                matricule=f"STU2024{i:04d}", current_class=self.classroom
+            )
+            for i in range(offset, offset + count)
+        ]
+
+    def _grade(self, student, subject, score, on, max_score='20', evaluation_type='TEST'):
+        return Grade.objects.create(
+            student=student, subject=subject, teacher=self.teacher, classroom=self.classroom,
+            evaluation_name="Contrôle", evaluation_type=evaluation_type,
+            score=Decimal(score), max_score=Decimal(max_score), date=on
+        )
+
+    def test_averages_counts_and_recent_grades(self):
+        """Moyennes en pourcentage, effectifs et trois dernières notes par élève"""
+        first, second = self.students
+        self._grade(first, self.math, '10', date(2024, 10, 1))
+        self._grade(first, self.math, '20', date(2024, 10, 2), max_score='30')
+        self._grade(first, self.french, '15', date(2024, 10, 3))
+        latest = self._grade(first, self.french, '12', date(2024, 10, 4), evaluation_type='EXAM')
+        self._grade(second, self.math, '8', date(2024, 10, 1))
+
+        stats = compute_class_statistics(self.classroom)
+        first_stats = stats['students'][first.pk]
+        self.assertEqual(first_stats['grades_count'], 4)
+        # (50 + 66.67 + 75 + 60) / 4
+        self.assertAlmostEqual(first_stats['average'], (50 + 200 / 3 + 75 + 60) / 4)
+        self.assertEqual(len(first_stats['recent_grades']), 3)
+        self.assertEqual(first_stats['recent_grades'][0]['id'], latest.pk)
+        self.assertAlmostEqual(first_stats['recent_grades'][2]['percentage'], 200 / 3)
+        self.assertEqual(stats['students'][second.pk]['average'], 40.0)
+        self.assertAlmostEqual(stats['class_average'], (first_stats['average'] + 40.0) / 2)
+
+        filtered = compute_class_statistics(self.classroom, self.math.pk, 'TEST')
+        self.assertEqual(filtered['students'][first.pk]['grades_count'], 2)
+
+    def test_two_queries_regardless_of_class_size(self):
+        """Agrégat et fenêtre : deux requêtes pour 2 comme pour 12 élèves"""
+        for student in self.students + self._create_students(10, offset=2):
+            self._grade(student, self.math, '12', date(2024, 10, 1))
+            self._grade(student, self.math, '14', date(2024, 10, 2))
+        with CaptureQueriesContext(connection) as ctx:
+            stats = compute_class_statistics(self.classroom)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(len(stats['students']), 12)
+
+    def test_cache_invalidated_on_grade_write(self):
+        """Lecture en cache, invalidée par l'écriture d'une note de la classe"""
+        first = self.students[0]
+        grade = self._grade(first, self.math, '10', date(2024, 10, 1))
+        self.assertEqual(get_class_statistics(self.classroom)['students'][first.pk]['average'], 50.0)
+        with CaptureQueriesContext(connection) as ctx:
+            get_class_statistics(self.classroom)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        grade.score = Decimal('16')
+        grade.save()
+        self.assertEqual(get_class_statistics(self.classroom)['students'][first.pk]['average'], 80.0)
+        grade.delete()
+        self.assertEqual(get_class_statistics(self.classroom)['students'], {})
+
+    def test_cache_invalidated_on_class_change(self):
+        """Un élève qui change de classe emporte ses notes"""
+        first = self.students[0]
+        self._grade(first, self.math, '10', date(2024, 10, 1))
+        self.assertIn(first.pk, get_class_statistics(self.classroom)['students'])
+        first.current_class = self.other_classroom
+        first.save()
+        self.assertNotIn(first.pk, get_class_statistics(self.classroom)['students'])
+        self.assertIn(first.pk, get_class_statistics(self.other_classroom)['students'])
+
+    def test_short_lived_in_process_local_cache(self):
+        """LocMemCache : une note saisie dans un autre processus n'invalide pas celui-ci"""
+        cache.clear()
+        with mock.patch.object(class_statistics.cache, 'set', wraps=class_statistics.cache.set) as cache_set, \
+                mock.patch.object(class_statistics.cache, 'add', wraps=class_statistics.cache.add) as cache_add:
+            get_class_statistics(self.classroom)
+        timeouts = [call.args[2] for call in cache_set.call_args_list + cache_add.call_args_list]
+        self.assertEqual(timeouts, [LOCAL_CACHE_TTL] * 3)
+
+    def test_class_grades_view_constant_queries(self):
+        """Le nombre de requêtes de la vue ne dépend pas de la taille de la classe"""
+        User.objects.create_user(email="admin@example.com", password="testpass123", role="ADMIN")
+        self.client.login(email="admin@example.com", password="testpass123")
+        url = reverse('academic:class_grades', args=[self.classroom.pk])
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries)
+
+        for student in self.students:
+            self._grade(student, self.math, '12', date(2024, 10, 1))
+        small = count_queries()
+        for student in self._create_students(8, offset=2):
+            self._grade(student, self.math, '12', date(2024, 10, 1))
+            self._grade(student, self.french, '9', date(2024, 10, 2))
+        self.assertEqual(count_queries(), small)
@@ -0,0 +1,245 @@
+"""
+Tests pour le calcul vectorisé des moyennes (academic.grading)
+"""
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Parent, Student, Teacher
+from .bulletins import generate_bulletins
+from .grading import average_scores_by_student, build_class_bulletins, build_student_grade_report
+from .management.commands.benchmark_grade_aggregation import (
+    engine_report_averages, legacy_report_averages, seed_student,
+)
+from .models import AcademicYear, ClassRoom, Grade, Level, Period, Subject
+
+User = get_user_model()
+
+
+class StudentGradeReportTest(TestCase):
+    """Tests pour les moyennes du bulletin"""
+
+    def setUp(self):
+        self.academic_year = AcademicYear.objects.create(
+            name="2024-2025",
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 7, 31),
+            is_current=True
+        )
+        level = Level.objects.create(name="6ème", order=6)
+        self.classroom = ClassRoom.objects.create(
+            name="6ème A", level=level, academic_year=self.academic_year
+        )
+        self.math = Subject.objects.create(name="Mathématiques", code="MATH", coefficient=Decimal('3.0'))
+        self.french = Subject.objects.create(name="Français", code="FR", coefficient=Decimal('2.0'))
+        teacher_user = User.objects.create_user(
+            email="teacher@example.com", password="testpass123", role="TEACHER"
+        )
+        self.teacher = Teacher.objects.create(user=teacher_user, employee_id="TEA20240001")
+        self.student_user = User.objects.create_user(
+            email="student@example.com", password="testpass123", role="STUDENT"
+        )
+        self.student = Student.objects.create(
+            user=self.student_user, matricule="STU20240001", current_class=self.classroom
+        )
+        self.periods = [
+            Period.objects.create(
+                name="Trimestre 1", academic_year=self.academic_year,
+                start_date=date(2024, 9, 1), end_date=date(2024, 12, 20)
+            ),
+            Period.objects.create(
+                name="Trimestre 2", academic_year=self.academic_year,
+                start_date=date(2025, 1, 6), end_date=date(2025, 3, 28)
+            ),
+        ]
+        # Trimestre 1 : maths 12 (coef 1) et 18 (coef 2) -> 16 ; français 10 -> 10
+        # Trimestre 2 : maths 14 -> 14 ; note du 2 janvier hors période
+        self._grade(self.student, self.math, '12', '1', date(2024, 10, 1))
+        self._grade(self.student, self.math, '18', '2', date(2024, 11, 5))
+        self._grade(self.student, self.french, '10', '1', date(2024, 10, 8))
+        self._grade(self.student, self.math, '14', '1', date(2025, 2, 3))
+        self._grade(self.student, self.french, '16', '1', date(2025, 1, 2))
+
+    def _grade(self, student, subject, score, coefficient, on):
+        return Grade.objects.create(
+            student=student, subject=subject, teacher=self.teacher, classroom=self.classroom,
+            evaluation_name="Contrôle", evaluation_type="TEST",
+            score=Decimal(score), coefficient=Decimal(coefficient), date=on
+        )
+
+    def test_period_and_annual_averages(self):
+        """Moyennes par matière, par période et annuelle calculées à la main"""
+        report = build_student_grade_report(self.student, self.periods)
+
+        first, second = report.period_stats
+        self.assertEqual(first[self.math.pk].weighted_average, 16.0)
+        self.assertEqual(first[self.math.pk].average, 15.0)
+        self.assertEqual(first[self.math.pk].count, 2)
+        self.assertEqual(first[self.math.pk].best_score, 18.0)
+        self.assertEqual(first[self.french.pk].weighted_average, 10.0)
+        self.assertEqual(list(second), [self.math.pk])
+        # (16 x 3 + 10 x 2) / 5 = 13.6 ; puis 14
+        self.assertEqual(report.period_averages, [13.6, 14.0])
+        self.assertEqual(report.annual_average, 13.8)
+        self.assertEqual(report.general_average, 14.0)
+        self.assertEqual(report.total_evaluations, 5)
+        self.assertEqual(len(report.grades_for(self.french.pk)), 2)
+        self.assertEqual(len(report.grades_for(self.french.pk, 0)), 1)
+
+    def test_report_uses_constant_queries(self):
+        """Notes et matières chargées en deux requêtes, quel que soit le volume"""
+        with CaptureQueriesContext(connection) as ctx:
+            build_student_grade_report(self.student, self.periods)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_matches_legacy_computation(self):
+        """Résultats identiques à l'ancien calcul sur un jeu de données plus large"""
+        student, periods = seed_student(n_subjects=6, n_periods=3, grades_per_cell=3)
+        self.assertEqual(
+            engine_report_averages(student, periods),
+            legacy_report_averages(student, periods)
+        )
+
+    def test_average_scores_by_student(self):
+        """Moyenne simple des notes de plusieurs élèves en une requête"""
+        other = Student.objects.create(
+            user=User.objects.create_user(email="other@example.com", password="x", role="STUDENT"),
+            matricule="STU20240002", current_class=self.classroom
+        )
+        self._grade(other, self.math, '8', '1', date(2024, 10, 1))
+        with CaptureQueriesContext(connection) as ctx:
+            averages = average_scores_by_student([self.student.pk, other.pk])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(averages, {self.student.pk: 14.0, other.pk: 8.0})
+
+    def test_report_card_and_child_detail_render(self):
+        """Le bulletin et la fiche enfant s'affichent avec les moyennes calculées"""
+        self.client.login(email="student@example.com", password="testpass123")
+        response = self.client.get(reverse('accounts:student_report_card'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['annual_average'], 13.8)
+
+        parent_user = User.objects.create_user(
+            email="parent@example.com", password="testpass123", role="PARENT"
+        )
+        parent = Parent.objects.create(user=parent_user)
+        self.student.parents.add(parent)
+        self.client.login(email="parent@example.com", password="testpass123")
+        response = self.client.get(reverse('accounts:parent_child_detail', args=[self.student.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class ClassBulletinsTest(TestCase):
+    """Tests pour les bulletins de classe (moyennes, statistiques et rangs)"""
+
+    def setUp(self):
+        academic_year = AcademicYear.objects.create(
+            name="2024-2025",
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 7, 31),
+            is_current=True
+        )
+        level = Level.objects.create(name="6ème", order=6)
+        self.classroom = ClassRoom.objects.create(name="6ème A", level=level, academic_year=academic_year)
+        self.math = Subject.objects.create(name="Mathématiques", code="MATH", coefficient=Decimal('2.0'))
+        self.french = Subject.objects.create(name="Français", code="FR", coefficient=Decimal('1.0'))
+        self.admin = User.objects.create_user(email="admin@example.com", password="testpass123", role="ADMIN")
+        teacher_user = User.objects.create_user(
+            email="teacher@example.com", password="testpass123", role="TEACHER"
+        )
+        self.teacher = Teacher.objects.create(user=teacher_user, employee_id="TEA20240001")
+        self.period = Period.objects.create(
+            name="Trimestre 1", academic_year=academic_year,
+            start_date=date(2024, 9, 1), end_date=date(2024, 12, 20), is_current=True
+        )
+        self.students = [
+            Student.objects.create(
+                user=User.objects.create_user(
+                    email=f"student{i}@example.com", password="testpass123",
+                    first_name="Élève", last_name=name, role="STUDENT"
+                ),
+                matricule=f"STU2024{i:04d}", current_class=self.classroom
+            )
+            for i, name in enumerate(["Alpha", "Bravo", "Charlie", "Delta"])
+        ]
+        alpha, bravo, charlie, _ = self.students
+        # Alpha : maths 15, français 12 -> (30 + 12) / 3 = 14
+        # Bravo : maths 12 (coef 1) et 18 (coef 2) -> 16, français 10 -> 14
+        # Charlie : maths 8 -> 8 ; Delta : aucune note
+        self._grade(alpha, self.math, '15', '1')
+        self._grade(alpha, self.french, '12', '1')
+        self._grade(bravo, self.math, '12', '1')
+        self._grade(bravo, self.math, '18', '2')
+        self._grade(bravo, self.french, '10', '1')
+        self._grade(charlie, self.math, '8', '1')
+        # Hors période : ignorée
+        self._grade(charlie, self.math, '20', '1', date(2025, 2, 1))
+
+    def _grade(self, student, subject, score, coefficient, on=date(2024, 10, 1)):
+        return Grade.objects.create(
+            student=student, subject=subject, teacher=self.teacher, classroom=self.classroom,
+            evaluation_name="Contrôle", evaluation_type="TEST",
+            score=Decimal(score), coefficient=Decimal(coefficient), date=on
+        )
+
+    def test_averages_statistics_and_ranks(self):
+        """Moyennes, statistiques de classe et rangs ex aequo"""
+        alpha, bravo, charlie, delta = self.students
+        report = build_class_bulletins(self.classroom, self.period)
+
+        self.assertEqual(
+            [(bulletin.student, bulletin.general_average, bulletin.rank) for bulletin in report.bulletins],
+            [(alpha, 14.0, 1), (bravo, 14.0, 1), (charlie, 8.0, 3), (delta, None, None)]
+        )
+        self.assertEqual(report.class_average, 12.0)
+        self.assertEqual((report.min_average, report.max_average), (8.0, 14.0))
+
+        math = {result.subject: result for result in report.for_student(bravo.pk).subjects}[self.math]
+        self.assertEqual((math.average, math.rank, math.count), (16.0, 1, 2))
+        self.assertEqual((math.class_average, math.class_min, math.class_max), (13.0, 8.0, 16.0))
+        self.assertEqual(report.for_student(delta.pk).subjects, [])
+        self.assertEqual(report.for_student(delta.pk).class_size, 4)
+
+    def test_constant_queries(self):
+        """Notes, élèves et matières : trois requêtes quelle que soit la taille de la classe"""
+        with CaptureQueriesContext(connection) as ctx:
+            build_class_bulletins(self.classroom, self.period)
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+    def test_views(self):
+        """Bulletin et rapport de classe pour l'administration, accès limité pour les élèves"""
+        alpha, bravo = self.students[:2]
+        self.client.login(email="admin@example.com", password="testpass123")
+        response = self.client.get(reverse('academic:class_report', args=[self.classroom.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report'].class_average, 12.0)
+        response = self.client.get(reverse('academic:student_bulletin', args=[bravo.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['bulletin'].rank, 1)
+
+        self.client.login(email="student0@example.com", password="testpass123")
+        response = self.client.get(reverse('academic:student_bulletin', args=[alpha.pk]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('academic:student_bulletin', args=[bravo.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_generate_bulletins(self):
+        """Un fichier par élève, pour chaque classe de l'année"""
+        with tempfile.TemporaryDirectory() as root:
+            results = generate_bulletins(self.period, workers=1, root=root)
+            self.assertEqual(results, {self.classroom.pk: 4})
+            files = sorted(path.name for path in Path(root).rglob('*.html'))
+            self.assertEqual(files, [f"stu2024{i:04d}.html" for i in range(4)])
+
+            out = StringIO()
+            call_command('generate_bulletins', '--workers', '1', '--output-dir', root, stdout=out)
+            self.assertIn('4 bulletin(s) pour 1 classe(s)', out.getvalue())
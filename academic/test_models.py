@@ -13,7 +13,7 @@ from accounts.models import Teacher, Student, Parent
 from .models import (
     AcademicYear, Level, Subject, ClassRoom, TeacherAssignment,
     Enrollment, Timetable, Attendance, Grade, Document, DocumentAccess,
-    Period
+    Period, Session, SessionAttendance, DailyAttendanceSummary
 )
 
 User = get_user_model()
@@ -898,3 +898,155 @@ class AcademicModelRelationsTest(TestCase):
         self.assertEqual(self.student.current_class, self.classroom)
         self.assertIn(self.student, self.classroom.students.all())
 
+
+
+class DailyAttendanceSummaryModelTest(TestCase):
+    """Tests pour le recalcul groupé des résumés quotidiens de présence"""
+    
+    def setUp(self):
+        self.academic_year = AcademicYear.objects.create(
+            name="2024-2025",
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 7, 31),
+            is_current=True
+        )
+        self.level = Level.objects.create(name="6ème", order=6)
+        self.subject = Subject.objects.create(name="Mathématiques", code="MATH")
+        self.classroom = ClassRoom.objects.create(
+            name="6ème A",
+            level=self.level,
+            academic_year=self.academic_year
+        )
+        teacher_user = User.objects.create_user(
+            email="teacher@example.com",
+            password="testpass123",
+            first_name="Jean",
+            last_name="Professeur",
+            role="TEACHER"
+        )
+        self.teacher = Teacher.objects.create(user=teacher_user, employee_id="TEA20240001")
+        self.period = Period.objects.create(
+            name="Trimestre 1",
+            academic_year=self.academic_year,
+            start_date=date(2024, 9, 1),
+            end_date=date(2024, 12, 20)
+        )
+        self.day = date(2024, 10, 7)
+        self.sessions = []
+        for hour in (8, 10):
+            timetable = Timetable.objects.create(
+                classroom=self.classroom,
+                subject=self.subject,
+                teacher=self.teacher,
+                weekday=1,
+                start_time=f"{hour:02d}:00",
+                end_time=f"{hour + 1:02d}:00"
+            )
+            self.sessions.append(
+                Session.objects.create(timetable=timetable, period=self.period, date=self.day)
+            )
+        self.students = []
+        for i in range(5):
+            user = User.objects.create_user(
+                email=f"student{i}@example.com",
+                password="testpass123",
+                first_name="Élève",
+                last_name=f"{i}",
+                role="STUDENT"
+            )
+            self.students.append(
+                Student.objects.create(user=user, matricule=f"STU2024{i:04d}", current_class=self.classroom)
+            )
+        self.recorder = teacher_user
+    
+    def _record(self, session, student, status, arrival_time=None, justification=''):
+        return SessionAttendance.objects.create(
+            session=session,
+            student=student,
+            status=status,
+            arrival_time=arrival_time,
+            justification=justification,
+            recorded_by=self.recorder
+        )
+    
+    def _recalculations(self, callbacks):
+        return [
+            callback for callback in callbacks
+            if getattr(callback, 'func', None) == DailyAttendanceSummary.recalculate_bulk
+        ]
+    
+    def test_recalculate_bulk_statistics(self):
+        """Test des statistiques calculées en un seul passage"""
+        with self.captureOnCommitCallbacks(execute=False):
+            student = self.students[0]
+            self._record(self.sessions[0], student, 'LATE', arrival_time="08:15")
+            self._record(self.sessions[1], student, 'ABSENT', justification="Malade")
+        
+        summaries = DailyAttendanceSummary.recalculate_bulk([(student, self.day)])
+        summary = summaries[(student.pk, self.day)]
+        
+        self.assertEqual(summary.total_sessions, 2)
+        self.assertEqual(summary.late_sessions, 1)
+        self.assertEqual(summary.absent_sessions, 1)
+        self.assertEqual(summary.total_late_minutes, 15)
+        self.assertEqual(summary.attendance_rate, Decimal('50.00'))
+        self.assertEqual(summary.daily_status, 'MOSTLY_ABSENT')
+        self.assertTrue(summary.justification_provided)
+        self.assertEqual(DailyAttendanceSummary.objects.get(student=student).total_sessions, 2)
+    
+    def test_roll_call_coalesced_into_single_batch(self):
+        """Les présences d'un appel sont recalculées en un seul lot au commit"""
+        from .models import DailySummaryBatch
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with DailySummaryBatch():
+                for student in self.students:
+                    self._record(self.sessions[0], student, 'PRESENT')
+        
+        self.assertEqual(len(self._recalculations(callbacks)), 1)
+        self.assertIsNone(DailySummaryBatch.current())
+        self.assertEqual(DailyAttendanceSummary.objects.filter(date=self.day).count(), 5)
+        self.assertEqual(
+            DailyAttendanceSummary.objects.filter(daily_status='FULLY_PRESENT').count(), 5
+        )
+    
+    def test_batch_discarded_on_rollback(self):
+        """Un lot annulé n'est pas planifié et ne reste pas attaché à la connexion"""
+        from .models import DailySummaryBatch
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError):
+                with DailySummaryBatch():
+                    self._record(self.sessions[0], self.students[0], 'PRESENT')
+                    raise ValueError
+            self.assertIsNone(DailySummaryBatch.current())
+            with DailySummaryBatch():
+                self._record(self.sessions[0], self.students[1], 'PRESENT')
+        
+        self.assertEqual(len(self._recalculations(callbacks)), 1)
+        self.assertEqual(
+            list(DailyAttendanceSummary.objects.values_list('student_id', flat=True)), [self.students[1].pk]
+        )
+    
+    def test_recalculate_bulk_query_count_is_constant(self):
+        """Le nombre de requêtes ne dépend pas du nombre d'élèves"""
+        with self.captureOnCommitCallbacks(execute=False):
+            for student in self.students:
+                self._record(self.sessions[0], student, 'PRESENT')
+        
+        pairs = [(student.pk, self.day) for student in self.students]
+        # Agrégat, retards, résumés existants, bulk_create
+        with self.assertNumQueries(4):
+            DailyAttendanceSummary.recalculate_bulk(pairs)
+        # Agrégat, retards, résumés existants, bulk_update
+        with self.assertNumQueries(4):
+            DailyAttendanceSummary.recalculate_bulk(pairs)
+    
+    def test_summary_removed_when_no_attendance_left(self):
+        """Le résumé est supprimé quand la dernière présence l'est"""
+        student = self.students[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance = self._record(self.sessions[0], student, 'PRESENT')
+        self.assertTrue(DailyAttendanceSummary.objects.filter(student=student).exists())
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance.delete()
+        self.assertFalse(DailyAttendanceSummary.objects.filter(student=student).exists())
@@ -0,0 +1,166 @@
+"""
+Tests pour les cumuls de notes (StudentAcademicRollup)
+"""
+import random
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.models import Student, Teacher
+from .models import AcademicYear, ClassRoom, Grade, Level, Period, StudentAcademicRollup, Subject
+from .rollups import rebuild_all_rollups
+
+User = get_user_model()
+
+ROLLUP_FIELDS = (
+    'student_id', 'subject_id', 'period_id', 'grade_count', 'score_sum', 'weighted_score_sum',
+    'coefficient_sum', 'min_score', 'max_score', 'last_grade_date',
+)
+
+
+class StudentAcademicRollupTest(TestCase):
+    """Tests pour le maintien incrémental et la reconstruction des cumuls"""
+
+    def setUp(self):
+        academic_year = AcademicYear.objects.create(
+            name="2024-2025",
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 7, 31),
+            is_current=True
+        )
+        level = Level.objects.create(name="6ème", order=6)
+        self.classroom = ClassRoom.objects.create(name="6ème A", level=level, academic_year=academic_year)
+        self.math = Subject.objects.create(name="Mathématiques", code="MATH")
+        self.french = Subject.objects.create(name="Français", code="FR")
+        teacher_user = User.objects.create_user(
+            email="teacher@example.com", password="testpass123", role="TEACHER"
+        )
+        self.teacher = Teacher.objects.create(user=teacher_user, employee_id="TEA20240001")
+        self.student = Student.objects.create(
+            user=User.objects.create_user(email="student@example.com", password="testpass123", role="STUDENT"),
+            matricule="STU20240001", current_class=self.classroom
+        )
+        self.term1 = Period.objects.create(
+            name="Trimestre 1", academic_year=academic_year,
+            start_date=date(2024, 9, 1), end_date=date(2024, 12, 20)
+        )
+        self.term2 = Period.objects.create(
+            name="Trimestre 2", academic_year=academic_year,
+            start_date=date(2025, 1, 6), end_date=date(2025, 3, 28)
+        )
+
+    def _grade(self, score, on=date(2024, 10, 1), subject=None, coefficient='1', student=None):
+        return Grade.objects.create(
+            student=student or self.student, subject=subject or self.math, teacher=self.teacher,
+            classroom=self.classroom, evaluation_name="Contrôle", evaluation_type="TEST",
+            score=Decimal(score), coefficient=Decimal(coefficient), date=on
+        )
+
+    def _rollup(self, subject=None, period=None):
+        return StudentAcademicRollup.objects.get(
+            student=self.student, subject=subject or self.math, period=period
+        )
+
+    def _snapshot(self):
+        return sorted(
+            StudentAcademicRollup.objects.values_list(*ROLLUP_FIELDS),
+            key=lambda row: tuple(str(value) for value in row)
+        )
+
+    def test_create_update_delete(self):
+        """Sommes, effectif, minimum, maximum et dernière date suivent les notes"""
+        first = self._grade('12', date(2024, 10, 1), coefficient='2')
+        second = self._grade('18', date(2024, 11, 5))
+        rollup = self._rollup(period=self.term1)
+        self.assertEqual(rollup.grade_count, 2)
+        self.assertEqual(rollup.score_sum, Decimal('30'))
+        self.assertEqual(rollup.weighted_score_sum, Decimal('42'))
+        self.assertEqual(rollup.coefficient_sum, Decimal('3'))
+        self.assertEqual((rollup.min_score, rollup.max_score), (Decimal('12'), Decimal('18')))
+        self.assertEqual(rollup.last_grade_date, date(2024, 11, 5))
+        self.assertEqual(rollup.weighted_average, Decimal('14'))
+
+        # Le maximum est modifié : recalculé à partir des notes restantes
+        second.score = Decimal('9')
+        second.save()
+        rollup = self._rollup(period=self.term1)
+        self.assertEqual((rollup.min_score, rollup.max_score), (Decimal('9'), Decimal('12')))
+        self.assertEqual(rollup.score_sum, Decimal('21'))
+
+        # Changement de période : la note change de cellule
+        second.date = date(2025, 2, 3)
+        second.save()
+        self.assertEqual(self._rollup(period=self.term1).last_grade_date, date(2024, 10, 1))
+        self.assertEqual(self._rollup(period=self.term2).grade_count, 1)
+
+        first.delete()
+        self.assertFalse(
+            StudentAcademicRollup.objects.filter(student=self.student, period=self.term1).exists()
+        )
+
+    def test_grades_outside_periods(self):
+        """Notes hors période cumulées avec period = None, rattachées à une nouvelle période"""
+        self._grade('10', date(2025, 5, 2))
+        self.assertEqual(self._rollup(period=None).grade_count, 1)
+        term3 = Period.objects.create(
+            name="Trimestre 3", academic_year=self.term1.academic_year,
+            start_date=date(2025, 4, 7), end_date=date(2025, 6, 30)
+        )
+        self.assertEqual(self._rollup(period=term3).grade_count, 1)
+        self.assertFalse(StudentAcademicRollup.objects.filter(period__isnull=True).exists())
+
+    def test_incremental_matches_rebuild(self):
+        """Après une suite aléatoire d'écritures, les cumuls égalent une reconstruction complète"""
+        rng = random.Random(7)
+        days = [date(2024, 10, 1), date(2024, 12, 20), date(2025, 1, 2), date(2025, 2, 14), date(2025, 6, 1)]
+        grades = []
+        for _ in range(30):
+            action = rng.random()
+            if grades and action < 0.25:
+                grades.pop(rng.randrange(len(grades))).delete()
+            elif grades and action < 0.6:
+                grade = rng.choice(grades)
+                grade.score = Decimal(rng.randint(0, 40)) / 2
+                grade.date = rng.choice(days)
+                grade.subject = rng.choice([self.math, self.french])
+                grade.save()
+            else:
+                grades.append(self._grade(
+                    str(Decimal(rng.randint(0, 40)) / 2), rng.choice(days),
+                    rng.choice([self.math, self.french]), rng.choice(['1', '2'])
+                ))
+        incremental = self._snapshot()
+        rebuild_all_rollups(chunk_size=1)
+        self.assertEqual(incremental, self._snapshot())
+
+    def test_reloaded_grade_uses_loaded_state(self):
+        """Une note rechargée ne relit pas son ancien état avant la sauvegarde"""
+        grade = Grade.objects.get(pk=self._grade('12').pk)
+        grade.score = Decimal('16')
+        grade.save()
+        self.assertEqual(self._rollup(period=self.term1).score_sum, Decimal('16'))
+
+    def test_rebuild_command(self):
+        """La commande recalcule les cumuls supprimés ou faux"""
+        self._grade('12')
+        self._grade('14', subject=self.french)
+        expected = self._snapshot()
+        StudentAcademicRollup.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_academic_rollups', '--chunk-size', '1', stdout=out)
+        self.assertEqual(self._snapshot(), expected)
+        self.assertIn('2 cumul(s) recalculé(s) pour 1 élève(s)', out.getvalue())
+
+    def test_totals_by_student(self):
+        """Moyenne de l'élève toutes matières et périodes confondues"""
+        self._grade('12')
+        self._grade('18', date(2025, 2, 3), subject=self.french)
+        self._grade('9', date(2025, 6, 1))
+        totals = StudentAcademicRollup.objects.filter(student=self.student).totals_by_student()
+        self.assertEqual(totals[self.student.pk]['grade_count'], 3)
+        self.assertEqual(totals[self.student.pk]['average'], 13.0)
+        self.assertEqual(totals[self.student.pk]['average_percentage'], 65.0)
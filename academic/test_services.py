@@ -0,0 +1,117 @@
+"""
+Tests pour les services du module academic
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import date, time
+
+from accounts.models import Teacher, Student
+from .models import (
+    AcademicYear, Level, Subject, ClassRoom, Timetable, Period,
+    Session, SessionAttendance, DailyAttendanceSummary
+)
+from .services import record_roll_call
+
+User = get_user_model()
+
+
+class RecordRollCallTest(TestCase):
+    """Tests pour l'enregistrement groupé de l'appel"""
+    
+    def setUp(self):
+        academic_year = AcademicYear.objects.create(
+            name="2024-2025",
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 7, 31),
+            is_current=True
+        )
+        level = Level.objects.create(name="6ème", order=6)
+        subject = Subject.objects.create(name="Mathématiques", code="MATH")
+        self.classroom = ClassRoom.objects.create(
+            name="6ème A", level=level, academic_year=academic_year
+        )
+        self.teacher_user = User.objects.create_user(
+            email="teacher@example.com",
+            password="testpass123",
+            first_name="Jean",
+            last_name="Professeur",
+            role="TEACHER"
+        )
+        teacher = Teacher.objects.create(user=self.teacher_user, employee_id="TEA20240001")
+        period = Period.objects.create(
+            name="Trimestre 1",
+            academic_year=academic_year,
+            start_date=date(2024, 9, 1),
+            end_date=date(2024, 12, 20)
+        )
+        timetable = Timetable.objects.create(
+            classroom=self.classroom,
+            subject=subject,
+            teacher=teacher,
+            weekday=1,
+            start_time=time(8, 0),
+            end_time=time(9, 0)
+        )
+        self.sessions = [
+            Session.objects.create(timetable=timetable, period=period, date=date(2024, 10, day))
+            for day in (7, 14)
+        ]
+    
+    def _create_students(self, count, offset=0):
+        students = []
+        for i in range(offset, offset + count):
+            user = User.objects.create_user(
+                email=f"student{i}@example.com",
+                password="testpass123",
+                first_name="Élève",
+                last_name=f"{i}",
+                role="STUDENT"
+            )
+            students.append(
+                Student.objects.create(user=user, matricule=f"STU2024{i:04d}", current_class=self.classroom)
+            )
+        return students
+    
+    def _roll_call_queries(self, session, students, data):
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                record_roll_call(session, students, data, self.teacher_user)
+        return len(ctx.captured_queries)
+    
+    def test_roll_call_creates_and_updates(self):
+        """Test de création puis de mise à jour de l'appel"""
+        students = self._create_students(3)
+        data = {f'status_{student.pk}': 'PRESENT' for student in students}
+        data[f'status_{students[0].pk}'] = 'LATE'
+        data[f'arrival_time_{students[0].pk}'] = '08:20'
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            created, updated = record_roll_call(self.sessions[0], students, data, self.teacher_user)
+        self.assertEqual((len(created), len(updated)), (3, 0))
+        self.assertTrue(Session.objects.get(pk=self.sessions[0].pk).attendance_taken)
+        summary = DailyAttendanceSummary.objects.get(student=students[0])
+        self.assertEqual(summary.total_late_minutes, 20)
+        
+        # Seule la ligne modifiée est réécrite
+        data[f'status_{students[1].pk}'] = 'ABSENT'
+        with self.captureOnCommitCallbacks(execute=True):
+            created, updated = record_roll_call(self.sessions[0], students, data, self.teacher_user)
+        self.assertEqual((len(created), len(updated)), (0, 1))
+        self.assertEqual(
+            SessionAttendance.objects.get(student=students[1]).status, 'ABSENT'
+        )
+        self.assertEqual(
+            DailyAttendanceSummary.objects.get(student=students[1]).daily_status, 'FULLY_ABSENT'
+        )
+    
+    def test_roll_call_query_count_independent_of_class_size(self):
+        """Le nombre de requêtes ne dépend pas de l'effectif de la classe"""
+        small_class = self._create_students(3)
+        small = self._roll_call_queries(self.sessions[0], small_class, {})
+        
+        large_class = small_class + self._create_students(12, offset=3)
+        large = self._roll_call_queries(self.sessions[1], large_class, {})
+        
+        self.assertEqual(small, large)
@@ -13,9 +13,9 @@ from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
 from datetime import datetime, timedelta
 import json
-import csv
 
 from core.decorators.permissions import admin_required
+from core.exports import Column, TabularExport, blank_if_none, choice_labels, date_format, label_format
 from accounts.models import Student, Teacher, Parent
 from academic.models import (
     Session, SessionAttendance, SessionDocument, 
@@ -467,7 +467,10 @@ def admin_students_overview(request):
 @admin_required
 def admin_export_attendance_csv(request):
     """
-    Export des données de présence en CSV
+    Export des données de présence en CSV (ou XLSX avec ?format=xlsx)
+    
+    Envoyé en streaming : la mémoire utilisée ne dépend pas de la période
+    (voir core.exports).
     """
     # Paramètres d'export
     period = request.GET.get('period', 'current_month')
@@ -486,41 +489,33 @@ def admin_export_attendance_csv(request):
         start_date = today - timedelta(days=30)
         end_date = today
     
-    # Récupérer les données
+    # Récupérer les données (valeurs seulement, lues par lots)
     summaries = DailyAttendanceSummary.objects.filter(
         date__range=[start_date, end_date]
-    ).select_related(
-        'student__user',
-        'student__current_class'
     ).order_by('date', 'student__user__last_name')
     
     if class_filter:
         summaries = summaries.filter(student__current_class_id=class_filter)
     
-    # Créer la réponse CSV
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="presences_{start_date}_{end_date}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Date', 'Nom', 'Prénom', 'Matricule', 'Classe', 
-        'Statut', 'Taux de présence', 'Sessions totales', 'Sessions assistées'
-    ])
-    
-    for summary in summaries:
-        writer.writerow([
-            summary.date.strftime('%Y-%m-%d'),
-            summary.student.user.last_name,
-            summary.student.user.first_name,
-            summary.student.matricule,
-            summary.student.current_class.name if summary.student.current_class else '',
-            summary.get_daily_status_display(),
-            f"{summary.attendance_rate:.1f}%",
-            summary.total_sessions,
-            summary.present_sessions,
-        ])
-    
-    return response
+    export = TabularExport(
+        summaries,
+        [
+            Column('Date', 'date', date_format('%Y-%m-%d')),
+            Column('Nom', 'student__user__last_name'),
+            Column('Prénom', 'student__user__first_name'),
+            Column('Matricule', 'student__matricule'),
+            Column('Classe', 'student__current_class__name', blank_if_none),
+            Column('Statut', 'daily_status', label_format(choice_labels(DailyAttendanceSummary, 'daily_status'))),
+            Column('Taux de présence', 'attendance_rate', lambda rate: f"{rate:.1f}%"),
+            Column('Sessions totales', 'total_sessions'),
+            Column('Sessions assistées', 'present_sessions'),
+        ],
+        filename=f'presences_{start_date}_{end_date}',
+        sheet_title='Présences',
+        # Sortie CSV inchangée : sans BOM, comme avant le passage à TabularExport
+        bom=False,
+    )
+    return export.response(request.GET.get('format', 'csv'))
 
 
 @admin_required
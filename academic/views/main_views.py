@@ -20,9 +20,12 @@ from core.decorators.permissions import (
 from ..models import (
     AcademicYear, Level, Subject, ClassRoom, 
     TeacherAssignment, Enrollment, Grade, Attendance, Timetable,
-    Document, DocumentAccess, Session, SessionAttendance, DailyAttendanceSummary
+    Document, DocumentAccess, Session, SessionAttendance, DailyAttendanceSummary, Period
 )
+from ..class_statistics import class_grades_queryset, get_class_statistics
+from ..grading import build_class_bulletins
 from accounts.models import Teacher, Student
+from communication.notifications import notify_grade
 
 User = get_user_model()
 
@@ -1294,6 +1297,7 @@ def grade_add(request):
                 comments=comments,
                 date=datetime.strptime(date_given, '%Y-%m-%d').date() if date_given else timezone.now().date()
             )
+            notify_grade(grade)
             
             messages.success(request, f"Note ajoutée avec succès pour {student.user.get_full_name()}")
             return redirect('academic:grade_list')
@@ -1418,35 +1422,20 @@ def class_grades(request, classroom_id):
     # Filtrage
     subject_filter = request.GET.get('subject')
     evaluation_type_filter = request.GET.get('evaluation_type')
+    if subject_filter and not subject_filter.isdigit():
+        subject_filter = None
     
-    grades = Grade.objects.filter(
-        student__current_class=classroom
+    grades = class_grades_queryset(
+        classroom, subject_filter, evaluation_type_filter
     ).select_related('student__user', 'teacher__user', 'subject')
     
-    if subject_filter:
-        grades = grades.filter(subject_id=subject_filter)
-    
-    if evaluation_type_filter:
-        grades = grades.filter(evaluation_type=evaluation_type_filter)
-    
-    # Statistiques de la classe
-    class_stats = {}
-    for student in students:
-        student_grades = grades.filter(student=student)
-        if student_grades.exists():
-            avg_percentage = sum([g.percentage for g in student_grades]) / student_grades.count()
-            class_stats[student.id] = {
-                'student': student,
-                'average': avg_percentage,
-                'grades_count': student_grades.count(),
-                'recent_grades': student_grades.order_by('-date')[:3]
-            }
-    
-    # Moyenne de classe
-    if class_stats:
-        class_average = sum([s['average'] for s in class_stats.values()]) / len(class_stats)
-    else:
-        class_average = 0
+    # Statistiques de la classe : agrégat + fenêtre, en cache par filtre
+    stats = get_class_statistics(classroom, subject_filter, evaluation_type_filter)
+    class_stats = {
+        student.id: {'student': student, **stats['students'][student.id]}
+        for student in students
+        if student.id in stats['students']
+    }
     
     context = {
         'classroom': classroom,
@@ -1454,24 +1443,81 @@ def class_grades(request, classroom_id):
         'grades': grades.order_by('-date'),
         'subjects': Subject.objects.all(),
         'class_stats': class_stats,
-        'class_average': class_average,
+        'class_average': stats['class_average'],
         'evaluation_types': Grade.EVALUATION_TYPE_CHOICES,
     }
     
     return render(request, 'academic/class_grades.html', context)
 
+def _bulletin_period(request, academic_year):
+    """
+    Période demandée (?period=) ou, par défaut, la période courante de l'année,
+    celle qui contient aujourd'hui, sinon la dernière
+
+    Returns:
+        tuple: (période ou None, périodes de l'année)
+    """
+    periods = list(Period.objects.filter(academic_year=academic_year).order_by('start_date'))
+    if not periods:
+        return None, periods
+    period_id = request.GET.get('period')
+    if period_id and period_id.isdigit():
+        for period in periods:
+            if period.pk == int(period_id):
+                return period, periods
+    today = timezone.now().date()
+    for period in periods:
+        if period.is_current:
+            return period, periods
+    for period in periods:
+        if period.start_date <= today <= period.end_date:
+            return period, periods
+    return periods[-1], periods
+
+
 @teacher_or_student_required
 def student_bulletin(request, student_id):
     """Bulletin d'un élève - Accessible à l'élève, ses parents, ses enseignants et admins"""
-    # TODO: Ajouter vérification RBAC pour s'assurer que l'utilisateur a accès à cet élève
-    return HttpResponse(f"Bulletin de l'élève {student_id} - En cours de développement")
+    student = get_object_or_404(
+        Student.objects.for_role(request.user).select_related('user', 'current_class__academic_year'),
+        id=student_id
+    )
+    bulletin = report = period = None
+    periods = []
+    if student.current_class:
+        period, periods = _bulletin_period(request, student.current_class.academic_year)
+        if period:
+            # Les rangs exigent le calcul de toute la classe
+            report = build_class_bulletins(student.current_class, period)
+            bulletin = report.for_student(student.pk)
 
-@teacher_required  
+    context = {
+        'student': student,
+        'report': report,
+        'bulletin': bulletin,
+        'period': period,
+        'periods': periods,
+    }
+    return render(request, 'academic/student_bulletin.html', context)
+
+
+@teacher_required
 def class_report(request, classroom_id):
     """Rapport de classe - Réservé aux enseignants et admins"""
-    # TODO: Ajouter vérification RBAC pour s'assurer que l'enseignant enseigne dans cette classe
-    return HttpResponse(f"Rapport de la classe {classroom_id} - En cours de développement")
+    classroom = get_object_or_404(
+        ClassRoom.objects.for_role(request.user).select_related('level', 'academic_year'),
+        id=classroom_id
+    )
+    period, periods = _bulletin_period(request, classroom.academic_year)
+    report = build_class_bulletins(classroom, period) if period else None
 
+    context = {
+        'classroom': classroom,
+        'report': report,
+        'period': period,
+        'periods': periods,
+    }
+    return render(request, 'academic/class_report.html', context)
 
 @teacher_required
 def course_detail(request, assignment_id):
@@ -14,6 +14,7 @@ from datetime import datetime, timedelta
 
 from core.decorators.permissions import student_required
 from accounts.models import Student
+from academic.attendance_matrix import prefetch_attendance_matrix
 from academic.models import (
     Session, SessionAttendance, SessionDocument, 
     SessionAssignment, DailyAttendanceSummary,
@@ -103,6 +104,9 @@ def student_sessions_view(request):
     paginator = Paginator(sessions, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    # Présences de la page en une requête (lues par le filtre get_student_attendance)
+    page_obj.object_list = list(page_obj.object_list)
+    prefetch_attendance_matrix(page_obj.object_list, [student])
     
     # Prochaine session
     next_session = sessions_query.filter(
@@ -162,14 +166,8 @@ def student_session_detail(request, session_id):
         timetable__classroom=student.current_class
     )
     
-    # Récupérer la présence de l'étudiant pour cette session
-    try:
-        attendance = SessionAttendance.objects.get(
-            session=session,
-            student=student
-        )
-    except SessionAttendance.DoesNotExist:
-        attendance = None
+    # Présence de l'étudiant (également lue par le filtre get_student_attendance)
+    attendance = prefetch_attendance_matrix([session], [student]).get(session, student)
     
     # Documents de la session
     documents = session.documents.select_related('document').filter(
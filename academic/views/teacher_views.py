@@ -22,6 +22,7 @@ from academic.models import (
     Timetable, Subject, ClassRoom, Document,
     Period, AcademicYear, Enrollment, TeacherAssignment
 )
+from academic.services import record_roll_call
 
 
 @teacher_required
@@ -271,9 +272,9 @@ def teacher_attendance_view(request, session_id):
     
     # Récupérer les présences existantes
     existing_attendances = {
-        att.student.id: att for att in SessionAttendance.objects.filter(
+        att.student_id: att for att in SessionAttendance.objects.filter(
             session=session
-        ).select_related('student__user')
+        ).order_by()
     }
     
     # Préparer les données pour le template
@@ -289,29 +290,11 @@ def teacher_attendance_view(request, session_id):
         })
     
     if request.method == 'POST':
-        # Traitement de la soumission des présences
-        for student in students:
-            status = request.POST.get(f'status_{student.pk}', 'ABSENT')
-            arrival_time = request.POST.get(f'arrival_time_{student.pk}') or None
-            notes = request.POST.get(f'notes_{student.pk}', '')
-            
-            # Créer ou mettre à jour l'enregistrement de présence
-            attendance, created = SessionAttendance.objects.update_or_create(
-                session=session,
-                student=student,
-                defaults={
-                    'status': status,
-                    'arrival_time': arrival_time,
-                    'notes': notes,
-                    'recorded_by': request.user,
-                    'recorded_at': timezone.now(),
-                }
-            )
-        
-        # Marquer l'appel comme effectué
-        session.attendance_taken = True
-        session.attendance_taken_at = timezone.now()
-        session.save()
+        # Enregistrement groupé de l'appel (nombre de requêtes constant)
+        record_roll_call(
+            session, students, request.POST, request.user,
+            existing=existing_attendances
+        )
         
         messages.success(request, "Présences enregistrées avec succès.")
         return redirect('academic:teacher_session_detail', session_id=session.pk)
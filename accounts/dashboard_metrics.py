@@ -0,0 +1,251 @@
+"""
+Indicateurs (KPI) du tableau de bord administrateur
+
+Les KPI sont calculés en quelques requêtes agrégées groupées puis stockés
+sous forme d'instantané versionné dans le cache. La vue `admin_dashboard`
+lit cet instantané au lieu de relancer une trentaine de COUNT/SUM/AVG.
+
+Cycle de vie de l'instantané :
+- une modification des modèles concernés supprime l'instantané (recalcul
+  synchrone au prochain affichage) ;
+- à l'expiration du TTL, l'ancien instantané reste servi et un thread
+  d'arrière-plan le recalcule (stale-while-revalidate).
+"""
+import logging
+import threading
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Incrémenter à chaque changement de la structure de l'instantané
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_KEY = f'dashboard_metrics:admin:v{SNAPSHOT_VERSION}'
+FRESH_KEY = f'{SNAPSHOT_KEY}:fresh'
+LOCK_KEY = f'{SNAPSHOT_KEY}:lock'
+
+# Durée pendant laquelle l'instantané est considéré comme frais (secondes)
+METRICS_TTL = getattr(settings, 'DASHBOARD_METRICS_TTL', 300)
+# Durée de conservation maximale d'un instantané périmé (secondes)
+METRICS_STALE_TTL = getattr(settings, 'DASHBOARD_METRICS_STALE_TTL', 3600)
+# Recalcul en arrière-plan à l'expiration du TTL (désactivable pour les tests)
+METRICS_ASYNC_REFRESH = getattr(settings, 'DASHBOARD_METRICS_ASYNC_REFRESH', True)
+
+
+def compute_admin_kpis(today=None):
+    """
+    Calcule tous les KPI du dashboard administrateur
+
+    Chaque bloc correspond à une seule requête agrégée (COUNT/SUM/AVG
+    conditionnels) au lieu d'une requête par indicateur.
+
+    Returns:
+        dict: instantané contenant `stats`, `academic_stats` et `activity_stats`
+    """
+    from accounts.models import User
+    from academic.models import ClassRoom, Subject, Enrollment, Grade, DailyAttendanceSummary
+    from finance.models import Invoice, Payment
+    from communication.models import Announcement
+    from activity_log.models import ActivityLog
+
+    today = today or date.today()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+
+    # Utilisateurs et profils (jointures 1-1, pas de multiplication de lignes)
+    users = User.objects.aggregate(
+        total_users=Count('id', filter=Q(is_active=True)),
+        total_students=Count('student_profile'),
+        total_students_last_month=Count(
+            'student_profile', filter=Q(date_joined__lt=month_ago)
+        ),
+        new_students_this_month=Count(
+            'student_profile', filter=Q(date_joined__gte=month_ago)
+        ),
+        total_teachers=Count('teacher_profile'),
+        total_parents=Count('parent_profile'),
+    )
+
+    student_growth_percentage = 0
+    if users['total_students_last_month'] > 0:
+        student_growth = users['total_students'] - users['total_students_last_month']
+        student_growth_percentage = round(
+            (student_growth / users['total_students_last_month']) * 100, 1
+        )
+
+    # Académique
+    total_classes = ClassRoom.objects.count()
+    total_subjects = Subject.objects.count()
+    enrollments = Enrollment.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(withdrawal_date__isnull=True)),
+    )
+    # Moyenne des effectifs = inscriptions / classes (classes vides incluses)
+    avg_class_size = enrollments['total'] / total_classes if total_classes else 0
+
+    # Présences du jour
+    attendance = DailyAttendanceSummary.objects.filter(date=today).aggregate(
+        total=Sum('total_sessions'),
+        absent=Sum('absent_sessions'),
+    )
+    today_total_sessions = attendance['total'] or 0
+    today_absent_sessions = attendance['absent'] or 0
+    attendance_rate = 0
+    if today_total_sessions > 0:
+        present_sessions = today_total_sessions - today_absent_sessions
+        attendance_rate = round((present_sessions / today_total_sessions) * 100, 1)
+
+    # Notes et annonces de la semaine
+    grades = Grade.objects.filter(created_at__gte=week_ago).aggregate(
+        count=Count('id'),
+        avg_score=Avg('score'),
+    )
+    recent_announcements_count = Announcement.objects.filter(
+        publish_date__gte=week_ago
+    ).count()
+
+    # Finances
+    invoices = Invoice.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='PENDING')),
+    )
+    revenue = Payment.objects.filter(status='COMPLETED').aggregate(
+        total=Sum('amount'),
+        month=Sum('amount', filter=Q(payment_date__gte=month_ago)),
+    )
+
+    # Journal d'activité
+    activity = ActivityLog.objects.filter(
+        Q(timestamp__gte=week_ago) | Q(timestamp__date=today)
+    ).aggregate(
+        today_count=Count('id', filter=Q(timestamp__date=today)),
+        week_count=Count('id', filter=Q(timestamp__gte=week_ago)),
+        grade_count=Count('id', filter=Q(timestamp__gte=week_ago, action_type__startswith='GRADE')),
+        invoice_count=Count('id', filter=Q(timestamp__gte=week_ago, action_type__startswith='INVOICE')),
+        payment_count=Count('id', filter=Q(timestamp__gte=week_ago, action_type__startswith='PAYMENT')),
+        login_count=Count('id', filter=Q(timestamp__gte=week_ago, action_type='USER_LOGIN')),
+    )
+    top_users = list(
+        ActivityLog.objects.filter(
+            timestamp__gte=week_ago,
+            user__isnull=False
+        ).values(
+            'user__first_name', 'user__last_name'
+        ).annotate(
+            count=Count('id')
+        ).order_by('-count')[:5]
+    )
+
+    recent_grades_avg = grades['avg_score'] or 0
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        'computed_at': timezone.now(),
+        'date': today,
+        'stats': {
+            # Utilisateurs
+            'total_students': users['total_students'],
+            'total_teachers': users['total_teachers'],
+            'total_parents': users['total_parents'],
+            'total_users': users['total_users'],
+            'new_students_this_month': users['new_students_this_month'],
+            'student_growth_percentage': student_growth_percentage,
+
+            # Académique
+            'total_classes': total_classes,
+            'total_subjects': total_subjects,
+            'active_enrollments': enrollments['active'],
+
+            # Présences du jour
+            'today_total_sessions': today_total_sessions,
+            'today_absent_sessions': today_absent_sessions,
+            'attendance_rate': attendance_rate,
+
+            # Annonces et notes récentes
+            'recent_announcements_count': recent_announcements_count,
+            'recent_grades_count': grades['count'],
+            'recent_grades_avg': round(recent_grades_avg, 1) if recent_grades_avg else 0,
+
+            # Financier
+            'total_invoices': invoices['total'],
+            'pending_invoices': invoices['pending'],
+            'total_revenue': revenue['total'] or 0,
+            'month_revenue': revenue['month'] or 0,
+        },
+        'academic_stats': {
+            'avg_class_size': avg_class_size,
+            'attendance_rate': 0,  # À calculer plus tard si besoin
+        },
+        'activity_stats': {
+            'today_count': activity['today_count'],
+            'week_count': activity['week_count'],
+            'grade_count': activity['grade_count'],
+            'invoice_count': activity['invoice_count'],
+            'payment_count': activity['payment_count'],
+            'login_count': activity['login_count'],
+            'top_users': top_users,
+        },
+    }
+
+
+def rebuild_admin_snapshot():
+    """Recalcule l'instantané et le stocke dans le cache"""
+    snapshot = compute_admin_kpis()
+    cache.set(SNAPSHOT_KEY, snapshot, METRICS_STALE_TTL)
+    cache.set(FRESH_KEY, True, METRICS_TTL)
+    return snapshot
+
+
+def _refresh_in_background():
+    try:
+        rebuild_admin_snapshot()
+    except Exception:
+        logger.exception("Échec du recalcul des KPI du dashboard administrateur")
+    finally:
+        cache.delete(LOCK_KEY)
+        connection.close()
+
+
+def schedule_refresh():
+    """Lance un recalcul en arrière-plan (un seul à la fois)"""
+    if not cache.add(LOCK_KEY, True, 60):
+        return False
+    if METRICS_ASYNC_REFRESH:
+        threading.Thread(
+            target=_refresh_in_background,
+            name='dashboard-metrics-refresh',
+            daemon=True,
+        ).start()
+    else:
+        try:
+            rebuild_admin_snapshot()
+        finally:
+            cache.delete(LOCK_KEY)
+    return True
+
+
+def get_admin_snapshot():
+    """
+    Retourne l'instantané des KPI administrateur
+
+    - absent ou d'une autre journée : recalcul synchrone ;
+    - périmé (TTL écoulé) : l'ancien instantané est servi et un recalcul
+      en arrière-plan est planifié.
+    """
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None or snapshot.get('date') != date.today():
+        return rebuild_admin_snapshot()
+    if cache.get(FRESH_KEY) is None:
+        schedule_refresh()
+    return snapshot
+
+
+def invalidate_admin_snapshot():
+    """Supprime l'instantané (recalculé au prochain affichage)"""
+    cache.delete_many([SNAPSHOT_KEY, FRESH_KEY])
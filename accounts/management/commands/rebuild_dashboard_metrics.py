@@ -0,0 +1,44 @@
+"""
+Management command pour recalculer l'instantané des KPI du dashboard administrateur
+
+Usage:
+    python manage.py rebuild_dashboard_metrics
+    python manage.py rebuild_dashboard_metrics --clear  # Supprime seulement l'instantané
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.dashboard_metrics import (
+    rebuild_admin_snapshot, invalidate_admin_snapshot, SNAPSHOT_VERSION
+)
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les KPI du dashboard administrateur et les stocke dans le cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Supprime l\'instantané sans le recalculer',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            invalidate_admin_snapshot()
+            self.stdout.write(self.style.SUCCESS('Instantané des KPI supprimé.'))
+            return
+
+        with CaptureQueriesContext(connection) as ctx:
+            snapshot = rebuild_admin_snapshot()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ KPI recalculés (version {SNAPSHOT_VERSION}, '
+                f'{len(ctx.captured_queries)} requêtes)'
+            )
+        )
+        for key, value in snapshot['stats'].items():
+            self.stdout.write(f'   {key}: {value}')
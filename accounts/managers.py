@@ -5,29 +5,31 @@ Module Accounts
 from django.db import models
 from django.db.models import Q
 
+from core.scopes import get_access_scope
+
 
 class StudentQuerySet(models.QuerySet):
     """QuerySet personnalisé pour les élèves"""
     
     def filter_for_teacher(self, teacher_user):
         """Filtre les élèves pour un enseignant - élèves de ses classes"""
-        if hasattr(teacher_user, 'teacher_profile'):
-            return self.filter(
-                enrollments__classroom__teacherassignment__teacher=teacher_user.teacher_profile,
-                enrollments__withdrawal_date__isnull=True
-            ).distinct()
+        scope = get_access_scope(teacher_user)
+        if scope.teacher_id:
+            return self.filter(id__in=scope.student_ids)
         return self.none()
     
     def filter_for_student(self, student_user):
         """Un élève ne peut voir que lui-même"""
-        if hasattr(student_user, 'student_profile'):
-            return self.filter(id=student_user.student_profile.id)
+        scope = get_access_scope(student_user)
+        if scope.student_id:
+            return self.filter(id=scope.student_id)
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Filtre les élèves pour un parent - seulement ses enfants"""
-        if hasattr(parent_user, 'parent_profile'):
-            return self.filter(parents=parent_user.parent_profile)
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
+            return self.filter(id__in=scope.student_ids)
         return self.none()
     
     def filter_for_role(self, user):
@@ -68,25 +70,31 @@ class ParentQuerySet(models.QuerySet):
     
     def filter_for_teacher(self, teacher_user):
         """Filtre les parents pour un enseignant - parents de ses élèves"""
-        if hasattr(teacher_user, 'teacher_profile'):
-            return self.filter(
-                children__enrollments__classroom__teacherassignment__teacher=teacher_user.teacher_profile,
-                children__enrollments__withdrawal_date__isnull=True
-            ).distinct()
+        scope = get_access_scope(teacher_user)
+        if scope.teacher_id:
+            return self.filter(id__in=self._parent_ids(scope.student_ids))
         return self.none()
     
     def filter_for_student(self, student_user):
         """Filtre les parents pour un élève - ses propres parents"""
-        if hasattr(student_user, 'student_profile'):
-            return self.filter(children=student_user.student_profile)
+        scope = get_access_scope(student_user)
+        if scope.student_id:
+            return self.filter(id__in=self._parent_ids([scope.student_id]))
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Un parent ne peut voir que lui-même"""
-        if hasattr(parent_user, 'parent_profile'):
-            return self.filter(id=parent_user.parent_profile.id)
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
+            return self.filter(id=scope.parent_id)
         return self.none()
     
+    def _parent_ids(self, student_ids):
+        """Sous-requête des parents liés aux élèves (table de liaison seule)"""
+        return self.model.children.through.objects.filter(
+            student_id__in=student_ids
+        ).values('parent_id')
+    
     def filter_for_role(self, user):
         """Filtre automatiquement selon le rôle de l'utilisateur"""
         if user.role == 'TEACHER':
@@ -125,28 +133,32 @@ class TeacherQuerySet(models.QuerySet):
     
     def filter_for_teacher(self, teacher_user):
         """Un enseignant ne peut voir que lui-même (ou collègues selon business rules)"""
-        if hasattr(teacher_user, 'teacher_profile'):
-            return self.filter(id=teacher_user.teacher_profile.id)
+        scope = get_access_scope(teacher_user)
+        if scope.teacher_id:
+            return self.filter(id=scope.teacher_id)
         return self.none()
     
     def filter_for_student(self, student_user):
         """Filtre les enseignants pour un élève - ses enseignants"""
-        if hasattr(student_user, 'student_profile'):
-            return self.filter(
-                teacherassignment__classroom__enrollments__student=student_user.student_profile,
-                teacherassignment__classroom__enrollments__withdrawal_date__isnull=True
-            ).distinct()
+        scope = get_access_scope(student_user)
+        if scope.student_id:
+            return self.filter(id__in=self._teacher_ids(scope.unwithdrawn_classroom_ids))
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Filtre les enseignants pour un parent - enseignants de ses enfants"""
-        if hasattr(parent_user, 'parent_profile'):
-            return self.filter(
-                teacherassignment__classroom__enrollments__student__parents=parent_user.parent_profile,
-                teacherassignment__classroom__enrollments__withdrawal_date__isnull=True
-            ).distinct()
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
+            return self.filter(id__in=self._teacher_ids(scope.unwithdrawn_classroom_ids))
         return self.none()
     
+    def _teacher_ids(self, classroom_ids):
+        """Sous-requête des enseignants ayant une attribution dans ces classes"""
+        from academic.models import TeacherAssignment
+        return TeacherAssignment.objects.filter(
+            classroom_id__in=classroom_ids
+        ).values('teacher_id')
+    
     def filter_for_role(self, user):
         """Filtre automatiquement selon le rôle de l'utilisateur"""
         if user.role == 'TEACHER':
@@ -3,6 +3,8 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.base_user import BaseUserManager
 
+from core.sequences import NumberSequence
+
 # Import des managers RBAC
 from .managers import StudentManager, TeacherManager, ParentManager
 
@@ -145,6 +147,9 @@ class Student(models.Model):
     # Manager RBAC
     objects = StudentManager()
 
+    # Numérotation STU<AAAA><NNNN>
+    number_sequence = NumberSequence('STU', 'accounts.Student', 'matricule', monthly=False)
+
     class Meta:
         verbose_name = 'Élève'
         verbose_name_plural = 'Élèves'
@@ -156,18 +161,7 @@ class Student(models.Model):
     def save(self, *args, **kwargs):
         if not self.matricule:
             # Générer un matricule automatiquement
-            current_year = timezone.now().year
-            last_student = Student.objects.filter(
-                matricule__startswith=f"STU{current_year}"
-            ).order_by('matricule').last()
-            
-            if last_student:
-                last_number = int(last_student.matricule[-4:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            
-            self.matricule = f"STU{current_year}{new_number:04d}"
+            self.matricule = self.number_sequence.next()
         
         super().save(*args, **kwargs)
 
@@ -225,6 +219,9 @@ class Teacher(models.Model):
     # Manager RBAC
     objects = TeacherManager()
 
+    # Numérotation TEA<AAAA><NNNN>
+    number_sequence = NumberSequence('TEA', 'accounts.Teacher', 'employee_id', monthly=False)
+
     class Meta:
         verbose_name = 'Enseignant'
         verbose_name_plural = 'Enseignants'
@@ -235,18 +232,7 @@ class Teacher(models.Model):
     def save(self, *args, **kwargs):
         if not self.employee_id:
             # Générer un ID employé automatiquement
-            current_year = timezone.now().year
-            last_teacher = Teacher.objects.filter(
-                employee_id__startswith=f"TEA{current_year}"
-            ).order_by('employee_id').last()
-            
-            if last_teacher:
-                last_number = int(last_teacher.employee_id[-4:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            
-            self.employee_id = f"TEA{current_year}{new_number:04d}"
+            self.employee_id = self.number_sequence.next()
         
         super().save(*args, **kwargs)
 
@@ -0,0 +1,69 @@
+"""
+Signaux du module Accounts
+
+Invalidation de l'instantané des KPI du dashboard administrateur lorsque
+les modèles qui l'alimentent sont modifiés.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import User, Student, Teacher, Parent
+from accounts.dashboard_metrics import invalidate_admin_snapshot
+from academic.models import (
+    ClassRoom, Subject, Enrollment, Grade, DailyAttendanceSummary, daily_summaries_updated
+)
+from finance.models import Invoice, Payment
+from finance.signals import invoices_generated
+from communication.models import Announcement
+
+
+# Modèles dont les modifications rendent l'instantané obsolète
+DASHBOARD_METRICS_SENDERS = (
+    Student, Teacher, Parent,
+    ClassRoom, Subject, Enrollment, Grade, DailyAttendanceSummary,
+    Invoice, Payment,
+    Announcement,
+)
+
+
+def _schedule_invalidation(sender=None, **kwargs):
+    """
+    Invalide l'instantané immédiatement puis une nouvelle fois après le commit,
+    au cas où une lecture concurrente l'aurait recalculé avant la validation
+    """
+    invalidate_admin_snapshot()
+    transaction.on_commit(invalidate_admin_snapshot)
+
+
+# Les résumés de présence sont écrits en masse (pas de post_save)
+daily_summaries_updated.connect(
+    _schedule_invalidation, dispatch_uid='dashboard_metrics_daily_summaries'
+)
+# Idem pour la génération de factures en masse
+invoices_generated.connect(
+    _schedule_invalidation, dispatch_uid='dashboard_metrics_invoices_generated'
+)
+
+for _sender in DASHBOARD_METRICS_SENDERS:
+    post_save.connect(
+        _schedule_invalidation, sender=_sender,
+        dispatch_uid=f'dashboard_metrics_save_{_sender.__name__}'
+    )
+    post_delete.connect(
+        _schedule_invalidation, sender=_sender,
+        dispatch_uid=f'dashboard_metrics_delete_{_sender.__name__}'
+    )
+
+
+@receiver(post_save, sender=User, dispatch_uid='dashboard_metrics_save_User')
+def invalidate_dashboard_metrics_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    """Invalide l'instantané sauf pour la simple mise à jour de last_login"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    _schedule_invalidation()
+
+
+@receiver(post_delete, sender=User, dispatch_uid='dashboard_metrics_delete_User')
+def invalidate_dashboard_metrics_on_user_delete(sender, instance, **kwargs):
+    _schedule_invalidation()
@@ -585,3 +585,81 @@ class RBACTest(TestCase):
         # Ne devrait pas pouvoir accéder aux vues administratives
         response = self.client.get(reverse('accounts:admin_dashboard'))
         self.assertEqual(response.status_code, 403)
+
+
+class AdminDashboardMetricsTest(TestCase):
+    """Tests pour l'instantané des KPI du dashboard administrateur"""
+    
+    def setUp(self):
+        from accounts.dashboard_metrics import invalidate_admin_snapshot
+        invalidate_admin_snapshot()
+        
+        self.client = Client()
+        self.admin_user = User.objects.create_user(
+            email="admin@example.com",
+            password="testpass123",
+            first_name="Admin",
+            last_name="User",
+            role="ADMIN",
+            is_staff=True
+        )
+        for i in range(3):
+            user = User.objects.create_user(
+                email=f"student{i}@example.com",
+                password="testpass123",
+                first_name="Student",
+                last_name=f"{i}",
+                role="STUDENT"
+            )
+            Student.objects.create(user=user, matricule=f"STU2025000{i}")
+    
+    def test_snapshot_counts(self):
+        """Test des KPI calculés par les requêtes agrégées"""
+        from accounts.dashboard_metrics import compute_admin_kpis
+        
+        snapshot = compute_admin_kpis()
+        self.assertEqual(snapshot['stats']['total_students'], 3)
+        self.assertEqual(snapshot['stats']['new_students_this_month'], 3)
+        self.assertEqual(snapshot['stats']['total_teachers'], 0)
+        self.assertEqual(snapshot['stats']['total_users'], 4)
+    
+    def test_snapshot_query_budget(self):
+        """Le calcul complet des KPI tient dans un nombre fixe de requêtes"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from accounts.dashboard_metrics import compute_admin_kpis
+        
+        with CaptureQueriesContext(connection) as ctx:
+            compute_admin_kpis()
+        self.assertLessEqual(len(ctx.captured_queries), 12)
+    
+    def test_dashboard_renders_from_cached_snapshot(self):
+        """Un second affichage ne recalcule pas les KPI"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.client.force_login(self.admin_user)
+        with CaptureQueriesContext(connection) as cold:
+            response = self.client.get(reverse('accounts:admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(reverse('accounts:admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['stats']['total_students'], 3)
+        self.assertLessEqual(len(warm.captured_queries), len(cold.captured_queries) - 10)
+    
+    def test_snapshot_invalidated_on_model_change(self):
+        """La création d'un élève invalide l'instantané"""
+        from accounts.dashboard_metrics import get_admin_snapshot
+        
+        self.assertEqual(get_admin_snapshot()['stats']['total_students'], 3)
+        user = User.objects.create_user(
+            email="student9@example.com",
+            password="testpass123",
+            first_name="Student",
+            last_name="9",
+            role="STUDENT"
+        )
+        Student.objects.create(user=user, matricule="STU20250009")
+        self.assertEqual(get_admin_snapshot()['stats']['total_students'], 4)
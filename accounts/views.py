@@ -8,17 +8,19 @@ from django.db.models import Q, Count, Sum, Avg
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_protect
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils.safestring import mark_safe
 from datetime import date, timedelta
 import secrets
 import string
 from .models import User, Student, Parent, Teacher
-from academic.models import ClassRoom, Subject, Session, SessionAttendance, DailyAttendanceSummary, Enrollment, Level, Grade
+from academic.models import ClassRoom, Subject, Session, SessionAttendance, DailyAttendanceSummary, Enrollment, Level, Grade, StudentAcademicRollup
+from academic.grading import average_scores_by_student, build_student_grade_report
 from finance.models import Invoice, Payment, FeeStructure
-from communication.models import Announcement, Message
+from communication.mailer import build_templated_email, get_email_template
+from communication.models import Announcement, EmailTemplate, Message
 from activity_log.models import ActivityLog
+from .dashboard_metrics import get_admin_snapshot
 from .forms import (
     UserRegistrationForm, CustomLoginForm, ProfileEditForm,
     StudentProfileForm, TeacherProfileForm, ParentProfileForm,
@@ -61,45 +63,57 @@ def generate_secure_password(length=12):
     return ''.join(password_list)
 
 
-def send_password_email(user, password):
-    """Envoie le mot de passe initial à l'utilisateur par email
-    
-    Args:
-        user: Instance de l'utilisateur
-        password: Mot de passe en clair
-        
-    Returns:
-        bool: True si l'email a été envoyé, False sinon
-    """
-    subject = f'Bienvenue sur {settings.SITE_NAME} - Vos identifiants de connexion'
-    message = f"""
-Bonjour {user.get_full_name()},
+PASSWORD_EMAIL_TEMPLATE = 'Identifiants de connexion'
+
+# Utilisé tant qu'aucun EmailTemplate actif de ce nom n'existe
+DEFAULT_PASSWORD_EMAIL = EmailTemplate(
+    name=PASSWORD_EMAIL_TEMPLATE,
+    subject='Bienvenue sur {{ site_name }} - Vos identifiants de connexion',
+    body_text="""
+Bonjour {{ full_name }},
 
-Votre compte a été créé avec succès sur {settings.SITE_NAME}.
+Votre compte a été créé avec succès sur {{ site_name }}.
 
 Voici vos identifiants de connexion :
-- Email : {user.email}
-- Mot de passe temporaire : {password}
+- Email : {{ email }}
+- Mot de passe temporaire : {{ password }}
 
 ⚠️ IMPORTANT : Pour des raisons de sécurité, veuillez changer ce mot de passe lors de votre première connexion.
 
-Pour vous connecter, rendez-vous sur : {settings.SITE_URL if hasattr(settings, 'SITE_URL') else 'votre portail'}
+Pour vous connecter, rendez-vous sur : {{ site_url }}
 
 Cordialement,
-L'équipe {settings.SITE_NAME}
-    """
+L'équipe {{ site_name }}
+    """,
+)
+
+
+def send_password_email(user, password):
+    """Met en file d'attente l'email contenant le mot de passe initial
+    
+    L'envoi est fait par la commande send_queued_emails (communication.mailer).
+    Le message est confidentiel : son corps est effacé du journal après l'envoi.
     
+    Args:
+        user: Instance de l'utilisateur
+        password: Mot de passe en clair
+        
+    Returns:
+        bool: True si l'email a été mis en file d'attente, False sinon
+    """
+    context = {
+        'site_name': settings.SITE_NAME,
+        'site_url': getattr(settings, 'SITE_URL', 'votre portail'),
+        'full_name': user.get_full_name(),
+        'email': user.email,
+        'password': password,
+    }
     try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+        template = get_email_template(PASSWORD_EMAIL_TEMPLATE, default=DEFAULT_PASSWORD_EMAIL)
+        build_templated_email(template, user.email, context, recipient_user=user, confidential=True).save()
         return True
     except Exception as e:
-        print(f"Erreur lors de l'envoi de l'email : {e}")
+        print(f"Erreur lors de la mise en file de l'email : {e}")
         return False
 
 
@@ -207,114 +221,20 @@ def admin_dashboard(request):
     today = date.today()
     now = timezone.now()
     week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    year_ago = today - timedelta(days=365)
     
-    # Statistiques principales avec comparaisons
-    total_students = Student.objects.count()
-    total_students_last_month = Student.objects.filter(
-        user__date_joined__lt=month_ago
-    ).count()
-    
-    total_teachers = Teacher.objects.count()
-    total_parents = Parent.objects.count()
-    
-    # Calcul du pourcentage d'évolution des étudiants
-    student_growth_percentage = 0
-    if total_students_last_month > 0:
-        student_growth = total_students - total_students_last_month
-        student_growth_percentage = round((student_growth / total_students_last_month) * 100, 1)
-    
-    # Nouvelles inscriptions ce mois
-    new_students_this_month = Student.objects.filter(
-        user__date_joined__gte=month_ago
-    ).count()
+    # KPI précalculés (instantané en cache, voir accounts.dashboard_metrics)
+    snapshot = get_admin_snapshot()
     
     # Annonces récentes
     recent_announcements = Announcement.objects.filter(
         publish_date__gte=week_ago
     ).order_by('-publish_date')[:5]
     
-    # Notes récentes
-    recent_grades = Grade.objects.select_related(
-        'student__user', 'subject', 'teacher__user'
-    ).order_by('-created_at')[:10]
-    
-    # Présences du jour (nouveau système basé sur les sessions)
-    today_summaries = DailyAttendanceSummary.objects.filter(date=today)
-    today_total_sessions = today_summaries.aggregate(
-        total=Sum('total_sessions')
-    )['total'] or 0
-    today_absent_sessions = today_summaries.aggregate(
-        total=Sum('absent_sessions')
-    )['total'] or 0
-    
-    # Calcul du taux de présence global
-    attendance_rate = 0
-    if today_total_sessions > 0:
-        present_sessions = today_total_sessions - today_absent_sessions
-        attendance_rate = round((present_sessions / today_total_sessions) * 100, 1)
-    
-    # Annonces récentes (7 derniers jours)
-    recent_announcements_count = Announcement.objects.filter(
-        publish_date__gte=week_ago
-    ).count()
-    
-    # Notes de cette semaine
-    recent_grades_count = Grade.objects.filter(
-        created_at__gte=week_ago
-    ).count()
-    
-    # Moyenne générale des notes récentes
-    recent_grades_avg = Grade.objects.filter(
-        created_at__gte=week_ago
-    ).aggregate(
-        avg_score=Avg('score')
-    )['avg_score'] or 0
-    
-    stats = {
-        # Utilisateurs
-        'total_students': total_students,
-        'total_teachers': total_teachers,
-        'total_parents': total_parents,
-        'total_users': User.objects.filter(is_active=True).count(),
-        'new_students_this_month': new_students_this_month,
-        'student_growth_percentage': student_growth_percentage,
-        
-        # Académique
-        'total_classes': ClassRoom.objects.count(),
-        'total_subjects': Subject.objects.count(),
-        'active_enrollments': Enrollment.objects.filter(
-            withdrawal_date__isnull=True
-        ).count(),
-        
-        # Présences du jour (nouveau système)
-        'today_total_sessions': today_total_sessions,
-        'today_absent_sessions': today_absent_sessions,
-        'attendance_rate': attendance_rate,
-        
-        # Annonces et notes récentes
-        'recent_announcements_count': recent_announcements_count,
-        'recent_grades_count': recent_grades_count,
-        'recent_grades_avg': round(recent_grades_avg, 1) if recent_grades_avg else 0,
-        
-        # Financier
-        'total_invoices': Invoice.objects.count(),
-        'pending_invoices': Invoice.objects.filter(status='PENDING').count(),
-        'total_revenue': Payment.objects.filter(
-            status='COMPLETED'
-        ).aggregate(total=Sum('amount'))['total'] or 0,
-        'month_revenue': Payment.objects.filter(
-            status='COMPLETED',
-            payment_date__gte=month_ago
-        ).aggregate(total=Sum('amount'))['total'] or 0,
-    }
-    
     # Activité récente
     recent_activity = {
         'new_students': Student.objects.filter(
             user__date_joined__gte=week_ago
-        ).order_by('-user__date_joined')[:5],
+        ).select_related('user').order_by('-user__date_joined')[:5],
         
         'recent_payments': Payment.objects.filter(
             status='COMPLETED',
@@ -323,16 +243,7 @@ def admin_dashboard(request):
         
         'pending_invoices': Invoice.objects.filter(
             status='PENDING'
-        ).order_by('-due_date')[:5],
-    }
-    
-    # Moyennes et statistiques académiques
-    academic_stats = {
-        'avg_class_size': ClassRoom.objects.annotate(
-            student_count=Count('enrollments')
-        ).aggregate(avg=Avg('student_count'))['avg'] or 0,
-        
-        'attendance_rate': 0,  # À calculer plus tard si besoin
+        ).select_related('student__user').order_by('-due_date')[:5],
     }
     
     # Graphiques données (pour futurs charts)
@@ -342,43 +253,14 @@ def admin_dashboard(request):
         'attendance_trend': [],  # Évolution des présences
     }
     
-    # Statistiques du journal d'activité
-    activity_stats = {
-        'today_count': ActivityLog.objects.filter(timestamp__date=today).count(),
-        'week_count': ActivityLog.objects.filter(timestamp__gte=week_ago).count(),
-        'grade_count': ActivityLog.objects.filter(
-            timestamp__gte=week_ago,
-            action_type__startswith='GRADE'
-        ).count(),
-        'invoice_count': ActivityLog.objects.filter(
-            timestamp__gte=week_ago,
-            action_type__startswith='INVOICE'
-        ).count(),
-        'payment_count': ActivityLog.objects.filter(
-            timestamp__gte=week_ago,
-            action_type__startswith='PAYMENT'
-        ).count(),
-        'login_count': ActivityLog.objects.filter(
-            timestamp__gte=week_ago,
-            action_type='USER_LOGIN'
-        ).count(),
-        'top_users': ActivityLog.objects.filter(
-            timestamp__gte=week_ago,
-            user__isnull=False
-        ).values(
-            'user__first_name', 'user__last_name'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
-    }
-    
     context = {
         'user': request.user,
-        'stats': stats,
+        'stats': snapshot['stats'],
         'recent_activity': recent_activity,
-        'academic_stats': academic_stats,
+        'academic_stats': snapshot['academic_stats'],
         'chart_data': chart_data,
-        'activity_stats': activity_stats,
+        'activity_stats': snapshot['activity_stats'],
+        'metrics_computed_at': snapshot['computed_at'],
         'recent_announcements': recent_announcements,
         'today': today,
         'now': now,
@@ -419,10 +301,10 @@ def student_dashboard(request):
         
         # Le pourcentage est calculé automatiquement par la propriété @percentage du modèle Grade
         
-        # Moyenne générale
-        student_grades = Grade.objects.filter(student=student)
-        if student_grades.exists():
-            avg_grade = student_grades.aggregate(avg=Avg('score'))['avg']
+        # Moyenne générale (cumuls de notes)
+        totals = StudentAcademicRollup.objects.filter(student=student).totals_by_student().get(student.pk)
+        if totals:
+            avg_grade = totals['average']
             context['average_grade'] = round(avg_grade, 2) if avg_grade else None
             context['average_percentage'] = round((avg_grade / 20) * 100, 1) if avg_grade else 0
         
@@ -541,10 +423,9 @@ def student_dashboard(request):
     ).count()
     
     # Informations financières - calcul avec balance réelle (inclut les paiements partiels)
-    all_student_invoices = Invoice.objects.filter(student=student).prefetch_related('payments')
-    pending_invoices_list = [inv for inv in all_student_invoices if not inv.is_paid]
-    pending_invoices = sorted(pending_invoices_list, key=lambda x: x.due_date, reverse=True)[:3]
-    total_pending = sum(inv.balance for inv in pending_invoices_list)
+    pending_student_invoices = Invoice.objects.filter(student=student).outstanding()
+    pending_invoices = pending_student_invoices.order_by('-due_date')[:3]
+    total_pending = pending_student_invoices.total_balance()
     
     recent_payments = Payment.objects.filter(
         invoice__student=student,
@@ -853,6 +734,8 @@ def parent_dashboard(request):
     total_children = children.count()
     
     # Collecte des données pour tous les enfants
+    # Moyennes et nombres de notes des enfants : une requête sur les cumuls
+    children_totals = StudentAcademicRollup.objects.filter(student__in=children).totals_by_student()
     children_data = []
     overall_stats = {
         'total_grades': 0,
@@ -868,8 +751,8 @@ def parent_dashboard(request):
         ).select_related('subject', 'teacher').order_by('-created_at')[:5]
         
         # Moyenne générale de l'enfant
-        all_grades = Grade.objects.filter(student=child)
-        average_grade = all_grades.aggregate(avg=Avg('score'))['avg'] or 0
+        child_totals = children_totals.get(child.pk, {})
+        average_grade = child_totals.get('average') or 0
         
         # Vérifier si l'élève est inscrit (a une classe ou une inscription active)
         is_enrolled = child.current_class is not None or Enrollment.objects.filter(
@@ -922,10 +805,8 @@ def parent_dashboard(request):
         ).select_related('session').order_by('-session__date')[:3]
         
         # Informations financières de l'enfant - Calcul correct avec paiements partiels
-        all_child_invoices = Invoice.objects.filter(student=child).prefetch_related('payments')
-        
-        # Factures non entièrement payées
-        pending_invoices_list = [inv for inv in all_child_invoices if not inv.is_paid]
+        # Factures non entièrement payées (solde stocké, filtré en SQL)
+        pending_invoices_list = list(Invoice.objects.filter(student=child).outstanding())
         
         # Calcul du vrai solde (montant - paiements effectués)
         total_pending = sum(inv.balance for inv in pending_invoices_list)
@@ -963,7 +844,7 @@ def parent_dashboard(request):
         children_data.append(child_data)
         
         # Mise à jour des statistiques globales
-        overall_stats['total_grades'] += all_grades.count()
+        overall_stats['total_grades'] += child_totals.get('grade_count', 0)
         overall_stats['total_average'] += average_grade
         overall_stats['total_absences'] += attendance_stats['absent']
         overall_stats['total_pending_amount'] += float(total_pending)
@@ -1197,7 +1078,7 @@ def user_create(request):
                     messages.success(
                         request, 
                         f'Utilisateur {user.full_name} créé avec succès. '
-                        f'Un email contenant les identifiants a été envoyé à {user.email}.'
+                        f'Un email contenant les identifiants va être envoyé à {user.email}.'
                     )
                 else:
                     messages.warning(
@@ -1557,7 +1438,7 @@ def parent_create(request):
                     messages.success(
                         request, 
                         f'Parent {user.get_full_name()} créé avec succès. '
-                        f'Un email contenant les identifiants a été envoyé à {user.email}.'
+                        f'Un email contenant les identifiants va être envoyé à {user.email}.'
                     )
                 else:
                     messages.warning(
@@ -1991,41 +1872,35 @@ def parent_bulk_import(request):
 @login_required
 @admin_required  
 def parent_export_csv(request):
-    """Export des parents en format CSV"""
-    import csv
-    from django.http import HttpResponse
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="parents_export.csv"'
-    
-    writer = csv.writer(response)
-    
-    # En-têtes
-    writer.writerow([
-        'ID', 'Prénom', 'Nom', 'Email', 'Téléphone', 'Relation',
-        'Profession', 'Lieu de travail', 'Nombre d\'enfants', 'Actif',
-        'Date création'
-    ])
-    
-    # Données
-    parents = Parent.objects.select_related('user').prefetch_related('children')
-    
-    for parent in parents:
-        writer.writerow([
-            parent.id,
-            parent.user.first_name,
-            parent.user.last_name,
-            parent.user.email,
-            parent.user.phone or '',
-            parent.get_relationship_display(),
-            parent.profession or '',
-            parent.workplace or '',
-            parent.children.count(),
-            'Oui' if parent.user.is_active else 'Non',
-            parent.created_at.strftime('%Y-%m-%d %H:%M')
-        ])
-    
-    return response
+    """
+    Export des parents en format CSV (ou XLSX avec ?format=xlsx)
+    
+    Envoyé en streaming, nombre d'enfants compté en SQL (voir core.exports).
+    """
+    from core.exports import Column, TabularExport, blank_if_none, choice_labels, label_format, yes_no
+    
+    parents = Parent.objects.annotate(children_count=Count('children')).order_by('id')
+    export = TabularExport(
+        parents,
+        [
+            Column('ID', 'id'),
+            Column('Prénom', 'user__first_name'),
+            Column('Nom', 'user__last_name'),
+            Column('Email', 'user__email'),
+            Column('Téléphone', 'user__phone', blank_if_none),
+            Column('Relation', 'relationship', label_format(choice_labels(Parent, 'relationship'))),
+            Column('Profession', 'profession', blank_if_none),
+            Column('Lieu de travail', 'workplace', blank_if_none),
+            Column('Nombre d\'enfants', 'children_count'),
+            Column('Actif', 'user__is_active', yes_no),
+            Column('Date création', 'created_at', lambda created_at: created_at.strftime('%Y-%m-%d %H:%M')),
+        ],
+        filename='parents_export',
+        sheet_title='Parents',
+        # Sortie CSV inchangée : sans BOM, comme avant le passage à TabularExport
+        bom=False,
+    )
+    return export.response(request.GET.get('format', 'csv'))
 
 
 @user_passes_test(is_admin_or_staff)
@@ -2264,42 +2139,36 @@ def student_grades_detail(request):
         messages.error(request, 'Profil étudiant non trouvé.')
         return redirect('accounts:dashboard')
     
+    # Toutes les notes en une requête, statistiques calculées en un passage
+    report = build_student_grade_report(student)
+    
     # Récupération des notes par matière
     grades_by_subject = {}
-    subjects = Subject.objects.filter(grades__student=student).distinct()
-    
-    for subject in subjects:
-        subject_grades = Grade.objects.filter(
-            student=student, 
-            subject=subject
-        ).order_by('-created_at')
-        
-        # Calculs statistiques
-        avg_score = subject_grades.aggregate(avg=Avg('score'))['avg'] or 0
-        best_score = subject_grades.order_by('-score').first()
+    for subject in report.subjects:
+        stats = report.subject_stats[subject.pk]
+        subject_grades = report.grades_for(subject.pk)
         recent_trend = subject_grades[:3]
         
         grades_by_subject[subject] = {
             'grades': subject_grades,
-            'average': round(avg_score, 2),
-            'percentage': round((avg_score / 20) * 100, 1),
-            'best_score': best_score.score if best_score else 0,
-            'total_evaluations': subject_grades.count(),
+            'average': stats.average,
+            'percentage': round((stats.average / 20) * 100, 1),
+            'best_score': stats.best_score,
+            'total_evaluations': stats.count,
             'recent_trend': recent_trend,
             'improvement': calculate_improvement(recent_trend) if len(recent_trend) >= 2 else 0
         }
     
     # Moyenne générale
-    all_grades = Grade.objects.filter(student=student)
-    general_average = all_grades.aggregate(avg=Avg('score'))['avg'] or 0
+    general_average = report.general_average
     
     context = {
         'student': student,
         'grades_by_subject': grades_by_subject,
-        'general_average': round(general_average, 2),
+        'general_average': general_average,
         'general_percentage': round((general_average / 20) * 100, 1),
-        'total_subjects': subjects.count(),
-        'total_evaluations': all_grades.count(),
+        'total_subjects': len(report.subjects),
+        'total_evaluations': report.total_evaluations,
     }
     
     return render(request, 'accounts/student_grades_detail.html', context)
@@ -2390,83 +2259,64 @@ def student_report_card(request):
     report_data = []
     
     # Récupérer toutes les matières de la classe de l'étudiant
-    from academic.models import TeacherAssignment
-    all_class_subjects = Subject.objects.filter(
+    all_class_subjects = list(Subject.objects.filter(
         teacherassignment__classroom=student.current_class
-    ).distinct()
+    ).distinct())
+    
+    # Notes de l'année en une requête ; moyennes par période et matière en un passage
+    periods = list(periods)
+    report = build_student_grade_report(
+        student,
+        periods,
+        date_from=min((period.start_date for period in periods), default=None),
+        date_to=max((period.end_date for period in periods), default=None),
+    )
     
-    for period in periods:
-        # Notes de l'étudiant pour cette période
-        period_grades = Grade.objects.filter(
-            student=student,
-            date__gte=period.start_date,
-            date__lte=period.end_date
-        )
+    for index, period in enumerate(report.periods):
+        period_stats = report.period_stats[index]
         
         # Regrouper par matière
         subjects_data = {}
-        subjects_with_grades = Subject.objects.filter(grades__in=period_grades).distinct()
-        
-        for subject in subjects_with_grades:
-            subject_grades = period_grades.filter(subject=subject)
-            
-            # Calculer la moyenne de la matière pour cette période
-            grades_list = []
-            total_weighted = 0
-            total_coef = 0
-            
-            for grade in subject_grades:
-                grades_list.append({
+        for subject in report.subjects:
+            stats = period_stats.get(subject.pk)
+            if stats is None:
+                continue
+            grades_list = [
+                {
                     'name': grade.evaluation_name,
                     'type': grade.get_evaluation_type_display(),
                     'score': grade.score,
                     'max_score': grade.max_score,
                     'coefficient': grade.coefficient,
                     'date': grade.date,
-                })
-                total_weighted += float(grade.score * grade.coefficient)
-                total_coef += float(grade.coefficient)
-            
-            average = (total_weighted / total_coef) if total_coef > 0 else 0
-            
+                }
+                for grade in sorted(report.grades_for(subject.pk, index), key=lambda row: row.date, reverse=True)
+            ]
             subjects_data[subject.name] = {
                 'subject': subject,
                 'grades': grades_list,
-                'average': round(average, 2),
-                'total_grades': len(grades_list),
+                'average': stats.weighted_average,
+                'total_grades': stats.count,
                 'coefficient': subject.coefficient,
             }
         
         # Identifier les matières sans notes pour cette période
-        subjects_without_grades = []
-        for subject in all_class_subjects:
-            if subject not in subjects_with_grades:
-                subjects_without_grades.append({
-                    'subject': subject,
-                    'name': subject.name,
-                    'code': subject.code,
-                    'coefficient': subject.coefficient,
-                })
-        
-        # Calculer la moyenne générale de la période
-        if subjects_data:
-            period_total_weighted = sum(
-                data['average'] * float(data['coefficient']) 
-                for data in subjects_data.values()
-            )
-            period_total_coef = sum(
-                float(data['coefficient']) 
-                for data in subjects_data.values()
-            )
-            period_average = (period_total_weighted / period_total_coef) if period_total_coef > 0 else 0
-        else:
-            period_average = 0
+        subjects_without_grades = [
+            {
+                'subject': subject,
+                'name': subject.name,
+                'code': subject.code,
+                'coefficient': subject.coefficient,
+            }
+            for subject in all_class_subjects
+            if subject.pk not in period_stats
+        ]
         
         report_data.append({
             'period': period,
             'subjects': subjects_data,
             'subjects_without_grades': subjects_without_grades,
-            'period_average': round(period_average, 2),
+            'period_average': report.period_averages[index],
             'total_subjects': len(subjects_data),
             'total_subjects_without_grades': len(subjects_without_grades),
             'total_evaluations': sum(data['total_grades'] for data in subjects_data.values()),
@@ -2474,11 +2324,7 @@ def student_report_card(request):
         })
     
     # Moyenne annuelle globale
-    periods_with_grades = [p for p in report_data if p['period_average'] > 0]
-    if periods_with_grades:
-        annual_average = sum(p['period_average'] for p in periods_with_grades) / len(periods_with_grades)
-    else:
-        annual_average = 0
+    annual_average = report.annual_average
     
     # Vérifier si au moins une période a des données
     has_any_data = any(p['has_data'] for p in report_data)
@@ -3012,10 +2858,8 @@ def parent_children_overview(request):
             attendance_rate = round((effective_present / total_sessions) * 100, 1) if total_sessions > 0 else 0
         
         # Situation financière - Calcul correct avec paiements partiels
-        all_child_invoices = Invoice.objects.filter(student=child).prefetch_related('payments')
-        
-        # Factures non entièrement payées (utilise la propriété is_paid)
-        pending_invoices_list = [inv for inv in all_child_invoices if not inv.is_paid]
+        # Factures non entièrement payées (solde stocké, filtré en SQL)
+        pending_invoices_list = list(Invoice.objects.filter(student=child).outstanding())
         
         # Factures en retard (échéance passée ET non payées)
         overdue_invoices_list = [
@@ -3117,37 +2961,41 @@ def parent_child_detail(request, child_id):
         student=child
     ).select_related('subject', 'teacher').order_by('-created_at')[:10]
     
-    average_grade = Grade.objects.filter(student=child).aggregate(avg=Avg('score'))['avg'] or 0
+    # Toutes les notes de l'enfant en une requête, statistiques en un passage
+    report = build_student_grade_report(child)
+    average_grade = report.general_average
     
     # Statistiques académiques détaillées
-    all_grades = Grade.objects.filter(student=child)
-    grades_by_subject = all_grades.values('subject__name').annotate(
-        avg_score=Avg('score'),
-        count=Count('id')
-    ).order_by('-avg_score')
+    grades_by_subject = sorted(
+        (
+            {'subject__name': stats.subject.name, 'avg_score': stats.average, 'count': stats.count}
+            for stats in report.subject_stats.values()
+        ),
+        key=lambda item: item['avg_score'],
+        reverse=True,
+    )
     
     # Rang en classe (approximatif)
     if child.current_class:
-        students_in_class = Student.objects.filter(current_class=child.current_class)
-        class_size = students_in_class.count()
-        
-        # Calculer les moyennes de tous les élèves de la classe
-        student_averages = []
-        for student in students_in_class:
-            avg = Grade.objects.filter(student=student).aggregate(avg=Avg('score'))['avg']
-            if avg:
-                student_averages.append({'student_id': student.pk, 'average': float(avg)})
-        
-        # Trier et trouver le rang
-        student_averages.sort(key=lambda x: x['average'], reverse=True)
-        class_rank = next((i + 1 for i, s in enumerate(student_averages) if s['student_id'] == child.pk), None)
+        class_student_ids = list(
+            Student.objects.filter(current_class=child.current_class).values_list('pk', flat=True)
+        )
+        class_size = len(class_student_ids)
+        
+        # Moyennes de tous les élèves de la classe (une requête)
+        student_averages = sorted(
+            average_scores_by_student(class_student_ids).items(),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        class_rank = next((i + 1 for i, (student_id, _) in enumerate(student_averages) if student_id == child.pk), None)
     else:
         class_size = 0
         class_rank = None
     
     # Tendance des notes (comparer les 5 dernières avec les 5 précédentes)
-    recent_5 = list(all_grades.order_by('-created_at')[:5])
-    previous_5 = list(all_grades.order_by('-created_at')[5:10])
+    recent_5 = report.rows[:5]
+    previous_5 = report.rows[5:10]
     
     if recent_5 and previous_5:
         recent_avg = float(sum(g.score for g in recent_5) / len(recent_5))
@@ -3170,7 +3018,7 @@ def parent_child_detail(request, child_id):
         'average_grade': round(average_grade, 2) if average_grade else 0,
         'class_rank': class_rank,
         'class_size': class_size,
-        'subject_count': grades_by_subject.count(),
+        'subject_count': len(grades_by_subject),
         'trend': trend,
         'trend_description': trend_description,
         'grades_by_subject': grades_by_subject,
@@ -3216,10 +3064,8 @@ def parent_child_detail(request, child_id):
     month_start = today.replace(day=1)
     
     # Toutes les factures de l'élève
-    all_invoices = Invoice.objects.filter(student=child).prefetch_related('payments')
-    
-    # Factures en attente (non entièrement payées)
-    pending_invoices = [inv for inv in all_invoices if not inv.is_paid]
+    # Factures en attente (non entièrement payées, solde stocké filtré en SQL)
+    pending_invoices = list(Invoice.objects.filter(student=child).outstanding())
     
     # Factures payées récemment
     paid_invoices = Invoice.objects.filter(
@@ -3250,14 +3096,7 @@ def parent_child_detail(request, child_id):
     )
     
     # Prochaine échéance (facture avec solde restant et date d'échéance la plus proche)
-    next_invoice = None
-    if pending_invoices:
-        # Trier par date d'échéance
-        sorted_pending = sorted(
-            [inv for inv in pending_invoices if hasattr(inv, 'due_date')],
-            key=lambda x: x.due_date
-        )
-        next_invoice = sorted_pending[0] if sorted_pending else None
+    next_invoice = min(pending_invoices, key=lambda x: x.due_date) if pending_invoices else None
     
     financial_stats = {
         'total_balance': float(total_balance),  # Solde restant à payer
@@ -209,6 +209,10 @@ def log_activity(user, action_type, description, content_type=None, object_id=No
     """
     Fonction utilitaire pour créer un log d'activité
     
+    L'entrée est écrite par lots en arrière-plan (voir activity_log.writer) :
+    l'instance retournée n'a pas encore d'identifiant, sauf si
+    ACTIVITY_LOG_ASYNC est désactivé.
+    
     Usage:
         log_activity(
             user=request.user,
@@ -244,4 +248,5 @@ def log_activity(user, action_type, description, content_type=None, object_id=No
         log_data['ip_address'] = request.META.get('REMOTE_ADDR')
         log_data['user_agent'] = request.META.get('HTTP_USER_AGENT', '')[:255]
     
-    return ActivityLog.objects.create(**log_data)
+    from .writer import write_activity
+    return write_activity(ActivityLog(**log_data))
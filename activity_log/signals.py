@@ -1,29 +1,83 @@
 """
 Signaux pour le tracking automatique des activités
 """
-from django.db.models.signals import post_save, post_delete, pre_save
+from types import SimpleNamespace
+
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.utils import timezone
 
 from academic.models import Grade
-from finance.models import Invoice, Payment
+from finance.models import Invoice, Payment, PaymentMethod
 from activity_log.models import ActivityLog, log_activity
 from activity_log.utils import get_current_user, get_current_request
 
 
-# ==================== GRADES ====================
+# ==================== ÉTAT CHARGÉ ====================
 
-@receiver(pre_save, sender=Grade)
-def grade_pre_save(sender, instance, **kwargs):
-    """Capture l'état avant modification d'une note"""
-    if instance.pk:
-        try:
-            instance._old_instance = Grade.objects.get(pk=instance.pk)
-        except Grade.DoesNotExist:
-            instance._old_instance = None
-    else:
+# Champs comparés avant/après modification pour chaque modèle suivi
+TRACKED_FIELDS = {
+    Grade: ('score', 'max_score', 'coefficient', 'evaluation_type'),
+    Invoice: ('total_amount', 'status', 'due_date'),
+    Payment: ('amount', 'payment_method_id', 'status', 'payment_date'),
+}
+
+
+def _snapshot(instance):
+    """Valeurs suivies déjà en mémoire (None si un champ est différé)"""
+    values = instance.__dict__
+    fields = TRACKED_FIELDS[type(instance)]
+    if not all(field in values for field in fields):
+        return None
+    return SimpleNamespace(**{field: values[field] for field in fields})
+
+
+def remember_loaded_state(sender, instance, **kwargs):
+    """Mémorise l'état d'une instance chargée, sans requête supplémentaire"""
+    instance._loaded_snapshot = _snapshot(instance) if instance.pk else None
+
+
+def capture_previous_state(sender, instance, **kwargs):
+    """
+    Capture l'état avant modification
+
+    L'état mémorisé au chargement est réutilisé ; la base n'est relue que si
+    l'instance n'en provient pas (ou a été chargée avec des champs différés).
+    """
+    if not instance.pk:
         instance._old_instance = None
+        return
+    snapshot = getattr(instance, '_loaded_snapshot', None)
+    if snapshot is not None and not instance._state.adding:
+        instance._old_instance = snapshot
+        return
+    fields = TRACKED_FIELDS[sender]
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._old_instance = SimpleNamespace(**previous) if previous else None
+
+
+def refresh_loaded_state(sender, instance, **kwargs):
+    """Après sauvegarde, l'état courant devient la référence des modifications suivantes"""
+    instance._loaded_snapshot = _snapshot(instance)
+
+
+for _model in TRACKED_FIELDS:
+    post_init.connect(remember_loaded_state, sender=_model, dispatch_uid=f'activity_log_loaded_{_model.__name__}')
+    pre_save.connect(capture_previous_state, sender=_model, dispatch_uid=f'activity_log_previous_{_model.__name__}')
+    post_save.connect(refresh_loaded_state, sender=_model, dispatch_uid=f'activity_log_saved_{_model.__name__}')
+
+
+def _payment_method_name(payment_method_id, instance):
+    if not payment_method_id:
+        return 'N/A'
+    if payment_method_id == instance.payment_method_id:
+        return instance.payment_method.name
+    name = PaymentMethod.objects.filter(pk=payment_method_id).values_list('name', flat=True).first()
+    return name or 'N/A'
+
+
+# ==================== GRADES ====================
 
 
 @receiver(post_save, sender=Grade)
@@ -131,18 +185,6 @@ def grade_post_delete(sender, instance, **kwargs):
 
 # ==================== INVOICES ====================
 
-@receiver(pre_save, sender=Invoice)
-def invoice_pre_save(sender, instance, **kwargs):
-    """Capture l'état avant modification d'une facture"""
-    if instance.pk:
-        try:
-            instance._old_instance = Invoice.objects.get(pk=instance.pk)
-        except Invoice.DoesNotExist:
-            instance._old_instance = None
-    else:
-        instance._old_instance = None
-
-
 @receiver(post_save, sender=Invoice)
 def invoice_post_save(sender, instance, created, **kwargs):
     """Log la création ou modification d'une facture"""
@@ -239,18 +281,6 @@ def invoice_post_delete(sender, instance, **kwargs):
 
 # ==================== PAYMENTS ====================
 
-@receiver(pre_save, sender=Payment)
-def payment_pre_save(sender, instance, **kwargs):
-    """Capture l'état avant modification d'un paiement"""
-    if instance.pk:
-        try:
-            instance._old_instance = Payment.objects.get(pk=instance.pk)
-        except Payment.DoesNotExist:
-            instance._old_instance = None
-    else:
-        instance._old_instance = None
-
-
 @receiver(post_save, sender=Payment)
 def payment_post_save(sender, instance, created, **kwargs):
     """Log la création ou modification d'un paiement"""
@@ -292,7 +322,7 @@ def payment_post_save(sender, instance, created, **kwargs):
             
             old_values = {
                 'amount': float(old_instance.amount),
-                'payment_method': old_instance.payment_method.name if old_instance.payment_method else 'N/A',
+                'payment_method': _payment_method_name(old_instance.payment_method_id, instance),
                 'status': old_instance.status,
                 'payment_date': old_instance.payment_date.isoformat() if old_instance.payment_date else None,
             }
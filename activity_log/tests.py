@@ -1,3 +1,135 @@
-from django.test import TestCase
+"""
+Tests du journal d'activité
+"""
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Student
+from activity_log.models import ActivityLog, log_activity
+from activity_log.signals import capture_previous_state
+from activity_log.writer import activity_writer
+from finance.models import Invoice
+
+User = get_user_model()
+
+
+class ActivityLogWriterTest(TestCase):
+    """Écriture immédiate ou groupée des entrées de journal"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='admin@test.com', password='x', role='ADMIN')
+
+    def _log(self, index=0):
+        return log_activity(
+            user=self.user,
+            action_type='OTHER',
+            description=f'Action {index}',
+            content_type='User',
+            object_repr=f'Objet {index}',
+        )
+
+    def test_synchronous_write(self):
+        entry = self._log()
+
+        self.assertIsNotNone(entry.pk)
+        self.assertTrue(ActivityLog.objects.filter(pk=entry.pk).exists())
+
+    @override_settings(ACTIVITY_LOG_ASYNC=True, ACTIVITY_LOG_BATCH_SIZE=1000, ACTIVITY_LOG_FLUSH_INTERVAL=3600)
+    def test_entries_queued_on_commit_and_written_in_one_batch(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            entries = [self._log(index) for index in range(3)]
+            self.assertEqual(activity_writer.pending, 0)
+
+        self.assertEqual(len(callbacks), 3)
+        self.assertIsNone(entries[0].pk)
+        self.assertEqual(activity_writer.pending, 3)
+        self.assertFalse(ActivityLog.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(activity_writer.flush(), 3)
+        self.assertEqual(activity_writer.pending, 0)
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('description', flat=True)),
+            ['Action 0', 'Action 1', 'Action 2']
+        )
+
+    @override_settings(ACTIVITY_LOG_ASYNC=True, ACTIVITY_LOG_BATCH_SIZE=1000, ACTIVITY_LOG_FLUSH_INTERVAL=3600)
+    def test_rolled_back_entries_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self._log()
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertEqual(activity_writer.pending, 0)
+        activity_writer.flush()
+        self.assertFalse(ActivityLog.objects.exists())
+
+    @override_settings(ACTIVITY_LOG_ASYNC=True, ACTIVITY_LOG_BATCH_SIZE=1000, ACTIVITY_LOG_FLUSH_INTERVAL=3600)
+    def test_rolled_back_savepoint_entries_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self._log(0)
+                try:
+                    with transaction.atomic():
+                        self._log(1)
+                        raise ValueError
+                except ValueError:
+                    pass
+                self._log(2)
+
+        self.assertEqual(activity_writer.flush(), 2)
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('description', flat=True)), ['Action 0', 'Action 2']
+        )
+
+
+class PreviousStateTest(TestCase):
+    """L'état avant modification réutilise l'instance chargée"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='finance@test.com', password='x', role='FINANCE')
+        student_user = User.objects.create_user(email='eleve@test.com', password='x', role='STUDENT')
+        self.student = Student.objects.create(user=student_user, matricule='STU0001')
+        self.invoice = Invoice.objects.create(
+            student=self.student, due_date=date(2025, 10, 31), total_amount=Decimal('100.00')
+        )
+
+    def test_loaded_instance_is_not_refetched(self):
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+        invoice.total_amount = Decimal('150.00')
+
+        with CaptureQueriesContext(connection) as queries:
+            capture_previous_state(Invoice, invoice)
+
+        self.assertEqual(len(queries.captured_queries), 0)
+        self.assertEqual(invoice._old_instance.total_amount, Decimal('100.00'))
+
+    def test_deferred_instance_falls_back_to_query(self):
+        invoice = Invoice.objects.only('id').get(pk=self.invoice.pk)
+
+        with self.assertNumQueries(1):
+            capture_previous_state(Invoice, invoice)
+
+        self.assertEqual(invoice._old_instance.total_amount, Decimal('100.00'))
+
+    def test_update_logs_old_and_new_values(self):
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+        invoice._user = self.user
+        invoice.status = 'PENDING'
+        invoice.save()
+        invoice.status = 'PAID'
+        invoice.save()
+
+        updates = ActivityLog.objects.filter(action_type='INVOICE_UPDATE').order_by('id')
+        self.assertEqual(
+            [(log.old_values['status'], log.new_values['status']) for log in updates],
+            [('DRAFT', 'PENDING'), ('PENDING', 'PAID')]
+        )
@@ -0,0 +1,144 @@
+"""
+Écriture groupée du journal d'activité
+
+`log_activity` ne fait plus un INSERT par action : les entrées sont placées
+dans une file en mémoire, vidée par un thread d'arrière-plan avec
+bulk_create dès que la file atteint ACTIVITY_LOG_BATCH_SIZE entrées ou que
+ACTIVITY_LOG_FLUSH_INTERVAL secondes se sont écoulées.
+
+Les entrées créées dans une transaction ne rejoignent la file qu'au commit
+(et sont abandonnées en cas de rollback). La file est vidée à l'arrêt du
+processus. Avec ACTIVITY_LOG_ASYNC = False (tests), l'écriture est
+immédiate, comme auparavant.
+"""
+import atexit
+import logging
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+
+class ActivityLogWriter:
+    """File d'entrées de journal écrite par lots dans un thread dédié"""
+
+    def __init__(self):
+        self._queue = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    @property
+    def pending(self):
+        with self._condition:
+            return len(self._queue)
+
+    def enqueue(self, entries):
+        """Ajoute des entrées (ActivityLog non sauvegardés) à la file"""
+        if not entries:
+            return
+        with self._condition:
+            self._queue.extend(entries)
+            self._ensure_thread()
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """Écrit immédiatement les entrées en attente depuis le thread appelant"""
+        with self._condition:
+            entries, self._queue = self._queue, []
+        return self._write(entries)
+
+    def drain(self):
+        """Arrête le thread d'écriture et vide la file (arrêt du processus)"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(self.flush_interval, 1.0) * 5)
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._stopping or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+        self._thread.start()
+
+    def _write(self, entries):
+        if not entries:
+            return 0
+        from .models import ActivityLog
+        try:
+            ActivityLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            return len(entries)
+        except Exception:
+            logger.exception("Échec de l'écriture groupée de %d entrée(s) du journal d'activité", len(entries))
+
+        # Une entrée invalide ne doit pas faire perdre tout le lot
+        written = 0
+        for entry in entries:
+            try:
+                entry.save()
+                written += 1
+            except Exception:
+                logger.exception("Entrée du journal d'activité ignorée : %s", entry.description)
+        return written
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._stopping or len(self._queue) >= self.batch_size,
+                        timeout=self.flush_interval,
+                    )
+                    entries, self._queue = self._queue, []
+                    stopping = self._stopping
+                if entries:
+                    close_old_connections()
+                    self._write(entries)
+                if stopping:
+                    return
+        finally:
+            connection.close()
+
+
+activity_writer = ActivityLogWriter()
+atexit.register(activity_writer.drain)
+
+
+def write_activity(entry):
+    """
+    Enregistre une entrée de journal (ActivityLog non sauvegardé)
+
+    Écriture immédiate si ACTIVITY_LOG_ASYNC est désactivé, sinon mise en
+    file (au commit si une transaction est en cours). Chaque entrée a son
+    propre rappel de commit : une entrée créée dans un point de sauvegarde
+    annulé est abandonnée avec lui. Les entrées d'une même transaction sont
+    écrites ensemble par le thread (un bulk_create par lot de la file).
+    """
+    if not getattr(settings, 'ACTIVITY_LOG_ASYNC', True):
+        entry.save()
+        return entry
+
+    if not transaction.get_connection().in_atomic_block:
+        activity_writer.enqueue([entry])
+        return entry
+
+    transaction.on_commit(partial(activity_writer.enqueue, [entry]))
+    return entry
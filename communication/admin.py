@@ -1,11 +1,16 @@
 from django.contrib import admin
 from .models import (
-    Announcement, AnnouncementRead, Message, GroupMessage, 
+    Announcement, AnnouncementRead, AnnouncementTargetRole, Message, GroupMessage, 
     GroupMessageRead, Resource, ResourceAccess, Notification, 
     EmailTemplate, EmailLog
 )
 
 
+class AnnouncementTargetRoleInline(admin.TabularInline):
+    model = AnnouncementTargetRole
+    extra = 0
+
+
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
     list_display = ('title', 'type', 'audience', 'author', 'is_published', 'publish_date', 'priority')
@@ -13,6 +18,7 @@ class AnnouncementAdmin(admin.ModelAdmin):
     search_fields = ('title', 'content')
     filter_horizontal = ('target_classes', 'target_levels')
     date_hierarchy = 'publish_date'
+    inlines = [AnnouncementTargetRoleInline]
 
 
 @admin.register(AnnouncementRead)
@@ -76,3 +82,9 @@ class EmailLogAdmin(admin.ModelAdmin):
     list_filter = ('status', 'sent_date')
     search_fields = ('recipient_email', 'subject')
     date_hierarchy = 'sent_date'
+
+    def get_exclude(self, request, obj=None):
+        # Corps d'un message confidentiel jamais affiché, même en attente d'envoi
+        if obj is not None and obj.is_confidential:
+            return ('body', 'body_html')
+        return super().get_exclude(request, obj)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommunicationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "communication"
+
+    def ready(self):
+        """Importer les signaux au démarrage de l'application"""
+        import communication.signals
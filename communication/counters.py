@@ -0,0 +1,263 @@
+"""
+Compteurs par utilisateur (non-lus et totaux), gardés en cache
+
+Les badges (en-tête, messages, notifications, annonces) lisent ces
+compteurs dans le cache au lieu d'un COUNT(*) par page :
+- notifications : notifications non lues ;
+- messages_unread, messages_received, messages_sent : messages reçus non
+  lus, reçus et envoyés (hors messages supprimés) ;
+- announcements : annonces visibles pour l'utilisateur et non lues
+  (voir communication.visibility).
+
+Un compteur absent est recalculé (une requête) puis ajouté au cache. Les
+écritures unitaires (envoi, lecture ou suppression d'un message, création
+ou lecture d'une notification, lecture d'une annonce) l'ajustent avec
+cache.incr/decr, atomiques, via les signaux (communication.signals), après
+le commit de la transaction (rien n'est ajusté si elle est annulée). Les
+écritures en masse (diffusion de notifications, update) suppriment les
+clés concernées. La publication ou la modification d'une annonce change
+la génération des compteurs d'annonces (tous à recalculer) ; un compteur
+d'annonces n'est pas gardé au-delà de la validité de la liste des annonces
+visibles dont il est tiré (expiration d'une annonce).
+
+Un écart (écriture hors ORM, lecture concurrente pendant la transaction)
+est corrigé par la commande reconcile_unread_counters, à lancer
+périodiquement.
+
+Ces compteurs supposent un cache partagé par tous les processus (Redis,
+Memcached ; contrôle core.W001 de `check --deploy`). Avec un cache propre
+à chaque processus (LocMemCache), ajustements et invalidations ne touchent
+que le processus qui écrit : les compteurs n'y sont gardés que quelques
+secondes (voir core.caching).
+"""
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from core.caching import cache_timeout
+
+from .models import AnnouncementRead, Message, Notification, User
+from .visibility import (
+    announcements_generation, compute_visible_announcements, remaining_seconds, visible_announcements,
+)
+
+COUNTERS_CACHE_PREFIX = 'communication:counters'
+COUNTERS_TTL = 60 * 60 * 24
+
+MESSAGE_COUNTERS = ('messages_unread', 'messages_received', 'messages_sent')
+COUNTERS = ('notifications',) + MESSAGE_COUNTERS + ('announcements',)
+
+
+def _key(name, user_id, generation=None):
+    if name == 'announcements':
+        return f'{COUNTERS_CACHE_PREFIX}:{name}:{generation or announcements_generation()}:{user_id}'
+    return f'{COUNTERS_CACHE_PREFIX}:{name}:{user_id}'
+
+
+# Calcul en base
+
+def _received(user_id):
+    return Message.objects.filter(recipient_id=user_id, deleted_by_recipient=False)
+
+
+def _unread_announcements(visible, read_ids):
+    return len(set(visible.ids) - set(read_ids))
+
+
+def compute_counter(name, user):
+    """
+    Valeur exacte d'un compteur
+
+    Returns:
+        tuple: (valeur, durée de validité en cache en secondes)
+    """
+    user_id = getattr(user, 'pk', user)
+    if name == 'notifications':
+        return Notification.objects.filter(user_id=user_id, is_read=False).count(), COUNTERS_TTL
+    if name == 'messages_unread':
+        return _received(user_id).filter(is_read=False).count(), COUNTERS_TTL
+    if name == 'messages_received':
+        return _received(user_id).count(), COUNTERS_TTL
+    if name == 'messages_sent':
+        return Message.objects.filter(sender_id=user_id, deleted_by_sender=False).count(), COUNTERS_TTL
+    if name == 'announcements':
+        if not isinstance(user, User):
+            user = User.objects.only('pk', 'role').get(pk=user_id)
+        visible = visible_announcements(user)
+        read_ids = AnnouncementRead.objects.filter(
+            user_id=user_id, announcement_id__in=visible.ids
+        ).values_list('announcement_id', flat=True)
+        return _unread_announcements(visible, read_ids), remaining_seconds(visible.valid_until)
+    raise ValueError(f'Compteur inconnu : {name}')
+
+
+# Lecture
+
+def get_counters(user, names=COUNTERS):
+    """
+    Compteurs demandés de l'utilisateur (instance ou identifiant), lus dans
+    le cache, calculés sinon
+
+    Returns:
+        dict: nom -> valeur
+    """
+    user_id = getattr(user, 'pk', user)
+    generation = announcements_generation() if 'announcements' in names else None
+    keys = {name: _key(name, user_id, generation) for name in names}
+    cached = cache.get_many(keys.values())
+    counters = {}
+    for name, key in keys.items():
+        value = cached.get(key)
+        if value is None:
+            value, timeout = compute_counter(name, user)
+            # add : ne remplace pas une valeur ajustée entre-temps
+            cache.add(key, value, cache_timeout(timeout))
+        counters[name] = max(value, 0)
+    return counters
+
+
+def get_counter(name, user):
+    return get_counters(user, (name,))[name]
+
+
+def unread_notifications(user_id):
+    """Nombre de notifications non lues de l'utilisateur"""
+    return get_counter('notifications', user_id)
+
+
+# Mise à jour
+
+def adjust(name, user_id, delta):
+    """
+    Ajoute `delta` au compteur s'il est en cache (sinon il sera recalculé),
+    après le commit de la transaction en cours
+    """
+    if not delta or not user_id:
+        return
+    transaction.on_commit(partial(_apply_delta, name, user_id, delta))
+
+
+def _apply_delta(name, user_id, delta):
+    key = _key(name, user_id)
+    try:
+        if delta > 0:
+            cache.incr(key, delta)
+        else:
+            cache.decr(key, -delta)
+    except ValueError:
+        pass
+
+
+def apply_changes(old_state, new_state):
+    """
+    Ajuste les compteurs de l'écart entre deux états
+
+    Un état associe (utilisateur, compteur) à la contribution d'un objet
+    (voir Message.get_counter_state).
+    """
+    for user_counter in set(old_state) | set(new_state):
+        user_id, name = user_counter
+        adjust(name, user_id, new_state.get(user_counter, 0) - old_state.get(user_counter, 0))
+
+
+def invalidate(names, user_ids):
+    """
+    Oublie les compteurs des utilisateurs donnés
+
+    Répété après le commit, au cas où une lecture concurrente aurait remis
+    en cache un total d'avant la transaction.
+    """
+    keys = [_key(name, user_id) for name in names for user_id in user_ids if user_id]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_unread_notifications(user_ids):
+    invalidate(('notifications',), user_ids)
+
+
+# Réconciliation
+
+def _grouped_counts(queryset, user_field, **counts):
+    rows = queryset.values(user_field).annotate(**counts).order_by()
+    return {row[user_field]: row for row in rows}
+
+
+def compute_all_counters(user_ids):
+    """
+    Compteurs exacts de plusieurs utilisateurs, en requêtes groupées (une
+    requête par utilisateur pour les annonces visibles)
+
+    Returns:
+        tuple: (identifiant -> {nom: valeur}, identifiant -> fin de validité
+        du compteur d'annonces)
+    """
+    user_ids = list(user_ids)
+    notifications = _grouped_counts(
+        Notification.objects.filter(user_id__in=user_ids, is_read=False), 'user_id', unread=Count('pk')
+    )
+    received = _grouped_counts(
+        Message.objects.filter(recipient_id__in=user_ids, deleted_by_recipient=False), 'recipient_id',
+        total=Count('pk'), unread=Count('pk', filter=Q(is_read=False)),
+    )
+    sent = _grouped_counts(
+        Message.objects.filter(sender_id__in=user_ids, deleted_by_sender=False), 'sender_id', total=Count('pk')
+    )
+
+    # Annonces : visibles (une requête par utilisateur) moins celles lues
+    users = User.objects.filter(pk__in=user_ids).only('pk', 'role')
+    read_ids = {}
+    for user_id, announcement_id in AnnouncementRead.objects.filter(user_id__in=user_ids).values_list(
+        'user_id', 'announcement_id'
+    ):
+        read_ids.setdefault(user_id, set()).add(announcement_id)
+    announcements = {}
+    for user in users:
+        visible = compute_visible_announcements(user)
+        announcements[user.pk] = (_unread_announcements(visible, read_ids.get(user.pk, ())), visible.valid_until)
+
+    return {
+        user_id: {
+            'notifications': notifications.get(user_id, {}).get('unread', 0),
+            'messages_unread': received.get(user_id, {}).get('unread', 0),
+            'messages_received': received.get(user_id, {}).get('total', 0),
+            'messages_sent': sent.get(user_id, {}).get('total', 0),
+            'announcements': announcements[user_id][0],
+        }
+        for user_id in announcements
+    }, {user_id: valid_until for user_id, (_, valid_until) in announcements.items()}
+
+
+def reconcile_counters(user_ids):
+    """
+    Recalcule et remet en cache les compteurs des utilisateurs donnés
+
+    Returns:
+        dict: identifiant -> {nom: (valeur en cache ou None, valeur exacte)}
+        pour les compteurs en cache qui différaient
+    """
+    exact, announcements_valid_until = compute_all_counters(user_ids)
+    generation = announcements_generation()
+    keys = {
+        (user_id, name): _key(name, user_id, generation)
+        for user_id in exact for name in COUNTERS
+    }
+    cached = cache.get_many(keys.values())
+    drift = {}
+    for (user_id, name), key in keys.items():
+        if key in cached and cached[key] != exact[user_id][name]:
+            drift.setdefault(user_id, {})[name] = (cached[key], exact[user_id][name])
+    cache.set_many(
+        {key: exact[user_id][name] for (user_id, name), key in keys.items() if name != 'announcements'},
+        cache_timeout(COUNTERS_TTL),
+    )
+    for user_id, valid_until in announcements_valid_until.items():
+        cache.set(
+            keys[user_id, 'announcements'], exact[user_id]['announcements'],
+            cache_timeout(remaining_seconds(valid_until)),
+        )
+    return drift
@@ -0,0 +1,127 @@
+"""
+Compteurs dénormalisés du forum
+
+Chaque sujet (ForumTopic) garde son nombre de messages (message
+d'ouverture inclus), la date et l'auteur de son dernier message ; chaque
+classe a une ligne ClassroomForumStats (sujets, messages, dernier message).
+Les pages du forum lisent ces colonnes au lieu de compter les messages de
+chaque sujet.
+
+Mise à jour via les signaux (communication.signals) :
+- création d'un sujet ou d'un message : une requête UPDATE par ligne,
+  atomique (F() et CASE), sans relire la ligne ;
+- suppression d'un message ou d'un sujet : recalcul par sous-requêtes du
+  sujet et de la classe concernés (le dernier message peut avoir disparu).
+Un écart (écriture hors ORM, sujet déplacé) est corrigé par la commande
+rebuild_forum_stats.
+"""
+from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import ClassroomForumStats, ForumPost, ForumTopic
+
+
+def _post_added(posted_at, author_id, **counts):
+    """Valeurs d'UPDATE pour un message ajouté à `posted_at`"""
+    newer = Q(last_post_at__isnull=True) | Q(last_post_at__lte=posted_at)
+    changes = {field: F(field) + delta for field, delta in counts.items()}
+    changes['last_post_at'] = Case(
+        When(newer, then=Value(posted_at)), default=F('last_post_at'), output_field=models.DateTimeField()
+    )
+    changes['last_post_author'] = Case(
+        When(newer, then=Value(author_id)), default=F('last_post_author'), output_field=models.IntegerField()
+    )
+    return changes
+
+
+def _classroom_id(topic_id):
+    return ForumTopic.objects.filter(pk=topic_id).values_list('classroom_id', flat=True).first()
+
+
+def _update_classroom(classroom_id, changes):
+    if not ClassroomForumStats.objects.filter(classroom_id=classroom_id).update(**changes):
+        # Première activité de la classe : ligne calculée depuis ses sujets
+        refresh_classroom_stats([classroom_id])
+
+
+# Création
+
+def record_topic(topic):
+    """Compte un sujet créé (et son message d'ouverture) dans sa classe"""
+    _update_classroom(
+        topic.classroom_id,
+        _post_added(topic.last_post_at, topic.last_post_author_id, topics_count=1, posts_count=1),
+    )
+
+
+def record_post(post):
+    """Compte un message créé dans son sujet et dans la classe du sujet"""
+    ForumTopic.objects.filter(pk=post.topic_id).update(
+        updated_at=post.created_at, **_post_added(post.created_at, post.author_id, posts_count=1)
+    )
+    topic = post._state.fields_cache.get('topic')
+    if topic is not None:
+        # Sujet déjà chargé (vue, création via topic=...) : gardé cohérent
+        topic.posts_count += 1
+        topic.updated_at = post.created_at
+        if topic.last_post_at is None or topic.last_post_at <= post.created_at:
+            topic.last_post_at = post.created_at
+            topic.last_post_author_id = post.author_id
+        classroom_id = topic.classroom_id
+    else:
+        classroom_id = _classroom_id(post.topic_id)
+    _update_classroom(classroom_id, _post_added(post.created_at, post.author_id, posts_count=1))
+
+
+# Recalcul
+
+def refresh_topic_stats(topic_ids):
+    """Recalcule les compteurs des sujets donnés, en une requête"""
+    posts = ForumPost.objects.filter(topic=OuterRef('pk')).order_by()
+    latest = posts.order_by('-created_at', '-pk')
+    ForumTopic.objects.filter(pk__in=topic_ids).update(
+        posts_count=Coalesce(Subquery(posts.values('topic').annotate(total=Count('pk')).values('total')), 0) + 1,
+        last_post_at=Coalesce(Subquery(latest.values('created_at')[:1]), F('created_at')),
+        last_post_author=Coalesce(Subquery(latest.values('author')[:1]), F('author')),
+    )
+
+
+def refresh_classroom_stats(classroom_ids, create=True):
+    """
+    Recalcule les compteurs des classes données depuis ceux de leurs sujets
+
+    Args:
+        create: crée les lignes manquantes (pas lors d'une suppression, qui
+            peut être celle de la classe elle-même)
+    """
+    classroom_ids = {classroom_id for classroom_id in classroom_ids if classroom_id}
+    if not classroom_ids:
+        return
+    if create:
+        ClassroomForumStats.objects.bulk_create(
+            [ClassroomForumStats(classroom_id=classroom_id) for classroom_id in classroom_ids],
+            ignore_conflicts=True,
+        )
+    topics = ForumTopic.objects.filter(classroom=OuterRef('classroom')).order_by()
+    totals = topics.values('classroom')
+    latest = topics.order_by(F('last_post_at').desc(nulls_last=True), '-pk')
+    ClassroomForumStats.objects.filter(classroom__in=classroom_ids).update(
+        topics_count=Coalesce(Subquery(totals.annotate(total=Count('pk')).values('total')), 0),
+        posts_count=Coalesce(Subquery(totals.annotate(total=Sum('posts_count')).values('total')), 0),
+        last_post_at=Subquery(latest.values('last_post_at')[:1]),
+        last_post_author=Subquery(latest.values('last_post_author')[:1]),
+    )
+
+
+# Suppression
+
+def record_post_removal(post):
+    """Recalcule le sujet et la classe d'un message supprimé"""
+    refresh_topic_stats([post.topic_id])
+    topic = post._state.fields_cache.get('topic')
+    refresh_classroom_stats([topic.classroom_id if topic is not None else _classroom_id(post.topic_id)], create=False)
+
+
+def record_topic_removal(topic):
+    refresh_classroom_stats([topic.classroom_id], create=False)
@@ -0,0 +1,219 @@
+"""
+File d'envoi des e-mails (EmailLog / EmailTemplate)
+
+Les vues n'envoient plus d'e-mail pendant la requête : elles ajoutent des
+lignes EmailLog en attente (PENDING), insérées en une requête pour un envoi
+groupé. La commande send_queued_emails les envoie par lots :
+- une seule connexion au serveur SMTP par lot (rouverte si elle tombe) ;
+- un échec repousse le message (attente doublée à chaque tentative,
+  next_attempt_at) ; après MAX_ATTEMPTS tentatives il passe en FAILED ;
+- les statuts du lot sont écrits en une requête (bulk_update) ;
+- le corps des messages confidentiels (is_confidential : identifiants,
+  mot de passe) est effacé dès qu'ils sont envoyés ou abandonnés.
+
+Les sources des modèles (EmailTemplate) sont compilées une fois par
+processus (cache LRU sur le texte source) ; sujet et texte sont rendus
+sans échappement HTML, le corps HTML avec.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import Q
+from django.template import Context, engines
+from django.utils import timezone
+
+from .models import EmailLog, EmailTemplate
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+
+# Attente avant la 2e tentative, doublée ensuite (plafonnée)
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=6)
+
+TEMPLATE_CACHE_SIZE = 256
+
+# Erreurs qui rendent la connexion SMTP inutilisable pour la suite du lot
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(source):
+    """Template Django compilé pour `source` (mis en cache par processus)"""
+    return engines['django'].engine.from_string(source)
+
+
+def _render(source, context, html=False):
+    return compile_template(source).render(Context(context, autoescape=html))
+
+
+def render_email(template, context):
+    """
+    Rend un EmailTemplate
+
+    Returns:
+        tuple: (sujet, corps texte, corps HTML ou '')
+    """
+    subject = _render(template.subject, context).strip()
+    body = _render(template.body_text, context)
+    body_html = _render(template.body_html, context, html=True) if template.body_html else ''
+    # Un sujet d'e-mail tient sur une ligne
+    return ' '.join(subject.split()), body, body_html
+
+
+def get_email_template(name, default=None):
+    """Modèle actif nommé `name`, sinon `default` (EmailTemplate non enregistré)"""
+    template = EmailTemplate.objects.filter(name=name, is_active=True).order_by('-updated_at').first()
+    return template or default
+
+
+def build_email(recipient_email, subject, body, body_html='', recipient_user=None, template=None,
+                confidential=False):
+    """
+    EmailLog en attente, non enregistré (voir queue_emails)
+
+    Args:
+        confidential: le corps contient un secret, il n'est pas conservé
+            dans le journal après l'envoi
+    """
+    return EmailLog(
+        recipient_email=recipient_email,
+        recipient_user=recipient_user,
+        template=template if template is not None and template.pk else None,
+        subject=subject[:200],
+        body=body,
+        body_html=body_html,
+        status='PENDING',
+        is_confidential=confidential,
+    )
+
+
+def build_templated_email(template, recipient_email, context, recipient_user=None, confidential=False):
+    subject, body, body_html = render_email(template, context)
+    return build_email(recipient_email, subject, body, body_html, recipient_user, template, confidential)
+
+
+def queue_emails(emails):
+    """Ajoute des EmailLog en attente à la file (une requête)"""
+    return EmailLog.objects.bulk_create(emails, batch_size=500)
+
+
+def queue_email(recipient_email, subject, body, body_html='', recipient_user=None, template=None):
+    """Ajoute un e-mail à la file"""
+    email = build_email(recipient_email, subject, body, body_html, recipient_user, template)
+    email.save()
+    return email
+
+
+def retry_delay(attempts):
+    """Attente avant la tentative suivante après `attempts` échecs"""
+    return min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY)
+
+
+def _due_emails(now):
+    return EmailLog.objects.filter(status='PENDING').filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+    ).order_by('id')
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.recipient_email], connection=connection
+    )
+    if email.body_html:
+        message.attach_alternative(email.body_html, 'text/html')
+    return message
+
+
+def _record_failure(email, error, now, max_attempts, stats):
+    email.error_message = f'{type(error).__name__}: {error}'[:1000]
+    if email.attempts >= max_attempts:
+        email.status = 'FAILED'
+        stats['failed'] += 1
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+        stats['retried'] += 1
+    logger.warning("Envoi de l'e-mail %s à %s impossible : %s", email.pk, email.recipient_email, error)
+
+
+def send_batch(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, connection=None):
+    """
+    Envoie un lot d'e-mails en attente sur une connexion
+
+    Les lignes du lot sont verrouillées pendant l'envoi (SKIP LOCKED quand
+    la base le permet : plusieurs workers se partagent la file). Si le
+    serveur est injoignable, tout le lot est repoussé.
+
+    Returns:
+        dict: {'sent', 'retried', 'failed'}
+    """
+    stats = {'sent': 0, 'retried': 0, 'failed': 0}
+    now = timezone.now()
+    with transaction.atomic():
+        due = _due_emails(now)
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        if not batch:
+            return stats
+
+        connection = connection or get_connection()
+        pending = iter(batch)
+        try:
+            connection.open()
+            for email in pending:
+                email.attempts += 1
+                try:
+                    _message(email, connection).send()
+                except Exception as error:
+                    _record_failure(email, error, now, max_attempts, stats)
+                    if isinstance(error, CONNECTION_ERRORS):
+                        connection.close()
+                        connection.open()
+                else:
+                    email.status = 'SENT'
+                    email.sent_date = timezone.now()
+                    email.error_message = ''
+                    email.next_attempt_at = None
+                    stats['sent'] += 1
+        except Exception as error:
+            # Connexion impossible : les messages restants sont repoussés
+            for email in pending:
+                email.attempts += 1
+                _record_failure(email, error, now, max_attempts, stats)
+        finally:
+            connection.close()
+        EmailLog.objects.bulk_update(batch, ['status', 'sent_date', 'attempts', 'next_attempt_at', 'error_message'])
+        _clear_confidential_bodies(batch)
+    return stats
+
+
+def _clear_confidential_bodies(batch):
+    """Efface le corps des messages confidentiels envoyés ou abandonnés (une requête)"""
+    done = [email for email in batch if email.is_confidential and email.status in ('SENT', 'FAILED')]
+    if not done:
+        return
+    EmailLog.objects.filter(pk__in=[email.pk for email in done]).update(body='', body_html='')
+    for email in done:
+        email.body = email.body_html = ''
+
+
+def send_queued_emails(batch_size=BATCH_SIZE, max_batches=None, max_attempts=MAX_ATTEMPTS):
+    """Envoie les lots en attente jusqu'à épuisement de la file (ou max_batches lots)"""
+    totals = {'sent': 0, 'retried': 0, 'failed': 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        stats = send_batch(batch_size, max_attempts)
+        batches += 1
+        for key, value in stats.items():
+            totals[key] += value
+        if sum(stats.values()) < batch_size:
+            break
+    return totals
@@ -0,0 +1,55 @@
+"""
+Management command pour recalculer les compteurs dénormalisés du forum
+
+Recalcule par lots les compteurs des sujets (messages, dernier message)
+puis ceux des classes (communication.forum). À lancer après une écriture
+hors ORM ou le déplacement de sujets entre classes.
+
+Usage:
+    python manage.py rebuild_forum_stats
+    python manage.py rebuild_forum_stats --classroom 12
+"""
+from django.core.management.base import BaseCommand
+
+from communication.forum import refresh_classroom_stats, refresh_topic_stats
+from communication.models import ForumTopic
+from core.exports import chunks
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs des sujets et des classes du forum'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--classroom',
+            type=int,
+            action='append',
+            dest='classrooms',
+            help='Limite le recalcul à cette classe (option répétable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de sujets recalculés par requête (défaut: 500)',
+        )
+
+    def handle(self, *args, **options):
+        topics = ForumTopic.objects.order_by('pk')
+        if options['classrooms']:
+            topics = topics.filter(classroom_id__in=options['classrooms'])
+
+        count = 0
+        classroom_ids = set(options['classrooms'] or ())
+        rows = topics.values_list('pk', 'classroom_id').iterator(chunk_size=options['batch_size'])
+        for batch in chunks(rows, options['batch_size']):
+            refresh_topic_stats([topic_id for topic_id, _ in batch])
+            classroom_ids.update(classroom_id for _, classroom_id in batch)
+            count += len(batch)
+
+        for batch in chunks(sorted(classroom_ids), options['batch_size']):
+            refresh_classroom_stats(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {count} sujet(s) et {len(classroom_ids)} forum(s) de classe recalculé(s)')
+        )
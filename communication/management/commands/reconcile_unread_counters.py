@@ -0,0 +1,65 @@
+"""
+Management command pour recalculer les compteurs par utilisateur en cache
+
+Recalcule en requêtes groupées les compteurs de communication.counters
+(notifications et messages non lus, messages reçus et envoyés, annonces
+non lues) et les remet en cache. À lancer périodiquement (cron) pour
+corriger les écarts laissés par une transaction annulée ou une écriture
+hors ORM.
+
+Nécessite un cache partagé (Redis, Memcached) : avec LocMemCache, les
+valeurs ne sont écrites que dans le cache de la commande elle-même.
+
+Usage:
+    python manage.py reconcile_unread_counters
+    python manage.py reconcile_unread_counters --user 42 --user 43
+"""
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from communication.counters import reconcile_counters
+from core.caching import cache_is_shared
+from core.exports import chunks
+
+
+class Command(BaseCommand):
+    help = 'Recalcule et remet en cache les compteurs de non-lus des utilisateurs actifs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Limite la réconciliation à cet utilisateur (option répétable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre d\'utilisateurs recalculés par lot (défaut: 500)',
+        )
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            self.stdout.write(self.style.WARNING(
+                'Cache propre au processus (LocMemCache) : les compteurs des workers web ne sont pas corrigés'
+            ))
+        users = User.objects.filter(is_active=True)
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        user_ids = users.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=options['batch_size'])
+
+        count = 0
+        drifted = 0
+        for batch in chunks(user_ids, options['batch_size']):
+            drift = reconcile_counters(batch)
+            count += len(batch)
+            drifted += len(drift)
+            for user_id, values in drift.items():
+                details = ', '.join(f'{name} {cached} -> {exact}' for name, (cached, exact) in values.items())
+                self.stdout.write(f'  utilisateur {user_id}: {details}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {count} utilisateur(s) recalculé(s), {drifted} en écart corrigé(s)')
+        )
@@ -0,0 +1,64 @@
+"""
+Management command pour envoyer les e-mails en attente (voir communication.mailer)
+
+Usage:
+    python manage.py send_queued_emails                 # Vide la file puis s'arrête (cron)
+    python manage.py send_queued_emails --loop          # Worker permanent
+    python manage.py send_queued_emails --batch-size 50 --max-batches 10
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from communication.mailer import BATCH_SIZE, MAX_ATTEMPTS, send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Envoie les e-mails en attente par lots, sur une connexion SMTP par lot'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Nombre d\'e-mails envoyés par connexion (défaut: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            help='Nombre maximal de lots par passage (défaut: jusqu\'à épuisement de la file)',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f'Tentatives avant abandon d\'un e-mail (défaut: {MAX_ATTEMPTS})',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Tourne en continu, la file étant relue toutes les --interval secondes',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help='Attente entre deux passages en mode --loop (secondes, défaut: 10)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = send_queued_emails(
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+                max_attempts=options['max_attempts'],
+            )
+            if any(stats.values()) or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✓ {stats['sent']} envoyé(s), {stats['retried']} repoussé(s), {stats['failed']} en échec"
+                    )
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,71 @@
+"""
+Managers personnalisés du module Communication
+"""
+from django.apps import apps
+from django.db import models
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+# Public réservé à chaque rôle (en plus de ALL, CLASS et LEVEL)
+ROLE_AUDIENCES = {
+    'STUDENT': 'STUDENTS',
+    'PARENT': 'PARENTS',
+    'TEACHER': 'TEACHERS',
+    'ADMIN': 'STAFF',
+}
+
+# Rôles qui voient toutes les annonces actives (gestion des annonces)
+MANAGER_ROLES = ('ADMIN', 'SUPER_ADMIN')
+
+
+class AnnouncementQuerySet(models.QuerySet):
+    """QuerySet personnalisé pour les annonces"""
+
+    def active(self, now=None):
+        """Annonces publiées et non expirées"""
+        now = now or timezone.now()
+        return self.filter(Q(expiry_date__isnull=True) | Q(expiry_date__gte=now), is_published=True)
+
+    def visible_to(self, user, now=None):
+        """
+        Annonces actives visibles pour l'utilisateur, en une requête
+
+        - rôles ciblés : aucun, ou le rôle de l'utilisateur ;
+        - public : ALL, CLASS, LEVEL ou le public réservé à son rôle ;
+        - public CLASS avec des classes ciblées : l'élève doit être dans
+          une de ces classes, l'enseignant y être affecté ;
+        - public LEVEL avec des niveaux ciblés : la classe de l'élève doit
+          être d'un de ces niveaux.
+        Les administrateurs voient toutes les annonces actives.
+        """
+        announcements = self.active(now)
+        role = getattr(user, 'role', None)
+        if role in MANAGER_ROLES:
+            return announcements
+
+        target_role = apps.get_model('communication', 'AnnouncementTargetRole').objects.filter(
+            announcement=OuterRef('pk')
+        )
+        audiences = ['ALL', 'CLASS', 'LEVEL']
+        if role in ROLE_AUDIENCES:
+            audiences.append(ROLE_AUDIENCES[role])
+        announcements = announcements.filter(
+            ~Exists(target_role) | Exists(target_role.filter(role=role)),
+            audience__in=audiences,
+        )
+
+        target_classes = self.model.target_classes.through.objects.filter(announcement=OuterRef('pk'))
+        target_levels = self.model.target_levels.through.objects.filter(announcement=OuterRef('pk'))
+        if role == 'STUDENT':
+            announcements = announcements.filter(
+                ~Q(audience='CLASS') | ~Exists(target_classes)
+                | Exists(target_classes.filter(classroom__students__user=user)),
+                ~Q(audience='LEVEL') | ~Exists(target_levels)
+                | Exists(target_levels.filter(level__classrooms__students__user=user)),
+            )
+        elif role == 'TEACHER':
+            announcements = announcements.filter(
+                ~Q(audience='CLASS') | ~Exists(target_classes)
+                | Exists(target_classes.filter(classroom__teachers__user=user)),
+            )
+        return announcements
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0002_announcement_target_roles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives'),
+        ),
+        migrations.AddField(
+            model_name='emaillog',
+            name='body_html',
+            field=models.TextField(blank=True, verbose_name='Corps du message (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='emaillog',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Prochaine tentative'),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='comm_emaillog_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_target_roles(apps, schema_editor):
+    """Convertit les rôles ciblés (chaîne séparée par des virgules) en lignes"""
+    Announcement = apps.get_model('communication', 'Announcement')
+    AnnouncementTargetRole = apps.get_model('communication', 'AnnouncementTargetRole')
+
+    targets = []
+    announcements = Announcement.objects.exclude(target_roles__isnull=True).exclude(target_roles='')
+    for announcement_id, target_roles in announcements.values_list('id', 'target_roles').iterator(chunk_size=1000):
+        roles = {role.strip() for role in target_roles.split(',') if role.strip()}
+        targets.extend(AnnouncementTargetRole(announcement_id=announcement_id, role=role) for role in sorted(roles))
+    AnnouncementTargetRole.objects.bulk_create(targets, batch_size=1000)
+
+
+def restore_target_roles(apps, schema_editor):
+    Announcement = apps.get_model('communication', 'Announcement')
+    AnnouncementTargetRole = apps.get_model('communication', 'AnnouncementTargetRole')
+
+    roles = {}
+    for announcement_id, role in AnnouncementTargetRole.objects.order_by('role').values_list('announcement_id', 'role'):
+        roles.setdefault(announcement_id, []).append(role)
+    for announcement_id, announcement_roles in roles.items():
+        Announcement.objects.filter(pk=announcement_id).update(target_roles=','.join(announcement_roles))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0003_email_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnouncementTargetRole',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('STUDENT', 'Élève'), ('PARENT', 'Parent'), ('TEACHER', 'Enseignant'), ('ADMIN', 'Administrateur'), ('FINANCE', 'Personnel financier'), ('SUPER_ADMIN', 'Super administrateur')], max_length=20, verbose_name='Rôle')),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='role_targets', to='communication.announcement', verbose_name='Annonce')),
+            ],
+            options={
+                'verbose_name': 'Rôle ciblé',
+                'verbose_name_plural': 'Rôles ciblés',
+                'indexes': [models.Index(fields=['role', 'announcement'], name='comm_announce_role_idx')],
+                'unique_together': {('announcement', 'role')},
+            },
+        ),
+        migrations.RunPython(copy_target_roles, restore_target_roles),
+        migrations.RemoveField(
+            model_name='announcement',
+            name='target_roles',
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_forum_counters(apps, schema_editor):
+    """Calcule les compteurs des sujets existants puis ceux de leurs classes"""
+    ForumTopic = apps.get_model('communication', 'ForumTopic')
+    ForumPost = apps.get_model('communication', 'ForumPost')
+    ClassroomForumStats = apps.get_model('communication', 'ClassroomForumStats')
+
+    posts = ForumPost.objects.filter(topic=OuterRef('pk')).order_by()
+    latest = posts.order_by('-created_at', '-pk')
+    ForumTopic.objects.update(
+        posts_count=Coalesce(Subquery(posts.values('topic').annotate(total=Count('pk')).values('total')), 0) + 1,
+        last_post_at=Coalesce(Subquery(latest.values('created_at')[:1]), F('created_at')),
+        last_post_author=Coalesce(Subquery(latest.values('author')[:1]), F('author')),
+    )
+
+    classroom_ids = ForumTopic.objects.order_by().values_list('classroom_id', flat=True).distinct()
+    ClassroomForumStats.objects.bulk_create(
+        [ClassroomForumStats(classroom_id=classroom_id) for classroom_id in classroom_ids], batch_size=1000
+    )
+    topics = ForumTopic.objects.filter(classroom=OuterRef('classroom')).order_by()
+    latest_topic = topics.order_by(F('last_post_at').desc(nulls_last=True), '-pk')
+    ClassroomForumStats.objects.update(
+        topics_count=Coalesce(Subquery(topics.values('classroom').annotate(total=Count('pk')).values('total')), 0),
+        posts_count=Coalesce(
+            Subquery(topics.values('classroom').annotate(total=Sum('posts_count')).values('total')), 0
+        ),
+        last_post_at=Subquery(latest_topic.values('last_post_at')[:1]),
+        last_post_author=Subquery(latest_topic.values('last_post_author')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0003_student_academic_rollup'),
+        ('communication', '0004_announcement_target_role'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumtopic',
+            name='last_post_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernier message le'),
+        ),
+        migrations.AddField(
+            model_name='forumtopic',
+            name='last_post_author',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Auteur du dernier message'),
+        ),
+        migrations.AddField(
+            model_name='forumtopic',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=1, verbose_name='Nombre de messages'),
+        ),
+        migrations.CreateModel(
+            name='ClassroomForumStats',
+            fields=[
+                ('classroom', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forum_stats', serialize=False, to='academic.classroom', verbose_name='Classe')),
+                ('topics_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de sujets')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de messages')),
+                ('last_post_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernier message le')),
+                ('last_post_author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Auteur du dernier message')),
+            ],
+            options={
+                'verbose_name': 'Statistiques du forum',
+                'verbose_name_plural': 'Statistiques des forums',
+            },
+        ),
+        migrations.RunPython(fill_forum_counters, migrations.RunPython.noop),
+    ]
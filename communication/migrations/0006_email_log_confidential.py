@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0005_forum_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='is_confidential',
+            field=models.BooleanField(default=False, verbose_name='Contenu confidentiel'),
+        ),
+    ]
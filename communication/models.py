@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 
+from .managers import AnnouncementQuerySet
+
 User = get_user_model()
 
 # Helper functions for default values
@@ -39,14 +41,7 @@ class Announcement(models.Model):
     type = models.CharField(max_length=15, choices=TYPE_CHOICES, default='GENERAL', verbose_name='Type')
     audience = models.CharField(max_length=15, choices=AUDIENCE_CHOICES, default='ALL', verbose_name='Public cible')
     
-    # Ciblage par rôles (stocké comme chaîne séparée par des virgules)
-    target_roles = models.CharField(
-        max_length=200, 
-        blank=True, 
-        null=True,
-        verbose_name='Rôles ciblés',
-        help_text='Liste des rôles séparés par des virgules (ex: STUDENT,PARENT,TEACHER)'
-    )
+    # Ciblage par rôles : voir AnnouncementTargetRole (role_targets)
     
     # Ciblage spécifique
     target_classes = models.ManyToManyField('academic.ClassRoom', blank=True, verbose_name='Classes ciblées')
@@ -69,6 +64,8 @@ class Announcement(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AnnouncementQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Annonce'
         verbose_name_plural = 'Annonces'
@@ -84,65 +81,25 @@ class Announcement(models.Model):
     
     @property
     def target_roles_list(self):
-        """Retourne la liste des rôles ciblés"""
-        if self.target_roles:
-            return [role.strip() for role in self.target_roles.split(',') if role.strip()]
-        return []
+        """Retourne la liste des rôles ciblés (vide : tous les rôles)"""
+        return sorted(target.role for target in self.role_targets.all())
     
     def set_target_roles(self, roles_list):
-        """Définit les rôles ciblés à partir d'une liste"""
-        if roles_list:
-            self.target_roles = ','.join(roles_list)
-        else:
-            self.target_roles = ''
+        """Remplace les rôles ciblés (l'annonce doit être enregistrée)"""
+        roles = set(roles_list or [])
+        current = set(self.target_roles_list)
+        if roles == current:
+            return
+        for target in self.role_targets.exclude(role__in=roles):
+            target.delete()
+        for role in sorted(roles - current):
+            AnnouncementTargetRole.objects.create(announcement=self, role=role)
+        # Vide le cache de préchargement éventuel
+        getattr(self, '_prefetched_objects_cache', {}).pop('role_targets', None)
     
     def is_visible_to_user(self, user):
-        """Vérifie si l'annonce est visible pour un utilisateur donné"""
-        if not self.is_active:
-            return False
-        
-        # Si audience est ALL et pas de rôles spécifiques, visible pour tous
-        if self.audience == 'ALL' and not self.target_roles:
-            return True
-        
-        # Vérifier les rôles ciblés
-        if self.target_roles:
-            user_role = user.role
-            target_roles_list = self.target_roles_list
-            if user_role not in target_roles_list:
-                return False
-        
-        # Vérifier l'audience spécifique
-        if self.audience == 'STUDENTS' and user.role != 'STUDENT':
-            return False
-        elif self.audience == 'PARENTS' and user.role != 'PARENT':
-            return False
-        elif self.audience == 'TEACHERS' and user.role != 'TEACHER':
-            return False
-        elif self.audience == 'STAFF' and user.role != 'ADMIN':
-            return False
-        
-        # Vérifier les classes ciblées
-        if self.audience == 'CLASS' and self.target_classes.exists():
-            if user.role == 'STUDENT':
-                if not hasattr(user, 'student_profile') or user.student_profile.current_class not in self.target_classes.all():
-                    return False
-            elif user.role == 'TEACHER':
-                # Les enseignants voient les annonces de leurs classes
-                if hasattr(user, 'teacher_profile'):
-                    teacher_classes = user.teacher_profile.assigned_classes.all()
-                    if not self.target_classes.filter(id__in=teacher_classes.values_list('id', flat=True)).exists():
-                        return False
-        
-        # Vérifier les niveaux ciblés
-        if self.audience == 'LEVEL' and self.target_levels.exists():
-            if user.role == 'STUDENT':
-                if not hasattr(user, 'student_profile') or not user.student_profile.current_class:
-                    return False
-                if user.student_profile.current_class.level not in self.target_levels.all():
-                    return False
-        
-        return True
+        """Vérifie si l'annonce est visible pour un utilisateur donné (voir visible_to)"""
+        return Announcement.objects.visible_to(user).filter(pk=self.pk).exists()
 
     @property
     def is_active(self):
@@ -155,6 +112,21 @@ class Announcement(models.Model):
         return True
 
 
+class AnnouncementTargetRole(models.Model):
+    """Rôle ciblé par une annonce (aucune ligne : tous les rôles)"""
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='role_targets', verbose_name='Annonce')
+    role = models.CharField(max_length=20, choices=User.ROLE_CHOICES, verbose_name='Rôle')
+
+    class Meta:
+        verbose_name = 'Rôle ciblé'
+        verbose_name_plural = 'Rôles ciblés'
+        unique_together = ['announcement', 'role']
+        indexes = [models.Index(fields=['role', 'announcement'], name='comm_announce_role_idx')]
+
+    def __str__(self):
+        return f"{self.announcement.title} → {self.role}"
+
+
 class AnnouncementRead(models.Model):
     """Suivi de lecture des annonces"""
     announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='read_status', verbose_name='Annonce')
@@ -199,6 +171,23 @@ class Message(models.Model):
     def __str__(self):
         return f"De {self.sender.full_name} à {self.recipient.full_name}: {self.subject}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État chargé, réutilisé par les signaux pour ajuster les compteurs sans relire la base
+        if {'sender_id', 'recipient_id', 'is_read', 'deleted_by_sender', 'deleted_by_recipient'}.issubset(field_names):
+            instance._loaded_counter_state = instance.get_counter_state()
+        return instance
+
+    def get_counter_state(self):
+        """Contribution du message aux compteurs (communication.counters)"""
+        received = not self.deleted_by_recipient
+        return {
+            (self.recipient_id, 'messages_received'): int(received),
+            (self.recipient_id, 'messages_unread'): int(received and not self.is_read),
+            (self.sender_id, 'messages_sent'): int(not self.deleted_by_sender),
+        }
+
     def mark_as_read(self):
         """Marquer le message comme lu"""
         if not self.is_read:
@@ -347,6 +336,18 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification pour {self.user.full_name}: {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État chargé, réutilisé par les signaux pour ajuster les compteurs sans relire la base
+        if {'user_id', 'is_read'}.issubset(field_names):
+            instance._loaded_counter_state = instance.get_counter_state()
+        return instance
+
+    def get_counter_state(self):
+        """Contribution de la notification aux compteurs (communication.counters)"""
+        return {(self.user_id, 'notifications'): int(not self.is_read)}
+
     def mark_as_read(self):
         """Marquer la notification comme lue"""
         if not self.is_read:
@@ -394,10 +395,17 @@ class EmailLog(models.Model):
     
     subject = models.CharField(max_length=200, verbose_name='Sujet')
     body = models.TextField(verbose_name='Corps du message')
+    body_html = models.TextField(blank=True, verbose_name='Corps du message (HTML)')
     
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='PENDING', verbose_name='Statut')
     error_message = models.TextField(blank=True, verbose_name='Message d\'erreur')
     
+    # File d'envoi (voir communication.mailer)
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')
+    next_attempt_at = models.DateTimeField(blank=True, null=True, verbose_name='Prochaine tentative')
+    # Corps effacé une fois l'envoi terminé (identifiants, mot de passe)
+    is_confidential = models.BooleanField(default=False, verbose_name='Contenu confidentiel')
+    
     sent_date = models.DateTimeField(default=get_current_datetime, verbose_name='Date d\'envoi')
     delivered_date = models.DateTimeField(blank=True, null=True, verbose_name='Date de livraison')
 
@@ -405,6 +413,9 @@ class EmailLog(models.Model):
         verbose_name = 'Journal d\'e-mail'
         verbose_name_plural = 'Journaux d\'e-mails'
         ordering = ['-sent_date']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='comm_emaillog_queue_idx'),
+        ]
 
     def __str__(self):
         return f"E-mail à {self.recipient_email} - {self.status}"
@@ -432,6 +443,11 @@ class ForumTopic(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Créé le')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Modifié le')
     views_count = models.PositiveIntegerField(default=0, verbose_name='Nombre de vues')
+
+    # Compteurs dénormalisés (tenus à jour par communication.forum)
+    posts_count = models.PositiveIntegerField(default=1, verbose_name='Nombre de messages')
+    last_post_at = models.DateTimeField(blank=True, null=True, verbose_name='Dernier message le')
+    last_post_author = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+', verbose_name='Auteur du dernier message')
     
     class Meta:
         verbose_name = 'Sujet de forum'
@@ -446,10 +462,12 @@ class ForumTopic(models.Model):
     def __str__(self):
         return f"{self.classroom.name} - {self.title}"
 
-    @property
-    def posts_count(self):
-        """Nombre total de posts (incluant le topic lui-même)"""
-        return self.forum_posts.count() + 1
+    def save(self, *args, **kwargs):
+        # Le message d'ouverture est le premier message du sujet
+        if self._state.adding and self.last_post_at is None:
+            self.last_post_at = timezone.now()
+            self.last_post_author_id = self.author_id
+        super().save(*args, **kwargs)
 
     @property
     def last_post(self):
@@ -459,10 +477,7 @@ class ForumTopic(models.Model):
     @property
     def last_activity(self):
         """Date de la dernière activité"""
-        last_post = self.last_post
-        if last_post:
-            return last_post.created_at
-        return self.created_at
+        return self.last_post_at or self.created_at
 
     def can_user_access(self, user):
         """Vérifie si un utilisateur peut accéder à ce topic"""
@@ -526,6 +541,22 @@ class ForumPost(models.Model):
         return self.can_user_edit(user)
 
 
+class ClassroomForumStats(models.Model):
+    """Compteurs dénormalisés du forum d'une classe (tenus à jour par communication.forum)"""
+    classroom = models.OneToOneField('academic.ClassRoom', on_delete=models.CASCADE, primary_key=True, related_name='forum_stats', verbose_name='Classe')
+    topics_count = models.PositiveIntegerField(default=0, verbose_name='Nombre de sujets')
+    posts_count = models.PositiveIntegerField(default=0, verbose_name='Nombre de messages')
+    last_post_at = models.DateTimeField(blank=True, null=True, verbose_name='Dernier message le')
+    last_post_author = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+', verbose_name='Auteur du dernier message')
+
+    class Meta:
+        verbose_name = 'Statistiques du forum'
+        verbose_name_plural = 'Statistiques des forums'
+
+    def __str__(self):
+        return f"Forum {self.classroom_id} : {self.topics_count} sujets, {self.posts_count} messages"
+
+
 class ForumModeration(models.Model):
     """Modération des forums"""
     
@@ -0,0 +1,163 @@
+"""
+Diffusion de notifications à un public (rôles, classes, niveaux, parents)
+
+Le public est résolu en une requête : une seule sélection sur les
+utilisateurs actifs, chaque critère étant une sous-requête (élèves des
+classes ou niveaux, leurs parents, leurs enseignants). Les notifications
+sont ensuite insérées par lots (bulk_create) en lisant les identifiants
+au fil de l'eau, et les compteurs de non-lus des destinataires sont
+invalidés lot par lot (voir communication.counters).
+
+    notify_audience(
+        'Réunion des parents', 'Vendredi à 16h', type='ANNOUNCEMENT',
+        classrooms=[classe], with_parents=True,
+    )
+"""
+from django.db.models import Q
+from django.urls import reverse
+
+from accounts.models import Parent, Student, Teacher, User
+from core.exports import chunks
+
+from .counters import invalidate_unread_notifications
+from .models import Notification
+
+NOTIFICATION_BATCH_SIZE = 1000
+
+
+def resolve_audience(roles=(), classrooms=(), levels=(), students=(), users=(),
+                     with_parents=False, with_teachers=False, only_roles=(), exclude=()):
+    """
+    Identifiants des utilisateurs actifs d'un public (une requête)
+
+    Args:
+        roles: rôles ciblés en entier (ex: ['TEACHER', 'ADMIN'])
+        classrooms, levels, students: élèves ciblés (instances ou identifiants)
+        users: utilisateurs ciblés nommément
+        with_parents: ajoute les parents des élèves ciblés
+        with_teachers: ajoute les enseignants affectés aux classes ou niveaux ciblés
+        only_roles: restreint le résultat à ces rôles
+        exclude: utilisateurs à écarter (ex: l'auteur)
+
+    Returns:
+        QuerySet: identifiants (values_list flat), à itérer ou à passer à notify
+    """
+    student_scope = Q()
+    if classrooms:
+        student_scope |= Q(current_class__in=classrooms)
+    if levels:
+        student_scope |= Q(current_class__level__in=levels)
+    if students:
+        student_scope |= Q(pk__in=students)
+
+    audience = Q()
+    if roles:
+        audience |= Q(role__in=roles)
+    if users:
+        audience |= Q(pk__in=users)
+    if student_scope:
+        targeted_students = Student.objects.filter(student_scope)
+        audience |= Q(pk__in=targeted_students.values('user_id'))
+        if with_parents:
+            audience |= Q(pk__in=Parent.objects.filter(children__in=targeted_students).values('user_id'))
+    if with_teachers and (classrooms or levels):
+        class_scope = Q()
+        if classrooms:
+            class_scope |= Q(assigned_classes__in=classrooms)
+        if levels:
+            class_scope |= Q(assigned_classes__level__in=levels)
+        audience |= Q(pk__in=Teacher.objects.filter(class_scope).values('user_id'))
+
+    if not audience:
+        return User.objects.none().values_list('pk', flat=True)
+    recipients = User.objects.filter(audience, is_active=True)
+    if only_roles:
+        recipients = recipients.filter(role__in=only_roles)
+    if exclude:
+        recipients = recipients.exclude(pk__in=exclude)
+    return recipients.values_list('pk', flat=True).order_by()
+
+
+def notify(user_ids, title, message, type='INFO', link_url='', batch_size=NOTIFICATION_BATCH_SIZE):
+    """
+    Crée une notification par utilisateur, par lots de `batch_size`
+
+    Returns:
+        int: nombre de notifications créées
+    """
+    if hasattr(user_ids, 'iterator'):
+        user_ids = user_ids.iterator(chunk_size=batch_size)
+    created = 0
+    for batch in chunks(user_ids, batch_size):
+        Notification.objects.bulk_create([
+            Notification(user_id=user_id, title=title, message=message, type=type, link_url=link_url)
+            for user_id in batch
+        ])
+        invalidate_unread_notifications(batch)
+        created += len(batch)
+    return created
+
+
+def notify_audience(title, message, type='INFO', link_url='', **audience):
+    """Résout le public (voir resolve_audience) puis le notifie"""
+    return notify(resolve_audience(**audience), title, message, type=type, link_url=link_url)
+
+
+# Publics des événements de l'application
+
+ANNOUNCEMENT_AUDIENCE_ROLES = {
+    'STUDENTS': ['STUDENT'],
+    'PARENTS': ['PARENT'],
+    'TEACHERS': ['TEACHER'],
+    'STAFF': ['ADMIN'],
+}
+
+
+def announcement_audience(announcement):
+    """Critères de resolve_audience correspondant au public d'une annonce"""
+    audience = {
+        'only_roles': announcement.target_roles_list,
+        'exclude': [announcement.author_id],
+    }
+    if announcement.audience == 'CLASS':
+        audience.update(classrooms=announcement.target_classes.all(), with_parents=True, with_teachers=True)
+    elif announcement.audience == 'LEVEL':
+        audience.update(levels=announcement.target_levels.all(), with_parents=True, with_teachers=True)
+    elif announcement.audience in ANNOUNCEMENT_AUDIENCE_ROLES:
+        audience['roles'] = ANNOUNCEMENT_AUDIENCE_ROLES[announcement.audience]
+    else:
+        audience['roles'] = [role for role, _ in User.ROLE_CHOICES]
+    return audience
+
+
+def notify_announcement(announcement):
+    """Notifie le public d'une annonce publiée"""
+    return notify_audience(
+        announcement.title,
+        announcement.content[:500],
+        type='ANNOUNCEMENT',
+        link_url=reverse('communication:announcement_detail', args=[announcement.pk]),
+        **announcement_audience(announcement)
+    )
+
+
+def notify_grade(grade):
+    """Notifie l'élève et ses parents d'une nouvelle note"""
+    return notify_audience(
+        f'Nouvelle note en {grade.subject.name}',
+        f'{grade.evaluation_name} : {grade.score:g}/{grade.max_score:g}',
+        type='GRADE',
+        students=[grade.student_id],
+        with_parents=True,
+    )
+
+
+def notify_payment_confirmed(payment):
+    """Notifie l'élève et ses parents de la confirmation d'un paiement"""
+    return notify_audience(
+        'Paiement confirmé',
+        f'Le paiement de {payment.amount} pour la facture {payment.invoice.invoice_number} a été confirmé.',
+        type='PAYMENT',
+        students=[payment.invoice.student_id],
+        with_parents=True,
+    )
@@ -0,0 +1,167 @@
+"""
+Signaux du module Communication
+
+Tient à jour les compteurs par utilisateur (voir communication.counters) :
+- création, lecture ou suppression d'une notification ;
+- envoi, lecture ou suppression (par l'expéditeur ou le destinataire)
+  d'un message ;
+- lecture d'une annonce ; publication, modification, ciblage ou
+  suppression d'une annonce (tous les compteurs d'annonces et toutes les
+  annonces visibles en cache, voir communication.visibility) ;
+- changement de rôle, de classe ou d'affectation d'un utilisateur (ses
+  annonces visibles et son compteur d'annonces) ;
+- création ou suppression d'un sujet ou d'un message du forum (compteurs
+  du sujet et de la classe, voir communication.forum).
+L'écart est calculé depuis l'état chargé avec l'objet (from_db) ; sans cet
+état, les compteurs concernés sont recalculés à la lecture suivante. Les
+écritures en masse (bulk_create, update) invalident elles-mêmes les
+compteurs concernés.
+
+Le compteur de notifications est calculé dès la connexion : le badge de
+l'en-tête des pages suivantes est lu dans le cache.
+"""
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from academic.models import TeacherAssignment
+from accounts.models import Student, Teacher, User
+
+from . import counters, forum
+from .models import (
+    Announcement, AnnouncementRead, AnnouncementTargetRole, ForumPost, ForumTopic, Message, Notification,
+)
+from .visibility import cached_visible_announcements, invalidate_announcements, invalidate_visible_announcements
+
+
+def _counter_changes(instance, created, names, user_ids):
+    """Ajuste les compteurs de l'écart entre l'état chargé et l'état sauvegardé"""
+    new_state = instance.get_counter_state()
+    if created:
+        counters.apply_changes({}, new_state)
+    elif hasattr(instance, '_loaded_counter_state'):
+        counters.apply_changes(instance._loaded_counter_state, new_state)
+    else:
+        counters.invalidate(names, user_ids)
+    instance._loaded_counter_state = new_state
+
+
+def _counter_removal(instance):
+    state = getattr(instance, '_loaded_counter_state', None) or instance.get_counter_state()
+    counters.apply_changes(state, {})
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='communication_notification_counter_save')
+def notification_counter_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    _counter_changes(instance, created, ('notifications',), [instance.user_id])
+
+
+@receiver(post_delete, sender=Notification, dispatch_uid='communication_notification_counter_delete')
+def notification_counter_delete(sender, instance, **kwargs):
+    _counter_removal(instance)
+
+
+@receiver(post_save, sender=Message, dispatch_uid='communication_message_counter_save')
+def message_counter_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    _counter_changes(instance, created, counters.MESSAGE_COUNTERS, [instance.sender_id, instance.recipient_id])
+
+
+@receiver(post_delete, sender=Message, dispatch_uid='communication_message_counter_delete')
+def message_counter_delete(sender, instance, **kwargs):
+    _counter_removal(instance)
+
+
+@receiver(post_save, sender=AnnouncementRead, dispatch_uid='communication_announcement_read_counter')
+def announcement_read_counter(sender, instance, created, raw=False, **kwargs):
+    """Une lecture retire l'annonce des non-lues si elle est visible pour l'utilisateur"""
+    if raw or not created:
+        return
+    visible = cached_visible_announcements(instance.user_id)
+    if visible is None:
+        counters.invalidate(('announcements',), [instance.user_id])
+    elif instance.announcement_id in visible.ids:
+        counters.adjust('announcements', instance.user_id, -1)
+
+
+@receiver(post_delete, sender=AnnouncementRead, dispatch_uid='communication_announcement_unread_counter')
+def announcement_unread_counter(sender, instance, **kwargs):
+    counters.invalidate(('announcements',), [instance.user_id])
+
+
+@receiver(post_save, sender=Announcement, dispatch_uid='communication_announcement_counters_save')
+@receiver(post_delete, sender=Announcement, dispatch_uid='communication_announcement_counters_delete')
+@receiver(post_save, sender=AnnouncementTargetRole, dispatch_uid='communication_announcement_role_save')
+@receiver(post_delete, sender=AnnouncementTargetRole, dispatch_uid='communication_announcement_role_delete')
+def announcement_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_announcements()
+
+
+@receiver(m2m_changed, sender=Announcement.target_classes.through, dispatch_uid='communication_announcement_classes')
+@receiver(m2m_changed, sender=Announcement.target_levels.through, dispatch_uid='communication_announcement_levels')
+def announcement_targets_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_announcements()
+
+
+def _audience_changed(user_ids):
+    invalidate_visible_announcements(user_ids)
+    counters.invalidate(('announcements',), user_ids)
+
+
+@receiver(post_save, sender=User, dispatch_uid='communication_user_audience')
+def user_audience_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Le rôle détermine les annonces visibles (pas les mises à jour de last_login)"""
+    if raw or created or (update_fields is not None and 'role' not in update_fields):
+        return
+    _audience_changed([instance.pk])
+
+
+@receiver(post_save, sender=Student, dispatch_uid='communication_student_audience_save')
+@receiver(post_delete, sender=Student, dispatch_uid='communication_student_audience_delete')
+def student_audience_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _audience_changed([instance.user_id])
+
+
+@receiver(post_save, sender=TeacherAssignment, dispatch_uid='communication_teacher_audience_save')
+@receiver(post_delete, sender=TeacherAssignment, dispatch_uid='communication_teacher_audience_delete')
+def teacher_audience_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        teacher = instance._state.fields_cache.get('teacher')
+        if teacher is not None:
+            user_id = teacher.user_id
+        else:
+            user_id = Teacher.objects.filter(pk=instance.teacher_id).values_list('user_id', flat=True).first()
+        _audience_changed([user_id])
+
+
+@receiver(post_save, sender=ForumTopic, dispatch_uid='communication_forum_topic_save')
+def forum_topic_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        forum.record_topic(instance)
+
+
+@receiver(post_delete, sender=ForumTopic, dispatch_uid='communication_forum_topic_delete')
+def forum_topic_deleted(sender, instance, **kwargs):
+    forum.record_topic_removal(instance)
+
+
+@receiver(post_save, sender=ForumPost, dispatch_uid='communication_forum_post_save')
+def forum_post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        forum.record_post(instance)
+
+
+@receiver(post_delete, sender=ForumPost, dispatch_uid='communication_forum_post_delete')
+def forum_post_deleted(sender, instance, **kwargs):
+    forum.record_post_removal(instance)
+
+
+@receiver(user_logged_in, dispatch_uid='communication_counters_login')
+def warm_counters_on_login(sender, user, **kwargs):
+    counters.unread_notifications(user.pk)
@@ -0,0 +1,17 @@
+from django import template
+
+from communication.counters import unread_notifications
+
+register = template.Library()
+
+
+@register.simple_tag
+def unread_notification_count(user):
+    """
+    Nombre de notifications non lues (compteur en cache)
+
+    Usage: {% unread_notification_count user as unread_notifications %}
+    """
+    if not user.is_authenticated:
+        return 0
+    return unread_notifications(user.pk)
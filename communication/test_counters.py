@@ -0,0 +1,145 @@
+"""
+Tests pour les compteurs par utilisateur (communication.counters)
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from communication import counters
+from communication.models import Announcement, AnnouncementRead, Message, Notification
+
+User = get_user_model()
+
+
+class CountersTest(TransactionTestCase):
+    """Ajustement des compteurs à chaque écriture (après le commit : transactions réelles)"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='testpass123', role='TEACHER')
+        self.bob = User.objects.create_user(email='bob@example.com', password='testpass123', role='PARENT')
+
+    def counters(self, user):
+        return counters.get_counters(user.pk)
+
+    def assertCounters(self, user, **expected):
+        cached = self.counters(user)
+        self.assertEqual({name: cached[name] for name in expected}, expected)
+        # Le cache reste égal au recalcul en base
+        exact = counters.compute_all_counters([user.pk])[0][user.pk]
+        self.assertEqual({name: exact[name] for name in expected}, expected)
+
+    def test_message_lifecycle(self):
+        self.counters(self.alice)
+        self.counters(self.bob)
+
+        with self.assertNumQueries(1):
+            message = Message.objects.create(sender=self.alice, recipient=self.bob, subject='A', content='a')
+        self.assertCounters(self.bob, messages_unread=1, messages_received=1, messages_sent=0)
+        self.assertCounters(self.alice, messages_sent=1, messages_received=0)
+
+        message = Message.objects.get(pk=message.pk)
+        message.mark_as_read()
+        message.mark_as_read()
+        self.assertCounters(self.bob, messages_unread=0, messages_received=1)
+
+        Message.objects.create(sender=self.alice, recipient=self.bob, subject='B', content='b')
+        message.deleted_by_recipient = True
+        message.save()
+        self.assertCounters(self.bob, messages_unread=1, messages_received=1)
+
+        Message.objects.filter(subject='B').get().delete()
+        self.assertCounters(self.bob, messages_unread=0, messages_received=0)
+        self.assertCounters(self.alice, messages_sent=1)
+
+    def test_rolled_back_write_not_counted(self):
+        self.counters(self.bob)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Message.objects.create(sender=self.alice, recipient=self.bob, subject='A', content='a')
+            Notification.objects.create(user=self.bob, title='A', message='a')
+            raise RuntimeError
+        self.assertCounters(self.bob, messages_unread=0, messages_received=0, notifications=0)
+
+    def test_counters_read_from_cache(self):
+        Notification.objects.create(user=self.bob, title='A', message='a')
+        self.counters(self.bob)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counters(self.bob)['notifications'], 1)
+
+    def test_announcements(self):
+        announcement = Announcement.objects.create(
+            title='Rentrée', content='...', audience='PARENTS', author=self.alice, is_published=True
+        )
+        Announcement.objects.create(title='Profs', content='...', audience='TEACHERS', author=self.alice,
+                                    is_published=True)
+        self.assertCounters(self.bob, announcements=1)
+        self.assertCounters(self.alice, announcements=1)
+
+        AnnouncementRead.objects.create(announcement=announcement, user=self.bob)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.get_counter('announcements', self.bob.pk), 0)
+
+        # Nouvelle annonce : tous les compteurs d'annonces sont recalculés
+        Announcement.objects.create(title='Sortie', content='...', audience='ALL', author=self.alice,
+                                    is_published=True)
+        self.assertCounters(self.bob, announcements=1)
+        self.assertCounters(self.alice, announcements=2)
+
+    def test_reconcile_command(self):
+        self.counters(self.bob)
+        # Écriture hors ORM : le cache n'est pas ajusté
+        Notification.objects.bulk_create([Notification(user=self.bob, title='A', message='a')])
+        self.assertEqual(self.counters(self.bob)['notifications'], 0)
+
+        out = StringIO()
+        call_command('reconcile_unread_counters', stdout=out)
+        self.assertIn(f'utilisateur {self.bob.pk}: notifications 0 -> 1', out.getvalue())
+        self.assertIn('Cache propre au processus', out.getvalue())
+        self.assertEqual(self.counters(self.bob)['notifications'], 1)
+
+
+class CounterViewsTest(TransactionTestCase):
+    """Les vues lisent leurs badges dans le cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='testpass123', role='TEACHER')
+        self.bob = User.objects.create_user(email='bob@example.com', password='testpass123', role='PARENT')
+        self.client.login(email='bob@example.com', password='testpass123')
+
+    def test_message_list(self):
+        for index in range(3):
+            Message.objects.create(sender=self.alice, recipient=self.bob, subject=f'S{index}', content='...')
+        Message.objects.create(sender=self.bob, recipient=self.alice, subject='R', content='...')
+        url = reverse('communication:message_list')
+        response = self.client.get(url)
+        self.assertEqual(response.context['unread_count'], 3)
+        self.assertEqual(response.context['total_received'], 3)
+        self.assertEqual(response.context['total_sent'], 1)
+
+        first = Message.objects.filter(recipient=self.bob).first()
+        self.client.get(reverse('communication:message_detail', args=[first.pk]))
+        self.assertEqual(self.client.get(url).context['unread_count'], 2)
+
+    def test_announcement_list(self):
+        announcements = [
+            Announcement.objects.create(title=f'A{index}', content='...', audience='ALL', author=self.alice,
+                                        is_published=True)
+            for index in range(3)
+        ]
+        Announcement.objects.create(title='Profs', content='...', audience='TEACHERS', author=self.alice,
+                                    is_published=True)
+        url = reverse('communication:announcement_list')
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_announcements'], 3)
+        self.assertEqual(response.context['unread_count'], 3)
+
+        self.client.get(reverse('communication:announcement_detail', args=[announcements[0].pk]))
+        response = self.client.get(url)
+        self.assertEqual(response.context['unread_count'], 2)
+        self.assertEqual(response.context['read_announcements'], {announcements[0].pk})
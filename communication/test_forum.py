@@ -0,0 +1,158 @@
+"""
+Tests pour les compteurs dénormalisés du forum (communication.forum)
+"""
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from academic.models import AcademicYear, ClassRoom, Level
+from accounts.models import Student
+from communication.models import ClassroomForumStats, ForumPost, ForumTopic
+
+User = get_user_model()
+
+
+class ForumCountersTest(TestCase):
+    """Compteurs des sujets et des classes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(
+            name='2024-2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        level = Level.objects.create(name='6ème', order=6)
+        cls.classroom = ClassRoom.objects.create(name='6ème A', level=level, academic_year=year)
+        cls.other_classroom = ClassRoom.objects.create(name='6ème B', level=level, academic_year=year)
+
+        cls.admin = User.objects.create_user(email='admin@example.com', password='testpass123', role='ADMIN')
+        cls.teacher = User.objects.create_user(email='teacher@example.com', password='testpass123', role='TEACHER')
+        cls.student = User.objects.create_user(
+            email='student@example.com', password='testpass123', role='STUDENT', first_name='Léa', last_name='Martin'
+        )
+        Student.objects.create(user=cls.student, matricule='STU20240001', current_class=cls.classroom)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_topic(self, title='Sujet', classroom=None, **fields):
+        return ForumTopic.objects.create(
+            title=title, content='...', classroom=classroom or self.classroom, author=self.teacher, **fields
+        )
+
+    def stats(self, classroom=None):
+        return ClassroomForumStats.objects.get(classroom=classroom or self.classroom)
+
+    def test_counters_on_create(self):
+        topic = self.create_topic()
+        topic.refresh_from_db()
+        self.assertEqual(topic.posts_count, 1)
+        self.assertEqual(topic.last_post_author, self.teacher)
+        stats = self.stats()
+        self.assertEqual((stats.topics_count, stats.posts_count), (1, 1))
+
+        post = ForumPost.objects.create(topic=topic, author=self.student, content='Réponse')
+        # Le sujet chargé est tenu à jour
+        self.assertEqual(topic.posts_count, 2)
+        topic.refresh_from_db()
+        self.assertEqual(topic.posts_count, 2)
+        self.assertEqual(topic.last_post_author, self.student)
+        self.assertEqual(topic.last_post_at, post.created_at)
+        self.assertEqual(topic.last_activity, post.created_at)
+        stats = self.stats()
+        self.assertEqual((stats.topics_count, stats.posts_count), (1, 2))
+        self.assertEqual(stats.last_post_author, self.student)
+
+        # Sujet non chargé avec le message
+        with self.assertNumQueries(4):
+            ForumPost.objects.create(topic_id=topic.pk, author=self.admin, content='Autre')
+        self.assertEqual(ForumTopic.objects.get(pk=topic.pk).posts_count, 3)
+        self.assertEqual(self.stats().last_post_author, self.admin)
+
+    def test_counters_on_delete(self):
+        topic = self.create_topic()
+        first = ForumPost.objects.create(topic=topic, author=self.student, content='Première')
+        last = ForumPost.objects.create(topic=topic, author=self.admin, content='Dernière')
+        other = self.create_topic('Autre sujet')
+
+        last.delete()
+        topic.refresh_from_db()
+        self.assertEqual(topic.posts_count, 2)
+        self.assertEqual(topic.last_post_author, self.student)
+        self.assertEqual(topic.last_post_at, first.created_at)
+        self.assertEqual(self.stats().posts_count, 3)
+
+        topic.delete()
+        stats = self.stats()
+        self.assertEqual((stats.topics_count, stats.posts_count), (1, 1))
+        other.refresh_from_db()
+        self.assertEqual(stats.last_post_at, other.last_post_at)
+
+        # Suppression de la classe avec ses sujets
+        self.classroom.delete()
+        self.assertFalse(ClassroomForumStats.objects.filter(classroom_id=other.classroom_id).exists())
+
+    def test_rebuild_command(self):
+        topic = self.create_topic()
+        ForumPost.objects.create(topic=topic, author=self.student, content='Réponse')
+        ForumTopic.objects.update(posts_count=10, last_post_author=None)
+        ClassroomForumStats.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_forum_stats', stdout=out)
+        self.assertIn('1 sujet(s)', out.getvalue())
+        topic.refresh_from_db()
+        self.assertEqual(topic.posts_count, 2)
+        self.assertEqual(topic.last_post_author, self.student)
+        stats = self.stats()
+        self.assertEqual((stats.topics_count, stats.posts_count), (1, 2))
+
+    def test_forum_pages_constant_queries(self):
+        self.client.login(email='admin@example.com', password='testpass123')
+
+        def count_queries(url):
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries), response
+
+        index_url = reverse('communication:forum_index')
+        classroom_url = reverse('communication:forum_classroom', args=[self.classroom.pk])
+
+        def add_topics(count):
+            for index in range(count):
+                topic = self.create_topic(f'Sujet {index}', is_pinned=index == 0)
+                ForumPost.objects.create(topic=topic, author=self.student, content='Réponse')
+            self.create_topic('Autre classe', classroom=self.other_classroom)
+
+        add_topics(2)
+        few_index, _ = count_queries(index_url)
+        few_classroom, _ = count_queries(classroom_url)
+
+        add_topics(15)
+        many_index, response = count_queries(index_url)
+        self.assertEqual(response.context['total_topics'], 19)
+        self.assertEqual(response.context['total_posts'], 36)
+        many_classroom, response = count_queries(classroom_url)
+        self.assertEqual(response.context['stats'].topics_count, 17)
+        self.assertEqual(len(response.context['pinned_topics']) + len(response.context['regular_topics']), 17)
+        self.assertContains(response, 'Léa Martin')
+
+        self.assertEqual(many_index, few_index)
+        self.assertEqual(many_classroom, few_classroom)
+
+    def test_index_lists_accessible_classrooms(self):
+        self.create_topic()
+        self.create_topic('Autre classe', classroom=self.other_classroom)
+
+        self.client.login(email='student@example.com', password='testpass123')
+        response = self.client.get(reverse('communication:forum_index'))
+        self.assertEqual([classroom for classroom, _ in response.context['classrooms']], [self.classroom])
+        self.assertEqual(response.context['total_topics'], 1)
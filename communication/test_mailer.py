@@ -0,0 +1,187 @@
+"""
+Tests pour la file d'envoi des e-mails (communication.mailer)
+"""
+import smtplib
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.views import send_password_email
+from communication import mailer
+from communication.models import EmailLog, EmailTemplate
+
+User = get_user_model()
+
+LOCMEM_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+class CountingBackend(EmailBackend):
+    """Backend mémoire qui compte les ouvertures de connexion"""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class FlakyBackend(EmailBackend):
+    """Backend mémoire qui refuse certains destinataires"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.startswith('bad') for address in message.to):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'Unknown user')})
+        return super().send_messages(messages)
+
+
+def queue(*addresses):
+    return mailer.queue_emails([
+        mailer.build_email(address, f'Sujet {address}', 'Corps') for address in addresses
+    ])
+
+
+@override_settings(EMAIL_BACKEND=LOCMEM_BACKEND)
+class EmailQueueTest(TestCase):
+    """Envoi par lots, nouvelles tentatives et écriture groupée des statuts"""
+
+    def test_batch_sent_over_one_connection(self):
+        queue(*[f'user{index}@example.com' for index in range(5)])
+        CountingBackend.opened = 0
+        with CaptureQueriesContext(connection) as ctx:
+            stats = mailer.send_batch(connection=CountingBackend())
+        self.assertEqual(stats, {'sent': 5, 'retried': 0, 'failed': 0})
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(EmailLog.objects.exclude(status='SENT').exists())
+        self.assertFalse(EmailLog.objects.filter(sent_date__isnull=True).exists())
+        # Lecture du lot + une mise à jour groupée (hors savepoints)
+        statements = [q['sql'] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(statements), 2)
+
+    def test_retry_with_backoff_then_failed(self):
+        queue('ok@example.com', 'bad@example.com')
+        with self.assertLogs('communication.mailer', 'WARNING'):
+            stats = mailer.send_batch(connection=FlakyBackend(), max_attempts=2)
+        self.assertEqual(stats, {'sent': 1, 'retried': 1, 'failed': 0})
+
+        bad = EmailLog.objects.get(recipient_email='bad@example.com')
+        self.assertEqual(bad.status, 'PENDING')
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn('SMTPRecipientsRefused', bad.error_message)
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+
+        # Pas encore dû
+        self.assertEqual(mailer.send_batch(connection=FlakyBackend())['retried'], 0)
+
+        EmailLog.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        with self.assertLogs('communication.mailer', 'WARNING'):
+            stats = mailer.send_batch(connection=FlakyBackend(), max_attempts=2)
+        self.assertEqual(stats, {'sent': 0, 'retried': 0, 'failed': 1})
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, 'FAILED')
+        self.assertEqual(bad.attempts, 2)
+
+    def test_retry_delay(self):
+        self.assertEqual(mailer.retry_delay(1), mailer.RETRY_BASE_DELAY)
+        self.assertEqual(mailer.retry_delay(3), mailer.RETRY_BASE_DELAY * 4)
+        self.assertEqual(mailer.retry_delay(30), mailer.RETRY_MAX_DELAY)
+
+    def test_unreachable_server_defers_batch(self):
+        queue('a@example.com', 'b@example.com')
+        backend = EmailBackend()
+        with mock.patch.object(backend, 'open', side_effect=ConnectionRefusedError('refusé')), \
+                self.assertLogs('communication.mailer', 'WARNING'):
+            stats = mailer.send_batch(connection=backend)
+        self.assertEqual(stats, {'sent': 0, 'retried': 2, 'failed': 0})
+        self.assertEqual(set(EmailLog.objects.values_list('attempts', flat=True)), {1})
+
+    def test_send_queued_emails_in_batches(self):
+        queue(*[f'user{index}@example.com' for index in range(5)])
+        self.assertEqual(mailer.send_queued_emails(batch_size=2, max_batches=2)['sent'], 4)
+        self.assertEqual(mailer.send_queued_emails(batch_size=2)['sent'], 1)
+
+    def test_command(self):
+        queue('a@example.com')
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        self.assertIn('1 envoyé(s)', out.getvalue())
+        self.assertEqual(mail.outbox[0].to, ['a@example.com'])
+
+
+@override_settings(EMAIL_BACKEND=LOCMEM_BACKEND)
+class EmailTemplateTest(TestCase):
+    """Rendu des modèles et mise en file des identifiants"""
+
+    def test_render_email(self):
+        template = EmailTemplate(
+            name='Test', subject='Bonjour\n{{ name }}', body_text='{{ name }} & co',
+            body_html='<p>{{ name }} & co</p>'
+        )
+        subject, body, body_html = mailer.render_email(template, {'name': 'A<b>'})
+        self.assertEqual(subject, 'Bonjour A<b>')
+        self.assertEqual(body, 'A<b> & co')
+        self.assertEqual(body_html, '<p>A&lt;b&gt; & co</p>')
+
+        mailer.compile_template.cache_clear()
+        mailer.render_email(template, {'name': 'B'})
+        mailer.render_email(template, {'name': 'C'})
+        self.assertEqual(mailer.compile_template.cache_info().misses, 3)
+
+    def test_password_email_is_queued(self):
+        user = User.objects.create_user(
+            email='new@example.com', password='x', first_name='Jean', last_name='Dupont', role='TEACHER'
+        )
+        self.assertTrue(send_password_email(user, 'Secret123!'))
+        self.assertEqual(len(mail.outbox), 0)
+
+        email = EmailLog.objects.get()
+        self.assertEqual(email.status, 'PENDING')
+        self.assertEqual(email.recipient_user, user)
+        self.assertIsNone(email.template)
+        self.assertIn('Secret123!', email.body)
+
+        self.assertTrue(email.is_confidential)
+
+        mailer.send_queued_emails()
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertIn('Vos identifiants de connexion', mail.outbox[0].subject)
+        self.assertIn('Secret123!', mail.outbox[0].body)
+        # Le mot de passe ne reste pas dans le journal
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.body, email.body_html), ('SENT', '', ''))
+
+    def test_confidential_body_cleared_when_abandoned(self):
+        kept, secret = mailer.queue_emails([
+            mailer.build_email('bad@example.com', 'Sujet', 'Corps'),
+            mailer.build_email('bad2@example.com', 'Sujet', 'Secret', '<p>Secret</p>', confidential=True),
+        ])
+        with self.assertLogs('communication.mailer', 'WARNING'):
+            mailer.send_batch(connection=FlakyBackend(), max_attempts=2)
+        # Nouvelle tentative prévue : corps conservé
+        self.assertEqual(EmailLog.objects.get(pk=secret.pk).body, 'Secret')
+
+        EmailLog.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('communication.mailer', 'WARNING'):
+            mailer.send_batch(connection=FlakyBackend(), max_attempts=2)
+        secret.refresh_from_db()
+        self.assertEqual((secret.status, secret.body, secret.body_html), ('FAILED', '', ''))
+        self.assertEqual(EmailLog.objects.get(pk=kept.pk).body, 'Corps')
+
+    def test_password_email_uses_active_template(self):
+        template = EmailTemplate.objects.create(
+            name='Identifiants de connexion', subject='Accès {{ site_name }}',
+            body_text='Mot de passe : {{ password }}'
+        )
+        user = User.objects.create_user(email='new@example.com', password='x', role='PARENT')
+        send_password_email(user, 'Secret123!')
+        email = EmailLog.objects.get()
+        self.assertEqual(email.template, template)
+        self.assertEqual(email.body, 'Mot de passe : Secret123!')
@@ -0,0 +1,160 @@
+"""
+Tests pour la diffusion des notifications (communication.notifications)
+"""
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from academic.models import AcademicYear, ClassRoom, Level, Subject, TeacherAssignment
+from accounts.models import Parent, Student, Teacher
+from communication import counters
+from communication.counters import unread_notifications
+from communication.models import Announcement, Notification
+from communication.notifications import announcement_audience, notify, resolve_audience
+from core.caching import LOCAL_CACHE_TTL
+
+User = get_user_model()
+
+
+class NotificationFanOutTest(TestCase):
+    """Résolution du public et insertion par lots"""
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(
+            name='2024-2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        cls.level6 = Level.objects.create(name='6ème', order=6)
+        level5 = Level.objects.create(name='5ème', order=5)
+        cls.class6a = ClassRoom.objects.create(name='6ème A', level=cls.level6, academic_year=year)
+        cls.class6b = ClassRoom.objects.create(name='6ème B', level=cls.level6, academic_year=year)
+        cls.class5a = ClassRoom.objects.create(name='5ème A', level=level5, academic_year=year)
+
+        cls.admin = User.objects.create_user(email='admin@example.com', password='testpass123', role='ADMIN')
+        cls.students = {}
+        for index, classroom in enumerate([cls.class6a, cls.class6a, cls.class6b, cls.class5a]):
+            cls.students[index] = Student.objects.create(
+                user=User.objects.create_user(email=f'student{index}@example.com', password='x', role='STUDENT'),
+                matricule=f'STU2024{index:04d}',
+                current_class=classroom,
+            )
+        cls.parent = Parent.objects.create(
+            user=User.objects.create_user(email='parent@example.com', password='x', role='PARENT'),
+            relationship='MOTHER',
+        )
+        # Un parent de deux élèves ne reçoit qu'une notification
+        cls.parent.children.add(cls.students[0], cls.students[1])
+        cls.teacher = Teacher.objects.create(
+            user=User.objects.create_user(email='teacher@example.com', password='x', role='TEACHER'),
+            employee_id='TEA20240001',
+        )
+        TeacherAssignment.objects.create(
+            teacher=cls.teacher, classroom=cls.class6b, academic_year=year,
+            subject=Subject.objects.create(name='Mathématiques', code='MATH'),
+        )
+        inactive = User.objects.create_user(email='inactive@example.com', password='x', role='STUDENT')
+        inactive.is_active = False
+        inactive.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def emails(self, user_ids):
+        return set(User.objects.filter(pk__in=list(user_ids)).values_list('email', flat=True))
+
+    def test_resolve_audience(self):
+        with CaptureQueriesContext(connection) as ctx:
+            recipients = list(resolve_audience(classrooms=[self.class6a], with_parents=True))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(self.emails(recipients), {
+            'student0@example.com', 'student1@example.com', 'parent@example.com'
+        })
+
+        recipients = resolve_audience(levels=[self.level6], with_teachers=True, only_roles=['TEACHER', 'STUDENT'])
+        self.assertEqual(self.emails(recipients), {
+            'student0@example.com', 'student1@example.com', 'student2@example.com', 'teacher@example.com'
+        })
+
+        recipients = resolve_audience(roles=['STUDENT'], exclude=[self.students[3].user_id])
+        self.assertEqual(len(recipients), 3)
+        self.assertEqual(list(resolve_audience()), [])
+
+    def test_notify_in_batches(self):
+        with CaptureQueriesContext(connection) as ctx:
+            created = notify(resolve_audience(roles=['STUDENT', 'PARENT', 'TEACHER']), 'Sortie', 'Lundi', batch_size=2)
+        self.assertEqual(created, 6)
+        self.assertEqual(Notification.objects.filter(title='Sortie').count(), 6)
+        # Lecture des identifiants + 3 lots
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_announcement_audience(self):
+        announcement = Announcement.objects.create(
+            title='Réunion', content='Vendredi', audience='CLASS', author=self.admin, is_published=True
+        )
+        announcement.target_classes.add(self.class6b)
+        recipients = resolve_audience(**announcement_audience(announcement))
+        self.assertEqual(self.emails(recipients), {'student2@example.com', 'teacher@example.com'})
+
+        announcement.audience = 'ALL'
+        announcement.set_target_roles(['PARENT', 'ADMIN'])
+        # L'auteur n'est pas notifié
+        recipients = resolve_audience(**announcement_audience(announcement))
+        self.assertEqual(self.emails(recipients), {'parent@example.com'})
+
+
+class UnreadCounterTest(TransactionTestCase):
+    """Compteur de non-lus en cache (ajusté après le commit : transactions réelles)"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='testpass123', role='PARENT')
+        self.client.login(email='user@example.com', password='testpass123')
+
+    def test_counter_follows_writes(self):
+        self.assertEqual(unread_notifications(self.user.pk), 0)
+        with self.assertNumQueries(0):
+            unread_notifications(self.user.pk)
+
+        notify([self.user.pk], 'A', 'a')
+        self.assertEqual(unread_notifications(self.user.pk), 1)
+
+        notification = Notification.objects.create(user=self.user, title='B', message='b')
+        self.assertEqual(unread_notifications(self.user.pk), 2)
+
+        notification.mark_as_read()
+        self.assertEqual(unread_notifications(self.user.pk), 1)
+
+        self.client.post(reverse('communication:notification_mark_all_read'))
+        self.assertEqual(unread_notifications(self.user.pk), 0)
+
+    def test_counter_short_lived_in_process_local_cache(self):
+        """LocMemCache : l'invalidation d'un autre processus n'arrive pas ici"""
+        cache.clear()
+        with mock.patch.object(counters.cache, 'add', wraps=counters.cache.add) as add:
+            unread_notifications(self.user.pk)
+        self.assertEqual(add.call_args.args[2], LOCAL_CACHE_TTL)
+
+        cache.clear()
+        with mock.patch('core.caching.cache_is_shared', return_value=True), \
+                mock.patch.object(counters.cache, 'add', wraps=counters.cache.add) as add:
+            unread_notifications(self.user.pk)
+        self.assertEqual(add.call_args.args[2], counters.COUNTERS_TTL)
+
+    def test_notification_list_and_badge(self):
+        notify([self.user.pk], 'A', 'a')
+        response = self.client.get(reverse('communication:notification_list'))
+        self.assertEqual(response.context['unread_count'], 1)
+        self.assertEqual(response.context['total_count'], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('communication:notification_list'))
+        counts = [q for q in ctx.captured_queries if 'COUNT(' in q['sql'] and 'notification' in q['sql']]
+        # Seul le COUNT de la pagination reste
+        self.assertEqual(len(counts), 1)
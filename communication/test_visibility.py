@@ -0,0 +1,167 @@
+"""
+Tests pour la visibilité des annonces (Announcement.objects.visible_to)
+"""
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from academic.models import AcademicYear, ClassRoom, Level, Subject, TeacherAssignment
+from accounts.models import Student, Teacher
+from communication import visibility
+from communication.models import Announcement
+from communication.visibility import visible_announcements
+from core.caching import LOCAL_CACHE_TTL
+
+User = get_user_model()
+
+
+class AnnouncementVisibilityTest(TestCase):
+    """Règle de visibilité exprimée en SQL"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.year = AcademicYear.objects.create(
+            name='2024-2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        cls.level6 = Level.objects.create(name='6ème', order=6)
+        level5 = Level.objects.create(name='5ème', order=5)
+        cls.class6a = ClassRoom.objects.create(name='6ème A', level=cls.level6, academic_year=cls.year)
+        cls.class5a = ClassRoom.objects.create(name='5ème A', level=level5, academic_year=cls.year)
+
+        cls.admin = User.objects.create_user(email='admin@example.com', password='testpass123', role='ADMIN')
+        cls.student = User.objects.create_user(email='student@example.com', password='testpass123', role='STUDENT')
+        Student.objects.create(user=cls.student, matricule='STU20240001', current_class=cls.class6a)
+        cls.parent = User.objects.create_user(email='parent@example.com', password='testpass123', role='PARENT')
+        cls.teacher = User.objects.create_user(email='teacher@example.com', password='testpass123', role='TEACHER')
+        teacher = Teacher.objects.create(user=cls.teacher, employee_id='TEA20240001')
+        TeacherAssignment.objects.create(
+            teacher=teacher, classroom=cls.class5a, academic_year=cls.year,
+            subject=Subject.objects.create(name='Mathématiques', code='MATH'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def announce(self, title, audience='ALL', roles=(), classes=(), levels=(), **fields):
+        fields.setdefault('is_published', True)
+        announcement = Announcement.objects.create(
+            title=title, content='...', audience=audience, author=self.admin, **fields
+        )
+        announcement.set_target_roles(roles)
+        announcement.target_classes.add(*classes)
+        announcement.target_levels.add(*levels)
+        return announcement
+
+    def visible_titles(self, user):
+        return set(Announcement.objects.visible_to(user).values_list('title', flat=True))
+
+    def test_visibility_rule(self):
+        self.announce('Tous')
+        self.announce('Parents et élèves', roles=['PARENT', 'STUDENT'])
+        self.announce('Élèves', audience='STUDENTS')
+        self.announce('Enseignants', audience='TEACHERS')
+        self.announce('Personnel', audience='STAFF')
+        self.announce('6ème A', audience='CLASS', classes=[self.class6a])
+        self.announce('5ème A', audience='CLASS', classes=[self.class5a])
+        self.announce('Niveau 6', audience='LEVEL', levels=[self.level6])
+        self.announce('Niveau 6 enseignants', audience='LEVEL', levels=[self.level6], roles=['TEACHER'])
+        self.announce('Brouillon', is_published=False)
+        self.announce('Expirée', expiry_date=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(self.visible_titles(self.student), {
+            'Tous', 'Parents et élèves', 'Élèves', '6ème A', 'Niveau 6'
+        })
+        self.assertEqual(self.visible_titles(self.teacher), {
+            'Tous', 'Enseignants', '5ème A', 'Niveau 6', 'Niveau 6 enseignants'
+        })
+        # Pas de restriction de classe ni de niveau pour les parents
+        self.assertEqual(self.visible_titles(self.parent), {
+            'Tous', 'Parents et élèves', '6ème A', '5ème A', 'Niveau 6'
+        })
+        self.assertEqual(len(self.visible_titles(self.admin)), 9)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.visible_titles(self.student)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        for announcement in Announcement.objects.all():
+            self.assertEqual(
+                announcement.is_visible_to_user(self.student),
+                announcement.title in self.visible_titles(self.student),
+            )
+
+    def test_cache_invalidation(self):
+        self.announce('Tous')
+        self.assertEqual(len(visible_announcements(self.student).ids), 1)
+        with self.assertNumQueries(0):
+            visible_announcements(self.student)
+
+        # Publication
+        announcement = self.announce('Élèves', audience='STUDENTS', is_published=False)
+        self.assertEqual(len(visible_announcements(self.student).ids), 1)
+        announcement.is_published = True
+        announcement.save()
+        self.assertEqual(len(visible_announcements(self.student).ids), 2)
+
+        # Changement de classe de l'élève
+        self.announce('5ème A', audience='CLASS', classes=[self.class5a])
+        self.assertEqual(len(visible_announcements(self.student).ids), 2)
+        profile = Student.objects.get(user=self.student)
+        profile.current_class = self.class5a
+        profile.save()
+        self.assertEqual(len(visible_announcements(self.student).ids), 3)
+
+    def test_expiry_bounds_cache(self):
+        self.announce('Bientôt expirée', expiry_date=timezone.now() + timedelta(seconds=30))
+        visible = visible_announcements(self.student)
+        self.assertEqual(len(visible.ids), 1)
+        self.assertLessEqual(visible.valid_until, timezone.now() + timedelta(seconds=30))
+
+        # L'entrée en cache n'est plus utilisée après l'expiration
+        later = timezone.now() + timedelta(seconds=60)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(visible_announcements(self.student).ids, [])
+
+    def test_short_lived_in_process_local_cache(self):
+        """LocMemCache : une publication vue par un autre processus n'invalide pas celui-ci"""
+        self.announce('Tous')
+        with mock.patch.object(visibility.cache, 'set', wraps=visibility.cache.set) as cache_set:
+            visible_announcements(self.student)
+        self.assertEqual(cache_set.call_args.args[2], LOCAL_CACHE_TTL)
+
+        cache.clear()
+        with mock.patch('core.caching.cache_is_shared', return_value=True), \
+                mock.patch.object(visibility.cache, 'set', wraps=visibility.cache.set) as cache_set:
+            visible_announcements(self.student)
+        self.assertEqual(cache_set.call_args.args[2], visibility.VISIBILITY_TTL)
+
+    def test_announcement_list_constant_queries(self):
+        self.client.login(email='student@example.com', password='testpass123')
+        url = reverse('communication:announcement_list')
+
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries), response
+
+        for index in range(3):
+            self.announce(f'Annonce {index}')
+        few, response = count_queries()
+        self.assertEqual(response.context['total_announcements'], 3)
+
+        for index in range(40):
+            self.announce(f'Ancienne {index}', audience='CLASS', classes=[self.class6a])
+        self.announce('Autre classe', audience='CLASS', classes=[self.class5a])
+        many, response = count_queries()
+        self.assertEqual(response.context['total_announcements'], 43)
+        self.assertEqual(len(response.context['announcements']), 10)
+        self.assertEqual(many, few)
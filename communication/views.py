@@ -13,7 +13,12 @@ from .models import (
     Announcement, AnnouncementRead, Message, GroupMessage, 
     GroupMessageRead, Resource, ResourceAccess, Notification
 )
+from .counters import (
+    MESSAGE_COUNTERS, get_counter, get_counters, invalidate_unread_notifications, unread_notifications,
+)
 from .forms import AnnouncementForm
+from .notifications import notify_announcement
+from .visibility import visible_announcements
 from accounts.models import User
 from academic.models import ClassRoom, Level
 
@@ -41,41 +46,26 @@ def announcement_list(request):
     """Liste des annonces visibles pour l'utilisateur"""
     user = request.user
     
-    # Filtrer les annonces selon le rôle de l'utilisateur
-    announcements = Announcement.objects.filter(is_published=True)
-    
-    if getattr(user, 'role', None) == 'STUDENT':
-        announcements = announcements.filter(
-            Q(audience__in=['ALL', 'STUDENTS'])
-        ).distinct()
-    elif getattr(user, 'role', None) == 'PARENT':
-        announcements = announcements.filter(
-            Q(audience__in=['ALL', 'PARENTS'])
-        ).distinct()
-    elif getattr(user, 'role', None) == 'TEACHER':
-        announcements = announcements.filter(
-            Q(audience__in=['ALL', 'TEACHERS', 'STAFF'])
-        ).distinct()
-    elif getattr(user, 'role', None) in ['ADMIN', 'SUPER_ADMIN']:
-        # Les admins voient toutes les annonces
-        pass
-    
-    # Marquer les annonces non lues
-    read_announcements = AnnouncementRead.objects.filter(user=user).values_list('announcement_id', flat=True)
-    
-    # Ordre pour la pagination
-    announcements = announcements.order_by('-created_at')
-    
-    # Pagination
-    paginator = Paginator(announcements, 10)
+    # Annonces visibles (identifiants en cache), la page est lue en une requête
+    visible = visible_announcements(user)
+    paginator = Paginator(visible.ids, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    announcements = Announcement.objects.select_related('author').in_bulk(page_obj.object_list)
+    page_obj.object_list = [announcements[pk] for pk in page_obj.object_list if pk in announcements]
+    
+    # Annonces lues parmi celles de la page
+    read_announcements = set(
+        AnnouncementRead.objects.filter(
+            user=user, announcement__in=list(announcements)
+        ).values_list('announcement_id', flat=True)
+    )
     
     context = {
         'announcements': page_obj,
         'user': user,
-        'total_announcements': announcements.count(),
-        'unread_count': announcements.exclude(id__in=read_announcements).count(),
+        'total_announcements': paginator.count,
+        'unread_count': get_counter('announcements', user),
         'read_announcements': read_announcements,
     }
     
@@ -95,14 +85,12 @@ def announcement_create(request):
             announcement.publish_date = timezone.now()
             announcement.save()
             
-            # Sauvegarder les rôles ciblés
-            target_roles = form.cleaned_data.get('target_roles', [])
-            if target_roles:
-                announcement.set_target_roles(target_roles)
-                announcement.save()
-            
-            # Sauvegarder les relations ManyToMany
+            # Sauvegarder les relations ManyToMany et les rôles ciblés
             form.save_m2m()
+            announcement.set_target_roles(form.cleaned_data.get('target_roles', []))
+            
+            # Notifier le public ciblé
+            notify_announcement(announcement)
             
             messages.success(request, f'✅ Annonce "{announcement.title}" créée avec succès!')
             return redirect('communication:announcement_list')
@@ -187,19 +175,15 @@ def message_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Statistiques
-    unread_count = Message.objects.filter(
-        recipient=user,
-        is_read=False,
-        deleted_by_recipient=False
-    ).count()
+    # Statistiques (compteurs en cache)
+    counters = get_counters(user.pk, MESSAGE_COUNTERS)
     
     context = {
         'messages': page_obj,
         'current_tab': tab,
-        'unread_count': unread_count,
-        'total_received': Message.objects.filter(recipient=user, deleted_by_recipient=False).count(),
-        'total_sent': Message.objects.filter(sender=user, deleted_by_sender=False).count(),
+        'unread_count': counters['messages_unread'],
+        'total_received': counters['messages_received'],
+        'total_sent': counters['messages_sent'],
     }
     
     return render(request, 'communication/message_list.html', context)
@@ -286,13 +270,10 @@ def notification_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Statistiques
-    unread_count = notifications.filter(is_read=False).count()
-    
     context = {
         'notifications': page_obj,
-        'unread_count': unread_count,
-        'total_count': notifications.count(),
+        'unread_count': unread_notifications(request.user.pk),
+        'total_count': paginator.count,
     }
     
     return render(request, 'communication/notification_list.html', context)
@@ -315,9 +296,10 @@ def notification_mark_read(request, notification_id):
 @require_http_methods(["POST"])
 def notification_mark_all_read(request):
     """Marquer toutes les notifications comme lues"""
-    notifications = Notification.objects.filter(user=request.user, is_read=False)
-    count = notifications.count()
-    notifications.update(is_read=True, read_date=timezone.now())
+    count = Notification.objects.filter(user=request.user, is_read=False).update(
+        is_read=True, read_date=timezone.now()
+    )
+    invalidate_unread_notifications([request.user.pk])
     
     return JsonResponse({
         'success': True,
@@ -341,38 +323,33 @@ def group_message_detail(request, message_id):
 @login_required
 def forum_index(request):
     """Page d'accueil du forum - Liste des classes/forums accessibles"""
+    from .models import ClassroomForumStats, ForumTopic
     user = request.user
-    accessible_classrooms = []
-    
-    if user.role in ['ADMIN', 'SUPER_ADMIN']:
-        # Les admins voient toutes les classes
-        from academic.models import ClassRoom
-        accessible_classrooms = ClassRoom.objects.all()
-    elif user.role == 'TEACHER':
-        # Les enseignants voient leurs classes
-        if hasattr(user, 'teacher_profile'):
-            accessible_classrooms = user.teacher_profile.assigned_classes.all()
-    elif user.role == 'STUDENT':
-        # Les étudiants voient leur classe
-        if hasattr(user, 'student_profile') and user.student_profile.current_class:
-            accessible_classrooms = [user.student_profile.current_class]
-    elif user.role == 'PARENT':
-        # Les parents voient les classes de leurs enfants
-        if hasattr(user, 'parent_profile'):
-            children_classes = []
-            for child in user.parent_profile.children.all():
-                if child.current_class:
-                    children_classes.append(child.current_class)
-            accessible_classrooms = children_classes
     
-    # Ajouter les statistiques pour chaque classe
-    from .models import ForumTopic
+    # Classes accessibles et leurs compteurs (communication.forum), en une requête
+    accessible_classrooms = list(
+        accessible_forum_classrooms(user).select_related('forum_stats__last_post_author')
+    )
+    classrooms = []
     for classroom in accessible_classrooms:
-        classroom.topics_count = ForumTopic.objects.filter(classroom=classroom).count()
-        classroom.recent_topics = ForumTopic.objects.filter(classroom=classroom).order_by('-updated_at')[:3]
+        try:
+            stats = classroom.forum_stats
+        except ClassroomForumStats.DoesNotExist:
+            stats = ClassroomForumStats(classroom=classroom)
+        classrooms.append((classroom, stats))
+    
+    # Derniers sujets actifs, toutes classes confondues
+    recent_topics_list = ForumTopic.objects.filter(
+        classroom__in=[classroom.pk for classroom in accessible_classrooms],
+        is_approved=True
+    ).select_related('classroom', 'author').order_by('-last_post_at')[:5]
     
     context = {
         'accessible_classrooms': accessible_classrooms,
+        'classrooms': classrooms,
+        'total_topics': sum(stats.topics_count for _, stats in classrooms),
+        'total_posts': sum(stats.posts_count for _, stats in classrooms),
+        'recent_topics_list': recent_topics_list,
         'user': user,
     }
     
@@ -382,8 +359,7 @@ def forum_index(request):
 @login_required
 def forum_classroom(request, classroom_id):
     """Forum d'une classe spécifique"""
-    from academic.models import ClassRoom
-    from .models import ForumTopic
+    from .models import ClassroomForumStats, ForumTopic
     
     classroom = get_object_or_404(ClassRoom, id=classroom_id)
     
@@ -392,23 +368,28 @@ def forum_classroom(request, classroom_id):
         messages.error(request, "Vous n'avez pas accès au forum de cette classe.")
         return redirect('communication:forum_index')
     
-    # Récupérer les topics
+    # Récupérer les topics (compteurs et dernier message dénormalisés)
     topics = ForumTopic.objects.filter(
         classroom=classroom,
         is_approved=True
-    ).select_related('author').prefetch_related('forum_posts').order_by('-updated_at')
+    ).select_related('author', 'last_post_author').order_by('-updated_at')
     
     # Pagination
     paginator = Paginator(topics, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    stats = ClassroomForumStats.objects.filter(classroom=classroom).first() or ClassroomForumStats(classroom=classroom)
+    
     # Permissions pour créer des topics
     can_create_topic = can_user_create_topic(request.user, classroom)
     
     context = {
         'classroom': classroom,
+        'stats': stats,
         'topics': page_obj,
+        'pinned_topics': [topic for topic in page_obj if topic.is_pinned],
+        'regular_topics': [topic for topic in page_obj if not topic.is_pinned],
         'can_create_topic': can_create_topic,
         'user': request.user,
     }
@@ -521,6 +502,7 @@ def forum_post_create(request, topic_id):
                 except ForumPost.DoesNotExist:
                     pass
             
+            # La date et les compteurs du topic sont mis à jour par communication.forum
             post = ForumPost.objects.create(
                 topic=topic,
                 author=request.user,
@@ -529,9 +511,6 @@ def forum_post_create(request, topic_id):
                 is_approved=True
             )
             
-            # Mettre à jour la date du topic
-            topic.save()
-            
             messages.success(request, 'Réponse ajoutée avec succès!')
             return redirect('communication:forum_topic_detail', topic_id=topic_id)
         else:
@@ -557,6 +536,19 @@ def can_user_access_classroom_forum(user, classroom):
     return False
 
 
+def accessible_forum_classrooms(user):
+    """Classes dont l'utilisateur peut consulter le forum (QuerySet)"""
+    if user.role in ['ADMIN', 'SUPER_ADMIN']:
+        return ClassRoom.objects.all()
+    elif user.role == 'TEACHER':
+        return ClassRoom.objects.filter(teachers__user=user).distinct()
+    elif user.role == 'STUDENT':
+        return ClassRoom.objects.filter(students__user=user)
+    elif user.role == 'PARENT':
+        return ClassRoom.objects.filter(students__parents__user=user).distinct()
+    return ClassRoom.objects.none()
+
+
 def can_user_create_topic(user, classroom):
     """Vérifie si un utilisateur peut créer un topic"""
     if user.role in ['ADMIN', 'SUPER_ADMIN', 'TEACHER']:
@@ -0,0 +1,111 @@
+"""
+Annonces visibles par utilisateur, gardées en cache
+
+La liste des identifiants des annonces visibles (Announcement.objects.
+visible_to, triée par date de création décroissante) est mise en cache par
+utilisateur : la liste des annonces se pagine ensuite sans recompter ni
+refiltrer l'historique (une requête pour la page affichée).
+
+Le cache est invalidé :
+- pour tous, à la publication, la modification, le ciblage ou la
+  suppression d'une annonce (nouvelle génération, partagée avec les
+  compteurs d'annonces non lues de communication.counters) ;
+- pour un utilisateur, quand sa classe ou ses affectations changent ;
+- à l'expiration de la première annonce expirante de la liste (durée de
+  vie de l'entrée bornée par cette date).
+
+Ces invalidations ne touchent que le cache du processus qui écrit quand il
+n'est pas partagé (LocMemCache) : listes et compteurs d'annonces n'y sont
+alors gardés que quelques secondes (voir core.caching).
+"""
+import math
+import time
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core.caching import cache_timeout
+
+from .models import Announcement
+
+VISIBILITY_CACHE_PREFIX = 'communication:visible_announcements'
+VISIBILITY_TTL = 60 * 15
+
+ANNOUNCEMENTS_GENERATION_KEY = 'communication:announcements:generation'
+
+
+def announcements_generation():
+    generation = cache.get(ANNOUNCEMENTS_GENERATION_KEY)
+    if generation is None:
+        cache.add(ANNOUNCEMENTS_GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(ANNOUNCEMENTS_GENERATION_KEY)
+    return generation
+
+
+def _bump_generation():
+    try:
+        cache.incr(ANNOUNCEMENTS_GENERATION_KEY)
+    except ValueError:
+        cache.set(ANNOUNCEMENTS_GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def invalidate_announcements():
+    """Oublie les annonces visibles et les compteurs d'annonces de tous les utilisateurs"""
+    _bump_generation()
+    transaction.on_commit(_bump_generation)
+
+
+class VisibleAnnouncements(NamedTuple):
+    """Identifiants visibles et date jusqu'à laquelle la liste reste exacte"""
+    ids: list
+    valid_until: object
+
+
+def _key(user_id):
+    return f'{VISIBILITY_CACHE_PREFIX}:{announcements_generation()}:{user_id}'
+
+
+def compute_visible_announcements(user, now=None):
+    now = now or timezone.now()
+    rows = Announcement.objects.visible_to(user, now).order_by('-created_at', '-pk').values_list('pk', 'expiry_date')
+    ids = []
+    valid_until = now + timedelta(seconds=VISIBILITY_TTL)
+    for pk, expiry_date in rows:
+        ids.append(pk)
+        if expiry_date is not None and expiry_date < valid_until:
+            valid_until = expiry_date
+    return VisibleAnnouncements(ids, valid_until)
+
+
+def remaining_seconds(valid_until, now=None):
+    """Durée de vie en cache d'une valeur exacte jusqu'à `valid_until`"""
+    return max(1, math.ceil((valid_until - (now or timezone.now())).total_seconds()))
+
+
+def cached_visible_announcements(user_id):
+    """Annonces visibles en cache pour l'utilisateur, ou None"""
+    visible = cache.get(_key(user_id))
+    if visible is None or visible.valid_until <= timezone.now():
+        return None
+    return visible
+
+
+def visible_announcements(user):
+    """Annonces visibles pour l'utilisateur (VisibleAnnouncements)"""
+    visible = cached_visible_announcements(user.pk)
+    if visible is None:
+        visible = compute_visible_announcements(user)
+        cache.set(_key(user.pk), visible, cache_timeout(remaining_seconds(visible.valid_until)))
+    return visible
+
+
+def invalidate_visible_announcements(user_ids):
+    """Oublie les annonces visibles des utilisateurs donnés"""
+    keys = [_key(user_id) for user_id in user_ids if user_id]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
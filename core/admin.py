@@ -1,9 +1,80 @@
 """
-Administration centrale - Configuration vide
+Administration centrale
 
 Le système de suivi d'activité a été déplacé vers activity_log.admin
 """
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
 
-# Aucune configuration admin dans ce module
-# Les configurations ont été déplacées dans leurs applications respectives
+from .models import SequenceCounter, ViewProfile
+from .profiling import DURATION_BUCKETS_MS, QUERY_BUCKETS
+
+
+@admin.register(SequenceCounter)
+class SequenceCounterAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'year', 'month', 'last_value', 'updated_at')
+    list_filter = ('prefix', 'year')
+    readonly_fields = ('updated_at',)
+
+
+def _histogram_rows(histogram, bounds, unit):
+    labels = [f'≤ {bound}{unit}' for bound in bounds] + [f'> {bounds[-1]}{unit}']
+    total = sum(histogram) or 1
+    return format_html(
+        '<table>{}</table>',
+        format_html_join(
+            '', '<tr><td>{}</td><td style="text-align:right">{}</td><td>{}</td></tr>',
+            ((label, count, '█' * round(40 * count / total)) for label, count in zip(labels, histogram)),
+        ),
+    )
+
+
+@admin.register(ViewProfile)
+class ViewProfileAdmin(admin.ModelAdmin):
+    """Mesures du profilage SQL (SQL_PROFILING), en lecture seule ; la suppression remet à zéro"""
+    list_display = (
+        'view_name', 'method', 'request_count', 'average_queries', 'max_queries', 'average_db_ms',
+        'average_duration_ms', 'p95_duration', 'n_plus_one_requests', 'slow_query_count', 'last_seen',
+    )
+    list_filter = ('method',)
+    search_fields = ('view_name',)
+    ordering = ('-total_db_ms',)
+    fields = (
+        'view_name', 'method', 'request_count', 'total_queries', 'max_queries', 'total_db_ms',
+        'total_template_ms', 'total_duration_ms', 'max_duration_ms', 'n_plus_one_requests',
+        'slow_query_count', 'duration_histogram_table', 'query_histogram_table', 'duplicate_queries_table',
+        'first_seen', 'last_seen',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Durée p95 (ms)')
+    def p95_duration(self, obj):
+        value = obj.duration_percentile(95)
+        return value if value is not None else f'> {DURATION_BUCKETS_MS[-1]}'
+
+    @admin.display(description='Histogramme des durées')
+    def duration_histogram_table(self, obj):
+        return _histogram_rows(obj.duration_histogram, DURATION_BUCKETS_MS, ' ms')
+
+    @admin.display(description='Histogramme des requêtes SQL')
+    def query_histogram_table(self, obj):
+        return _histogram_rows(obj.query_histogram, QUERY_BUCKETS, '')
+
+    @admin.display(description='Requêtes en double (N+1)')
+    def duplicate_queries_table(self, obj):
+        entries = sorted(obj.duplicate_queries.values(), key=lambda entry: entry['requests'], reverse=True)
+        if not entries:
+            return '-'
+        return format_html(
+            '<table><tr><th>Requêtes HTTP</th><th>Répétitions max</th><th>SQL</th></tr>{}</table>',
+            format_html_join(
+                '', '<tr><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+                ((entry['requests'], entry['max_repeats'], entry['sql']) for entry in entries),
+            ),
+        )
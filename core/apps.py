@@ -5,3 +5,8 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = 'Core'
+
+    def ready(self):
+        """Importer les signaux au démarrage de l'application"""
+        import core.signals
+        import core.caching  # contrôles (checks) du cache
@@ -0,0 +1,50 @@
+"""
+Portée du cache par défaut
+
+LocMemCache (configuration de développement) garde ses entrées dans la
+mémoire de chaque processus : une invalidation faite par un worker
+gunicorn, ou par une commande lancée par cron, n'atteint pas le cache des
+autres processus. Les valeurs mises en cache puis invalidées à l'écriture
+(compteurs, annonces visibles) n'y sont gardées que LOCAL_CACHE_TTL
+secondes : l'écart entre processus reste borné à cette durée.
+
+En production, configurer un cache partagé (Redis, Memcached) : les
+durées de vie normales s'appliquent. Le contrôle core.W001
+(`manage.py check --deploy`) signale un cache propre au processus.
+"""
+from django.conf import settings
+from django.core import checks
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+# Durée de vie maximale d'une valeur invalidable dans un cache propre au processus
+LOCAL_CACHE_TTL = 30
+
+
+def cache_is_shared(alias='default'):
+    """Le cache est commun à tous les processus (pas LocMemCache)"""
+    return settings.CACHES.get(alias, {}).get('BACKEND') != LOCMEM_BACKEND
+
+
+def cache_timeout(timeout):
+    """`timeout` avec un cache partagé, au plus LOCAL_CACHE_TTL sinon"""
+    if cache_is_shared():
+        return timeout
+    return LOCAL_CACHE_TTL if timeout is None else min(timeout, LOCAL_CACHE_TTL)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Compteurs et annonces en cache supposent un cache commun aux workers"""
+    if cache_is_shared():
+        return []
+    return [checks.Warning(
+        "Le cache par défaut (LocMemCache) est propre à chaque processus.",
+        hint=(
+            "Configurer un cache partagé (Redis, Memcached) dans CACHES : sinon les compteurs de non-lus "
+            f"et les annonces visibles ne sont gardés que {LOCAL_CACHE_TTL} s, la commande "
+            "reconcile_unread_counters n'agit que sur son propre processus et la génération de "
+            "factures en arrière-plan est faite pendant la requête."
+        ),
+        id='core.W001',
+    )]
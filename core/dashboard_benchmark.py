@@ -0,0 +1,198 @@
+"""
+Benchmark des dashboards par rôle
+
+Affiche chaque dashboard (accounts) et chaque vue d'administration
+(academic) avec le client de test, connecté avec l'utilisateur du rôle
+concerné, et mesure :
+- le nombre de requêtes SQL et le temps passé en base ;
+- le temps Python (temps total moins le temps en base) ;
+- le pic de mémoire allouée (tracemalloc, mesuré à part car il ralentit
+  l'exécution).
+
+La première requête est faite caches invalidés (« à froid » : caches des
+dashboards, compteurs et annonces visibles de l'utilisateur) ; les suivantes
+donnent les mesures « à chaud » (médiane). Le budget de requêtes de chaque
+vue est enregistré dans un fichier JSON de référence (dashboard_baseline.json)
+et porte sur la requête à froid.
+"""
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from academic.class_statistics import invalidate_class_statistics
+from accounts.dashboard_metrics import invalidate_admin_snapshot
+from communication.counters import COUNTERS, invalidate as invalidate_counters
+from communication.visibility import invalidate_announcements, invalidate_visible_announcements
+from core.scopes import invalidate_access_scopes
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'dashboard_baseline.json'
+
+
+class DashboardScenario(NamedTuple):
+    """Vue mesurée et rôle de l'utilisateur connecté"""
+    url_name: str
+    role: str
+
+
+SCENARIOS = [
+    DashboardScenario('accounts:admin_dashboard', 'ADMIN'),
+    DashboardScenario('accounts:student_dashboard', 'STUDENT'),
+    DashboardScenario('accounts:teacher_dashboard', 'TEACHER'),
+    DashboardScenario('accounts:parent_dashboard', 'PARENT'),
+    DashboardScenario('academic:admin_dashboard', 'ADMIN'),
+    DashboardScenario('academic:admin_sessions', 'ADMIN'),
+    DashboardScenario('academic:admin_attendance_reports', 'ADMIN'),
+    DashboardScenario('academic:admin_teachers', 'ADMIN'),
+    DashboardScenario('academic:admin_students', 'ADMIN'),
+    DashboardScenario('academic:admin_system_stats', 'ADMIN'),
+]
+
+
+def invalidate_caches(user_ids=()):
+    """
+    Invalide les caches applicatifs lus par les dashboards et par l'en-tête
+    des pages (compteurs et annonces visibles des utilisateurs donnés)
+    """
+    invalidate_admin_snapshot()
+    invalidate_access_scopes()
+    invalidate_class_statistics()
+    invalidate_announcements()
+    invalidate_visible_announcements(user_ids)
+    invalidate_counters(COUNTERS, user_ids)
+
+
+def _client():
+    # Une vue en erreur est mesurée (réponse 500) au lieu d'interrompre le benchmark
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), None)
+    if host and '*' not in settings.ALLOWED_HOSTS:
+        return Client(raise_request_exception=False, SERVER_NAME=host)
+    return Client(raise_request_exception=False)
+
+
+def _timed_get(client, url):
+    # Journal plein (9 000 requêtes, p. ex. après la création de l'école) : le décompte serait faux
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.get(url)
+        total = time.perf_counter() - start
+    db_time = sum(float(query['time']) for query in queries.captured_queries)
+    return response, len(queries.captured_queries), db_time, total
+
+
+def measure_view(client, url, repeat=5, user=None):
+    """
+    Mesure une vue pour le client connecté (avec `user`, l'utilisateur connecté)
+
+    Returns:
+        dict: status, queries (à froid), warm_queries, db_ms, python_ms et
+        total_ms (à froid), warm_total_ms (médiane), peak_memory_kb
+    """
+    invalidate_caches([user.pk] if user is not None else ())
+    response, queries, db_time, total = _timed_get(client, url)
+    warm = [_timed_get(client, url) for _ in range(repeat)]
+
+    tracemalloc.start()
+    try:
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'queries': queries,
+        'warm_queries': max(result[1] for result in warm) if warm else queries,
+        'db_ms': round(db_time * 1000, 1),
+        'python_ms': round((total - db_time) * 1000, 1),
+        'total_ms': round(total * 1000, 1),
+        'warm_total_ms': round(statistics.median(result[3] for result in warm) * 1000, 1) if warm else None,
+        'peak_memory_kb': round(peak / 1024),
+    }
+
+
+def run_dashboard_benchmark(school, scenarios=SCENARIOS, repeat=5):
+    """
+    Mesure chaque scénario avec l'utilisateur du rôle dans l'école synthétique
+
+    Returns:
+        dict: {url_name: mesures (voir measure_view) + 'role'}
+    """
+    clients = {}
+    results = {}
+    # Les erreurs 500 sont reportées dans les mesures, sans trace à chaque appel
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        for scenario in scenarios:
+            user = school.user_for_role(scenario.role)
+            if scenario.role not in clients:
+                clients[scenario.role] = _client()
+                clients[scenario.role].force_login(user)
+            results[scenario.url_name] = {
+                'role': scenario.role,
+                **measure_view(clients[scenario.role], reverse(scenario.url_name), repeat, user),
+            }
+    finally:
+        request_logger.setLevel(level)
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Fichier de référence, ou None s'il n'existe pas"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def write_baseline(results, scale, path=BASELINE_PATH, budgets=None):
+    """
+    Enregistre les mesures comme référence
+
+    Le budget de chaque vue est conservé depuis `budgets` s'il y figure,
+    sinon il vaut le nombre de requêtes mesuré.
+    """
+    budgets = budgets or {}
+    baseline = {
+        'scale': scale._asdict(),
+        'views': {
+            url_name: {**result, 'budget': budgets.get(url_name, result['queries'])}
+            for url_name, result in results.items()
+        },
+    }
+    Path(path).write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+    return baseline
+
+
+def budget_violations(results, baseline):
+    """
+    Vues au-delà de leur budget de requêtes, ou dont le code HTTP a changé
+    depuis la référence (une vue déjà en erreur dans la référence reste
+    signalée dans les mesures sans faire échouer le benchmark)
+
+    Returns:
+        list: messages (vide si tout est dans le budget)
+    """
+    violations = []
+    for url_name, result in results.items():
+        reference = baseline['views'].get(url_name, {})
+        if result['status'] != reference.get('status', 200):
+            violations.append(f'{url_name} : code HTTP {result["status"]} (référence : {reference.get("status", 200)})')
+        budget = reference.get('budget')
+        if budget is None:
+            violations.append(f'{url_name} : pas de budget de requêtes dans la référence')
+        elif result['queries'] > budget:
+            violations.append(f'{url_name} : {result["queries"]} requêtes pour un budget de {budget}')
+    return violations
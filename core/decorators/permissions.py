@@ -151,8 +151,7 @@ class StudentDataAccessMixin:
     
     def check_student_access(self, user, student):
         """Vérifie si l'utilisateur peut accéder aux données de cet étudiant"""
-        accessible_students = self.get_accessible_students(user)
-        if student not in accessible_students:
+        if not self.get_accessible_students(user).filter(pk=student.pk).exists():
             raise PermissionDenied("Accès refusé à cet étudiant")
         return True
 
@@ -164,25 +163,21 @@ class SessionAccessMixin:
     def get_accessible_sessions(self, user):
         """Retourne les sessions accessibles selon le rôle de l'utilisateur"""
         from academic.models import Session
+        from core.scopes import get_access_scope
         
-        if user.role == 'STUDENT':
-            # Étudiant : sessions de sa classe
-            if hasattr(user, 'student_profile') and user.student_profile.current_class:
+        scope = get_access_scope(user)
+        if user.role in ['STUDENT', 'PARENT']:
+            # Étudiant : sessions de sa classe ; parent : sessions des classes de ses enfants
+            if scope.current_classroom_ids:
                 return Session.objects.filter(
-                    timetable__classroom=user.student_profile.current_class
+                    timetable__classroom_id__in=scope.current_classroom_ids
                 )
         elif user.role == 'TEACHER':
             # Enseignant : sessions qu'il enseigne
-            if hasattr(user, 'teacher_profile'):
+            if scope.teacher_id:
                 return Session.objects.filter(
-                    timetable__teacher=user.teacher_profile
+                    timetable__teacher_id=scope.teacher_id
                 )
-        elif user.role == 'PARENT':
-            # Parent : sessions des classes de ses enfants
-            if hasattr(user, 'parent_profile'):
-                return Session.objects.filter(
-                    timetable__classroom__students__parents=user.parent_profile
-                ).distinct()
         elif user.role in ['ADMIN', 'SUPER_ADMIN']:
             # Admin : toutes les sessions
             return Session.objects.all()
@@ -191,8 +186,7 @@ class SessionAccessMixin:
     
     def check_session_access(self, user, session):
         """Vérifie si l'utilisateur peut accéder à cette session"""
-        accessible_sessions = self.get_accessible_sessions(user)
-        if session not in accessible_sessions:
+        if not self.get_accessible_sessions(user).filter(pk=session.pk).exists():
             raise PermissionDenied("Accès refusé à cette session")
         return True
 
@@ -204,25 +198,21 @@ class TimetableAccessMixin:
     def get_accessible_timetables(self, user):
         """Retourne les créneaux accessibles selon le rôle de l'utilisateur"""
         from academic.models import Timetable
+        from core.scopes import get_access_scope
         
-        if user.role == 'STUDENT':
-            # Étudiant : créneaux de sa classe
-            if hasattr(user, 'student_profile') and user.student_profile.current_class:
+        scope = get_access_scope(user)
+        if user.role in ['STUDENT', 'PARENT']:
+            # Étudiant : créneaux de sa classe ; parent : créneaux des classes de ses enfants
+            if scope.current_classroom_ids:
                 return Timetable.objects.filter(
-                    classroom=user.student_profile.current_class
+                    classroom_id__in=scope.current_classroom_ids
                 )
         elif user.role == 'TEACHER':
             # Enseignant : créneaux qu'il enseigne
-            if hasattr(user, 'teacher_profile'):
+            if scope.teacher_id:
                 return Timetable.objects.filter(
-                    teacher=user.teacher_profile
+                    teacher_id=scope.teacher_id
                 )
-        elif user.role == 'PARENT':
-            # Parent : créneaux des classes de ses enfants
-            if hasattr(user, 'parent_profile'):
-                return Timetable.objects.filter(
-                    classroom__students__parents=user.parent_profile
-                ).distinct()
         elif user.role in ['ADMIN', 'SUPER_ADMIN']:
             # Admin : tous les créneaux
             return Timetable.objects.all()
@@ -0,0 +1,151 @@
+"""
+Exports tabulaires en streaming (CSV et XLSX)
+
+Un export décrit ses colonnes (en-tête, chemin de champ, mise en forme) sur
+un queryset : les lignes sont lues avec values_list().iterator() par lots,
+sans instancier de modèles, et les libellés des choix viennent de tables
+précalculées (choice_labels) au lieu de get_FOO_display() par ligne.
+
+- CSV : envoyé au fil de l'eau (StreamingHttpResponse) ;
+- XLSX : classeur openpyxl en écriture seule, écrit dans un fichier
+  temporaire puis envoyé par morceaux (FileResponse).
+
+La mémoire utilisée ne dépend pas du nombre de lignes exportées.
+"""
+import csv
+import tempfile
+from typing import Callable, NamedTuple, Optional
+
+from django.http import FileResponse, StreamingHttpResponse
+
+# Lignes lues par aller-retour avec la base
+EXPORT_CHUNK_SIZE = 2000
+
+# Taille en mémoire d'un fichier XLSX avant bascule sur disque
+XLSX_SPOOL_SIZE = 5 * 1024 * 1024
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """Pseudo-buffer : `write` renvoie la valeur au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def chunks(iterable, size):
+    """Regroupe un itérable en listes de `size` éléments"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def choice_labels(model, field_name):
+    """Table valeur → libellé des choix d'un champ (remplace get_FOO_display)"""
+    return {value: str(label) for value, label in model._meta.get_field(field_name).flatchoices}
+
+
+# Mises en forme usuelles des cellules
+
+def date_format(pattern):
+    return lambda value: value.strftime(pattern) if value else ''
+
+
+def label_format(labels):
+    return lambda value: labels.get(value, value if value is not None else '')
+
+
+def yes_no(value):
+    return 'Oui' if value else 'Non'
+
+
+def blank_if_none(value):
+    return '' if value is None else value
+
+
+class Column(NamedTuple):
+    """Colonne d'un export : en-tête, chemin de champ (values_list), mise en forme"""
+    header: str
+    field: str
+    format: Optional[Callable] = None
+
+
+class TabularExport:
+    """Export d'un queryset selon une liste de colonnes"""
+
+    def __init__(self, queryset, columns, filename, sheet_title='Export', chunk_size=EXPORT_CHUNK_SIZE, bom=True):
+        self.queryset = queryset
+        self.columns = list(columns)
+        self.filename = filename
+        self.sheet_title = sheet_title
+        self.chunk_size = chunk_size
+        # BOM en tête du CSV (Excel)
+        self.bom = bom
+
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    def rows(self):
+        """En-têtes puis une ligne mise en forme par enregistrement"""
+        yield self.headers()
+        formats = [column.format for column in self.columns]
+        values = self.queryset.values_list(*(column.field for column in self.columns)).iterator(
+            chunk_size=self.chunk_size
+        )
+        for record in values:
+            yield [value if fmt is None else fmt(value) for fmt, value in zip(formats, record)]
+
+    def response(self, export_format='csv'):
+        """Réponse HTTP de l'export au format demandé (csv ou xlsx)"""
+        if export_format == 'xlsx':
+            return xlsx_response(self.rows(), f'{self.filename}.xlsx', self.sheet_title)
+        return csv_response(self.rows(), f'{self.filename}.csv', bom=self.bom)
+
+
+def stream_csv(rows, bom=True):
+    """Convertit un itérable de lignes en flux de chaînes CSV"""
+    writer = csv.writer(Echo())
+    if bom:
+        # BOM pour Excel UTF-8
+        yield '\ufeff'
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(rows, filename, bom=True):
+    response = StreamingHttpResponse(stream_csv(rows, bom=bom), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def write_xlsx(rows, title='Export'):
+    """
+    Écrit les lignes dans un classeur XLSX en écriture seule
+
+    Returns:
+        fichier temporaire positionné au début (fermé par l'appelant)
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for row in rows:
+        sheet.append(row)
+    output = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def xlsx_response(rows, filename, title='Export'):
+    return FileResponse(
+        write_xlsx(rows, title), as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE
+    )
@@ -0,0 +1,100 @@
+"""
+Benchmark des dashboards par rôle, avec budget de requêtes
+
+Crée une école synthétique (2 000 élèves, 100 enseignants et une année de
+séances par défaut, voir core.synthetic_school) dans une transaction annulée
+à la fin, affiche chaque dashboard avec l'utilisateur du rôle concerné et
+compare le nombre de requêtes au budget du fichier de référence
+(core/dashboard_baseline.json). La commande échoue si une vue dépasse son
+budget.
+
+Usage:
+    python manage.py benchmark_dashboards
+    python manage.py benchmark_dashboards --students 500 --teachers 25 --repeat 3
+    python manage.py benchmark_dashboards --write-baseline
+    python manage.py benchmark_dashboards --output resultats.json
+"""
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.dashboard_benchmark import (
+    BASELINE_PATH, budget_violations, load_baseline, run_dashboard_benchmark, write_baseline,
+)
+from core.synthetic_school import SchoolScale, seed_school
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Mesure requêtes, temps et mémoire des dashboards sur une école synthétique'
+
+    def add_arguments(self, parser):
+        defaults = SchoolScale()
+        parser.add_argument('--students', type=int, default=defaults.students)
+        parser.add_argument('--teachers', type=int, default=defaults.teachers)
+        parser.add_argument('--class-size', type=int, default=defaults.class_size)
+        parser.add_argument('--grades', type=int, default=defaults.grades_per_subject, help='Notes par élève et par matière')
+        parser.add_argument('--repeat', type=int, default=5, help='Mesures à chaud par vue (défaut: 5)')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Fichier JSON de référence')
+        parser.add_argument(
+            '--write-baseline',
+            action='store_true',
+            help='Enregistre les mesures comme référence (les budgets existants sont conservés)',
+        )
+        parser.add_argument('--output', help='Écrit aussi les mesures dans ce fichier JSON')
+
+    def handle(self, *args, **options):
+        scale = SchoolScale(
+            students=options['students'],
+            teachers=options['teachers'],
+            class_size=options['class_size'],
+            grades_per_subject=options['grades'],
+        )
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                school = seed_school(scale)
+                self.stdout.write(
+                    f'École synthétique créée en {time.perf_counter() - start:.1f} s : '
+                    + ', '.join(f'{value} {name}' for name, value in school.counts.items())
+                )
+                results = run_dashboard_benchmark(school, repeat=options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(
+            f"{'Vue':<38} {'Rôle':<8} {'HTTP':>4} {'Req.':>5} {'Chaud':>5} {'SQL ms':>8} {'Python ms':>10} "
+            f"{'Chaud ms':>9} {'Mémoire Ko':>11}"
+        )
+        for url_name, result in results.items():
+            self.stdout.write(
+                f"{url_name:<38} {result['role']:<8} {result['status']:>4} {result['queries']:>5} {result['warm_queries']:>5} "
+                f"{result['db_ms']:>8.1f} {result['python_ms']:>10.1f} {result['warm_total_ms']:>9.1f} "
+                f"{result['peak_memory_kb']:>11}"
+            )
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+
+        baseline = load_baseline(options['baseline'])
+        if options['write_baseline']:
+            budgets = {
+                url_name: view['budget'] for url_name, view in (baseline or {}).get('views', {}).items()
+            }
+            write_baseline(results, scale, options['baseline'], budgets)
+            self.stdout.write(self.style.SUCCESS(f"✓ Référence enregistrée dans {options['baseline']}"))
+            return
+        if baseline is None:
+            raise CommandError(f"Fichier de référence introuvable : {options['baseline']} (voir --write-baseline)")
+
+        violations = budget_violations(results, baseline)
+        if violations:
+            raise CommandError('Budget de requêtes dépassé :\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS('✓ Toutes les vues respectent leur budget de requêtes'))
@@ -0,0 +1,135 @@
+"""
+Micro-benchmark du contrôle d'accès RBAC par requête
+
+Compare l'ancien parcours linéaire des préfixes (startswith sur chaque
+règle, via MiddlewareMixin) à la table compilée de core.route_permissions :
+- décision seule (règles des rôles, hors chemins publics) ;
+- appel complet du middleware tel que configuré.
+
+Aucune requête SQL : les utilisateurs sont simulés.
+
+Usage:
+    python manage.py benchmark_rbac_middleware
+    python manage.py benchmark_rbac_middleware --iterations 100000
+"""
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils.deprecation import MiddlewareMixin
+
+from core.middleware.rbac_middleware import RBACMiddleware
+from core.route_permissions import PUBLIC_URLS, ROLE_URL_PERMISSIONS, RoutePermissionTable
+
+SAMPLE_PATHS = [
+    '/',
+    '/static/css/output.css',
+    '/accounts/login/',
+    '/accounts/student/dashboard/',
+    '/accounts/parent/children/12/',
+    '/academic/teacher/sessions/154/attendance/',
+    '/academic/classes/3/grades/',
+    '/finance/invoices/2048/',
+    '/finance/parent/payments/',
+    '/communication/messages/inbox/',
+    '/activity-logs/',
+    '/unknown/path/',
+]
+
+ROLES = ['STUDENT', 'TEACHER', 'PARENT', 'ADMIN', 'FINANCE']
+
+
+def legacy_role_allows(role, path):
+    """Ancienne vérification (référence) : parcours linéaire des préfixes du rôle"""
+    for allowed_pattern in ROLE_URL_PERMISSIONS.get(role, []):
+        if allowed_pattern == '*':
+            return True
+        elif path.startswith(allowed_pattern):
+            return True
+    return False
+
+
+class LegacyRBACMiddleware(MiddlewareMixin):
+    """Ancien middleware (référence), sans les messages ni les redirections"""
+
+    def process_request(self, request):
+        if any(request.path.startswith(url) for url in PUBLIC_URLS):
+            return None
+        if request.path.startswith('/static/') or request.path.startswith('/media/'):
+            return None
+        if not request.user.is_authenticated:
+            return HttpResponse(status=302)
+        if request.user.role == 'SUPER_ADMIN' or request.user.is_superuser:
+            return None
+        if not legacy_role_allows(request.user.role, request.path):
+            return HttpResponse(status=302)
+        return None
+
+
+def _per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût par requête du contrôle d'accès RBAC (ancien parcours vs table compilée)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000,
+                            help='Nombre de répétitions par mesure (défaut : 20000)')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        # Table sans '/' public, pour mesurer réellement les règles des rôles
+        public_urls = [url for url in PUBLIC_URLS if url != '/']
+        tables = (
+            ('trie sans mémorisation', RoutePermissionTable(public_urls, ROLE_URL_PERMISSIONS, cache_size=0)),
+            ('trie + LRU par chemin', RoutePermissionTable(public_urls, ROLE_URL_PERMISSIONS)),
+        )
+        pairs = [(role, path) for role in ROLES for path in SAMPLE_PATHS]
+
+        for _, table in tables:
+            for role, path in pairs:
+                assert table.role_allows(role, path) == legacy_role_allows(role, path), (role, path)
+
+        def legacy_decisions():
+            for role, path in pairs:
+                legacy_role_allows(role, path)
+
+        rounds = max(iterations // len(pairs), 1)
+        self.stdout.write(f"Décision par rôle ({len(pairs)} couples rôle/chemin)")
+        legacy = _per_call(legacy_decisions, rounds) / len(pairs)
+        self.stdout.write(f"  parcours linéaire      : {legacy:.3f} µs")
+        for label, table in tables:
+            def compiled_decisions():
+                for role, path in pairs:
+                    table.role_allows(role, path)
+            compiled = _per_call(compiled_decisions, rounds) / len(pairs)
+            self.stdout.write(f"  {label:<22} : {compiled:.3f} µs")
+
+        factory = RequestFactory()
+        user = SimpleNamespace(is_authenticated=True, is_superuser=False, role='PARENT')
+        requests = []
+        for path in SAMPLE_PATHS:
+            request = factory.get(path)
+            request.user = user
+            requests.append(request)
+
+        def get_response(request):
+            return None
+
+        for label, middleware in (
+            ('ancien middleware (MiddlewareMixin)', LegacyRBACMiddleware(get_response)),
+            ('middleware compilé', RBACMiddleware(get_response)),
+        ):
+            def run():
+                for request in requests:
+                    middleware(request)
+            cost = _per_call(run, rounds) / len(requests)
+            self.stdout.write(f"Appel complet, {label} : {cost:.3f} µs/requête")
+
+        self.stdout.write(self.style.SUCCESS('✓ Résultats identiques pour tous les couples rôle/chemin'))
@@ -1,106 +1,93 @@
 """
 Middleware pour le contrôle d'accès basé sur les rôles (RBAC)
+
+Les règles (core.route_permissions) sont compilées une seule fois au
+démarrage ; chaque requête ne fait qu'un parcours du trie des préfixes.
+Le middleware fonctionne en mode synchrone (WSGI) comme asynchrone (ASGI).
 """
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib import messages
 from django.shortcuts import redirect
 from django.urls import reverse
-from django.contrib import messages
-from django.utils.deprecation import MiddlewareMixin
 
+from core.route_permissions import (
+    PUBLIC_URLS, ROLE_URL_PERMISSIONS, RoutePermissionTable, get_route_permissions,
+)
 
-class RBACMiddleware(MiddlewareMixin):
+
+class RBACMiddleware:
     """
     Middleware pour contrôler l'accès aux vues selon le rôle de l'utilisateur
     """
-    
-    # URLs publiques accessibles sans authentification
-    PUBLIC_URLS = [
-        '/',
-        '/accounts/login/',
-        '/accounts/register/',
-        '/accounts/logout/',
-        '/admin/',
-    ]
-    
-    # Mappage des rôles vers les URL patterns autorisés
-    ROLE_URL_PERMISSIONS = {
-        'STUDENT': [
-            '/accounts/student/',
-            '/academic/student/',
-            '/communication/student/',
-        ],
-        'TEACHER': [
-            '/accounts/teacher/',
-            '/academic/teacher/',
-            '/communication/teacher/',
-        ],
-        'PARENT': [
-            '/accounts/parent/',
-            '/academic/parent/',
-            '/finance/parent/',
-            '/communication/parent/',
-        ],
-        'ADMIN': [
-            '/accounts/',
-            '/academic/',
-            '/finance/',
-            '/communication/',
-            '/activity-logs/',  # Système de logs d'activité
-        ],
-        'FINANCE': [
-            '/accounts/finance/',
-            '/finance/',
-        ],
-        'SUPER_ADMIN': [
-            '*',  # Accès total
-        ]
-    }
-    
-    def process_request(self, request):
+    sync_capable = True
+    async_capable = True
+
+    # Règles par défaut ; une sous-classe peut les redéfinir
+    PUBLIC_URLS = PUBLIC_URLS
+    ROLE_URL_PERMISSIONS = ROLE_URL_PERMISSIONS
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.permissions = self.compile_permissions()
+
+    @classmethod
+    def compile_permissions(cls):
+        """Table compilée des règles de la classe"""
+        if cls.PUBLIC_URLS is PUBLIC_URLS and cls.ROLE_URL_PERMISSIONS is ROLE_URL_PERMISSIONS:
+            return get_route_permissions()
+        return RoutePermissionTable(cls.PUBLIC_URLS + ['/static/', '/media/'], cls.ROLE_URL_PERMISSIONS)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.permissions.is_public(request.path):
+            response = self.check_access(request, request.user)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self.permissions.is_public(request.path):
+            user = await request.auser()
+            if not self.is_allowed(user, request.path):
+                # Messages et session : accès synchrones
+                return await sync_to_async(self.check_access)(request, user)
+        return await self.get_response(request)
+
+    def is_allowed(self, user, path):
+        """Un utilisateur connecté dont le rôle autorise ce chemin"""
+        if not user.is_authenticated:
+            return False
+        # Super admin a accès à tout
+        if user.role == 'SUPER_ADMIN' or user.is_superuser:
+            return True
+        return self.permissions.role_allows(user.role, path)
+
+    def check_access(self, request, user):
         """
         Vérifie les permissions avant le traitement de la requête
+
+        Retourne la redirection à renvoyer si l'accès est refusé, sinon None.
         """
-        # Ignorer les URLs publiques
-        if any(request.path.startswith(url) for url in self.PUBLIC_URLS):
+        if self.is_allowed(user, request.path):
             return None
-            
-        # Ignorer les URLs d'assets (CSS, JS, images)
-        if request.path.startswith('/static/') or request.path.startswith('/media/'):
-            return None
-            
+
         # Vérifier l'authentification
-        if not request.user.is_authenticated:
+        if not user.is_authenticated:
             messages.warning(request, "Vous devez être connecté pour accéder à cette page.")
             return redirect('accounts:login')
-        
-        # Super admin a accès à tout
-        if request.user.role == 'SUPER_ADMIN' or request.user.is_superuser:
-            return None
-            
-        # Vérifier les permissions selon le rôle
-        user_role = request.user.role
-        allowed_urls = self.ROLE_URL_PERMISSIONS.get(user_role, [])
-        
-        # Vérifier si l'URL actuelle est autorisée pour ce rôle
-        path_allowed = False
-        for allowed_pattern in allowed_urls:
-            if allowed_pattern == '*':  # Accès total
-                path_allowed = True
-                break
-            elif request.path.startswith(allowed_pattern):
-                path_allowed = True
-                break
-                
-        if not path_allowed:
-            messages.error(
-                request, 
-                f"Accès refusé. Votre rôle '{request.user.get_role_display()}' "
-                f"ne permet pas d'accéder à cette section."
-            )
-            # Rediriger vers le dashboard approprié
-            return redirect(self.get_role_dashboard(user_role))
-            
-        return None
-    
+
+        messages.error(
+            request,
+            f"Accès refusé. Votre rôle '{user.get_role_display()}' "
+            f"ne permet pas d'accéder à cette section."
+        )
+        # Rediriger vers le dashboard approprié
+        return redirect(self.get_role_dashboard(user.role))
+
     def get_role_dashboard(self, role):
         """
         Retourne l'URL du dashboard approprié selon le rôle
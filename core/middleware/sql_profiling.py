@@ -0,0 +1,78 @@
+"""
+Middleware de profilage SQL par requête (opt-in, voir core.profiling)
+
+Désactivé par défaut : sans SQL_PROFILING = True, Django retire le
+middleware de la chaîne (MiddlewareNotUsed) et il ne coûte rien.
+
+Pour chaque requête profilée :
+- en-tête Server-Timing (temps SQL, templates, Python et total), lisible
+  dans l'onglet réseau du navigateur ;
+- une ligne de journal structurée (JSON) sur le logger core.profiling,
+  au niveau WARNING en cas de requêtes en double (N+1) ou lentes ;
+- agrégation par vue dans ViewProfile (admin « Profils SQL des vues »).
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core.profiling import (
+    DEFAULT_DUPLICATE_THRESHOLD, DEFAULT_SLOW_QUERY_MS, RequestProfile, server_timing,
+    set_current_profile, view_stats,
+)
+
+logger = logging.getLogger('core.profiling')
+
+# Requêtes qui ne correspondent à aucune vue (404) : regroupées sous un seul nom
+UNRESOLVED_VIEW = '<non résolue>'
+
+
+class SQLProfilingMiddleware:
+    """Mesure requêtes SQL, requêtes en double et temps de rendu de chaque requête HTTP"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_PROFILING_SAMPLE_RATE', 1.0)
+        self.slow_query_ms = getattr(settings, 'SQL_PROFILING_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+        self.duplicate_threshold = getattr(
+            settings, 'SQL_PROFILING_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD
+        )
+        self.server_timing = getattr(settings, 'SQL_PROFILING_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile(self.slow_query_ms)
+        set_current_profile(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            set_current_profile(None)
+        summary = profile.summary(time.perf_counter() - start, self.duplicate_threshold)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else UNRESOLVED_VIEW
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(summary)
+
+        level = logging.WARNING if summary['duplicates'] or summary['slow_queries'] else logging.INFO
+        record = {
+            'view': view_name, 'method': request.method, 'path': request.path,
+            'status': response.status_code, **summary,
+        }
+        logger.log(level, 'sql_profile %s', json.dumps(record, ensure_ascii=False), extra={'sql_profile': record})
+
+        view_stats.add(view_name, request.method, summary)
+        return response
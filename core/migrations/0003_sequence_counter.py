@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_delete_activitylog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, verbose_name='Préfixe')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Année')),
+                ('month', models.PositiveSmallIntegerField(default=0, verbose_name='Mois')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Dernière valeur attribuée')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur de numérotation',
+                'verbose_name_plural': 'Compteurs de numérotation',
+                'constraints': [models.UniqueConstraint(fields=('prefix', 'year', 'month'), name='core_sequence_unique_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_sequence_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=200, verbose_name='Vue')),
+                ('method', models.CharField(max_length=10, verbose_name='Méthode HTTP')),
+                ('request_count', models.PositiveIntegerField(default=0, verbose_name='Requêtes HTTP')),
+                ('total_queries', models.PositiveBigIntegerField(default=0, verbose_name='Requêtes SQL (total)')),
+                ('max_queries', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL (max)')),
+                ('total_db_ms', models.FloatField(default=0, verbose_name='Temps SQL total (ms)')),
+                ('total_template_ms', models.FloatField(default=0, verbose_name='Temps de rendu total (ms)')),
+                ('total_duration_ms', models.FloatField(default=0, verbose_name='Durée totale (ms)')),
+                ('max_duration_ms', models.FloatField(default=0, verbose_name='Durée max (ms)')),
+                ('n_plus_one_requests', models.PositiveIntegerField(default=0, verbose_name='Requêtes HTTP avec N+1')),
+                ('slow_query_count', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL lentes')),
+                ('duration_histogram', models.JSONField(default=list, verbose_name='Histogramme des durées')),
+                ('query_histogram', models.JSONField(default=list, verbose_name='Histogramme des requêtes SQL')),
+                ('duplicate_queries', models.JSONField(default=dict, verbose_name='Requêtes en double')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Première mesure')),
+                ('last_seen', models.DateTimeField(blank=True, null=True, verbose_name='Dernière mesure')),
+            ],
+            options={
+                'verbose_name': 'Profil SQL de vue',
+                'verbose_name_plural': 'Profils SQL des vues',
+                'ordering': ['-total_db_ms'],
+                'constraints': [models.UniqueConstraint(fields=('view_name', 'method'), name='core_view_profile_unique_view')],
+            },
+        ),
+    ]
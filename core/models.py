@@ -2,6 +2,115 @@
 Core models - Models centraux du projet
 
 Le système de suivi d'activité a été déplacé vers l'application activity_log.
+Seuls les modèles techniques partagés entre applications restent ici.
 """
-# Aucun modèle dans cette application
-# Les modèles ont été déplacés dans leurs applications respectives
+from django.db import models
+
+from core.profiling import DURATION_BUCKETS_MS, merge_duplicates
+
+
+class SequenceCounter(models.Model):
+    """
+    Compteur de numérotation par (préfixe, année, mois)
+
+    Utilisé par core.sequences pour attribuer les numéros de facture, de
+    paiement, les matricules et les identifiants employés. `month` vaut 0
+    pour les séquences annuelles.
+    """
+    prefix = models.CharField(max_length=10, verbose_name='Préfixe')
+    year = models.PositiveSmallIntegerField(verbose_name='Année')
+    month = models.PositiveSmallIntegerField(default=0, verbose_name='Mois')
+    last_value = models.PositiveIntegerField(default=0, verbose_name='Dernière valeur attribuée')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Compteur de numérotation'
+        verbose_name_plural = 'Compteurs de numérotation'
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'year', 'month'], name='core_sequence_unique_key'),
+        ]
+
+    def __str__(self):
+        period = f"{self.year}{self.month:02d}" if self.month else f"{self.year}"
+        return f"{self.prefix}{period}: {self.last_value}"
+
+
+class ViewProfile(models.Model):
+    """
+    Mesures SQL agrégées par vue (profilage opt-in, voir core.profiling)
+
+    Totaux, maxima et histogrammes (durée, nombre de requêtes) ; les classes
+    des histogrammes sont core.profiling.DURATION_BUCKETS_MS et QUERY_BUCKETS.
+    `duplicate_queries` garde les empreintes SQL répétées dans une même
+    requête HTTP (N+1) : {clé: {'sql', 'requests', 'max_repeats'}}.
+    """
+    view_name = models.CharField(max_length=200, verbose_name='Vue')
+    method = models.CharField(max_length=10, verbose_name='Méthode HTTP')
+
+    request_count = models.PositiveIntegerField(default=0, verbose_name='Requêtes HTTP')
+    total_queries = models.PositiveBigIntegerField(default=0, verbose_name='Requêtes SQL (total)')
+    max_queries = models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL (max)')
+    total_db_ms = models.FloatField(default=0, verbose_name='Temps SQL total (ms)')
+    total_template_ms = models.FloatField(default=0, verbose_name='Temps de rendu total (ms)')
+    total_duration_ms = models.FloatField(default=0, verbose_name='Durée totale (ms)')
+    max_duration_ms = models.FloatField(default=0, verbose_name='Durée max (ms)')
+    n_plus_one_requests = models.PositiveIntegerField(default=0, verbose_name='Requêtes HTTP avec N+1')
+    slow_query_count = models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL lentes')
+
+    duration_histogram = models.JSONField(default=list, verbose_name='Histogramme des durées')
+    query_histogram = models.JSONField(default=list, verbose_name='Histogramme des requêtes SQL')
+    duplicate_queries = models.JSONField(default=dict, verbose_name='Requêtes en double')
+
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name='Première mesure')
+    last_seen = models.DateTimeField(null=True, blank=True, verbose_name='Dernière mesure')
+
+    class Meta:
+        verbose_name = 'Profil SQL de vue'
+        verbose_name_plural = 'Profils SQL des vues'
+        ordering = ['-total_db_ms']
+        constraints = [
+            models.UniqueConstraint(fields=['view_name', 'method'], name='core_view_profile_unique_view'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.view_name}"
+
+    def merge(self, stats):
+        """Ajoute des mesures agrégées (voir core.profiling.ViewStatsBuffer)"""
+        for field in ('request_count', 'total_queries', 'total_db_ms', 'total_template_ms',
+                      'total_duration_ms', 'n_plus_one_requests', 'slow_query_count'):
+            setattr(self, field, getattr(self, field) + stats[field])
+        self.max_queries = max(self.max_queries, stats['max_queries'])
+        self.max_duration_ms = max(self.max_duration_ms, stats['max_duration_ms'])
+        for field in ('duration_histogram', 'query_histogram'):
+            current = getattr(self, field) or [0] * len(stats[field])
+            setattr(self, field, [a + b for a, b in zip(current, stats[field])])
+        self.duplicate_queries = merge_duplicates(dict(self.duplicate_queries or {}), stats['duplicate_queries'])
+
+    def _average(self, total):
+        return round(total / self.request_count, 1) if self.request_count else None
+
+    @property
+    def average_queries(self):
+        return self._average(self.total_queries)
+
+    @property
+    def average_db_ms(self):
+        return self._average(self.total_db_ms)
+
+    @property
+    def average_duration_ms(self):
+        return self._average(self.total_duration_ms)
+
+    def duration_percentile(self, percentile):
+        """Borne supérieure de la classe contenant le centile (None au-delà de la dernière borne)"""
+        if not self.request_count:
+            return None
+        target = self.request_count * percentile / 100
+        seen = 0
+        for index, count in enumerate(self.duration_histogram):
+            seen += count
+            if seen >= target:
+                return DURATION_BUCKETS_MS[index] if index < len(DURATION_BUCKETS_MS) else None
+        return None
@@ -0,0 +1,270 @@
+"""
+Profilage SQL par requête (opt-in)
+
+Activé par SQL_PROFILING = True (voir core.middleware.sql_profiling) :
+- chaque requête SQL passe par un execute_wrapper qui mesure sa durée et
+  calcule son empreinte (SQL sans les valeurs, listes IN réduites) ;
+- une empreinte exécutée au moins SQL_PROFILING_DUPLICATE_THRESHOLD fois
+  dans la même requête HTTP signale un probable N+1 (propriété ou filtre de
+  template appelé dans une boucle) ;
+- le temps de rendu des templates est mesuré par le moteur
+  ProfilingDjangoTemplates ;
+- les mesures sont agrégées par vue en mémoire puis ajoutées toutes les
+  SQL_PROFILING_FLUSH_INTERVAL secondes au modèle ViewProfile (histogrammes
+  consultables dans l'admin).
+
+Aucune dépendance au mode DEBUG ni à la debug toolbar : utilisable en
+production, éventuellement sur un échantillon (SQL_PROFILING_SAMPLE_RATE).
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.template.backends.django import DjangoTemplates
+from django.utils import timezone
+
+# Bornes supérieures des classes des histogrammes (dernière classe : au-delà)
+DURATION_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (5, 10, 20, 50, 100, 200)
+
+# Requêtes en double conservées par vue (les plus répétées)
+MAX_DUPLICATES_PER_VIEW = 20
+
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_DUPLICATE_THRESHOLD = 3
+DEFAULT_FLUSH_INTERVAL = 30
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL normalisé : valeurs remplacées par ?, listes IN réduites, espaces compactés"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql.replace('%s', '?')).strip()
+
+
+def fingerprint_key(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()[:12]
+
+
+def _bucket(value, bounds):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+
+class RequestProfile:
+    """Mesures d'une requête HTTP ; sert aussi d'execute_wrapper"""
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = Counter()
+        self.samples = {}
+        self.slow_queries = []
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.db_time += elapsed
+            normalized = fingerprint(sql)
+            key = fingerprint_key(normalized)
+            self.fingerprints[key] += 1
+            self.samples.setdefault(key, normalized)
+            if elapsed * 1000 >= self.slow_query_ms:
+                self.slow_queries.append({'sql': normalized[:500], 'ms': round(elapsed * 1000, 1)})
+
+    def template_started(self):
+        self._template_depth += 1
+        return time.perf_counter()
+
+    def template_finished(self, start):
+        self._template_depth -= 1
+        # Un template rendu depuis un autre (render_to_string dans un tag) n'est compté qu'une fois
+        if self._template_depth == 0:
+            self.template_time += time.perf_counter() - start
+
+    def duplicates(self, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+        """Empreintes exécutées au moins `threshold` fois, les plus répétées d'abord"""
+        return [
+            {'key': key, 'count': count, 'sql': self.samples[key][:500]}
+            for key, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+    def summary(self, duration, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+        """Mesures de la requête (durées en millisecondes)"""
+        return {
+            'queries': self.query_count,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'duration_ms': round(duration * 1000, 1),
+            'duplicates': self.duplicates(threshold),
+            'slow_queries': self.slow_queries,
+        }
+
+
+def get_current_profile():
+    """Profil de la requête en cours dans ce thread (None hors profilage)"""
+    return getattr(_state, 'profile', None)
+
+
+def set_current_profile(profile):
+    _state.profile = profile
+
+
+def server_timing(summary):
+    """Valeur de l'en-tête Server-Timing (ASCII : les en-têtes sont encodés en latin-1)"""
+    app_ms = max(summary['duration_ms'] - summary['db_ms'] - summary['template_ms'], 0)
+    return ', '.join([
+        f'db;dur={summary["db_ms"]};desc="SQL ({summary["queries"]})"',
+        f'tpl;dur={summary["template_ms"]};desc="Templates"',
+        f'app;dur={round(app_ms, 1)};desc="Python"',
+        f'total;dur={summary["duration_ms"]}',
+    ])
+
+
+class _ProfiledTemplate:
+    """Template du moteur Django dont le rendu est chronométré"""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        profile = get_current_profile()
+        if profile is None:
+            return self._template.render(context, request)
+        start = profile.template_started()
+        try:
+            return self._template.render(context, request)
+        finally:
+            profile.template_finished(start)
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """Moteur de templates Django qui mesure le temps de rendu (SQL_PROFILING)"""
+
+    def from_string(self, template_code):
+        return _ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _ProfiledTemplate(super().get_template(template_name))
+
+
+def _empty_stats():
+    return {
+        'request_count': 0,
+        'total_queries': 0,
+        'max_queries': 0,
+        'total_db_ms': 0.0,
+        'total_template_ms': 0.0,
+        'total_duration_ms': 0.0,
+        'max_duration_ms': 0.0,
+        'n_plus_one_requests': 0,
+        'slow_query_count': 0,
+        'duration_histogram': [0] * (len(DURATION_BUCKETS_MS) + 1),
+        'query_histogram': [0] * (len(QUERY_BUCKETS) + 1),
+        'duplicate_queries': {},
+    }
+
+
+def merge_duplicates(target, duplicates, limit=MAX_DUPLICATES_PER_VIEW):
+    """
+    Ajoute des requêtes en double ({clé: {'sql', 'requests', 'max_repeats'}})
+
+    Seules les `limit` empreintes les plus fréquentes sont conservées.
+    """
+    for key, entry in duplicates.items():
+        current = target.setdefault(key, {'sql': entry['sql'], 'requests': 0, 'max_repeats': 0})
+        current['requests'] += entry['requests']
+        current['max_repeats'] = max(current['max_repeats'], entry['max_repeats'])
+    if len(target) > limit:
+        kept = sorted(target.items(), key=lambda item: (item[1]['requests'], item[1]['max_repeats']), reverse=True)
+        target.clear()
+        target.update(kept[:limit])
+    return target
+
+
+class ViewStatsBuffer:
+    """Mesures agrégées par (vue, méthode) en mémoire, écrites périodiquement dans ViewProfile"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'SQL_PROFILING_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    def add(self, view_name, method, summary):
+        """Ajoute les mesures d'une requête ; écrit le tampon si l'intervalle est écoulé"""
+        with self._lock:
+            stats = self._pending.setdefault((view_name, method), _empty_stats())
+            stats['request_count'] += 1
+            stats['total_queries'] += summary['queries']
+            stats['max_queries'] = max(stats['max_queries'], summary['queries'])
+            stats['total_db_ms'] += summary['db_ms']
+            stats['total_template_ms'] += summary['template_ms']
+            stats['total_duration_ms'] += summary['duration_ms']
+            stats['max_duration_ms'] = max(stats['max_duration_ms'], summary['duration_ms'])
+            stats['n_plus_one_requests'] += bool(summary['duplicates'])
+            stats['slow_query_count'] += len(summary['slow_queries'])
+            stats['duration_histogram'][_bucket(summary['duration_ms'], DURATION_BUCKETS_MS)] += 1
+            stats['query_histogram'][_bucket(summary['queries'], QUERY_BUCKETS)] += 1
+            merge_duplicates(stats['duplicate_queries'], {
+                duplicate['key']: {'sql': duplicate['sql'], 'requests': 1, 'max_repeats': duplicate['count']}
+                for duplicate in summary['duplicates']
+            })
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Ajoute les mesures en attente aux lignes ViewProfile"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        from core.models import ViewProfile
+
+        for (view_name, method), stats in pending.items():
+            try:
+                with transaction.atomic():
+                    profile, _ = ViewProfile.objects.select_for_update().get_or_create(
+                        view_name=view_name, method=method
+                    )
+                    profile.merge(stats)
+                    profile.last_seen = timezone.now()
+                    profile.save()
+            except DatabaseError:
+                # Le profilage ne doit jamais faire échouer la requête profilée
+                logger.exception("Écriture du profil SQL de %s %s impossible", method, view_name)
+        return len(pending)
+
+
+view_stats = ViewStatsBuffer()
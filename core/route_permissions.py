@@ -0,0 +1,200 @@
+"""
+Table des permissions d'accès aux URL par rôle (RBAC)
+
+Les préfixes autorisés sont compilés une seule fois en un arbre de préfixes
+(trie) par segment de chemin : une vérification parcourt au plus autant de
+nœuds que le chemin a de segments, quel que soit le nombre de règles.
+Un préfixe '/a/b/' correspond exactement à `path.startswith('/a/b/')`.
+
+La même table sert au middleware RBAC, aux vues (`can_role_reach`) et aux
+gabarits (filtre `can_reach`).
+
+Note : PUBLIC_URLS contient '/' ; comme `startswith` dans l'ancien
+middleware, ce préfixe rend publics tous les chemins pour `is_public`
+(middleware). `can_reach` (vues, gabarits) ne le compare qu'exactement :
+'/' n'y désigne que la page d'accueil, sinon tout chemin serait atteignable.
+"""
+from functools import lru_cache
+
+from django.urls import NoReverseMatch, reverse
+
+# URLs publiques accessibles sans authentification
+PUBLIC_URLS = [
+    '/',
+    '/accounts/login/',
+    '/accounts/register/',
+    '/accounts/logout/',
+    '/admin/',
+]
+
+# Assets (CSS, JS, images) jamais contrôlés
+ASSET_URLS = [
+    '/static/',
+    '/media/',
+]
+
+# Mappage des rôles vers les URL patterns autorisés
+ROLE_URL_PERMISSIONS = {
+    'STUDENT': [
+        '/accounts/student/',
+        '/academic/student/',
+        '/communication/student/',
+    ],
+    'TEACHER': [
+        '/accounts/teacher/',
+        '/academic/teacher/',
+        '/communication/teacher/',
+    ],
+    'PARENT': [
+        '/accounts/parent/',
+        '/academic/parent/',
+        '/finance/parent/',
+        '/communication/parent/',
+    ],
+    'ADMIN': [
+        '/accounts/',
+        '/academic/',
+        '/finance/',
+        '/communication/',
+        '/activity-logs/',  # Système de logs d'activité
+    ],
+    'FINANCE': [
+        '/accounts/finance/',
+        '/finance/',
+    ],
+    'SUPER_ADMIN': [
+        '*',  # Accès total
+    ]
+}
+
+# Marqueur des chemins publics dans le trie
+PUBLIC = '__public__'
+
+
+class _Node:
+    __slots__ = ('children', 'grants')
+
+    def __init__(self):
+        self.children = {}
+        self.grants = frozenset()
+
+
+class RoutePermissionTable:
+    """
+    Règles d'accès compilées : chemins publics et préfixes autorisés par rôle
+
+    Usage:
+        table = RoutePermissionTable(PUBLIC_URLS, ROLE_URL_PERMISSIONS)
+        table.is_public('/accounts/login/')
+        table.role_allows('PARENT', '/finance/parent/invoices/')
+    """
+
+    def __init__(self, public_urls, role_permissions, cache_size=4096):
+        self._root = _Node()
+        # Les mêmes chemins reviennent sans cesse : résultats mémorisés (LRU borné)
+        self._cached_grants = lru_cache(maxsize=cache_size)(self._grants) if cache_size else self._grants
+        self._wildcard_roles = frozenset(
+            role for role, prefixes in role_permissions.items() if '*' in prefixes
+        )
+        # Préfixes ne se terminant pas par '/' : comparés avec startswith
+        self._raw_prefixes = []
+        # '/' public : gardé hors du trie, il couvrirait tous les chemins
+        self._public_root = '/' in public_urls
+        for prefix in public_urls:
+            if prefix != '/':
+                self._add(prefix, PUBLIC)
+        for role, prefixes in role_permissions.items():
+            for prefix in prefixes:
+                if prefix != '*':
+                    self._add(prefix, role)
+
+    def _add(self, prefix, grant):
+        if not prefix.startswith('/') or not prefix.endswith('/'):
+            self._raw_prefixes.append((prefix, grant))
+            return
+        node = self._root
+        for segment in prefix.strip('/').split('/') if prefix != '/' else ():
+            node = node.children.setdefault(segment, _Node())
+        node.grants = node.grants | {grant}
+
+    def grants(self, path):
+        """Ensemble des autorisations (rôles, PUBLIC) qui couvrent ce chemin"""
+        return self._cached_grants(path)
+
+    def _grants(self, path):
+        if not path.startswith('/'):
+            return frozenset()
+        node = self._root
+        granted = set(node.grants)
+        # Seuls les segments suivis d'un '/' peuvent correspondre à un préfixe
+        start = 1
+        end = path.find('/', start)
+        while end >= 0:
+            node = node.children.get(path[start:end])
+            if node is None:
+                break
+            granted.update(node.grants)
+            start = end + 1
+            end = path.find('/', start)
+        for prefix, grant in self._raw_prefixes:
+            if path.startswith(prefix):
+                granted.add(grant)
+        return frozenset(granted)
+
+    def is_public(self, path):
+        """Le chemin est accessible sans authentification (préfixe '/' inclus)"""
+        if self._public_root and path.startswith('/'):
+            return True
+        return PUBLIC in self.grants(path)
+
+    def role_allows(self, role, path):
+        """Les règles du rôle autorisent ce chemin (hors chemins publics)"""
+        return role in self._wildcard_roles or role in self.grants(path)
+
+    def can_reach(self, role, path):
+        """
+        Un utilisateur connecté avec ce rôle peut atteindre ce chemin
+
+        Règles du rôle ou chemin public ; '/' ne couvre que la page d'accueil.
+        """
+        if role in self._wildcard_roles:
+            return True
+        if self._public_root and path == '/':
+            return True
+        granted = self.grants(path)
+        return PUBLIC in granted or role in granted
+
+
+@lru_cache(maxsize=None)
+def get_route_permissions():
+    """Table compilée à partir des règles du module (une seule fois par processus)"""
+    return RoutePermissionTable(PUBLIC_URLS + ASSET_URLS, ROLE_URL_PERMISSIONS)
+
+
+def resolve_target(target, *args, **kwargs):
+    """Chemin d'une cible donnée par URL ('/finance/') ou nom d'URL ('finance:invoice_list')"""
+    if target.startswith('/'):
+        return target
+    try:
+        return reverse(target, args=args or None, kwargs=kwargs or None)
+    except NoReverseMatch:
+        return None
+
+
+def can_role_reach(role_or_user, target, *args, **kwargs):
+    """
+    Indique si un rôle (ou un utilisateur) peut atteindre une URL
+
+    Usage:
+        can_role_reach('PARENT', 'finance:invoice_list')
+        can_role_reach(request.user, '/finance/payments/')
+    """
+    role = role_or_user
+    if not isinstance(role_or_user, str):
+        if getattr(role_or_user, 'is_superuser', False):
+            return True
+        role = getattr(role_or_user, 'role', None)
+    path = resolve_target(target, *args, **kwargs)
+    if path is None:
+        return False
+    return get_route_permissions().can_reach(role, path)
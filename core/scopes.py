@@ -0,0 +1,160 @@
+"""
+Périmètre d'accès (RBAC) d'un utilisateur
+
+Les managers `for_role` et les mixins d'accès ont besoin des mêmes
+informations : profils de l'utilisateur, élèves accessibles (ses enfants,
+les élèves de ses classes), classes et matières. Elles sont calculées une
+seule fois par objet utilisateur, donc une fois par requête.
+
+Le périmètre n'est pas conservé entre les requêtes : une autorisation
+retirée (lien parent/enfant, inscription, attribution) s'applique dès la
+requête suivante, dans tous les processus. Une modification faite pendant
+la requête (voir core.signals) fait recalculer les périmètres déjà
+mémorisés.
+"""
+from django.db.models import Q
+
+# Incrémenté à chaque invalidation dans ce processus : les périmètres déjà
+# mémorisés sur des objets utilisateur sont alors recalculés.
+_local_generation = 0
+
+
+class AccessScope:
+    """Identifiants accessibles à un utilisateur"""
+
+    def __init__(self, role=None, student_id=None, teacher_id=None, parent_id=None,
+                 student_ids=(), classroom_ids=(), current_classroom_ids=(), subject_ids=(),
+                 unwithdrawn_classroom_ids=()):
+        self.role = role
+        # Profil de l'utilisateur (None s'il n'en a pas)
+        self.student_id = student_id
+        self.teacher_id = teacher_id
+        self.parent_id = parent_id
+        # Élèves : lui-même, ses enfants ou les élèves inscrits dans ses classes
+        self.student_ids = frozenset(student_ids)
+        # Classes : inscriptions actives (élève, parent) ou attributions (enseignant)
+        self.classroom_ids = frozenset(classroom_ids)
+        # Classes des inscriptions sans date de retrait (élève, parent)
+        self.unwithdrawn_classroom_ids = frozenset(unwithdrawn_classroom_ids)
+        # Classes actuelles (Student.current_class) de l'élève ou des enfants
+        self.current_classroom_ids = frozenset(current_classroom_ids)
+        # Matières enseignées dans ces classes (ou par l'enseignant)
+        self.subject_ids = frozenset(subject_ids)
+
+    def __repr__(self):
+        return (
+            f'<AccessScope {self.role}: {len(self.student_ids)} élève(s), '
+            f'{len(self.classroom_ids)} classe(s), {len(self.subject_ids)} matière(s)>'
+        )
+
+
+def _enrolled_classrooms(student_ids):
+    """Classes des inscriptions actives, et des inscriptions sans date de retrait (une requête)"""
+    from academic.models import Enrollment
+
+    active, unwithdrawn = set(), set()
+    enrollments = Enrollment.objects.filter(
+        Q(is_active=True) | Q(withdrawal_date__isnull=True), student_id__in=student_ids
+    ).values_list('classroom_id', 'is_active', 'withdrawal_date')
+    for classroom_id, is_active, withdrawal_date in enrollments:
+        if is_active:
+            active.add(classroom_id)
+        if withdrawal_date is None:
+            unwithdrawn.add(classroom_id)
+    return active, unwithdrawn
+
+
+def _student_scope(role, student_id):
+    from academic.models import TeacherAssignment
+    from accounts.models import Student
+
+    student_ids = [student_id]
+    classroom_ids, unwithdrawn_classroom_ids = _enrolled_classrooms([student_id])
+    current = Student.objects.filter(pk=student_id, current_class__isnull=False).values_list('current_class_id', flat=True)
+    subject_ids = TeacherAssignment.objects.filter(
+        classroom_id__in=classroom_ids
+    ).values_list('subject_id', flat=True).distinct()
+    return AccessScope(
+        role, student_id=student_id, student_ids=student_ids, classroom_ids=classroom_ids,
+        current_classroom_ids=current, subject_ids=subject_ids,
+        unwithdrawn_classroom_ids=unwithdrawn_classroom_ids
+    )
+
+
+def _parent_scope(role, parent_id):
+    from academic.models import TeacherAssignment
+    from accounts.models import Student
+
+    children = list(
+        Student.objects.filter(parents__id=parent_id).values_list('id', 'current_class_id')
+    )
+    student_ids = [student_id for student_id, _ in children]
+    classroom_ids, unwithdrawn_classroom_ids = _enrolled_classrooms(student_ids) if student_ids else (set(), set())
+    subject_ids = TeacherAssignment.objects.filter(
+        classroom_id__in=classroom_ids
+    ).values_list('subject_id', flat=True).distinct() if classroom_ids else ()
+    return AccessScope(
+        role, parent_id=parent_id, student_ids=student_ids, classroom_ids=classroom_ids,
+        current_classroom_ids=[class_id for _, class_id in children if class_id],
+        subject_ids=subject_ids, unwithdrawn_classroom_ids=unwithdrawn_classroom_ids
+    )
+
+
+def _teacher_scope(role, teacher_id):
+    from academic.models import Enrollment, TeacherAssignment
+
+    assignments = list(
+        TeacherAssignment.objects.filter(teacher_id=teacher_id).values_list('classroom_id', 'subject_id')
+    )
+    classroom_ids = {classroom_id for classroom_id, _ in assignments}
+    student_ids = Enrollment.objects.filter(
+        classroom_id__in=classroom_ids, withdrawal_date__isnull=True
+    ).values_list('student_id', flat=True).distinct() if classroom_ids else ()
+    return AccessScope(
+        role, teacher_id=teacher_id, student_ids=student_ids, classroom_ids=classroom_ids,
+        subject_ids={subject_id for _, subject_id in assignments}
+    )
+
+
+def compute_access_scope(user):
+    """Calcule le périmètre d'un utilisateur (sans cache)"""
+    from accounts.models import Parent, Student, Teacher
+
+    role = getattr(user, 'role', None)
+    if role == 'STUDENT':
+        student_id = Student.objects.filter(user_id=user.pk).values_list('id', flat=True).first()
+        if student_id:
+            return _student_scope(role, student_id)
+    elif role == 'PARENT':
+        parent_id = Parent.objects.filter(user_id=user.pk).values_list('id', flat=True).first()
+        if parent_id:
+            return _parent_scope(role, parent_id)
+    elif role == 'TEACHER':
+        teacher_id = Teacher.objects.filter(user_id=user.pk).values_list('id', flat=True).first()
+        if teacher_id:
+            return _teacher_scope(role, teacher_id)
+    return AccessScope(role)
+
+
+def get_access_scope(user):
+    """
+    Périmètre d'accès de l'utilisateur
+
+    Mémorisé sur l'objet utilisateur : une seule résolution par requête.
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return AccessScope()
+
+    memo = getattr(user, '_access_scope', None)
+    if memo is not None and memo[0] == _local_generation and memo[1].role == user.role:
+        return memo[1]
+
+    scope = compute_access_scope(user)
+    user._access_scope = (_local_generation, scope)
+    return scope
+
+
+def invalidate_access_scopes():
+    """Fait recalculer les périmètres déjà mémorisés dans ce processus"""
+    global _local_generation
+    _local_generation += 1
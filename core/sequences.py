@@ -0,0 +1,100 @@
+"""
+Service de numérotation séquentielle
+
+Attribue les numéros lisibles (factures, paiements, matricules, identifiants
+employés) à partir d'un compteur par (préfixe, année, mois) stocké dans
+core.SequenceCounter :
+
+- l'incrément est un UPDATE ... SET last_value = last_value + n, qui
+  verrouille la ligne jusqu'à la fin de la transaction : deux processus ne
+  peuvent pas obtenir le même numéro ;
+- une seule requête par attribution, sans parcourir la table métier ;
+- `reserve()` attribue un bloc de numéros en une fois pour les opérations
+  en masse (génération de factures, imports).
+
+À la création d'un compteur, sa valeur initiale est reprise du plus grand
+numéro existant, pour rester compatible avec les données déjà numérotées.
+"""
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class NumberSequence:
+    """
+    Séquence de numéros de la forme <préfixe><année>[<mois>]<compteur>
+
+    Exemple: NumberSequence('INV', 'finance.Invoice', 'invoice_number')
+    produit INV2025100001, INV2025100002, ...
+    """
+
+    def __init__(self, prefix, model, field, monthly=True, width=4):
+        self.prefix = prefix
+        self.model_label = model
+        self.field = field
+        self.monthly = monthly
+        self.width = width
+
+    def period(self, when=None):
+        """Clé (année, mois) de la séquence ; mois = 0 pour une séquence annuelle"""
+        when = when or timezone.now()
+        return when.year, (when.month if self.monthly else 0)
+
+    def key_prefix(self, year, month):
+        return f"{self.prefix}{year}{month:02d}" if month else f"{self.prefix}{year}"
+
+    def format(self, year, month, value):
+        return f"{self.key_prefix(year, month)}{value:0{self.width}d}"
+
+    def next(self, when=None):
+        """Attribue le prochain numéro"""
+        return self.reserve(1, when)[0]
+
+    def reserve(self, count, when=None):
+        """Attribue un bloc de `count` numéros consécutifs"""
+        if count <= 0:
+            return []
+        year, month = self.period(when)
+        first = allocate(self.prefix, year, month, count, seed=lambda: self._existing_max(year, month))
+        return [self.format(year, month, value) for value in range(first, first + count)]
+
+    def _existing_max(self, year, month):
+        """Plus grand compteur déjà utilisé dans la table métier (une seule fois par période)"""
+        model = apps.get_model(self.model_label)
+        key_prefix = self.key_prefix(year, month)
+        last = model._default_manager.filter(
+            **{f'{self.field}__startswith': key_prefix}
+        ).order_by(f'-{self.field}').values_list(self.field, flat=True).first()
+        if not last:
+            return 0
+        try:
+            return int(last[len(key_prefix):])
+        except ValueError:
+            return 0
+
+
+def allocate(prefix, year, month=0, count=1, seed=None):
+    """
+    Incrémente le compteur (prefix, year, month) de `count`
+
+    Returns:
+        int: première valeur du bloc attribué
+    """
+    from core.models import SequenceCounter
+
+    counter = SequenceCounter.objects.filter(prefix=prefix, year=year, month=month)
+    with transaction.atomic():
+        if not counter.update(last_value=F('last_value') + count, updated_at=timezone.now()):
+            start = seed() if seed else 0
+            try:
+                with transaction.atomic():
+                    SequenceCounter.objects.create(
+                        prefix=prefix, year=year, month=month, last_value=start + count
+                    )
+                return start + 1
+            except IntegrityError:
+                # Compteur créé entre-temps par un autre processus
+                counter.update(last_value=F('last_value') + count, updated_at=timezone.now())
+        last_value = counter.values_list('last_value', flat=True).get()
+    return last_value - count + 1
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from decouple import config
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -88,6 +89,8 @@ MIDDLEWARE = [
     "allauth.account.middleware.AccountMiddleware",
     # Middleware pour le tracking d'activité
     "activity_log.middleware.ActivityTrackingMiddleware",
+    # Profilage SQL par requête - inactif sans SQL_PROFILING
+    "core.middleware.sql_profiling.SQLProfilingMiddleware",
     # RBAC Middleware - À activer après tests
     "core.middleware.rbac_middleware.RBACMiddleware",
 ]
@@ -268,6 +271,8 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 # Cache Configuration - utilisation du cache en mémoire pour le développement
+# LocMemCache est propre à chaque processus : en production (plusieurs workers),
+# un cache partagé est requis (voir core.caching, contrôle core.W001 de check --deploy)
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
@@ -291,6 +296,25 @@ CACHES = {
 # CELERY_RESULT_SERIALIZER = 'json'
 # CELERY_TIMEZONE = TIME_ZONE
 
+# Exécution des tests (manage.py test ou pytest / pytest-django)
+TESTING = 'test' in sys.argv[1:2] or 'pytest' in sys.modules
+
+# Journal d'activité - écriture groupée en arrière-plan, immédiate pendant les tests
+ACTIVITY_LOG_ASYNC = config('ACTIVITY_LOG_ASYNC', default=not TESTING, cast=bool)
+ACTIVITY_LOG_BATCH_SIZE = config('ACTIVITY_LOG_BATCH_SIZE', default=100, cast=int)
+ACTIVITY_LOG_FLUSH_INTERVAL = config('ACTIVITY_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+
+# Profilage SQL par requête (core.profiling) - opt-in, utilisable en production
+SQL_PROFILING = config('SQL_PROFILING', default=False, cast=bool)
+SQL_PROFILING_SAMPLE_RATE = config('SQL_PROFILING_SAMPLE_RATE', default=1.0, cast=float)
+SQL_PROFILING_SLOW_QUERY_MS = config('SQL_PROFILING_SLOW_QUERY_MS', default=100, cast=int)
+SQL_PROFILING_DUPLICATE_THRESHOLD = config('SQL_PROFILING_DUPLICATE_THRESHOLD', default=3, cast=int)
+SQL_PROFILING_FLUSH_INTERVAL = config('SQL_PROFILING_FLUSH_INTERVAL', default=30, cast=int)
+SQL_PROFILING_SERVER_TIMING = config('SQL_PROFILING_SERVER_TIMING', default=True, cast=bool)
+if SQL_PROFILING:
+    # Moteur de templates qui mesure le temps de rendu
+    TEMPLATES[0].update(BACKEND='core.profiling.ProfilingDjangoTemplates', NAME='django')
+
 # Email Configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='localhost')
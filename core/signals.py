@@ -0,0 +1,54 @@
+"""
+Signaux du module core
+
+Invalidation des périmètres d'accès (core.scopes) quand les liens qui les
+définissent changent : inscriptions, attributions d'enseignants, liens
+parent/enfant, profils et classe actuelle d'un élève.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from academic.models import Enrollment, TeacherAssignment
+from accounts.models import Parent, Student, Teacher
+from core.scopes import invalidate_access_scopes
+
+
+@receiver(post_save, sender=Enrollment, dispatch_uid='core_scope_enrollment_save')
+@receiver(post_delete, sender=Enrollment, dispatch_uid='core_scope_enrollment_delete')
+@receiver(post_save, sender=TeacherAssignment, dispatch_uid='core_scope_assignment_save')
+@receiver(post_delete, sender=TeacherAssignment, dispatch_uid='core_scope_assignment_delete')
+def invalidate_scopes_on_change(sender, raw=False, **kwargs):
+    """Une inscription ou une attribution change le périmètre de plusieurs utilisateurs"""
+    if not raw:
+        invalidate_access_scopes()
+
+
+@receiver(m2m_changed, sender=Student.parents.through, dispatch_uid='core_scope_parent_link')
+def invalidate_scopes_on_parent_link(sender, action, **kwargs):
+    """Ajout ou retrait d'un lien parent/enfant"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_access_scopes()
+
+
+@receiver(post_save, sender=Student, dispatch_uid='core_scope_student_save')
+def invalidate_scopes_on_student_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """La classe actuelle d'un élève détermine les séances et créneaux accessibles"""
+    if raw:
+        return
+    if created or update_fields is None or 'current_class' in update_fields:
+        invalidate_access_scopes()
+
+
+@receiver(post_save, sender=Parent, dispatch_uid='core_scope_parent_save')
+@receiver(post_save, sender=Teacher, dispatch_uid='core_scope_teacher_save')
+def invalidate_scopes_on_profile_created(sender, created, raw=False, **kwargs):
+    """Un nouveau profil donne un périmètre à son utilisateur"""
+    if created and not raw:
+        invalidate_access_scopes()
+
+
+@receiver(post_delete, sender=Student, dispatch_uid='core_scope_student_delete')
+@receiver(post_delete, sender=Parent, dispatch_uid='core_scope_parent_delete')
+@receiver(post_delete, sender=Teacher, dispatch_uid='core_scope_teacher_delete')
+def invalidate_scopes_on_profile_deleted(sender, **kwargs):
+    invalidate_access_scopes()
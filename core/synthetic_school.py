@@ -0,0 +1,360 @@
+"""
+École synthétique pour les benchmarks
+
+Crée une école complète (année scolaire en cours, classes, enseignants,
+élèves, parents, emploi du temps et une année de séances, présences, notes,
+factures, annonces et messages) avec des insertions en masse : quelques
+dizaines de secondes pour 2 000 élèves, contre plusieurs heures avec
+scripts/reset_and_populate.py qui crée les objets un par un.
+
+Les identifiants (e-mails, matricules, codes) sont préfixés pour ne pas
+entrer en conflit avec des données existantes ; les benchmarks créent
+l'école dans une transaction annulée à la fin.
+
+Les insertions en masse n'envoient pas de signaux : les cumuls de notes sont
+recalculés et les caches (instantané du dashboard, périmètres d'accès,
+statistiques de classe) invalidés à la fin.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from academic.class_statistics import invalidate_class_statistics
+from academic.models import (
+    AcademicYear, ClassRoom, DailyAttendanceSummary, Enrollment, Grade, Level, Period, Session,
+    SessionAttendance, Subject, TeacherAssignment, Timetable,
+)
+from academic.rollups import rebuild_all_rollups
+from accounts.dashboard_metrics import invalidate_admin_snapshot
+from accounts.models import Parent, Student, Teacher
+from communication.models import Announcement, Message
+from core.scopes import invalidate_access_scopes
+from finance.models import FeeType, Invoice, Payment, PaymentMethod
+
+User = get_user_model()
+
+# Préfixe des identifiants créés
+PREFIX = 'bench'
+
+PASSWORD = 'bench-password'
+
+SUBJECT_NAMES = [
+    'Mathématiques', 'Français', 'Anglais', 'Histoire-Géographie', 'Sciences physiques',
+    'SVT', 'Éducation physique', 'Philosophie', 'Informatique', 'Arts plastiques',
+    'Musique', 'Espagnol',
+]
+
+LEVEL_NAMES = ['6ème', '5ème', '4ème', '3ème', '2nde', '1ère', 'Terminale']
+
+# Créneaux quotidiens de l'emploi du temps
+SLOTS = [(time(8), time(9)), (time(9), time(10)), (time(10, 15), time(11, 15)),
+         (time(11, 15), time(12, 15)), (time(14), time(15)), (time(15), time(16))]
+
+BATCH_SIZE = 2000
+
+
+class SchoolScale(NamedTuple):
+    """Taille de l'école synthétique"""
+    students: int = 2000
+    teachers: int = 100
+    class_size: int = 30
+    subjects: int = 10
+    slots_per_day: int = 5
+    grades_per_subject: int = 6
+    # Jours (passés) avec l'appel détaillé par séance ; les autres jours n'ont que le résumé quotidien
+    attendance_days: int = 14
+
+
+class SyntheticSchool(NamedTuple):
+    """École créée : utilisateurs représentatifs de chaque rôle et volumes"""
+    academic_year: AcademicYear
+    admin: User
+    student: User
+    teacher: User
+    parent: User
+    counts: dict
+
+    def user_for_role(self, role):
+        return {
+            'ADMIN': self.admin, 'STUDENT': self.student, 'TEACHER': self.teacher, 'PARENT': self.parent,
+        }[role]
+
+
+def _school_days(start, end):
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def _bulk(model, objects):
+    # SQLite et PostgreSQL renvoient les clés primaires des objets insérés
+    return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def _users(role, count, password, first_name):
+    return _bulk(User, [
+        User(
+            email=f'{PREFIX}.{role.lower()}{index:05d}@example.com',
+            first_name=first_name, last_name=f'{index:05d}', role=role, password=password,
+        )
+        for index in range(count)
+    ])
+
+
+def seed_school(scale=SchoolScale(), today=None, seed=42):
+    """
+    Crée l'école synthétique (à appeler dans une transaction)
+
+    L'année scolaire couvre les 300 derniers jours et les deux prochains
+    mois ; les séances passées sont terminées et les deux prochaines
+    semaines planifiées.
+
+    Returns:
+        SyntheticSchool
+    """
+    rng = random.Random(seed)
+    today = today or timezone.localdate()
+    password = make_password(PASSWORD)
+
+    # Structure académique
+    year = AcademicYear.objects.create(
+        name=f'{PREFIX.upper()} {today.year - 1}-{today.year}',
+        start_date=today - timedelta(days=300), end_date=today + timedelta(days=60), is_current=True,
+    )
+    span = (year.end_date - year.start_date).days // 3
+    periods = []
+    for index in range(3):
+        start_date = year.start_date + timedelta(days=index * span)
+        end_date = year.end_date if index == 2 else start_date + timedelta(days=span - 1)
+        periods.append(Period.objects.create(
+            name=f'Trimestre {index + 1}', academic_year=year, start_date=start_date, end_date=end_date,
+            is_current=start_date <= today <= end_date,
+        ))
+    levels = _bulk(Level, [
+        Level(name=f'{PREFIX.upper()} {name}', order=index + 1) for index, name in enumerate(LEVEL_NAMES)
+    ])
+    subjects = _bulk(Subject, [
+        Subject(
+            name=SUBJECT_NAMES[index % len(SUBJECT_NAMES)], code=f'BX{index:03d}',
+            coefficient=Decimal(rng.choice(['1.0', '2.0', '3.0'])),
+        )
+        for index in range(scale.subjects)
+    ])
+    Subject.levels.through.objects.bulk_create([
+        Subject.levels.through(subject_id=subject.pk, level_id=level.pk) for subject in subjects for level in levels
+    ])
+    n_classes = max(1, -(-scale.students // scale.class_size))
+    classrooms = _bulk(ClassRoom, [
+        ClassRoom(
+            name=f'{LEVEL_NAMES[index % len(levels)]} {index // len(levels) + 1}',
+            level=levels[index % len(levels)], academic_year=year, capacity=scale.class_size,
+        )
+        for index in range(n_classes)
+    ])
+
+    # Personnes
+    admin = User.objects.create(
+        email=f'{PREFIX}.admin@example.com', first_name='Admin', last_name='Benchmark',
+        role='ADMIN', password=password, is_staff=True,
+    )
+    teacher_users = _users('TEACHER', scale.teachers, password, 'Enseignant')
+    teachers = _bulk(Teacher, [
+        Teacher(user=user, employee_id=f'BTEA{index:05d}') for index, user in enumerate(teacher_users)
+    ])
+    student_users = _users('STUDENT', scale.students, password, 'Élève')
+    students = _bulk(Student, [
+        Student(
+            user=user, matricule=f'BSTU{index:06d}', current_class=classrooms[index // scale.class_size],
+            enrollment_date=year.start_date,
+        )
+        for index, user in enumerate(student_users)
+    ])
+    # Deux enfants par parent, dans deux classes différentes
+    parent_users = _users('PARENT', -(-scale.students // 2), password, 'Parent')
+    parents = _bulk(Parent, [Parent(user=user) for user in parent_users])
+    half = -(-len(students) // 2)
+    Student.parents.through.objects.bulk_create([
+        Student.parents.through(student_id=student.pk, parent_id=parents[index % half].pk)
+        for index, student in enumerate(students)
+    ], batch_size=BATCH_SIZE)
+    _bulk(Enrollment, [
+        Enrollment(student=student, classroom_id=student.current_class_id, academic_year=year)
+        for student in students
+    ])
+
+    # Attributions et emploi du temps : un enseignant par (classe, matière)
+    teacher_for = {
+        (classroom.pk, subject.pk): teachers[(class_index * len(subjects) + subject_index) % len(teachers)]
+        for class_index, classroom in enumerate(classrooms)
+        for subject_index, subject in enumerate(subjects)
+    }
+    _bulk(TeacherAssignment, [
+        TeacherAssignment(teacher=teacher, classroom_id=classroom_id, subject_id=subject_id, academic_year=year)
+        for (classroom_id, subject_id), teacher in teacher_for.items()
+    ])
+    timetables = []
+    for class_index, classroom in enumerate(classrooms):
+        for weekday in range(1, 6):
+            for slot in range(scale.slots_per_day):
+                subject = subjects[(class_index + weekday * scale.slots_per_day + slot) % len(subjects)]
+                start_time, end_time = SLOTS[slot % len(SLOTS)]
+                timetables.append(Timetable(
+                    classroom=classroom, subject=subject, teacher=teacher_for[(classroom.pk, subject.pk)],
+                    weekday=weekday, start_time=start_time, end_time=end_time, room=f'Salle {class_index + 1}',
+                ))
+    timetables = _bulk(Timetable, timetables)
+
+    # Une année de séances : terminées jusqu'à hier, planifiées pour les deux prochaines semaines
+    by_weekday = {}
+    for timetable in timetables:
+        by_weekday.setdefault(timetable.weekday, []).append(timetable)
+    last_day = min(year.end_date, today + timedelta(days=14))
+    attendance_from = today - timedelta(days=scale.attendance_days)
+    sessions = []
+    for day in _school_days(year.start_date, last_day):
+        period = next((period for period in periods if period.start_date <= day <= period.end_date), periods[-1])
+        done = day < today
+        for timetable in by_weekday.get(day.isoweekday(), []):
+            sessions.append(Session(
+                timetable=timetable, period=period, date=day,
+                status='COMPLETED' if done else 'SCHEDULED',
+                lesson_title=f'Leçon du {day:%d/%m}' if done else '',
+                attendance_taken=done,
+                attendance_taken_at=(
+                    timezone.make_aware(datetime.combine(day, timetable.start_time)) if done else None
+                ),
+            ))
+    sessions = _bulk(Session, sessions)
+
+    # Appel détaillé des derniers jours
+    class_students = {}
+    for student in students:
+        class_students.setdefault(student.current_class_id, []).append(student)
+    teacher_user_ids = {teacher.pk: teacher.user_id for teacher in teachers}
+    timetable_by_id = {timetable.pk: timetable for timetable in timetables}
+    statuses = ['PRESENT'] * 17 + ['ABSENT', 'LATE', 'EXCUSED']
+    attendances = []
+    for session in sessions:
+        if not attendance_from <= session.date < today:
+            continue
+        timetable = timetable_by_id[session.timetable_id]
+        for student in class_students.get(timetable.classroom_id, []):
+            attendances.append(SessionAttendance(
+                session=session, student=student, status=rng.choice(statuses),
+                recorded_by_id=teacher_user_ids[timetable.teacher_id],
+            ))
+    _bulk(SessionAttendance, attendances)
+
+    # Résumés quotidiens de présence pour toute l'année écoulée
+    summaries = []
+    for day in _school_days(year.start_date, today - timedelta(days=1)):
+        for student in students:
+            absent = rng.choices([0, 1, scale.slots_per_day], weights=[90, 8, 2])[0]
+            present = scale.slots_per_day - absent
+            summaries.append(DailyAttendanceSummary(
+                student=student, date=day, total_sessions=scale.slots_per_day,
+                present_sessions=present, absent_sessions=absent,
+                daily_status=(
+                    'FULLY_PRESENT' if not absent else 'FULLY_ABSENT' if not present else 'PARTIALLY_PRESENT'
+                ),
+                attendance_rate=Decimal(present * 100) / scale.slots_per_day,
+            ))
+        if len(summaries) >= BATCH_SIZE * 10:
+            _bulk(DailyAttendanceSummary, summaries)
+            summaries = []
+    _bulk(DailyAttendanceSummary, summaries)
+
+    # Notes réparties sur l'année écoulée
+    days = list(_school_days(year.start_date, today - timedelta(days=1)))
+    grades = []
+    for student in students:
+        for subject in subjects:
+            for index in range(scale.grades_per_subject):
+                grades.append(Grade(
+                    student=student, subject=subject, teacher=teacher_for[(student.current_class_id, subject.pk)],
+                    classroom_id=student.current_class_id,
+                    evaluation_name=f'Évaluation {index + 1}', evaluation_type=rng.choice(['TEST', 'HOMEWORK', 'EXAM']),
+                    score=Decimal(rng.randint(0, 40)) / 2, coefficient=Decimal(rng.choice(['1.0', '2.0'])),
+                    date=rng.choice(days),
+                ))
+        if len(grades) >= BATCH_SIZE * 10:
+            _bulk(Grade, grades)
+            grades = []
+    _bulk(Grade, grades)
+    rebuild_all_rollups()
+
+    # Finances : une facture de scolarité par élève, payée en tout ou partie
+    fee_type = FeeType.objects.create(name=f'{PREFIX.upper()} Scolarité')
+    method = PaymentMethod.objects.create(name='Espèces (benchmark)', code=f'{PREFIX.upper()}_CASH')
+    invoices = []
+    paid = {}
+    for index, student in enumerate(students):
+        total = Decimal(rng.choice([150000, 180000, 210000]))
+        amount_paid = rng.choice([Decimal('0'), total / 2, total])
+        paid[index] = amount_paid
+        issue_date = year.start_date + timedelta(days=rng.randrange(30))
+        invoices.append(Invoice(
+            invoice_number=f'BINV{index:06d}', student=student, parent=parents[index % half],
+            issue_date=issue_date, due_date=issue_date + timedelta(days=60),
+            subtotal=total, total_amount=total, amount_paid=amount_paid, balance_due=total - amount_paid,
+            status='PAID' if amount_paid == total else 'SENT' if amount_paid else 'OVERDUE',
+        ))
+    invoices = _bulk(Invoice, invoices)
+    elapsed = (today - year.start_date).days
+    _bulk(Payment, [
+        Payment(
+            payment_reference=f'BPAY{index:06d}', invoice=invoice, payment_method=method,
+            amount=paid[index], status='COMPLETED',
+            payment_date=timezone.make_aware(datetime.combine(
+                year.start_date + timedelta(days=rng.randrange(elapsed)), time(10)
+            )),
+        )
+        for index, invoice in enumerate(invoices) if paid[index]
+    ])
+
+    # Communication
+    now = timezone.now()
+    _bulk(Announcement, [
+        Announcement(
+            title=f'Annonce {index + 1}', content='Contenu de l\'annonce.', author=admin, is_published=True,
+            audience=['ALL', 'STUDENTS', 'PARENTS', 'TEACHERS'][index % 4],
+            publish_date=now - timedelta(days=index),
+        )
+        for index in range(30)
+    ])
+    _bulk(Message, [
+        Message(
+            sender=teacher_users[index % len(teacher_users)], recipient=parent.user,
+            subject='Suivi de votre enfant', content='Bonjour, ...', is_read=index % 3 == 0,
+        )
+        for index, parent in enumerate(parents)
+    ])
+
+    invalidate_admin_snapshot()
+    invalidate_access_scopes()
+    invalidate_class_statistics()
+
+    counts = {
+        'classrooms': len(classrooms), 'teachers': len(teachers), 'students': len(students),
+        'parents': len(parents), 'sessions': len(sessions), 'session_attendances': len(attendances),
+        'daily_summaries': DailyAttendanceSummary.objects.filter(student__current_class__academic_year=year).count(),
+        'grades': Grade.objects.filter(classroom__academic_year=year).count(),
+        'invoices': len(invoices),
+    }
+    # Utilisateurs représentatifs : le plus chargé de chaque rôle
+    busiest_teacher = max(teachers, key=lambda teacher: sum(1 for t in teacher_for.values() if t is teacher))
+    return SyntheticSchool(
+        academic_year=year,
+        admin=admin,
+        student=student_users[0],
+        teacher=busiest_teacher.user,
+        parent=parent_users[0],
+        counts=counts,
+    )
@@ -0,0 +1,15 @@
+from django import template
+
+from core.route_permissions import can_role_reach
+
+register = template.Library()
+
+
+@register.filter
+def can_reach(user, target):
+    """
+    Indique si l'utilisateur peut atteindre une URL (chemin ou nom d'URL)
+
+    Usage: {% if request.user|can_reach:'finance:invoice_list' %}
+    """
+    return can_role_reach(user, target)
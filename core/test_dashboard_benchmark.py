@@ -0,0 +1,83 @@
+"""
+Tests pour le benchmark des dashboards (budgets de requêtes)
+"""
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from academic.models import Grade, StudentAcademicRollup
+from .dashboard_benchmark import SCENARIOS, budget_violations, load_baseline, run_dashboard_benchmark
+from .synthetic_school import SchoolScale, seed_school
+
+# Petite école : les requêtes ne croissent pas (ou peu) avec le volume, les budgets de la référence s'appliquent
+SMALL_SCHOOL = SchoolScale(students=40, teachers=6, class_size=20, grades_per_subject=2, attendance_days=3)
+
+
+class DashboardQueryBudgetTest(TestCase):
+    """Chaque dashboard reste dans le budget de requêtes de la référence"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = seed_school(SMALL_SCHOOL)
+
+    def test_seeded_school(self):
+        """École complète : élèves avec parents, notes et cumuls recalculés"""
+        self.assertEqual(self.school.counts['students'], 40)
+        self.assertEqual(self.school.counts['classrooms'], 2)
+        self.assertEqual(self.school.student.student_profile.parents.count(), 1)
+        self.assertEqual(self.school.parent.parent_profile.children.count(), 2)
+        self.assertEqual(
+            sum(StudentAcademicRollup.objects.values_list('grade_count', flat=True)),
+            Grade.objects.count()
+        )
+
+    def test_views_within_budget(self):
+        """Toutes les vues mesurées respectent la référence (budget et code HTTP)"""
+        results = run_dashboard_benchmark(self.school, repeat=1)
+        self.assertEqual(set(results), {scenario.url_name for scenario in SCENARIOS})
+        self.assertEqual(results['accounts:student_dashboard']['status'], 200)
+        self.assertEqual(budget_violations(results, load_baseline()), [])
+
+    def test_budget_violations(self):
+        """Dépassement du budget et changement de code HTTP signalés"""
+        baseline = {'views': {'accounts:admin_dashboard': {'status': 200, 'budget': 10}}}
+        self.assertEqual(
+            budget_violations({'accounts:admin_dashboard': {'status': 200, 'queries': 10}}, baseline), []
+        )
+        self.assertEqual(
+            budget_violations({'accounts:admin_dashboard': {'status': 500, 'queries': 12}}, baseline),
+            [
+                'accounts:admin_dashboard : code HTTP 500 (référence : 200)',
+                'accounts:admin_dashboard : 12 requêtes pour un budget de 10',
+            ]
+        )
+
+
+class BenchmarkDashboardsCommandTest(TestCase):
+    """Tests pour la commande benchmark_dashboards"""
+
+    def test_command_fails_over_budget(self):
+        """La commande échoue quand une vue dépasse son budget ; --write-baseline conserve les budgets"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'baseline.json'
+            options = ['--students', '20', '--teachers', '3', '--grades', '1', '--repeat', '1', '--baseline', str(path)]
+            call_command('benchmark_dashboards', *options, '--write-baseline', stdout=StringIO())
+            baseline = json.loads(path.read_text(encoding='utf-8'))
+            self.assertEqual(baseline['scale']['students'], 20)
+            self.assertEqual(
+                baseline['views']['accounts:admin_dashboard']['budget'],
+                baseline['views']['accounts:admin_dashboard']['queries']
+            )
+
+            baseline['views']['accounts:admin_dashboard']['budget'] = 1
+            path.write_text(json.dumps(baseline), encoding='utf-8')
+            with self.assertRaisesMessage(CommandError, 'accounts:admin_dashboard'):
+                call_command('benchmark_dashboards', *options, stdout=StringIO())
+
+            call_command('benchmark_dashboards', *options, '--write-baseline', stdout=StringIO())
+            baseline = json.loads(path.read_text(encoding='utf-8'))
+            self.assertEqual(baseline['views']['accounts:admin_dashboard']['budget'], 1)
@@ -0,0 +1,166 @@
+"""
+Tests pour les exports en streaming (core.exports)
+"""
+import csv
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import FileResponse, StreamingHttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from academic.models import AcademicYear, ClassRoom, DailyAttendanceSummary, Level
+from accounts.models import Parent, Student
+from .exports import Column, TabularExport, choice_labels, label_format, stream_csv
+
+User = get_user_model()
+
+
+def read_csv(response):
+    content = b''.join(response.streaming_content).decode('utf-8-sig')
+    return list(csv.reader(io.StringIO(content)))
+
+
+def read_xlsx(response):
+    sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+class TabularExportTest(TestCase):
+    """Tests pour la lecture par lots et la mise en forme des lignes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            User.objects.create_user(
+                email=f'user{index}@example.com', password='x', last_name=f'Nom{index}',
+                role='PARENT' if index % 2 else 'STUDENT'
+            )
+
+    def _export(self, chunk_size=2):
+        return TabularExport(
+            User.objects.order_by('email'),
+            [
+                Column('Email', 'email'),
+                Column('Rôle', 'role', label_format(choice_labels(User, 'role'))),
+            ],
+            filename='users',
+            chunk_size=chunk_size,
+        )
+
+    def test_rows(self):
+        rows = list(self._export().rows())
+        self.assertEqual(rows[0], ['Email', 'Rôle'])
+        self.assertEqual(rows[1], ['user0@example.com', 'Élève'])
+        self.assertEqual(rows[2], ['user1@example.com', 'Parent'])
+        self.assertEqual(len(rows), 6)
+
+    def test_csv_and_xlsx_responses(self):
+        response = self._export().response('csv')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="users.csv"')
+        self.assertEqual(read_csv(response), list(self._export().rows()))
+
+        response = self._export().response('xlsx')
+        self.assertIsInstance(response, FileResponse)
+        self.assertIn('users.xlsx', response['Content-Disposition'])
+        self.assertEqual(read_xlsx(response), list(self._export().rows()))
+
+    def test_stream_csv_is_lazy(self):
+        def rows():
+            yield ['a']
+            raise AssertionError('ligne lue trop tôt')
+
+        stream = stream_csv(rows())
+        self.assertEqual(next(stream), '\ufeff')
+        self.assertEqual(next(stream), 'a\r\n')
+
+
+class ExportViewsTest(TestCase):
+    """Tests pour les exports des présences et des parents"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(email='admin@example.com', password='testpass123', role='ADMIN')
+        academic_year = AcademicYear.objects.create(
+            name='2024-2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        level = Level.objects.create(name='6ème', order=6)
+        cls.classroom = ClassRoom.objects.create(name='6ème A', level=level, academic_year=academic_year)
+        cls.students = [
+            Student.objects.create(
+                user=User.objects.create_user(
+                    email=f'student{index}@example.com', password='x', first_name='Eleve',
+                    last_name=f'Nom{index}', role='STUDENT'
+                ),
+                matricule=f'STU2024{index:04d}',
+                current_class=cls.classroom if index else None,
+            )
+            for index in range(3)
+        ]
+        cls.parent = Parent.objects.create(
+            user=User.objects.create_user(
+                email='parent@example.com', password='x', first_name='Paul', last_name='Parent', role='PARENT'
+            ),
+            relationship='FATHER',
+        )
+        cls.parent.children.add(*cls.students[:2])
+
+    def setUp(self):
+        self.client.login(email='admin@example.com', password='testpass123')
+
+    def _create_summaries(self, days):
+        # Même jour que la vue (date UTC)
+        today = timezone.now().date()
+        DailyAttendanceSummary.objects.bulk_create([
+            DailyAttendanceSummary(
+                student=student, date=today - timedelta(days=offset), total_sessions=4, present_sessions=3,
+                daily_status='PARTIALLY_PRESENT', attendance_rate=Decimal('75.00')
+            )
+            for offset in range(days)
+            for student in self.students
+        ])
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+            content = read_xlsx(response) if params.get('format') == 'xlsx' else read_csv(response)
+        return content, len(ctx.captured_queries)
+
+    def test_attendance_export(self):
+        url = reverse('academic:admin_export_attendance_csv')
+        self._create_summaries(2)
+        rows, few = self._get(url, period='last_30_days')
+        self.assertEqual(rows[0][:2], ['Date', 'Nom'])
+        self.assertEqual(len(rows), 7)
+        self.assertIn(['Nom0', 'Eleve', 'STU20240000', '', 'Partiellement présent', '75.0%', '4', '3'],
+                      [row[1:] for row in rows])
+
+        DailyAttendanceSummary.objects.all().delete()
+        self._create_summaries(25)
+        rows, many = self._get(url, period='last_30_days')
+        self.assertEqual(len(rows), 76)
+        self.assertEqual(few, many)
+
+        rows, _ = self._get(url, period='last_30_days', format='xlsx')
+        self.assertEqual(len(rows), 76)
+        self.assertEqual(rows[1][6], '75.0%')
+
+    def test_parent_export(self):
+        rows, queries = self._get(reverse('accounts:parent_export_csv'))
+        self.assertEqual(rows[0][0], 'ID')
+        self.assertEqual(rows[1][1:10], [
+            'Paul', 'Parent', 'parent@example.com', '', 'Père', '', '', '2', 'Oui'
+        ])
+        self.assertLessEqual(queries, 4)
+
+    def test_view_exports_without_bom(self):
+        for url in (reverse('accounts:parent_export_csv'), reverse('academic:admin_export_attendance_csv')):
+            content = b''.join(self.client.get(url).streaming_content)
+            self.assertTrue(content.startswith(b'ID,') or content.startswith(b'Date,'), url)
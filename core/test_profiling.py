@@ -0,0 +1,116 @@
+"""
+Tests pour le profilage SQL par requête (core.profiling)
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from accounts.models import Student
+from .models import ViewProfile
+from .profiling import fingerprint
+
+User = get_user_model()
+
+PROFILING_TEMPLATES = [{
+    'BACKEND': 'core.profiling.ProfilingDjangoTemplates',
+    'NAME': 'django',
+    'DIRS': [],
+    'APP_DIRS': True,
+    'OPTIONS': {'context_processors': ['django.contrib.auth.context_processors.auth']},
+}]
+
+
+def students_view(request):
+    """Vue de test avec un N+1 : l'utilisateur de chaque élève est chargé dans la boucle"""
+    names = [student.user.email for student in Student.objects.order_by('pk')]
+    template = engines['django'].from_string('{% for name in names %}{{ name }} {% endfor %}')
+    return HttpResponse(template.render({'names': names}, request))
+
+
+urlpatterns = [
+    path('students/', students_view, name='profiled_students'),
+]
+
+
+class FingerprintTest(TestCase):
+    """Tests pour la normalisation des requêtes SQL"""
+
+    def test_values_and_in_lists(self):
+        """Valeurs remplacées et listes IN réduites : une empreinte par forme de requête"""
+        self.assertEqual(
+            fingerprint('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s) AND "a"."x" = %s  LIMIT 21'),
+            'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "a"."x" = ? LIMIT ?'
+        )
+        self.assertEqual(
+            fingerprint("SELECT 1 FROM t WHERE name = 'O''Neil' AND id IN (%s)"),
+            fingerprint("SELECT 2 FROM t WHERE name = 'x' AND id IN (%s, %s)")
+        )
+
+
+@override_settings(
+    ROOT_URLCONF='core.test_profiling',
+    SQL_PROFILING=True,
+    SQL_PROFILING_FLUSH_INTERVAL=0,
+    SQL_PROFILING_DUPLICATE_THRESHOLD=3,
+    TEMPLATES=PROFILING_TEMPLATES,
+)
+class SQLProfilingMiddlewareTest(TestCase):
+    """Tests pour le middleware de profilage"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(4):
+            Student.objects.create(
+                user=User.objects.create_user(email=f'student{index}@example.com', password='x', role='STUDENT'),
+                matricule=f'STU2024{index:04d}'
+            )
+
+    def test_profiled_request(self):
+        """En-tête Server-Timing, journal structuré et agrégation par vue"""
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            response = self.client.get(reverse('profiled_students'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="SQL \(5\)", tpl;dur=')
+
+        record = json.loads(logs.records[0].getMessage().split(' ', 1)[1])
+        self.assertEqual(record['view'], 'profiled_students')
+        self.assertEqual(record['queries'], 5)
+        self.assertEqual(len(record['duplicates']), 1)
+        self.assertEqual(record['duplicates'][0]['count'], 4)
+        self.assertIn('"accounts_user"', record['duplicates'][0]['sql'])
+
+        self.client.get(reverse('profiled_students'))
+        profile = ViewProfile.objects.get(view_name='profiled_students', method='GET')
+        self.assertEqual(profile.request_count, 2)
+        self.assertEqual(profile.total_queries, 10)
+        self.assertEqual(profile.max_queries, 5)
+        self.assertEqual(profile.n_plus_one_requests, 2)
+        self.assertEqual(sum(profile.duration_histogram), 2)
+        self.assertEqual(profile.query_histogram[0], 2)
+        (duplicate,) = profile.duplicate_queries.values()
+        self.assertEqual((duplicate['requests'], duplicate['max_repeats']), (2, 4))
+
+    def test_admin_pages(self):
+        """Liste et détail des profils dans l'admin"""
+        self.client.get(reverse('profiled_students'))
+        with override_settings(ROOT_URLCONF='core.urls'), self.assertLogs('core.profiling', 'INFO'):
+            User.objects.create_superuser(email='admin@example.com', password='testpass123')
+            self.client.login(email='admin@example.com', password='testpass123')
+            response = self.client.get(reverse('admin:core_viewprofile_changelist'))
+            self.assertContains(response, 'profiled_students')
+            profile = ViewProfile.objects.get(view_name='profiled_students')
+            response = self.client.get(reverse('admin:core_viewprofile_change', args=[profile.pk]))
+            self.assertContains(response, 'accounts_user')
+
+
+class SQLProfilingDisabledTest(TestCase):
+    """Sans SQL_PROFILING, le middleware est retiré de la chaîne"""
+
+    def test_no_header(self):
+        response = self.client.get(reverse('accounts:login'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(ViewProfile.objects.exists())
@@ -0,0 +1,287 @@
+"""
+Tests du module core
+"""
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from academic.models import AcademicYear, ClassRoom, Enrollment, Level, Subject, TeacherAssignment
+from accounts.models import Parent, Student, Teacher
+from core.caching import LOCAL_CACHE_TTL, cache_is_shared, cache_timeout, check_shared_cache
+from core.middleware.rbac_middleware import RBACMiddleware
+from core.models import SequenceCounter
+from core.route_permissions import ROLE_URL_PERMISSIONS, RoutePermissionTable, can_role_reach
+from core.scopes import get_access_scope
+from core.sequences import NumberSequence
+from finance.models import Invoice, Payment, PaymentMethod
+
+User = get_user_model()
+
+
+class NumberSequenceTest(TestCase):
+    """Tests du service de numérotation séquentielle"""
+
+    def setUp(self):
+        self.sequence = NumberSequence('INV', 'finance.Invoice', 'invoice_number')
+        self.october = timezone.make_aware(datetime(2025, 10, 15))
+
+    def test_consecutive_numbers(self):
+        self.assertEqual(self.sequence.next(self.october), 'INV2025100001')
+        self.assertEqual(self.sequence.next(self.october), 'INV2025100002')
+
+        counter = SequenceCounter.objects.get(prefix='INV', year=2025, month=10)
+        self.assertEqual(counter.last_value, 2)
+
+    def test_block_reservation(self):
+        self.sequence.next(self.october)
+
+        block = self.sequence.reserve(3, self.october)
+
+        self.assertEqual(block, ['INV2025100002', 'INV2025100003', 'INV2025100004'])
+        self.assertEqual(self.sequence.next(self.october), 'INV2025100005')
+        self.assertEqual(self.sequence.reserve(0, self.october), [])
+
+    def test_periods_are_independent(self):
+        november = timezone.make_aware(datetime(2025, 11, 2))
+        yearly = NumberSequence('STU', 'accounts.Student', 'matricule', monthly=False)
+
+        self.assertEqual(self.sequence.next(self.october), 'INV2025100001')
+        self.assertEqual(self.sequence.next(november), 'INV2025110001')
+        self.assertEqual(yearly.next(self.october), 'STU20250001')
+        self.assertEqual(yearly.next(november), 'STU20250002')
+
+    def test_counter_seeded_from_existing_numbers(self):
+        """Un nouveau compteur reprend après le plus grand numéro existant"""
+        user = User.objects.create_user(email='eleve@test.com', password='x', role='STUDENT')
+        student = Student.objects.create(user=user, matricule='STU0001')
+        Invoice.objects.create(
+            student=student, invoice_number='INV2025100041', due_date=self.october.date()
+        )
+
+        self.assertEqual(self.sequence.next(self.october), 'INV2025100042')
+
+    def test_allocation_does_not_scan_table(self):
+        self.sequence.next(self.october)
+        # SAVEPOINT, UPDATE du compteur, lecture de la valeur, RELEASE
+        with self.assertNumQueries(4):
+            self.sequence.reserve(100, self.october)
+
+
+class ModelNumberingTest(TestCase):
+    """Les modèles utilisent le service de numérotation"""
+
+    def test_generated_identifiers(self):
+        year = timezone.now().year
+        month = timezone.now().month
+
+        teacher_user = User.objects.create_user(email='prof@test.com', password='x', role='TEACHER')
+        teacher = Teacher.objects.create(user=teacher_user)
+        students = [
+            Student.objects.create(
+                user=User.objects.create_user(email=f'eleve{i}@test.com', password='x', role='STUDENT')
+            )
+            for i in range(2)
+        ]
+        invoice = Invoice.objects.create(student=students[0], due_date=timezone.now().date())
+        payment = Payment.objects.create(
+            invoice=invoice,
+            payment_method=PaymentMethod.objects.create(name='Espèces', code='CASH'),
+            amount=Decimal('10.00')
+        )
+
+        self.assertEqual(teacher.employee_id, f'TEA{year}0001')
+        self.assertEqual([s.matricule for s in students], [f'STU{year}0001', f'STU{year}0002'])
+        self.assertEqual(invoice.invoice_number, f'INV{year}{month:02d}0001')
+        self.assertEqual(payment.payment_reference, f'PAY{year}{month:02d}0001')
+
+
+class AccessScopeTest(TestCase):
+    """Périmètre d'accès RBAC mémorisé pour la requête"""
+
+    def setUp(self):
+        self.year = AcademicYear.objects.create(
+            name='2025-2026', start_date=date(2025, 9, 1), end_date=date(2026, 7, 31), is_current=True
+        )
+        level = Level.objects.create(name='6ème', order=6)
+        self.classroom = ClassRoom.objects.create(name='6ème A', level=level, academic_year=self.year)
+        self.other_classroom = ClassRoom.objects.create(name='6ème B', level=level, academic_year=self.year)
+        self.subject = Subject.objects.create(name='Mathématiques', code='MATH')
+
+        self.teacher_user = User.objects.create_user(email='prof@test.com', password='x', role='TEACHER')
+        self.teacher = Teacher.objects.create(user=self.teacher_user)
+        TeacherAssignment.objects.create(
+            teacher=self.teacher, classroom=self.classroom, subject=self.subject, academic_year=self.year
+        )
+        self.parent_user = User.objects.create_user(email='parent@test.com', password='x', role='PARENT')
+        self.parent = Parent.objects.create(user=self.parent_user)
+        self.student = self._create_student(1, self.classroom)
+        self.student.parents.add(self.parent)
+
+    def _create_student(self, index, classroom):
+        user = User.objects.create_user(email=f'eleve{index}@test.com', password='x', role='STUDENT')
+        student = Student.objects.create(user=user, matricule=f'STU{index:04d}', current_class=classroom)
+        Enrollment.objects.create(student=student, classroom=classroom, academic_year=self.year)
+        return student
+
+    def test_scope_contents(self):
+        teacher_scope = get_access_scope(self.teacher_user)
+        self.assertEqual(teacher_scope.teacher_id, self.teacher.id)
+        self.assertEqual(teacher_scope.classroom_ids, {self.classroom.id})
+        self.assertEqual(teacher_scope.subject_ids, {self.subject.id})
+        self.assertEqual(teacher_scope.student_ids, {self.student.id})
+
+        parent_scope = get_access_scope(self.parent_user)
+        self.assertEqual(parent_scope.parent_id, self.parent.id)
+        self.assertEqual(parent_scope.student_ids, {self.student.id})
+        self.assertEqual(parent_scope.current_classroom_ids, {self.classroom.id})
+
+    def test_scope_resolved_once_per_request(self):
+        get_access_scope(self.teacher_user)
+
+        # Même objet utilisateur (même requête)
+        with self.assertNumQueries(0):
+            get_access_scope(self.teacher_user)
+
+    def test_scope_not_kept_between_requests(self):
+        self.assertEqual(get_access_scope(self.parent_user).student_ids, {self.student.id})
+
+        # Lien retiré hors de ce processus (sans signal) : la requête suivante
+        # (nouvel objet utilisateur) ne voit plus l'enfant
+        Student.parents.through.objects.filter(parent=self.parent).delete()
+        fresh_user = User.objects.get(pk=self.parent_user.pk)
+        self.assertEqual(get_access_scope(fresh_user).student_ids, set())
+        self.assertFalse(Invoice.objects.for_role(fresh_user).exists())
+
+    def test_teachers_of_withdrawn_enrollment_hidden(self):
+        self.assertEqual(list(Teacher.objects.for_role(self.parent_user)), [self.teacher])
+
+        Enrollment.objects.filter(student=self.student).update(withdrawal_date=date(2025, 10, 1))
+        fresh_user = User.objects.get(pk=self.parent_user.pk)
+        self.assertEqual(list(Teacher.objects.for_role(fresh_user)), [])
+
+    def test_invalidated_on_enrollment_and_parent_link(self):
+        self.assertEqual(set(Student.objects.for_role(self.teacher_user)), {self.student})
+
+        newcomer = self._create_student(2, self.classroom)
+        self._create_student(3, self.other_classroom)
+        self.assertEqual(set(Student.objects.for_role(self.teacher_user)), {self.student, newcomer})
+
+        newcomer.parents.add(self.parent)
+        self.assertEqual(set(Student.objects.for_role(self.parent_user)), {self.student, newcomer})
+
+    def test_invalidated_on_assignment(self):
+        other = self._create_student(2, self.other_classroom)
+        self.assertEqual(list(ClassRoom.objects.for_role(self.teacher_user)), [self.classroom])
+
+        TeacherAssignment.objects.create(
+            teacher=self.teacher, classroom=self.other_classroom, subject=self.subject, academic_year=self.year
+        )
+
+        self.assertEqual(set(ClassRoom.objects.for_role(self.teacher_user)), {self.classroom, self.other_classroom})
+        self.assertIn(other, Student.objects.for_role(self.teacher_user))
+
+    def test_managers_filter_without_joins(self):
+        invoice = Invoice.objects.create(student=self.student, due_date=date(2025, 10, 31))
+        get_access_scope(self.parent_user)
+        get_access_scope(self.teacher_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(list(Invoice.objects.for_role(self.parent_user)), [invoice])
+            list(ClassRoom.objects.for_role(self.teacher_user))
+
+        for query in queries.captured_queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+        self.assertNotIn('accounts_student_parents', queries.captured_queries[0]['sql'])
+
+
+class RoutePermissionTableTest(SimpleTestCase):
+    """Table compilée des permissions d'URL"""
+
+    PATHS = [
+        '/', '/accounts', '/accounts/', '/accounts/login/', '/accounts/login',
+        '/accounts/student/dashboard/', '/finance/parent/', '/finance/parent',
+        '/finance/invoices/12/', '/academic/teacher/sessions/3/', '/activity-logs/',
+        '/static/css/output.css', '/unknown/', 'relative/',
+    ]
+
+    def test_matches_startswith_semantics(self):
+        public_urls = ['/accounts/login/', '/static/']
+        table = RoutePermissionTable(public_urls, ROLE_URL_PERMISSIONS)
+
+        for path in self.PATHS:
+            self.assertEqual(table.is_public(path), any(path.startswith(url) for url in public_urls), path)
+            for role, prefixes in ROLE_URL_PERMISSIONS.items():
+                expected = '*' in prefixes or any(path.startswith(prefix) for prefix in prefixes)
+                self.assertEqual(table.role_allows(role, path), expected, (role, path))
+
+    def test_root_prefix_makes_every_path_public(self):
+        """Comportement historique : '/' dans PUBLIC_URLS couvre tous les chemins"""
+        table = RoutePermissionTable(['/', '/accounts/login/'], ROLE_URL_PERMISSIONS)
+
+        self.assertTrue(table.is_public('/finance/invoices/12/'))
+        self.assertFalse(table.role_allows('STUDENT', '/finance/invoices/12/'))
+
+    def test_can_reach_matches_root_exactly(self):
+        table = RoutePermissionTable(['/', '/accounts/login/'], ROLE_URL_PERMISSIONS)
+
+        self.assertTrue(table.can_reach('STUDENT', '/'))
+        self.assertTrue(table.can_reach('STUDENT', '/accounts/login/'))
+        self.assertTrue(table.can_reach('STUDENT', '/academic/student/grades/'))
+        self.assertFalse(table.can_reach('STUDENT', '/finance/invoices/12/'))
+        self.assertTrue(table.can_reach('SUPER_ADMIN', '/finance/invoices/12/'))
+
+    def test_can_role_reach_url_name(self):
+        self.assertTrue(can_role_reach('PARENT', 'accounts:login'))
+        self.assertFalse(can_role_reach('PARENT', 'finance:unknown_view'))
+        self.assertFalse(can_role_reach('STUDENT', '/finance/invoices/'))
+        self.assertTrue(can_role_reach('PARENT', '/finance/parent/'))
+        self.assertTrue(can_role_reach(SimpleNamespace(is_superuser=True, role='STUDENT'), '/finance/'))
+
+    def test_async_middleware(self):
+        class RestrictedMiddleware(RBACMiddleware):
+            PUBLIC_URLS = ['/accounts/login/']
+
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        middleware = RestrictedMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        request = RequestFactory().get('/finance/parent/payments/')
+        parent = SimpleNamespace(is_authenticated=True, is_superuser=False, role='PARENT')
+
+        async def auser():
+            return parent
+        request.auser = auser
+
+        response = asyncio.run(middleware(request))
+        self.assertEqual(response.content, b'ok')
+
+
+REDIS_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+
+
+class CacheScopeTest(SimpleTestCase):
+    """Durées de vie selon la portée du cache (core.caching)"""
+
+    def test_process_local_cache_bounds_timeouts(self):
+        self.assertFalse(cache_is_shared())
+        self.assertEqual(cache_timeout(3600), LOCAL_CACHE_TTL)
+        self.assertEqual(cache_timeout(None), LOCAL_CACHE_TTL)
+        self.assertEqual(cache_timeout(5), 5)
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['core.W001'])
+
+    @override_settings(CACHES=REDIS_CACHES)
+    def test_shared_cache_keeps_timeouts(self):
+        self.assertTrue(cache_is_shared())
+        self.assertEqual(cache_timeout(3600), 3600)
+        self.assertIsNone(cache_timeout(None))
+        self.assertEqual(check_shared_cache(None), [])
@@ -29,10 +29,10 @@ class InvoiceItemInline(admin.TabularInline):
 
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
-    list_display = ('invoice_number', 'student', 'issue_date', 'due_date', 'total_amount', 'status', 'balance')
+    list_display = ('invoice_number', 'student', 'issue_date', 'due_date', 'total_amount', 'status', 'balance_due')
     list_filter = ('status', 'issue_date', 'due_date')
     search_fields = ('invoice_number', 'student__user__first_name', 'student__user__last_name')
-    readonly_fields = ('invoice_number', 'subtotal', 'total_amount', 'paid_amount', 'balance')
+    readonly_fields = ('invoice_number', 'subtotal', 'total_amount', 'amount_paid', 'balance_due')
     inlines = [InvoiceItemInline]
     date_hierarchy = 'issue_date'
     
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FinanceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "finance"
+
+    def ready(self):
+        """Importer les signaux au démarrage de l'application"""
+        import finance.signals
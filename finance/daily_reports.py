@@ -0,0 +1,377 @@
+"""
+Calcul des rapports financiers journaliers (DailyFinancialReport)
+
+Les indicateurs d'une plage de dates sont calculés en une passe, avec un
+nombre fixe de requêtes d'agrégation groupées (par jour, par méthode de
+paiement, par dates d'émission/échéance des factures) quelle que soit la
+longueur de la plage :
+- les indicateurs du jour (paiements, factures créées ou payées) viennent
+  d'agrégats groupés par jour ;
+- les indicateurs « à cette date » (factures en attente, en retard,
+  créances, ancienneté) sont obtenus en balayant les jours avec des
+  intervalles de validité, à partir des factures ouvertes groupées par
+  (émission, échéance).
+
+Les rapports sont écrits en une requête par lot (upsert sur report_date) :
+notes et suivi d'envoi des rapports existants sont conservés.
+
+Une facture ouverte est une facture émise (ni brouillon ni annulée) dont le
+solde restant (balance_due) est positif (Invoice.objects.unpaid()) ; elle
+est partielle si elle a déjà reçu un paiement.
+
+Les paiements modifiés ou supprimés, et les factures créées, modifiées
+(émission, échéance, montant, statut) ou supprimées, marquent à recalculer
+(is_stale, voir finance.signals) les rapports de leur jour et de tous les
+jours suivants : comparaisons, moyenne du mois et taux de recouvrement sont
+cumulés. generate_incremental ne recalcule que ces jours et les jours sans
+rapport depuis le dernier.
+
+Limite : les indicateurs « à cette date » partent des factures ouvertes
+aujourd'hui et de leur solde actuel. Pour un jour passé (rattrapage,
+--from/--to), une facture soldée depuis n'y figure plus et le solde des
+factures partielles est celui d'aujourd'hui ; seuls les indicateurs du
+jour (paiements, factures créées ou payées) sont exacts rétroactivement.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyFinancialReport, Invoice, Payment
+
+ZERO = Decimal('0.00')
+
+# Champ du rapport alimenté par chaque code de méthode de paiement
+PAYMENT_METHOD_FIELDS = {
+    'CASH': 'payments_cash',
+    'CHECK': 'payments_check',
+    'TRANSFER': 'payments_transfer',
+    'CARD': 'payments_card',
+    'MOBILE': 'payments_mobile',
+}
+
+# Tranches d'ancienneté des factures en retard : (libellé, premier jour de retard)
+AGING_BUCKETS = (('0-30', 1), ('31-60', 31), ('61-90', 61), ('90+', 91))
+
+TOP_PAYERS_LIMIT = 10
+TIMELINE_LIMIT = 50
+
+# Pourcentages stockés sur 5 chiffres dont 2 décimales
+MAX_PERCENT = Decimal('999.99')
+
+# Champs réécrits lors d'une regénération (notes et suivi d'envoi conservés)
+REPORT_FIELDS = [
+    'payments_count', 'payments_total', *PAYMENT_METHOD_FIELDS.values(),
+    'invoices_created_count', 'invoices_created_total',
+    'invoices_pending_count', 'invoices_pending_total',
+    'invoices_paid_count', 'invoices_paid_total',
+    'invoices_overdue_count', 'invoices_overdue_total',
+    'invoices_partial_count', 'invoices_partial_total',
+    'payments_diff_previous_day', 'payments_diff_previous_day_percent',
+    'payments_diff_previous_week', 'payments_diff_previous_week_percent',
+    'monthly_average_payments', 'total_receivables', 'collection_rate',
+    'net_balance', 'additional_data', 'is_stale', 'generated_at', 'updated_at',
+]
+
+UPSERT_BATCH_SIZE = 500
+
+# Champs d'une facture dont la modification change les rapports
+INVOICE_REPORT_FIELDS = frozenset({'issue_date', 'due_date', 'total_amount', 'status'})
+
+
+def date_range(start, end):
+    """Jours de start à end inclus"""
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def contiguous_ranges(dates):
+    """Regroupe des dates en plages de jours consécutifs [(début, fin), ...]"""
+    ranges = []
+    for day in sorted(set(dates)):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(bounds) for bounds in ranges]
+
+
+def _percent(part, whole):
+    if not whole:
+        return ZERO
+    value = (part / whole * 100).quantize(Decimal('0.01'))
+    return max(min(value, MAX_PERCENT), -MAX_PERCENT)
+
+
+class _IntervalSums:
+    """
+    Sommes par jour de valeurs valables sur des intervalles de jours
+
+    add(first, last, ...) ajoute les valeurs à chaque jour de [first, last]
+    (last=None : sans fin) ; totals() rend les sommes de chaque jour de la
+    plage, en O(jours + intervalles) (tableau de différences).
+    """
+
+    def __init__(self, start, end, width):
+        self.start = start
+        self.size = (end - start).days + 1
+        self._deltas = [[0] * width for _ in range(self.size + 1)]
+
+    def add(self, first, last, *values):
+        lo = max((first - self.start).days, 0)
+        hi = self.size - 1 if last is None else min((last - self.start).days, self.size - 1)
+        if lo > hi:
+            return
+        for index, value in enumerate(values):
+            self._deltas[lo][index] += value
+            self._deltas[hi + 1][index] -= value
+
+    def totals(self):
+        running = [0] * len(self._deltas[0])
+        for deltas in self._deltas[:-1]:
+            running = [total + delta for total, delta in zip(running, deltas)]
+            yield running
+
+
+def _completed_payments(start, end):
+    return Payment.objects.filter(status='COMPLETED', payment_date__date__range=(start, end)).annotate(
+        day=TruncDate('payment_date')
+    )
+
+
+def _local_time(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime('%H:%M')
+
+
+def compute_daily_reports(start, end):
+    """
+    Calcule les rapports des jours de start à end (instances non enregistrées)
+
+    Le nombre de requêtes ne dépend pas de la longueur de la plage. Les
+    comparaisons (jour et semaine précédents, moyenne du mois) utilisent les
+    rapports déjà enregistrés et ceux de la plage.
+
+    Les indicateurs « à cette date » (en attente, en retard, partielles,
+    créances, ancienneté) sont calculés depuis l'état actuel des factures :
+    exacts pour aujourd'hui, approchés pour un jour passé (voir le module).
+
+    Returns:
+        list[DailyFinancialReport] dans l'ordre des dates
+    """
+    days = date_range(start, end)
+    reports = {day: DailyFinancialReport(report_date=day, additional_data={}) for day in days}
+
+    # === PAIEMENTS DU JOUR, PAR MÉTHODE ===
+    paid_by_day = defaultdict(lambda: ZERO)
+    for row in _completed_payments(start, end).values('day', 'payment_method__code').annotate(
+        count=Count('id'), total=Sum('amount')
+    ).order_by():
+        report = reports[row['day']]
+        report.payments_count += row['count']
+        report.payments_total += row['total']
+        paid_by_day[row['day']] += row['total']
+        field = PAYMENT_METHOD_FIELDS.get(row['payment_method__code'])
+        if field:
+            setattr(report, field, getattr(report, field) + row['total'])
+
+    # === FACTURES CRÉÉES (et montant facturé cumulé pour le taux de recouvrement) ===
+    invoiced_before = ZERO
+    invoiced_by_day = {}
+    for row in Invoice.objects.filter(issue_date__lte=end).values('issue_date').annotate(
+        count=Count('id'), total=Sum('total_amount')
+    ).order_by():
+        if row['issue_date'] < start:
+            invoiced_before += row['total']
+        else:
+            invoiced_by_day[row['issue_date']] = row['total']
+            reports[row['issue_date']].invoices_created_count = row['count']
+            reports[row['issue_date']].invoices_created_total = row['total']
+
+    # === FACTURES PAYÉES (ayant reçu un paiement ce jour-là) ===
+    for day, _, total in _completed_payments(start, end).filter(invoice__status='PAID').values_list(
+        'day', 'invoice_id', 'invoice__total_amount'
+    ).distinct().order_by():
+        reports[day].invoices_paid_count += 1
+        reports[day].invoices_paid_total += total
+
+    # === FACTURES OUVERTES À CETTE DATE ===
+    # Valeurs : en attente (nombre, montant), en retard (nombre, solde), partielles (nombre, solde),
+    # créances (solde), puis (nombre, solde) de chaque tranche d'ancienneté
+    states = _IntervalSums(start, end, 7 + 2 * len(AGING_BUCKETS))
+    for row in Invoice.objects.unpaid().values('issue_date', 'due_date').annotate(
+        count=Count('id'),
+        total=Sum('total_amount'),
+        balance=Sum('balance_due'),
+        partial_count=Count('id', filter=Q(amount_paid__gt=0)),
+        partial_balance=Sum('balance_due', filter=Q(amount_paid__gt=0), default=ZERO),
+    ).order_by():
+        issue_date, due_date = row['issue_date'], row['due_date']
+        states.add(issue_date, due_date, row['count'], row['total'])
+        states.add(due_date + timedelta(days=1), None, 0, 0, row['count'], row['balance'])
+        states.add(issue_date, None, 0, 0, 0, 0, row['partial_count'], row['partial_balance'], row['balance'])
+        for index, (_, first_day) in enumerate(AGING_BUCKETS):
+            last_day = AGING_BUCKETS[index + 1][1] - 1 if index + 1 < len(AGING_BUCKETS) else None
+            values = [0] * (7 + 2 * index) + [row['count'], row['balance']]
+            states.add(
+                due_date + timedelta(days=first_day),
+                None if last_day is None else due_date + timedelta(days=last_day),
+                *values
+            )
+
+    # Paiements cumulés avant la plage
+    paid_before = Payment.objects.filter(status='COMPLETED', payment_date__date__lt=start).aggregate(
+        total=Sum('amount', default=ZERO)
+    )['total']
+
+    # === ADDITIONAL DATA : plus gros payeurs et chronologie ===
+    payers = defaultdict(list)
+    for row in _completed_payments(start, end).values(
+        'day', 'invoice__student_id', 'invoice__student__user__first_name', 'invoice__student__user__last_name'
+    ).annotate(total=Sum('amount')).order_by('day', '-total'):
+        if len(payers[row['day']]) < TOP_PAYERS_LIMIT:
+            payers[row['day']].append({
+                'student': f"{row['invoice__student__user__first_name']} {row['invoice__student__user__last_name']}",
+                'amount': float(row['total']),
+            })
+
+    timelines = defaultdict(list)
+    for row in _completed_payments(start, end).values(
+        'day', 'created_at', 'amount', 'payment_method__name'
+    ).order_by('created_at'):
+        if len(timelines[row['day']]) < TIMELINE_LIMIT:
+            timelines[row['day']].append({
+                'time': _local_time(row['created_at']),
+                'amount': float(row['amount']),
+                'method': row['payment_method__name'],
+            })
+
+    # === COMPARAISONS (rapports enregistrés, remplacés par ceux de la plage) ===
+    history_start = min(start - timedelta(days=7), start.replace(day=1))
+    known_totals = dict(
+        DailyFinancialReport.objects.filter(report_date__range=(history_start, end)).exclude(
+            report_date__range=(start, end)
+        ).values_list('report_date', 'payments_total')
+    )
+
+    cumulative_paid = paid_before
+    cumulative_invoiced = invoiced_before
+    for day, values in zip(days, states.totals()):
+        report = reports[day]
+        (report.invoices_pending_count, report.invoices_pending_total,
+         report.invoices_overdue_count, report.invoices_overdue_total,
+         report.invoices_partial_count, report.invoices_partial_total,
+         report.total_receivables) = values[:7]
+        aging = values[7:]
+
+        for offset, diff_field in ((1, 'payments_diff_previous_day'), (7, 'payments_diff_previous_week')):
+            previous = known_totals.get(day - timedelta(days=offset))
+            if previous is not None:
+                setattr(report, diff_field, report.payments_total - previous)
+                setattr(report, f'{diff_field}_percent', _percent(report.payments_total - previous, previous))
+
+        month_totals = [
+            total for known_day, total in known_totals.items() if day.replace(day=1) <= known_day < day
+        ]
+        if month_totals:
+            report.monthly_average_payments = (sum(month_totals) / len(month_totals)).quantize(Decimal('0.01'))
+        known_totals[day] = report.payments_total
+
+        cumulative_paid += paid_by_day[day]
+        cumulative_invoiced += invoiced_by_day.get(day, ZERO)
+        if cumulative_invoiced > 0:
+            report.collection_rate = _percent(cumulative_paid, cumulative_invoiced)
+
+        report.net_balance = report.payments_total - report.expenses_total
+        report.additional_data = {
+            'top_payers': payers.get(day, []),
+            'payment_timeline': timelines.get(day, []),
+            'invoice_aging': {
+                label: {'count': aging[2 * index], 'amount': float(aging[2 * index + 1])}
+                for index, (label, _) in enumerate(AGING_BUCKETS)
+            },
+        }
+    return [reports[day] for day in days]
+
+
+def save_daily_reports(reports, force=False):
+    """
+    Enregistre les rapports par lots (upsert sur report_date)
+
+    Sans `force`, les jours qui ont déjà un rapport non marqué à recalculer
+    sont laissés intacts.
+
+    Returns:
+        list[DailyFinancialReport] enregistrés
+    """
+    if not reports:
+        return []
+    if not force:
+        kept = set(DailyFinancialReport.objects.filter(
+            report_date__in=[report.report_date for report in reports], is_stale=False
+        ).values_list('report_date', flat=True))
+        reports = [report for report in reports if report.report_date not in kept]
+    for report in reports:
+        report.is_stale = False
+    DailyFinancialReport.objects.bulk_create(
+        reports,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['report_date'],
+        update_fields=REPORT_FIELDS,
+    )
+    return reports
+
+
+def generate_daily_reports(start, end, force=False):
+    """Calcule et enregistre les rapports de start à end"""
+    return save_daily_reports(compute_daily_reports(start, end), force=force)
+
+
+def pending_report_dates(today=None):
+    """
+    Jours à (re)calculer en mode incrémental : rapports marqués à recalculer
+    et jours sans rapport depuis le dernier rapport jusqu'à aujourd'hui
+    """
+    today = today or timezone.localdate()
+    dates = set(DailyFinancialReport.objects.filter(is_stale=True, report_date__lte=today).values_list(
+        'report_date', flat=True
+    ))
+    latest = DailyFinancialReport.objects.order_by('-report_date').values_list('report_date', flat=True).first()
+    if latest is None:
+        dates.add(today)
+    elif latest < today:
+        dates.update(date_range(latest + timedelta(days=1), today))
+    return sorted(dates)
+
+
+def generate_incremental(today=None):
+    """Recalcule les jours de pending_report_dates, plage contiguë par plage"""
+    saved = []
+    for start, end in contiguous_ranges(pending_report_dates(today)):
+        saved.extend(generate_daily_reports(start, end, force=True))
+    return saved
+
+
+def payment_day(value):
+    """Jour (heure locale) d'une date de paiement"""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def mark_reports_stale(days):
+    """
+    Marque à recalculer les rapports à partir du plus ancien des jours indiqués
+
+    Les jours suivants dépendent de ce jour (comparaisons, moyenne du mois,
+    taux de recouvrement cumulé) : ils sont marqués aussi.
+    """
+    days = [day for day in days if day is not None]
+    if days:
+        DailyFinancialReport.objects.filter(report_date__gte=min(days), is_stale=False).update(is_stale=True)
@@ -0,0 +1,124 @@
+"""
+Exports financiers en streaming
+
+Les lignes sont produites au fil de l'eau à partir de quelques agrégats
+groupés par lot d'élèves : la mémoire utilisée et le nombre de requêtes ne
+dépendent plus du nombre de factures. Conversion CSV : voir core.exports.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from accounts.models import Student
+from core.exports import chunks
+from .models import Invoice, InvoiceItem
+
+# Nombre d'élèves traités par lot (une série d'agrégats par lot)
+EXPORT_CHUNK_SIZE = 500
+
+
+def _fmt(amount):
+    return f"{amount or Decimal('0.00'):.2f}"
+
+
+def iter_student_fee_rows(academic_year, fee_types, class_ids=None, student_ids=None,
+                          chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Génère les lignes du rapport des frais par élève
+
+    Format: Matricule, Étudiant, Classe, [Type de frais...], Total Facturé,
+    Total Payé, Solde Restant, puis une ligne de total général.
+
+    Pour chaque lot d'élèves : un agrégat des lignes de facture par
+    (élève, type de frais) et un agrégat des factures (montants facturés et
+    payés stockés), pivotés en mémoire.
+    """
+    fee_types = list(fee_types)
+    fee_type_ids = [fee_type.id for fee_type in fee_types]
+    year = academic_year.start_date.year
+
+    yield ['Matricule', 'Étudiant', 'Classe'] + [fee_type.name for fee_type in fee_types] + [
+        'Total Facturé', 'Total Payé', 'Solde Restant'
+    ]
+
+    students = Student.objects.filter(user__is_active=True)
+    if class_ids:
+        students = students.filter(current_class_id__in=class_ids)
+    if student_ids:
+        students = students.filter(id__in=student_ids)
+    students = students.order_by(
+        'current_class__name', 'user__last_name', 'user__first_name'
+    ).values_list(
+        'id', 'matricule', 'user__first_name', 'user__last_name', 'current_class__name'
+    ).iterator(chunk_size=chunk_size)
+
+    for chunk in chunks(students, chunk_size):
+        ids = [row[0] for row in chunk]
+
+        fee_amounts = defaultdict(dict)
+        items = InvoiceItem.objects.filter(
+            invoice__student_id__in=ids,
+            invoice__issue_date__year=year,
+            fee_type_id__in=fee_type_ids
+        ).values('invoice__student_id', 'fee_type_id').annotate(
+            total=Sum('total')
+        ).order_by()
+        for item in items:
+            fee_amounts[item['invoice__student_id']][item['fee_type_id']] = item['total']
+
+        invoice_totals = {
+            row['student_id']: row
+            for row in Invoice.objects.filter(
+                student_id__in=ids,
+                issue_date__year=year
+            ).values('student_id').annotate(
+                invoiced=Sum('total_amount'),
+                paid=Sum('amount_paid')
+            ).order_by()
+        }
+
+        for student_id, matricule, first_name, last_name, class_name in chunk:
+            amounts = fee_amounts.get(student_id, {})
+            totals = invoice_totals.get(student_id, {})
+            total_invoiced = totals.get('invoiced') or Decimal('0.00')
+            total_paid = totals.get('paid') or Decimal('0.00')
+            yield [
+                matricule,
+                f"{first_name} {last_name}",
+                class_name or 'Non assigné',
+            ] + [_fmt(amounts.get(fee_type_id)) for fee_type_id in fee_type_ids] + [
+                _fmt(total_invoiced),
+                _fmt(total_paid),
+                _fmt(total_invoiced - total_paid),
+            ]
+
+    # Lignes vides avant le résumé
+    yield []
+    yield [''] * (len(fee_types) + 6)
+
+    # Totaux généraux (tous les élèves actifs de l'année)
+    fee_totals = dict(
+        InvoiceItem.objects.filter(
+            fee_type_id__in=fee_type_ids,
+            invoice__issue_date__year=year,
+            invoice__student__user__is_active=True
+        ).values('fee_type_id').annotate(
+            total=Sum('total')
+        ).order_by().values_list('fee_type_id', 'total')
+    )
+    totals = Invoice.objects.filter(
+        issue_date__year=year,
+        student__user__is_active=True
+    ).aggregate(invoiced=Sum('total_amount'), paid=Sum('amount_paid'))
+    total_invoiced_all = totals['invoiced'] or Decimal('0.00')
+    total_paid_all = totals['paid'] or Decimal('0.00')
+
+    yield ['', 'TOTAL GÉNÉRAL', ''] + [
+        _fmt(fee_totals.get(fee_type_id)) for fee_type_id in fee_type_ids
+    ] + [
+        _fmt(total_invoiced_all),
+        _fmt(total_paid_all),
+        _fmt(total_invoiced_all - total_paid_all),
+    ]
+
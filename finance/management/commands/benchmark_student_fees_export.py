@@ -0,0 +1,181 @@
+"""
+Benchmark de l'export CSV des frais par élève
+
+Compare l'ancien algorithme (requêtes par élève, factures chargées en
+mémoire) à l'export en streaming de finance.exports : nombre de requêtes,
+pic mémoire (tracemalloc) et durée.
+
+Usage:
+    python manage.py benchmark_student_fees_export
+    python manage.py benchmark_student_fees_export --academic-year 3 --chunk-size 200
+"""
+import csv
+import io
+import time
+import tracemalloc
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+
+from academic.models import AcademicYear
+from accounts.models import Student
+from core.exports import stream_csv
+from finance.exports import EXPORT_CHUNK_SIZE, iter_student_fee_rows
+from finance.models import FeeType, Invoice, InvoiceItem
+
+
+def _completed_payments(invoice):
+    """Ancien calcul de Invoice.paid_amount (une requête par facture)"""
+    return sum(payment.amount for payment in invoice.payments.filter(status='COMPLETED'))
+
+
+def legacy_student_fee_rows(academic_year, fee_types):
+    """Ancienne implémentation (référence) : requêtes par élève et par facture"""
+    fee_types = list(fee_types)
+    rows = [['Matricule', 'Étudiant', 'Classe'] + [ft.name for ft in fee_types] + [
+        'Total Facturé', 'Total Payé', 'Solde Restant'
+    ]]
+    students = Student.objects.filter(user__is_active=True).select_related(
+        'user', 'current_class', 'current_class__level'
+    ).order_by('current_class__name', 'user__last_name', 'user__first_name')
+
+    for student in students:
+        row = [
+            student.matricule,
+            student.user.full_name,
+            student.current_class.name if student.current_class else 'Non assigné'
+        ]
+        invoices = Invoice.objects.filter(
+            student=student,
+            issue_date__year=academic_year.start_date.year
+        ).prefetch_related('items', 'items__fee_type', 'payments')
+        fee_amounts = defaultdict(Decimal)
+        for invoice in invoices:
+            for item in invoice.items.all():
+                fee_amounts[item.fee_type.id] += item.total
+        for fee_type in fee_types:
+            row.append(f"{fee_amounts.get(fee_type.id, Decimal('0.00')):.2f}")
+        total_invoiced = sum(invoice.total_amount for invoice in invoices)
+        total_paid = sum(_completed_payments(invoice) for invoice in invoices)
+        row.extend([f"{total_invoiced:.2f}", f"{total_paid:.2f}", f"{total_invoiced - total_paid:.2f}"])
+        rows.append(row)
+
+    rows.append([])
+    rows.append([''] * len(rows[0]))
+    total_row = ['', 'TOTAL GÉNÉRAL', '']
+    for fee_type in fee_types:
+        total = InvoiceItem.objects.filter(
+            fee_type=fee_type,
+            invoice__issue_date__year=academic_year.start_date.year,
+            invoice__student__user__is_active=True
+        ).aggregate(total=Sum('total'))['total'] or Decimal('0.00')
+        total_row.append(f"{total:.2f}")
+    all_invoices = Invoice.objects.filter(
+        issue_date__year=academic_year.start_date.year,
+        student__user__is_active=True
+    )
+    total_invoiced_all = sum(invoice.total_amount for invoice in all_invoices)
+    total_paid_all = sum(_completed_payments(invoice) for invoice in all_invoices)
+    total_row.extend([
+        f"{total_invoiced_all:.2f}",
+        f"{total_paid_all:.2f}",
+        f"{total_invoiced_all - total_paid_all:.2f}"
+    ])
+    rows.append(total_row)
+
+    # L'ancienne vue accumulait tout le fichier dans la réponse
+    buffer = io.StringIO()
+    buffer.write('﻿')
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def legacy_student_fees_size(academic_year, fee_types):
+    """Taille en octets du fichier produit par l'ancienne implémentation"""
+    return len(legacy_student_fee_rows(academic_year, fee_types).encode('utf-8'))
+
+
+def consume_streaming_export(academic_year, fee_types, chunk_size):
+    """Consomme le flux sans le conserver (comme le ferait le serveur WSGI)"""
+    size = 0
+    for chunk in stream_csv(iter_student_fee_rows(academic_year, fee_types, chunk_size=chunk_size)):
+        size += len(chunk.encode('utf-8'))
+    return size
+
+
+def measure(func):
+    """Retourne (résultat, nombre de requêtes, pic mémoire en octets, durée en secondes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as ctx:
+        result = func()
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, len(ctx.captured_queries), peak, duration
+
+
+class Command(BaseCommand):
+    help = "Compare l'ancien export CSV des frais par élève à l'export en streaming"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--academic-year',
+            type=int,
+            help="ID de l'année académique (par défaut: année en cours)"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f"Taille des lots d'élèves (défaut: {EXPORT_CHUNK_SIZE})"
+        )
+        parser.add_argument(
+            '--skip-legacy',
+            action='store_true',
+            help="Ne mesure que l'export en streaming"
+        )
+
+    def handle(self, *args, **options):
+        if options['academic_year']:
+            academic_year = AcademicYear.objects.filter(id=options['academic_year']).first()
+        else:
+            academic_year = AcademicYear.objects.filter(is_current=True).first()
+        if not academic_year:
+            raise CommandError('Aucune année académique trouvée.')
+
+        fee_types = FeeType.objects.all().order_by('name')
+        student_count = Student.objects.filter(user__is_active=True).count()
+        self.stdout.write(
+            f"Année {academic_year.name} - {student_count} élève(s) actif(s), "
+            f"{fee_types.count()} type(s) de frais"
+        )
+
+        results = []
+        if not options['skip_legacy']:
+            content, queries, peak, duration = measure(
+                lambda: legacy_student_fees_size(academic_year, fee_types)
+            )
+            results.append(('Ancien export', content, queries, peak, duration))
+
+        size, queries, peak, duration = measure(
+            lambda: consume_streaming_export(academic_year, fee_types, options['chunk_size'])
+        )
+        results.append(('Streaming', size, queries, peak, duration))
+
+        self.stdout.write(f"{'Version':<16}{'Octets':>12}{'Requêtes':>10}{'Pic mémoire':>14}{'Durée':>10}")
+        for label, size, queries, peak, duration in results:
+            self.stdout.write(
+                f"{label:<16}{size:>12}{queries:>10}{peak / 1024:>11.1f} Ko{duration:>9.2f}s"
+            )
+
+        if len(results) == 2:
+            legacy, streaming = results
+            self.stdout.write(self.style.SUCCESS(
+                f"Requêtes : {legacy[2]} -> {streaming[2]} ; "
+                f"pic mémoire : {legacy[3] / 1024:.1f} Ko -> {streaming[3] / 1024:.1f} Ko"
+            ))
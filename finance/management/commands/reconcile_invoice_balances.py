@@ -0,0 +1,70 @@
+"""
+Management command pour vérifier les montants payés dénormalisés des factures
+
+Compare `Invoice.amount_paid` / `Invoice.balance_due` à la somme réelle des
+paiements terminés et corrige les écarts avec --fix.
+
+Usage:
+    python manage.py reconcile_invoice_balances          # Vérification seule
+    python manage.py reconcile_invoice_balances --fix    # Corrige les écarts
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from finance.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Vérifie (et corrige avec --fix) les montants payés et soldes stockés des factures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Corrige les factures dont les valeurs stockées divergent',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de factures corrigées par requête (défaut: 500)',
+        )
+
+    def handle(self, *args, **options):
+        drifted = Invoice.objects.with_computed_paid().filter(
+            ~Q(amount_paid=F('computed_paid'))
+            | ~Q(balance_due=F('total_amount') - F('computed_paid'))
+        ).order_by('pk').only('pk', 'invoice_number', 'total_amount', 'amount_paid', 'balance_due')
+
+        batch = []
+        count = 0
+        for invoice in drifted:
+            count += 1
+            self.stdout.write(
+                f"  {invoice.invoice_number}: payé {invoice.amount_paid} -> {invoice.computed_paid}, "
+                f"solde {invoice.balance_due} -> {invoice.total_amount - invoice.computed_paid}"
+            )
+            if options['fix']:
+                invoice.amount_paid = invoice.computed_paid
+                invoice.balance_due = invoice.total_amount - invoice.computed_paid
+                batch.append(invoice)
+                if len(batch) >= options['batch_size']:
+                    self._save(batch)
+                    batch = []
+        if batch:
+            self._save(batch)
+
+        if not count:
+            self.stdout.write(self.style.SUCCESS('✓ Aucun écart détecté'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'✓ {count} facture(s) corrigée(s)'))
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'{count} facture(s) en écart. Utilisez --fix pour corriger.')
+            )
+
+    def _save(self, invoices):
+        with transaction.atomic():
+            Invoice.objects.bulk_update(invoices, ['amount_paid', 'balance_due'])
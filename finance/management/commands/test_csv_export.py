@@ -44,15 +44,18 @@ class Command(BaseCommand):
             
             # Check response
             if response.status_code == 200:
-                # Save to file for inspection
+                # Save to file for inspection (réponse en streaming)
+                content_length = 0
                 with open('student_fees_test_export.csv', 'wb') as f:
-                    f.write(response.content)
+                    for chunk in response.streaming_content:
+                        f.write(chunk)
+                        content_length += len(chunk)
                 
                 self.stdout.write(
                     self.style.SUCCESS(
                         'CSV report generated successfully!\n'
                         'File saved as: student_fees_test_export.csv\n'
-                        f'Content length: {len(response.content)} bytes'
+                        f'Content length: {content_length} bytes'
                     )
                 )
             else:
@@ -2,8 +2,16 @@
 Managers personnalisés pour le filtrage des données selon les rôles (RBAC)
 Module Finance
 """
+from decimal import Decimal
+
 from django.db import models
-from django.db.models import Q
+from django.db.models import DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.scopes import get_access_scope
+
+# Facture émise (ni brouillon ni annulée) avec un solde restant à payer
+UNPAID_INVOICE = Q(balance_due__gt=0) & ~Q(status__in=['DRAFT', 'CANCELLED'])
 
 
 class PaymentQuerySet(models.QuerySet):
@@ -15,15 +23,16 @@ class PaymentQuerySet(models.QuerySet):
     
     def filter_for_student(self, student_user):
         """Filtre les paiements pour un élève - ses propres paiements"""
-        if hasattr(student_user, 'student_profile'):
-            return self.filter(invoice__student=student_user.student_profile)
+        scope = get_access_scope(student_user)
+        if scope.student_id:
+            return self.filter(invoice__student_id=scope.student_id)
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Filtre les paiements pour un parent - paiements de ses enfants"""
-        if hasattr(parent_user, 'parent_profile'):
-            children = parent_user.parent_profile.children.all()
-            return self.filter(invoice__student__in=children)
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
+            return self.filter(invoice__student_id__in=scope.student_ids)
         return self.none()
     
     def filter_for_finance_staff(self, user):
@@ -75,15 +84,16 @@ class InvoiceQuerySet(models.QuerySet):
     
     def filter_for_student(self, student_user):
         """Filtre les factures pour un élève - ses propres factures"""
-        if hasattr(student_user, 'student_profile'):
-            return self.filter(student=student_user.student_profile)
+        scope = get_access_scope(student_user)
+        if scope.student_id:
+            return self.filter(student_id=scope.student_id)
         return self.none()
     
     def filter_for_parent(self, parent_user):
         """Filtre les factures pour un parent - factures de ses enfants"""
-        if hasattr(parent_user, 'parent_profile'):
-            children = parent_user.parent_profile.children.all()
-            return self.filter(student__in=children)
+        scope = get_access_scope(parent_user)
+        if scope.parent_id:
+            return self.filter(student_id__in=scope.student_ids)
         return self.none()
     
     def filter_for_finance_staff(self, user):
@@ -102,6 +112,46 @@ class InvoiceQuerySet(models.QuerySet):
             return self.filter_for_finance_staff(user)
         else:
             return self.none()
+    
+    # Filtres et tris sur le solde (colonnes dénormalisées amount_paid/balance_due)
+    
+    def outstanding(self):
+        """Factures avec un solde restant à payer"""
+        return self.filter(balance_due__gt=0)
+    
+    def unpaid(self):
+        """Factures émises (ni brouillon ni annulée) avec un solde restant à payer"""
+        return self.filter(UNPAID_INVOICE)
+    
+    def settled(self):
+        """Factures entièrement payées (solde nul ou négatif)"""
+        return self.filter(balance_due__lte=0)
+    
+    def order_by_balance(self, descending=True):
+        """Trie par solde restant (le plus élevé d'abord par défaut)"""
+        return self.order_by('-balance_due' if descending else 'balance_due', '-issue_date')
+    
+    def total_balance(self):
+        """Somme des soldes restants"""
+        return self.aggregate(total=Sum('balance_due'))['total'] or Decimal('0.00')
+    
+    def with_computed_paid(self):
+        """
+        Annote `computed_paid` : somme réelle des paiements terminés,
+        recalculée depuis la table des paiements (réconciliation)
+        """
+        from .models import Payment
+        
+        completed = Payment.objects.filter(
+            invoice=OuterRef('pk'), status='COMPLETED'
+        ).order_by().values('invoice').annotate(total=Sum('amount')).values('total')
+        return self.annotate(
+            computed_paid=Coalesce(
+                Subquery(completed, output_field=DecimalField(max_digits=10, decimal_places=2)),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
 
 
 class InvoiceManager(models.Manager):
@@ -124,6 +174,18 @@ class InvoiceManager(models.Manager):
     
     def for_role(self, user):
         return self.get_queryset().filter_for_role(user)
+    
+    def outstanding(self):
+        return self.get_queryset().outstanding()
+    
+    def unpaid(self):
+        return self.get_queryset().unpaid()
+    
+    def settled(self):
+        return self.get_queryset().settled()
+    
+    def with_computed_paid(self):
+        return self.get_queryset().with_computed_paid()
 
 
 class ExpenseQuerySet(models.QuerySet):
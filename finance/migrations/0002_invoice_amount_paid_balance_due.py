@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:25
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_invoice_balances(apps, schema_editor):
+    """Calcule amount_paid/balance_due des factures existantes"""
+    Invoice = apps.get_model('finance', 'Invoice')
+    Payment = apps.get_model('finance', 'Payment')
+
+    paid = dict(
+        Payment.objects.filter(status='COMPLETED').values('invoice_id').annotate(
+            total=Sum('amount')
+        ).order_by().values_list('invoice_id', 'total')
+    )
+    batch = []
+    for invoice in Invoice.objects.only('id', 'total_amount').iterator(chunk_size=1000):
+        invoice.amount_paid = paid.get(invoice.id) or Decimal('0.00')
+        invoice.balance_due = invoice.total_amount - invoice.amount_paid
+        batch.append(invoice)
+        if len(batch) >= 1000:
+            Invoice.objects.bulk_update(batch, ['amount_paid', 'balance_due'])
+            batch = []
+    if batch:
+        Invoice.objects.bulk_update(batch, ['amount_paid', 'balance_due'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('finance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10, verbose_name='Montant payé'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance_due',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10, verbose_name='Solde restant'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['balance_due'], name='finance_inv_balance_idx'),
+        ),
+        migrations.RunPython(populate_invoice_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_invoice_amount_paid_balance_due'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyfinancialreport',
+            name='is_stale',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='À recalculer'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_daily_report_is_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyfinancialreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le'),
+        ),
+    ]
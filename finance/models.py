@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from core.sequences import NumberSequence
+
 # Import des managers RBAC
 from .managers import PaymentManager, InvoiceManager
 
@@ -80,6 +83,10 @@ class Invoice(models.Model):
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name='Remise')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name='Montant total')
     
+    # Valeurs dénormalisées, maintenues par les signaux de Payment (voir finance.signals)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False, verbose_name='Montant payé')
+    balance_due = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False, verbose_name='Solde restant')
+    
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='DRAFT', verbose_name='Statut')
     notes = models.TextField(blank=True, verbose_name='Notes')
     
@@ -89,42 +96,68 @@ class Invoice(models.Model):
     # Manager RBAC
     objects = InvoiceManager()
 
+    # Colonnes maintenues par les paiements, exclues des sauvegardes de la facture
+    BALANCE_FIELDS = ('amount_paid', 'balance_due')
+
+    # Numérotation INV<AAAA><MM><NNNN>
+    number_sequence = NumberSequence('INV', 'finance.Invoice', 'invoice_number')
+
     class Meta:
         verbose_name = 'Facture'
         verbose_name_plural = 'Factures'
         ordering = ['-issue_date']
+        indexes = [
+            models.Index(fields=['balance_due'], name='finance_inv_balance_idx'),
+        ]
 
     def __str__(self):
         return f"Facture {self.invoice_number} - {self.student.user.full_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Date d'émission chargée : rapports journaliers à recalculer si elle change
+        if 'issue_date' in field_names:
+            instance._loaded_issue_date = instance.issue_date
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.invoice_number:
             # Générer un numéro de facture automatiquement
-            current_year = timezone.now().year
-            current_month = timezone.now().month
-            last_invoice = Invoice.objects.filter(
-                invoice_number__startswith=f"INV{current_year}{current_month:02d}"
-            ).order_by('invoice_number').last()
-            
-            if last_invoice:
-                last_number = int(last_invoice.invoice_number[-4:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            
-            self.invoice_number = f"INV{current_year}{current_month:02d}{new_number:04d}"
+            self.invoice_number = self.number_sequence.next()
+        
+        if self._state.adding:
+            self.balance_due = self.total_amount - self.amount_paid
+            super().save(*args, **kwargs)
+            return
         
+        # Mise à jour : le montant payé et le solde ne sont jamais réécrits depuis
+        # la mémoire, ils ont pu changer entre-temps (paiement concurrent, F())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.BALANCE_FIELDS
+            ]
+        else:
+            update_fields = set(update_fields) - set(self.BALANCE_FIELDS)
+        kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
+        
+        # Le solde suit le montant total, calculé en base avec le montant payé courant
+        if 'total_amount' in update_fields:
+            Invoice.objects.filter(pk=self.pk).update(balance_due=F('total_amount') - F('amount_paid'))
+            self.balance_due = self.total_amount - self.amount_paid
 
     @property
     def paid_amount(self):
-        """Montant payé"""
-        return sum(payment.amount for payment in self.payments.filter(status='COMPLETED'))
+        """Montant payé (paiements terminés, valeur stockée)"""
+        return self.amount_paid
 
     @property
     def balance(self):
-        """Solde restant"""
-        return self.total_amount - self.paid_amount
+        """Solde restant (valeur stockée)"""
+        return self.balance_due
 
     @property
     def is_paid(self):
@@ -217,6 +250,9 @@ class Payment(models.Model):
     # Manager RBAC
     objects = PaymentManager()
 
+    # Numérotation PAY<AAAA><MM><NNNN>
+    number_sequence = NumberSequence('PAY', 'finance.Payment', 'payment_reference')
+
     class Meta:
         verbose_name = 'Paiement'
         verbose_name_plural = 'Paiements'
@@ -225,22 +261,26 @@ class Payment(models.Model):
     def __str__(self):
         return f"Paiement {self.payment_reference} - {self.amount}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État chargé, réutilisé par les signaux pour calculer l'écart sans relire la base
+        if {'invoice_id', 'amount', 'status'}.issubset(field_names):
+            instance._loaded_state = instance.get_balance_state()
+        if 'payment_date' in field_names:
+            instance._loaded_payment_date = instance.payment_date
+        return instance
+
+    def get_balance_state(self):
+        """(facture, montant pris en compte dans le montant payé de la facture)"""
+        if self.status == 'COMPLETED' and self.amount is not None:
+            return self.invoice_id, self.amount
+        return self.invoice_id, Decimal('0.00')
+
     def save(self, *args, **kwargs):
         if not self.payment_reference:
             # Générer une référence de paiement automatiquement
-            current_year = timezone.now().year
-            current_month = timezone.now().month
-            last_payment = Payment.objects.filter(
-                payment_reference__startswith=f"PAY{current_year}{current_month:02d}"
-            ).order_by('payment_reference').last()
-            
-            if last_payment:
-                last_number = int(last_payment.payment_reference[-4:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            
-            self.payment_reference = f"PAY{current_year}{current_month:02d}{new_number:04d}"
+            self.payment_reference = self.number_sequence.next()
         
         super().save(*args, **kwargs)
 
@@ -592,6 +632,8 @@ class DailyFinancialReport(models.Model):
     
     # === MÉTADONNÉES ===
     generated_at = models.DateTimeField(auto_now_add=True, verbose_name='Généré le')
+    # Version des séries en cache (voir finance.timeseries)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Modifié le')
     generated_by = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
@@ -615,6 +657,9 @@ class DailyFinancialReport(models.Model):
         verbose_name='Données supplémentaires',
         help_text='Stockage de données complexes pour graphiques et analyses'
     )
+    
+    # Un paiement ou une facture a changé depuis le calcul (voir finance.daily_reports)
+    is_stale = models.BooleanField(default=False, db_index=True, verbose_name='À recalculer')
 
     class Meta:
         verbose_name = 'Rapport financier journalier'
@@ -0,0 +1,280 @@
+"""
+Services du module Finance
+
+Génération de factures en masse : les données nécessaires (inscriptions,
+structures de frais, factures ouvertes, parent responsable) sont chargées en
+quelques requêtes pour tous les élèves, les numéros sont réservés par bloc
+et les factures/lignes insérées avec bulk_create par lots.
+
+La génération en arrière-plan (start_generation_job) publie sa progression
+dans le cache : le suivi (get_generation_job) peut être servi par un autre
+worker que celui qui a lancé le job, ce qui suppose un cache partagé
+(Redis, Memcached ; contrôle core.W001 de `check --deploy`). Avec un cache
+propre à chaque processus (LocMemCache), la génération est faite pendant
+la requête qui la demande, qui renvoie directement l'état final.
+"""
+import logging
+import threading
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from academic.models import Enrollment
+from accounts.models import Student
+from core.caching import cache_is_shared
+from .models import FeeStructure, Invoice, InvoiceItem
+from .signals import invoices_generated
+
+logger = logging.getLogger(__name__)
+
+# Nombre de factures insérées par transaction
+INVOICE_GENERATION_CHUNK_SIZE = 500
+
+# Durée de conservation de l'état d'une génération en arrière-plan (secondes)
+JOB_CACHE_TIMEOUT = 3600
+JOB_CACHE_PREFIX = 'finance:invoice_generation'
+
+
+class InvoiceGenerationPlan:
+    """Factures à créer et élèves écartés pour une génération"""
+
+    def __init__(self, fee_type, academic_year, level=None, due_date=None):
+        self.fee_type = fee_type
+        self.academic_year = academic_year
+        self.level = level
+        self.due_date = due_date or (timezone.now() + timedelta(days=30)).date()
+        # (student_id, parent_id, nom de l'élève, nom du niveau, montant)
+        self.entries = []
+        self.errors = []
+        self.eligible_count = 0
+        self.created_count = 0
+
+    @property
+    def total_amount(self):
+        return sum((entry[4] for entry in self.entries), Decimal('0.00'))
+
+    def as_dict(self):
+        return {
+            'eligible_students': self.eligible_count,
+            'invoices_to_create': len(self.entries),
+            'created': self.created_count,
+            'total_amount': str(self.total_amount),
+            'errors': self.errors,
+        }
+
+
+def plan_invoice_generation(fee_type, academic_year, level=None, due_date=None):
+    """
+    Prépare une génération de factures (4 requêtes, quel que soit le nombre d'élèves)
+
+    Un élève est écarté s'il n'existe pas de structure de frais pour son
+    niveau ou s'il a déjà une facture ouverte pour ce type de frais.
+    """
+    plan = InvoiceGenerationPlan(fee_type, academic_year, level, due_date)
+
+    enrollments = Enrollment.objects.filter(academic_year=academic_year, is_active=True)
+    if level:
+        enrollments = enrollments.filter(classroom__level=level)
+    student_ids = enrollments.values('student_id')
+
+    rows = list(
+        enrollments.order_by('student__matricule').values_list(
+            'student_id',
+            'student__user__first_name',
+            'student__user__last_name',
+            'classroom__level_id',
+            'classroom__level__name',
+        )
+    )
+    amounts = dict(
+        FeeStructure.objects.filter(
+            fee_type=fee_type,
+            academic_year=academic_year
+        ).values_list('level_id', 'amount')
+    )
+    open_invoices = set(
+        Invoice.objects.filter(
+            student_id__in=student_ids,
+            items__fee_type=fee_type,
+            status__in=['DRAFT', 'PENDING']
+        ).values_list('student_id', flat=True)
+    )
+    # Parent responsable : le premier parent lié (équivalent de student.parents.first())
+    first_parents = dict(
+        Student.parents.through.objects.filter(
+            student_id__in=student_ids
+        ).values('student_id').annotate(
+            first_parent=Min('parent_id')
+        ).order_by().values_list('student_id', 'first_parent')
+    )
+
+    seen = set()
+    for student_id, first_name, last_name, level_id, level_name in rows:
+        if student_id in seen:
+            continue
+        seen.add(student_id)
+        full_name = f"{first_name} {last_name}"
+
+        amount = amounts.get(level_id)
+        if amount is None:
+            plan.errors.append(f"Pas de structure de frais pour {fee_type.name} - {level_name}")
+            continue
+        if student_id in open_invoices:
+            plan.errors.append(f"Facture en cours déjà existante pour {full_name}")
+            continue
+        plan.entries.append((student_id, first_parents.get(student_id), full_name, level_name, amount))
+
+    plan.eligible_count = len(seen)
+    return plan
+
+
+def generate_invoices(fee_type, academic_year, level=None, due_date=None, dry_run=False,
+                      user=None, chunk_size=INVOICE_GENERATION_CHUNK_SIZE, progress=None):
+    """
+    Génère les factures (statut DRAFT) d'un type de frais pour une année
+
+    Args:
+        dry_run: ne crée rien, retourne seulement le plan (prévisualisation)
+        user: utilisateur à l'origine de la génération (journal d'activité)
+        progress: callable(done, total) appelé après chaque lot
+
+    Returns:
+        InvoiceGenerationPlan: plan exécuté (`created_count` renseigné)
+    """
+    plan = plan_invoice_generation(fee_type, academic_year, level, due_date)
+    if dry_run or not plan.entries:
+        return plan
+
+    total = len(plan.entries)
+    if progress:
+        progress(0, total)
+
+    for start in range(0, total, chunk_size):
+        chunk = plan.entries[start:start + chunk_size]
+        with transaction.atomic():
+            numbers = Invoice.number_sequence.reserve(len(chunk))
+            invoices = Invoice.objects.bulk_create([
+                Invoice(
+                    invoice_number=number,
+                    student_id=student_id,
+                    parent_id=parent_id,
+                    due_date=plan.due_date,
+                    status='DRAFT',
+                    subtotal=amount,
+                    total_amount=amount,
+                    balance_due=amount,
+                )
+                for number, (student_id, parent_id, _, _, amount) in zip(numbers, chunk)
+            ])
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(
+                    invoice=invoice,
+                    fee_type=fee_type,
+                    description=f"{fee_type.name} - {level_name}",
+                    quantity=Decimal('1.00'),
+                    unit_price=amount,
+                    total=amount,
+                )
+                for invoice, (_, _, _, level_name, amount) in zip(invoices, chunk)
+            ])
+        plan.created_count += len(chunk)
+        if progress:
+            progress(plan.created_count, total)
+
+    invoices_generated.send(sender=Invoice, plan=plan)
+
+    if user is not None:
+        # Une entrée de journal pour toute la génération (bulk_create n'émet pas de post_save)
+        from activity_log.models import log_activity
+        log_activity(
+            user=user,
+            action_type='INVOICE_CREATE',
+            description=(
+                f"{plan.created_count} facture(s) générée(s) pour {fee_type.name} "
+                f"({academic_year.name}): {plan.total_amount} FCFA"
+            ),
+            content_type='Invoice',
+            object_repr=f"Génération {fee_type.name} ({academic_year.name})",
+            new_values={
+                'fee_type': fee_type.name,
+                'academic_year': academic_year.name,
+                'level': plan.level.name if plan.level else None,
+                'created': plan.created_count,
+            },
+        )
+    return plan
+
+
+# ===========================
+# GÉNÉRATION EN ARRIÈRE-PLAN
+# ===========================
+
+def _job_key(job_id):
+    return f'{JOB_CACHE_PREFIX}:{job_id}'
+
+
+def get_generation_job(job_id):
+    """État d'une génération en arrière-plan (None si inconnue ou expirée)"""
+    return cache.get(_job_key(job_id))
+
+
+def _update_job(job_id, **values):
+    state = cache.get(_job_key(job_id)) or {}
+    state.update(values)
+    cache.set(_job_key(job_id), state, JOB_CACHE_TIMEOUT)
+
+
+def _run_generation_job(job_id, params):
+    try:
+        _update_job(job_id, status='running')
+        plan = generate_invoices(
+            progress=lambda done, total: _update_job(job_id, done=done, total=total),
+            **params
+        )
+        _update_job(job_id, status='done', **plan.as_dict())
+    except Exception as exc:
+        logger.exception("Échec de la génération de factures %s", job_id)
+        _update_job(job_id, status='failed', error=str(exc))
+
+
+def _run_generation_thread(job_id, params):
+    try:
+        _run_generation_job(job_id, params)
+    finally:
+        connection.close()
+
+
+def start_generation_job(fee_type, academic_year, level=None, due_date=None, user=None):
+    """
+    Lance la génération en arrière-plan et retourne l'identifiant du job
+
+    La progression est lisible avec get_generation_job(job_id). Avec
+    INVOICE_GENERATION_ASYNC = False (tests) ou un cache propre au processus
+    (voir le module), le job s'exécute immédiatement : son état est final au
+    retour.
+    """
+    job_id = uuid.uuid4().hex
+    cache.set(_job_key(job_id), {'status': 'pending', 'done': 0, 'total': 0}, JOB_CACHE_TIMEOUT)
+    params = {
+        'fee_type': fee_type,
+        'academic_year': academic_year,
+        'level': level,
+        'due_date': due_date,
+        'user': user,
+    }
+    if getattr(settings, 'INVOICE_GENERATION_ASYNC', True) and cache_is_shared():
+        threading.Thread(
+            target=_run_generation_thread,
+            args=(job_id, params),
+            name=f'invoice-generation-{job_id[:8]}',
+            daemon=True,
+        ).start()
+    else:
+        _run_generation_job(job_id, params)
+    return job_id
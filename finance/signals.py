@@ -0,0 +1,136 @@
+"""
+Signaux du module Finance
+
+Maintien incrémental des colonnes dénormalisées `Invoice.amount_paid` et
+`Invoice.balance_due` lors de la création, la modification ou la
+suppression d'un paiement. Les écarts sont appliqués avec des expressions
+F() (pas de relecture de la facture, pas de course entre deux paiements).
+
+Marque aussi à recalculer les rapports financiers journaliers à partir du
+jour d'un paiement terminé modifié ou supprimé, ou d'une facture créée,
+modifiée ou supprimée (voir finance.daily_reports).
+
+Définit aussi `invoices_generated`, émis après une génération en masse.
+"""
+from decimal import Decimal
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from finance.daily_reports import INVOICE_REPORT_FIELDS, mark_reports_stale, payment_day
+from finance.models import Invoice, Payment, get_current_date
+
+
+# Émis après une génération de factures en masse (bulk_create, pas de post_save)
+invoices_generated = Signal()
+
+
+def apply_payment_delta(invoice_id, delta, invoice=None):
+    """
+    Ajoute `delta` au montant payé de la facture (et le retire du solde)
+
+    Si l'instance de facture déjà chargée est fournie, ses valeurs en mémoire
+    sont ajustées pour rester cohérentes avec la base.
+    """
+    if not invoice_id or not delta:
+        return
+    Invoice.objects.filter(pk=invoice_id).update(
+        amount_paid=F('amount_paid') + delta,
+        balance_due=F('balance_due') - delta,
+    )
+    if invoice is not None and invoice.pk == invoice_id:
+        invoice.amount_paid += delta
+        invoice.balance_due -= delta
+
+
+def _previous_state(instance):
+    """État pris en compte avant la sauvegarde (chargé avec l'instance, sinon relu en pre_save)"""
+    return getattr(instance, '_loaded_state', None) or (None, Decimal('0.00'))
+
+
+def _cached_invoice(instance):
+    return instance._state.fields_cache.get('invoice')
+
+
+@receiver(pre_save, sender=Payment, dispatch_uid='finance_payment_balance_pre_save')
+def payment_balance_pre_save(sender, instance, raw=False, **kwargs):
+    """
+    Relit l'état précédent d'un paiement existant qui n'a pas été chargé
+    complet (only/defer, instance construite avec sa clé) : en post_save, la
+    ligne contient déjà les nouvelles valeurs.
+    """
+    if raw or instance.pk is None:
+        return
+    if getattr(instance, '_loaded_state', None) is not None and hasattr(instance, '_loaded_payment_date'):
+        return
+    previous = Payment.objects.filter(pk=instance.pk).values('invoice_id', 'amount', 'status', 'payment_date').first()
+    if previous is None:
+        return
+    if getattr(instance, '_loaded_state', None) is None:
+        amount = previous['amount'] if previous['status'] == 'COMPLETED' else Decimal('0.00')
+        instance._loaded_state = (previous['invoice_id'], amount)
+    if not hasattr(instance, '_loaded_payment_date'):
+        instance._loaded_payment_date = previous['payment_date']
+
+
+@receiver(post_save, sender=Payment, dispatch_uid='finance_payment_balance_save')
+def payment_balance_post_save(sender, instance, created, raw=False, **kwargs):
+    """Répercute le paiement sur le montant payé de sa facture"""
+    if raw:
+        return
+    if created:
+        old_invoice_id, old_amount = None, Decimal('0.00')
+    else:
+        old_invoice_id, old_amount = _previous_state(instance)
+    new_invoice_id, new_amount = instance.get_balance_state()
+    invoice = _cached_invoice(instance)
+
+    if old_invoice_id == new_invoice_id:
+        apply_payment_delta(new_invoice_id, new_amount - old_amount, invoice)
+    else:
+        apply_payment_delta(old_invoice_id, -old_amount)
+        apply_payment_delta(new_invoice_id, new_amount, invoice)
+
+    # Rapports du jour du paiement (et de son ancien jour s'il a été déplacé)
+    if old_amount or new_amount:
+        mark_reports_stale({
+            payment_day(instance.payment_date),
+            payment_day(getattr(instance, '_loaded_payment_date', None)),
+        })
+
+    instance._loaded_state = (new_invoice_id, new_amount)
+    instance._loaded_payment_date = instance.payment_date
+
+
+@receiver(post_delete, sender=Payment, dispatch_uid='finance_payment_balance_delete')
+def payment_balance_post_delete(sender, instance, **kwargs):
+    """Retire le paiement supprimé du montant payé de sa facture"""
+    state = getattr(instance, '_loaded_state', None)
+    invoice_id, amount = state if state is not None else instance.get_balance_state()
+    apply_payment_delta(invoice_id, -amount, _cached_invoice(instance))
+    if amount:
+        mark_reports_stale({payment_day(getattr(instance, '_loaded_payment_date', instance.payment_date))})
+
+
+@receiver(post_save, sender=Invoice, dispatch_uid='finance_invoice_reports_save')
+def invoice_reports_post_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Rapports à recalculer depuis l'émission de la facture (ou son ancienne date)"""
+    if raw:
+        return
+    if not created and update_fields is not None and not INVOICE_REPORT_FIELDS.intersection(update_fields):
+        return
+    mark_reports_stale({instance.issue_date, getattr(instance, '_loaded_issue_date', None)})
+    instance._loaded_issue_date = instance.issue_date
+
+
+@receiver(post_delete, sender=Invoice, dispatch_uid='finance_invoice_reports_delete')
+def invoice_reports_post_delete(sender, instance, **kwargs):
+    mark_reports_stale({instance.issue_date, getattr(instance, '_loaded_issue_date', None)})
+
+
+@receiver(invoices_generated, dispatch_uid='finance_invoices_generated_reports')
+def invoices_generated_reports(sender, **kwargs):
+    """Factures créées en masse (bulk_create), émises aujourd'hui"""
+    mark_reports_stale({get_current_date()})
+
@@ -4,10 +4,18 @@ Test script to demonstrate the filtered CSV export functionality
 This shows how the filtering works with different parameters.
 """
 
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import StreamingHttpResponse
 from finance.views import student_fees_export_filters, student_fees_csv_export
-from finance.models import FeeType, Invoice, InvoiceItem
+from finance.models import FeeType, Invoice, InvoiceItem, Payment, PaymentMethod
 from accounts.models import Student
 from academic.models import AcademicYear, ClassRoom, Level
 
@@ -97,7 +105,7 @@ class StudentFeesExportTest(TestCase):
         
         self.assertEqual(response.status_code, 200)
         # Should only include the selected fee type
-        self.assertIn('Scolarité'.encode('utf-8'), response.content)
+        self.assertIn('Scolarité'.encode('utf-8'), b''.join(response.streaming_content))
     
     def test_csv_export_all_filters(self):
         """Test CSV export with multiple filters combined"""
@@ -113,8 +121,133 @@ class StudentFeesExportTest(TestCase):
         response = student_fees_csv_export(request)
         
         self.assertEqual(response.status_code, 200)
-        self.assertIn('Scolarité'.encode('utf-8'), response.content)
-        self.assertIn('Transport'.encode('utf-8'), response.content)
+        content = b''.join(response.streaming_content)
+        self.assertIn('Scolarité'.encode('utf-8'), content)
+        self.assertIn('Transport'.encode('utf-8'), content)
+
+
+
+class StudentFeesStreamingExportTest(TestCase):
+    """
+    Export en streaming : contenu et nombre de requêtes constant
+    """
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.admin_user = User.objects.create_user(
+            email='finance@test.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='Finance',
+            role='ADMIN'
+        )
+        self.academic_year = AcademicYear.objects.create(
+            name='2025-2026',
+            start_date=date(2025, 9, 1),
+            end_date=date(2026, 7, 31),
+            is_current=True
+        )
+        self.level = Level.objects.create(name='6ème', order=1)
+        self.classroom = ClassRoom.objects.create(
+            name='6ème A',
+            level=self.level,
+            academic_year=self.academic_year
+        )
+        self.tuition = FeeType.objects.create(name='Scolarité')
+        self.transport = FeeType.objects.create(name='Transport')
+        self.method = PaymentMethod.objects.create(name='Espèces', code='CASH')
+        self.counter = 0
+    
+    def _create_student(self, last_name, tuition, transport=None, paid=None):
+        self.counter += 1
+        user = User.objects.create_user(
+            email=f'student{self.counter}@test.com',
+            password='testpass123',
+            first_name='Élève',
+            last_name=last_name,
+            role='STUDENT'
+        )
+        student = Student.objects.create(
+            user=user,
+            matricule=f'STU{self.counter:04d}',
+            current_class=self.classroom
+        )
+        invoice = Invoice.objects.create(
+            student=student,
+            issue_date=date(2025, 10, 1),
+            due_date=date(2025, 11, 1),
+            total_amount=tuition + (transport or Decimal('0.00'))
+        )
+        InvoiceItem.objects.create(
+            invoice=invoice, fee_type=self.tuition, description='Scolarité', unit_price=tuition
+        )
+        if transport:
+            InvoiceItem.objects.create(
+                invoice=invoice, fee_type=self.transport, description='Transport', unit_price=transport
+            )
+        if paid:
+            Payment.objects.create(
+                invoice=invoice, payment_method=self.method, amount=paid, status='COMPLETED'
+            )
+            # Les paiements non terminés ne comptent pas
+            Payment.objects.create(
+                invoice=invoice, payment_method=self.method, amount=paid, status='PENDING'
+            )
+        return student
+    
+    def _export_rows(self, params=None):
+        request = self.factory.get('/finance/reports/students-fees-csv/', params or {})
+        request.user = self.admin_user
+        response = student_fees_csv_export(request)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(content.lstrip('\ufeff'))))
+    
+    def test_export_content(self):
+        """Montants par type de frais, totaux et ligne de total général"""
+        self._create_student('Alpha', Decimal('100.00'), Decimal('20.00'), paid=Decimal('50.00'))
+        self._create_student('Beta', Decimal('100.00'))
+        
+        rows = self._export_rows()
+        
+        self.assertEqual(rows[0], [
+            'Matricule', 'Étudiant', 'Classe', 'Scolarité', 'Transport',
+            'Total Facturé', 'Total Payé', 'Solde Restant'
+        ])
+        self.assertEqual(rows[1], [
+            'STU0001', 'Élève Alpha', '6ème A', '100.00', '20.00', '120.00', '50.00', '70.00'
+        ])
+        self.assertEqual(rows[2], [
+            'STU0002', 'Élève Beta', '6ème A', '100.00', '0.00', '100.00', '0.00', '100.00'
+        ])
+        self.assertEqual(rows[-1], [
+            '', 'TOTAL GÉNÉRAL', '', '200.00', '20.00', '220.00', '50.00', '170.00'
+        ])
+    
+    def test_student_filter(self):
+        """Seuls les élèves sélectionnés sont exportés"""
+        self._create_student('Alpha', Decimal('100.00'))
+        beta = self._create_student('Beta', Decimal('80.00'))
+        
+        rows = self._export_rows({'students': [beta.id]})
+        
+        self.assertEqual([row[0] for row in rows[1:-3]], ['STU0002'])
+    
+    def test_query_count_is_constant(self):
+        """Le nombre de requêtes ne dépend pas du nombre d'élèves"""
+        for i in range(3):
+            self._create_student(f'Petit{i}', Decimal('100.00'), paid=Decimal('10.00'))
+        with CaptureQueriesContext(connection) as small:
+            self._export_rows()
+        
+        for i in range(12):
+            self._create_student(f'Grand{i}', Decimal('100.00'), Decimal('15.00'), paid=Decimal('10.00'))
+        with CaptureQueriesContext(connection) as large:
+            rows = self._export_rows()
+        
+        self.assertEqual(len(rows), 1 + 15 + 3)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
 
 
 # Manual test instructions
@@ -0,0 +1,212 @@
+"""
+Tests du calcul des rapports financiers journaliers (finance.daily_reports)
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Student
+from finance.daily_reports import compute_daily_reports, generate_daily_reports, generate_incremental
+from finance.models import DailyFinancialReport, Invoice, Payment, PaymentMethod
+
+User = get_user_model()
+
+
+def at(day, hour=10):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+class DailyReportTest(TestCase):
+    """Indicateurs calculés par agrégats groupés sur une plage de dates"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create_user(
+                email=f'eleve{index}@test.com', password='x', first_name='Eleve', last_name=str(index), role='STUDENT'
+            )
+            for index in range(3)
+        ]
+        cls.students = [Student.objects.create(user=user, matricule=f'STU000{index}') for index, user in enumerate(users)]
+        cls.cash = PaymentMethod.objects.create(name='Espèces', code='CASH')
+        cls.mobile = PaymentMethod.objects.create(name='Mobile Money', code='MOBILE')
+        # Facture entièrement payée le 2 mars
+        cls.paid_invoice = cls._invoice(0, date(2025, 3, 1), date(2025, 3, 10), '300.00', status='PAID')
+        # Facture partiellement payée le 2 mars, échue le 5
+        cls.partial_invoice = cls._invoice(1, date(2025, 3, 1), date(2025, 3, 5), '500.00', status='SENT')
+        # Facture sans paiement émise le 3 mars
+        cls.open_invoice = cls._invoice(2, date(2025, 3, 3), date(2025, 3, 20), '200.00', status='SENT')
+        # Brouillon : ignoré des factures ouvertes
+        cls._invoice(2, date(2025, 3, 1), date(2025, 3, 2), '999.00', status='DRAFT')
+
+        cls._pay(cls.paid_invoice, '100.00', date(2025, 3, 1), cls.cash)
+        cls._pay(cls.paid_invoice, '200.00', date(2025, 3, 2), cls.mobile)
+        cls._pay(cls.partial_invoice, '150.00', date(2025, 3, 2), cls.cash)
+        cls._pay(cls.partial_invoice, '40.00', date(2025, 3, 2), cls.cash, status='PENDING')
+
+    @classmethod
+    def _invoice(cls, student, issue_date, due_date, total, status):
+        return Invoice.objects.create(
+            student=cls.students[student], issue_date=issue_date, due_date=due_date,
+            total_amount=Decimal(total), status=status
+        )
+
+    @classmethod
+    def _pay(cls, invoice, amount, day, method, status='COMPLETED'):
+        return Payment.objects.create(
+            invoice=invoice, payment_method=method, amount=Decimal(amount), payment_date=at(day), status=status
+        )
+
+    def test_range_indicators(self):
+        reports = {report.report_date: report for report in compute_daily_reports(date(2025, 3, 1), date(2025, 3, 8))}
+        first, second, third, eighth = (reports[date(2025, 3, day)] for day in (1, 2, 3, 8))
+
+        self.assertEqual((first.payments_count, first.payments_total), (1, Decimal('100.00')))
+        self.assertEqual((second.payments_count, second.payments_total), (2, Decimal('350.00')))
+        self.assertEqual((second.payments_cash, second.payments_mobile), (Decimal('150.00'), Decimal('200.00')))
+        self.assertEqual((first.invoices_created_count, first.invoices_created_total), (3, Decimal('1799.00')))
+        self.assertEqual((second.invoices_paid_count, second.invoices_paid_total), (1, Decimal('300.00')))
+        # Comme auparavant : toute facture payée ayant reçu un paiement ce jour-là
+        self.assertEqual(first.invoices_paid_count, 1)
+
+        # La facture partielle est en attente jusqu'à son échéance, puis en retard
+        self.assertEqual((second.invoices_pending_count, second.invoices_pending_total), (1, Decimal('500.00')))
+        self.assertEqual((third.invoices_pending_count, third.invoices_pending_total), (2, Decimal('700.00')))
+        self.assertEqual((second.invoices_partial_count, second.invoices_partial_total), (1, Decimal('350.00')))
+        self.assertEqual(reports[date(2025, 3, 5)].invoices_overdue_count, 0)
+        self.assertEqual((eighth.invoices_overdue_count, eighth.invoices_overdue_total), (1, Decimal('350.00')))
+        self.assertEqual(eighth.invoices_pending_count, 1)
+        self.assertEqual(third.total_receivables, Decimal('550.00'))
+        self.assertEqual(eighth.additional_data['invoice_aging']['0-30'], {'count': 1, 'amount': 350.0})
+
+        # Recouvrement cumulé : 450 payés sur 1999 facturés au 3 mars
+        self.assertEqual(third.collection_rate, Decimal('22.51'))
+        self.assertEqual(second.payments_diff_previous_day, Decimal('250.00'))
+        self.assertEqual(second.payments_diff_previous_day_percent, Decimal('250.00'))
+        self.assertEqual(third.monthly_average_payments, Decimal('225.00'))
+        self.assertEqual(
+            [payer['amount'] for payer in second.additional_data['top_payers']], [200.0, 150.0]
+        )
+        self.assertEqual(
+            sorted(entry['method'] for entry in second.additional_data['payment_timeline']),
+            ['Espèces', 'Mobile Money']
+        )
+
+    def test_query_count_independent_of_range(self):
+        with CaptureQueriesContext(connection) as short:
+            compute_daily_reports(date(2025, 3, 1), date(2025, 3, 3))
+        with CaptureQueriesContext(connection) as long:
+            compute_daily_reports(date(2024, 3, 1), date(2025, 3, 31))
+        self.assertEqual(len(short.captured_queries), len(long.captured_queries))
+
+    def test_upsert_keeps_notes(self):
+        generate_daily_reports(date(2025, 3, 1), date(2025, 3, 3))
+        DailyFinancialReport.objects.filter(report_date=date(2025, 3, 2)).update(
+            notes='Vérifié', payments_total=Decimal('1.00')
+        )
+
+        # Sans force, les rapports existants sont conservés
+        saved = generate_daily_reports(date(2025, 3, 1), date(2025, 3, 4))
+        self.assertEqual([report.report_date for report in saved], [date(2025, 3, 4)])
+        self.assertEqual(DailyFinancialReport.objects.get(report_date=date(2025, 3, 2)).payments_total, Decimal('1.00'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            generate_daily_reports(date(2025, 3, 1), date(2025, 3, 4), force=True)
+        report = DailyFinancialReport.objects.get(report_date=date(2025, 3, 2))
+        self.assertEqual((report.payments_total, report.notes), (Decimal('350.00'), 'Vérifié'))
+        self.assertEqual(DailyFinancialReport.objects.count(), 4)
+        self.assertEqual(sum('INSERT' in query['sql'] for query in ctx.captured_queries), 1)
+
+    def test_payment_changes_mark_reports_stale(self):
+        generate_daily_reports(date(2025, 3, 1), date(2025, 3, 4))
+        payment = Payment.objects.get(amount=Decimal('150.00'))
+        payment.payment_date = at(date(2025, 3, 3))
+        payment.save()
+        # Jour de l'ancienne date et jours suivants (cumuls)
+        self.assertEqual(
+            list(DailyFinancialReport.objects.filter(is_stale=True).values_list('report_date', flat=True)),
+            [date(2025, 3, 4), date(2025, 3, 3), date(2025, 3, 2)]
+        )
+
+        # Un paiement en attente ne change pas les rapports
+        pending = Payment.objects.get(status='PENDING')
+        pending.amount = Decimal('45.00')
+        pending.save()
+        self.assertEqual(DailyFinancialReport.objects.filter(is_stale=True).count(), 3)
+
+        saved = generate_incremental(today=date(2025, 3, 6))
+        self.assertEqual(
+            [report.report_date for report in saved],
+            [date(2025, 3, 2), date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 5), date(2025, 3, 6)]
+        )
+        self.assertFalse(DailyFinancialReport.objects.filter(is_stale=True).exists())
+        self.assertEqual(
+            DailyFinancialReport.objects.get(report_date=date(2025, 3, 3)).payments_total, Decimal('150.00')
+        )
+
+        Payment.objects.get(amount=Decimal('100.00')).delete()
+        self.assertEqual(DailyFinancialReport.objects.filter(is_stale=True).count(), 6)
+
+    def test_invoice_changes_mark_reports_stale(self):
+        generate_daily_reports(date(2025, 3, 1), date(2025, 3, 6))
+
+        def stale_dates():
+            dates = DailyFinancialReport.objects.filter(is_stale=True).values_list('report_date', flat=True)
+            return sorted(dates)
+
+        # Création : rapports à partir du jour d'émission
+        invoice = self._invoice(0, date(2025, 3, 4), date(2025, 3, 30), '80.00', status='SENT')
+        self.assertEqual(stale_dates(), [date(2025, 3, 4), date(2025, 3, 5), date(2025, 3, 6)])
+        generate_incremental(today=date(2025, 3, 6))
+
+        # Sauvegarde sans champ utilisé par les rapports
+        invoice.notes = 'Relance'
+        invoice.save(update_fields=['notes'])
+        self.assertEqual(stale_dates(), [])
+
+        # Annulation
+        invoice = Invoice.objects.get(pk=invoice.pk)
+        invoice.status = 'CANCELLED'
+        invoice.save()
+        self.assertEqual(stale_dates(), [date(2025, 3, 4), date(2025, 3, 5), date(2025, 3, 6)])
+        generate_incremental(today=date(2025, 3, 6))
+
+        # Date d'émission déplacée plus tard : l'ancien jour est recalculé
+        invoice.issue_date = date(2025, 3, 5)
+        invoice.save()
+        self.assertEqual(stale_dates()[0], date(2025, 3, 4))
+        generate_incremental(today=date(2025, 3, 6))
+
+        invoice.delete()
+        self.assertEqual(stale_dates(), [date(2025, 3, 5), date(2025, 3, 6)])
+
+
+class GenerateDailyFinancialReportCommandTest(TestCase):
+    """Options de la commande generate_daily_financial_report"""
+
+    def call(self, *args):
+        out = StringIO()
+        call_command('generate_daily_financial_report', *args, stdout=out)
+        return out.getvalue()
+
+    def test_single_date_and_range(self):
+        output = self.call('--date', '2025-03-01')
+        self.assertIn('Rapport généré avec succès', output)
+        self.assertIn('Un rapport existe déjà', self.call('--date', '2025-03-01'))
+
+        output = self.call('--from', '2025-02-25', '--to', '2025-03-02')
+        self.assertIn('5 rapport(s) généré(s)', output)
+        self.assertEqual(DailyFinancialReport.objects.count(), 6)
+
+    def test_incremental(self):
+        today = timezone.localdate()
+        self.call('--date', str(today - timedelta(days=2)))
+        self.assertIn('2 rapport(s) généré(s)', self.call('--incremental'))
+        self.assertIn('Aucun rapport à générer', self.call('--incremental'))
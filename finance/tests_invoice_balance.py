@@ -0,0 +1,175 @@
+"""
+Tests des montants payés et soldes dénormalisés des factures
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.models import Student
+from finance.models import Invoice, Payment, PaymentMethod
+
+User = get_user_model()
+
+
+class InvoiceBalanceTest(TestCase):
+    """Maintien incrémental de amount_paid / balance_due"""
+
+    def setUp(self):
+        user = User.objects.create_user(
+            email='eleve@test.com',
+            password='testpass123',
+            first_name='Marie',
+            last_name='Martin',
+            role='STUDENT'
+        )
+        self.student = Student.objects.create(user=user, matricule='STU0001')
+        self.method = PaymentMethod.objects.create(name='Espèces', code='CASH')
+        self.invoice = self._create_invoice(Decimal('500.00'))
+
+    def _create_invoice(self, total):
+        return Invoice.objects.create(
+            student=self.student,
+            due_date=date(2025, 11, 1),
+            total_amount=total
+        )
+
+    def _pay(self, amount, status='COMPLETED', invoice=None):
+        return Payment.objects.create(
+            invoice=invoice or self.invoice,
+            payment_method=self.method,
+            amount=amount,
+            status=status
+        )
+
+    def assertStored(self, invoice, paid, balance):
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.amount_paid, Decimal(paid))
+        self.assertEqual(invoice.balance_due, Decimal(balance))
+
+    def test_new_invoice_balance(self):
+        self.assertStored(self.invoice, '0.00', '500.00')
+        self.assertFalse(self.invoice.is_paid)
+
+    def test_completed_payment_updates_invoice(self):
+        self._pay(Decimal('200.00'))
+        self._pay(Decimal('50.00'), status='PENDING')
+
+        self.assertStored(self.invoice, '200.00', '300.00')
+        self.assertEqual(self.invoice.paid_amount, Decimal('200.00'))
+        self.assertEqual(self.invoice.balance, Decimal('300.00'))
+
+    def test_loaded_invoice_instance_is_kept_in_sync(self):
+        self._pay(Decimal('500.00'))
+
+        # L'instance liée au paiement est ajustée sans relecture
+        self.assertEqual(self.invoice.amount_paid, Decimal('500.00'))
+        self.assertTrue(self.invoice.is_paid)
+
+    def test_status_and_amount_changes(self):
+        payment = Payment.objects.get(pk=self._pay(Decimal('100.00'), status='PENDING').pk)
+        self.assertStored(self.invoice, '0.00', '500.00')
+
+        payment.status = 'COMPLETED'
+        payment.save()
+        self.assertStored(self.invoice, '100.00', '400.00')
+
+        payment.amount = Decimal('150.00')
+        payment.save()
+        self.assertStored(self.invoice, '150.00', '350.00')
+
+        payment.status = 'REFUNDED'
+        payment.save()
+        self.assertStored(self.invoice, '0.00', '500.00')
+
+    def test_payment_moved_to_another_invoice(self):
+        other = self._create_invoice(Decimal('300.00'))
+        payment = self._pay(Decimal('100.00'))
+
+        payment.invoice = other
+        payment.save()
+
+        self.assertStored(self.invoice, '0.00', '500.00')
+        self.assertStored(other, '100.00', '200.00')
+
+    def test_payment_deletion(self):
+        self._pay(Decimal('100.00'))
+        Payment.objects.get(invoice=self.invoice).delete()
+        self.assertStored(self.invoice, '0.00', '500.00')
+
+        self._pay(Decimal('80.00'))
+        Payment.objects.filter(invoice=self.invoice).delete()
+        self.assertStored(self.invoice, '0.00', '500.00')
+
+    def test_total_change_updates_balance(self):
+        self._pay(Decimal('100.00'))
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+
+        invoice.total_amount = Decimal('600.00')
+        invoice.save(update_fields=['total_amount'])
+
+        self.assertStored(invoice, '100.00', '500.00')
+
+    def test_partially_loaded_or_built_payment(self):
+        payment = self._pay(Decimal('100.00'))
+
+        # Chargé sans le statut : l'état précédent est relu avant la sauvegarde
+        deferred = Payment.objects.only('id', 'amount').get(pk=payment.pk)
+        deferred.amount = Decimal('150.00')
+        deferred.save()
+        self.assertStored(self.invoice, '150.00', '350.00')
+
+        # Instance construite avec sa clé
+        built = Payment.objects.filter(pk=payment.pk).values().get()
+        built = Payment(**built)
+        built.amount = Decimal('120.00')
+        built.save()
+        self.assertStored(self.invoice, '120.00', '380.00')
+
+    def test_invoice_save_keeps_concurrent_payment(self):
+        stale = Invoice.objects.get(pk=self.invoice.pk)
+        self._pay(Decimal('200.00'))
+
+        # Sauvegarde d'une instance chargée avant le paiement
+        stale.notes = 'Relance envoyée'
+        stale.save()
+        self.assertStored(self.invoice, '200.00', '300.00')
+
+        stale.total_amount = Decimal('400.00')
+        stale.save()
+        self.assertStored(self.invoice, '200.00', '200.00')
+
+    def test_queryset_helpers(self):
+        paid = self._create_invoice(Decimal('100.00'))
+        self._pay(Decimal('100.00'), invoice=paid)
+        small = self._create_invoice(Decimal('50.00'))
+
+        self.assertEqual(set(Invoice.objects.outstanding()), {self.invoice, small})
+        self.assertEqual(list(Invoice.objects.settled()), [paid])
+        self.assertEqual(
+            list(Invoice.objects.all().order_by_balance()),
+            [self.invoice, small, paid]
+        )
+        self.assertEqual(Invoice.objects.outstanding().total_balance(), Decimal('550.00'))
+
+    def test_reconcile_command(self):
+        self._pay(Decimal('120.00'))
+        # Simuler une dérive (mise à jour en masse sans signaux)
+        Invoice.objects.filter(pk=self.invoice.pk).update(amount_paid=0, balance_due=Decimal('500.00'))
+
+        out = StringIO()
+        call_command('reconcile_invoice_balances', stdout=out)
+        self.assertIn('1 facture(s) en écart', out.getvalue())
+        self.assertStored(self.invoice, '0.00', '500.00')
+
+        out = StringIO()
+        call_command('reconcile_invoice_balances', '--fix', stdout=out)
+        self.assertIn('1 facture(s) corrigée(s)', out.getvalue())
+        self.assertStored(self.invoice, '120.00', '380.00')
+
+        out = StringIO()
+        call_command('reconcile_invoice_balances', stdout=out)
+        self.assertIn('Aucun écart', out.getvalue())
@@ -0,0 +1,205 @@
+"""
+Tests de la génération de factures en masse
+"""
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from academic.models import AcademicYear, ClassRoom, Enrollment, Level
+from accounts.models import Parent, Student
+from activity_log.models import ActivityLog
+from finance.models import FeeStructure, FeeType, Invoice, InvoiceItem
+from finance.services import generate_invoices, get_generation_job, start_generation_job
+
+User = get_user_model()
+
+
+class InvoiceGenerationTest(TestCase):
+    """Service generate_invoices et vue invoice_generate"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='finance@test.com', password='testpass123', role='FINANCE',
+            first_name='Agent', last_name='Finance'
+        )
+        self.academic_year = AcademicYear.objects.create(
+            name='2025-2026',
+            start_date=date(2025, 9, 1),
+            end_date=date(2026, 7, 31),
+            is_current=True
+        )
+        self.level = Level.objects.create(name='6ème', order=6)
+        self.other_level = Level.objects.create(name='5ème', order=5)
+        self.classroom = ClassRoom.objects.create(
+            name='6ème A', level=self.level, academic_year=self.academic_year
+        )
+        self.other_classroom = ClassRoom.objects.create(
+            name='5ème A', level=self.other_level, academic_year=self.academic_year
+        )
+        self.fee_type = FeeType.objects.create(name='Scolarité')
+        # Pas de structure de frais pour la 5ème
+        FeeStructure.objects.create(
+            fee_type=self.fee_type, level=self.level,
+            academic_year=self.academic_year, amount=Decimal('150.00')
+        )
+        self.counter = 0
+
+    def _create_student(self, classroom=None):
+        self.counter += 1
+        user = User.objects.create_user(
+            email=f'eleve{self.counter}@test.com', password='testpass123', role='STUDENT',
+            first_name='Élève', last_name=f'N{self.counter}'
+        )
+        student = Student.objects.create(user=user, matricule=f'STU{self.counter:04d}')
+        Enrollment.objects.create(
+            student=student,
+            classroom=classroom or self.classroom,
+            academic_year=self.academic_year
+        )
+        return student
+
+    def test_dry_run_creates_nothing(self):
+        self._create_student()
+        self._create_student(self.other_classroom)
+
+        plan = generate_invoices(self.fee_type, self.academic_year, dry_run=True)
+
+        self.assertEqual(plan.eligible_count, 2)
+        self.assertEqual(len(plan.entries), 1)
+        self.assertEqual(plan.total_amount, Decimal('150.00'))
+        self.assertEqual(plan.errors, ['Pas de structure de frais pour Scolarité - 5ème'])
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_generation(self):
+        first = self._create_student()
+        second = self._create_student()
+        already_billed = self._create_student()
+        parent_user = User.objects.create_user(email='parent@test.com', password='x', role='PARENT')
+        parent = Parent.objects.create(user=parent_user)
+        first.parents.add(parent)
+        existing = Invoice.objects.create(
+            student=already_billed, due_date=date(2025, 10, 1), status='DRAFT'
+        )
+        InvoiceItem.objects.create(
+            invoice=existing, fee_type=self.fee_type, description='Scolarité', unit_price=Decimal('150.00')
+        )
+
+        plan = generate_invoices(
+            self.fee_type, self.academic_year, due_date=date(2025, 10, 31), user=self.admin
+        )
+
+        self.assertEqual(plan.created_count, 2)
+        self.assertEqual(plan.errors, [f'Facture en cours déjà existante pour {already_billed.user.full_name}'])
+        invoices = list(Invoice.objects.filter(student__in=[first, second]).order_by('invoice_number'))
+        self.assertEqual([invoice.student for invoice in invoices], [first, second])
+        self.assertEqual(invoices[0].parent, parent)
+        self.assertIsNone(invoices[1].parent)
+        self.assertEqual(
+            int(invoices[1].invoice_number[-4:]), int(invoices[0].invoice_number[-4:]) + 1
+        )
+        for invoice in invoices:
+            self.assertEqual(invoice.status, 'DRAFT')
+            self.assertEqual(invoice.due_date, date(2025, 10, 31))
+            self.assertEqual(invoice.total_amount, Decimal('150.00'))
+            self.assertEqual(invoice.balance_due, Decimal('150.00'))
+            item = invoice.items.get()
+            self.assertEqual(item.description, 'Scolarité - 6ème')
+            self.assertEqual(item.total, Decimal('150.00'))
+        # Une seule entrée de journal pour toute la génération
+        self.assertEqual(
+            ActivityLog.objects.filter(action_type='INVOICE_CREATE', user=self.admin).count(), 1
+        )
+
+    def test_query_count_does_not_depend_on_students(self):
+        for _ in range(2):
+            self._create_student()
+        # Premier passage : création du compteur de numérotation
+        generate_invoices(self.fee_type, self.academic_year)
+        Invoice.objects.all().delete()
+        with CaptureQueriesContext(connection) as small:
+            generate_invoices(self.fee_type, self.academic_year)
+
+        Invoice.objects.all().delete()
+        for _ in range(10):
+            self._create_student()
+        with CaptureQueriesContext(connection) as large:
+            plan = generate_invoices(self.fee_type, self.academic_year)
+
+        self.assertEqual(plan.created_count, 12)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_level_filter(self):
+        self._create_student()
+        self._create_student(self.other_classroom)
+
+        plan = generate_invoices(self.fee_type, self.academic_year, level=self.level)
+
+        self.assertEqual(plan.eligible_count, 1)
+        self.assertEqual(plan.created_count, 1)
+        self.assertEqual(plan.errors, [])
+
+    def test_view_preview(self):
+        self._create_student()
+        self.client.force_login(self.admin)
+
+        response = self.client.post(reverse('finance:invoice_generate'), {
+            'fee_type': self.fee_type.id,
+            'academic_year': self.academic_year.id,
+            'mode': 'preview',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['invoices_to_create'], 1)
+        self.assertFalse(Invoice.objects.exists())
+
+    @override_settings(INVOICE_GENERATION_ASYNC=False)
+    def test_view_background_job(self):
+        self._create_student()
+        self._create_student()
+        self.client.force_login(self.admin)
+
+        response = self.client.post(reverse('finance:invoice_generate'), {
+            'fee_type': self.fee_type.id,
+            'academic_year': self.academic_year.id,
+            'mode': 'background',
+        })
+        # Exécuté pendant la requête : état final dans la réponse
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'done')
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual((status['done'], status['total'], status['created']), (2, 2, 2))
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_background_job_needs_shared_cache(self):
+        """Sans cache partagé, le suivi ne serait lisible que par ce worker : pas de thread"""
+        self._create_student()
+        with mock.patch('finance.services.threading.Thread') as thread:
+            job_id = start_generation_job(self.fee_type, self.academic_year)
+        thread.assert_not_called()
+        self.assertEqual(get_generation_job(job_id)['status'], 'done')
+
+        with mock.patch('finance.services.cache_is_shared', return_value=True), \
+                mock.patch('finance.services.threading.Thread') as thread:
+            job_id = start_generation_job(self.fee_type, self.academic_year)
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(get_generation_job(job_id)['status'], 'pending')
+
+    def test_view_synchronous(self):
+        self._create_student()
+        self.client.force_login(self.admin)
+
+        response = self.client.post(reverse('finance:invoice_generate'), {
+            'fee_type': self.fee_type.id,
+            'academic_year': self.academic_year.id,
+        })
+
+        self.assertRedirects(response, reverse('finance:invoice_list'), fetch_redirect_response=False)
+        self.assertEqual(Invoice.objects.count(), 1)
@@ -0,0 +1,140 @@
+"""
+Tests des séries temporelles financières (finance.timeseries)
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from finance.daily_reports import generate_daily_reports
+from finance.models import DailyFinancialReport
+from finance.timeseries import compute_series, default_window, get_report_totals, get_series
+
+User = get_user_model()
+
+
+def create_reports(start, days, amount='100.00'):
+    DailyFinancialReport.objects.bulk_create([
+        DailyFinancialReport(
+            report_date=start + timedelta(days=offset), payments_count=2,
+            payments_total=Decimal(amount), payments_cash=Decimal(amount)
+        )
+        for offset in range(days)
+    ])
+
+
+class FinancialSeriesTest(TestCase):
+    """Cumuls par période calculés en SQL"""
+
+    def setUp(self):
+        cache.clear()
+        # Du 25 janvier au 4 mars 2025 inclus
+        create_reports(date(2025, 1, 25), 39)
+
+    def test_monthly_series(self):
+        with CaptureQueriesContext(connection) as ctx:
+            series = compute_series(date(2024, 12, 15), date(2025, 3, 31), 'month')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(series['periods'], ['2024-12-01', '2025-01-01', '2025-02-01', '2025-03-01'])
+        self.assertEqual(series['labels'], ['12/2024', '01/2025', '02/2025', '03/2025'])
+        self.assertEqual(series['series']['payments_total'], [0, 700.0, 2800.0, 400.0])
+        self.assertEqual(series['series']['payments_count'], [0, 14, 56, 8])
+        self.assertEqual(series['days'], [0, 7, 28, 4])
+
+    def test_weekly_and_yearly_series(self):
+        weekly = compute_series(date(2025, 1, 27), date(2025, 2, 9), 'week')
+        self.assertEqual(weekly['labels'], ['S05 2025', 'S06 2025'])
+        self.assertEqual(weekly['series']['payments_cash'], [700.0, 700.0])
+
+        yearly = compute_series(date(2024, 1, 1), date(2025, 12, 31), 'year')
+        self.assertEqual(yearly['series']['payments_total'], [0, 3900.0])
+
+    def test_default_window(self):
+        self.assertEqual(default_window('month', date(2025, 3, 4)), (date(2024, 4, 1), date(2025, 3, 4)))
+        self.assertEqual(default_window('week', date(2025, 3, 5))[0], date(2024, 12, 16))
+
+    def test_cache_invalidated_on_report_writes(self):
+        window = (date(2025, 3, 1), date(2025, 3, 7))
+        self.assertEqual(get_series(*window, 'day')['series']['payments_total'][-1], 0)
+        self.assertEqual(get_report_totals()['total_reports'], 39)
+        # En cache : seule la version des rapports est relue
+        with CaptureQueriesContext(connection) as ctx:
+            get_series(*window, 'day')
+            get_report_totals()
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertTrue(all('MAX' in query['sql'] for query in ctx.captured_queries))
+
+        # Écriture en masse (upsert)
+        generate_daily_reports(date(2025, 3, 7), date(2025, 3, 7))
+        self.assertEqual(get_series(*window, 'day')['days'][-1], 1)
+
+        # Modification d'un rapport
+        report = DailyFinancialReport.objects.get(report_date=date(2025, 3, 7))
+        report.payments_total = Decimal('50.00')
+        report.save()
+        self.assertEqual(get_series(*window, 'day')['series']['payments_total'][-1], 50.0)
+        self.assertEqual(get_report_totals()['total_payments'], Decimal('3950.00'))
+
+    def test_cache_follows_database_without_invalidation(self):
+        """Écritures d'un autre processus : aucun signal ni invalidation dans celui-ci"""
+        window = (date(2025, 3, 1), date(2025, 3, 7))
+        self.assertEqual(get_series(*window, 'day')['days'], [1, 1, 1, 1, 0, 0, 0])
+
+        create_reports(date(2025, 3, 5), 1)
+        self.assertEqual(get_series(*window, 'day')['days'], [1, 1, 1, 1, 1, 0, 0])
+
+        DailyFinancialReport.objects.filter(report_date=date(2025, 3, 1)).delete()
+        self.assertEqual(get_report_totals()['total_reports'], 39)
+
+
+class FinancialSeriesViewTest(TestCase):
+    """Endpoint JSON et page du rapport journalier"""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(email='finance@test.com', password='testpass123', role='FINANCE')
+        self.client.login(email='finance@test.com', password='testpass123')
+
+    def test_series_endpoint(self):
+        create_reports(date(2025, 1, 1), 10)
+        response = self.client.get(
+            reverse('finance:daily_financial_series'),
+            {'granularity': 'week', 'from': '2025-01-01', 'to': '2025-01-10'}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['periods'], ['2024-12-30', '2025-01-06'])
+        self.assertEqual(data['series']['payments_total'], [500.0, 500.0])
+
+        response = self.client.get(reverse('finance:daily_financial_series'))
+        self.assertEqual(len(response.json()['periods']), 30)
+
+    def test_series_endpoint_errors(self):
+        url = reverse('finance:daily_financial_series')
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get(url, {'granularity': 'hour'}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'from': '2025-13-01'}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'from': '2025-02-01', 'to': '2025-01-01'}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'from': '2000-01-01', 'to': '2025-01-01'}).status_code, 400)
+
+    def test_report_page_queries_flat_with_history(self):
+        today = timezone.localdate()
+        url = reverse('finance:daily_financial_report')
+
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries)
+
+        create_reports(today - timedelta(days=9), 10)
+        few = count_queries()
+        create_reports(today - timedelta(days=400), 300)
+        self.assertEqual(count_queries(), few)
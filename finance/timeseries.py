@@ -0,0 +1,227 @@
+"""
+Séries temporelles financières (graphiques des rapports journaliers)
+
+Cumuls par jour, semaine, mois ou année calculés en SQL sur les rapports
+journaliers (DailyFinancialReport) : une requête d'agrégation groupée par
+période, quelle que soit la longueur de l'historique. Les séries sont
+mises en forme pour les graphiques (libellés et une liste de valeurs par
+indicateur, périodes sans rapport à zéro).
+
+Séries, totaux globaux et répartition des factures sont mis en cache. Les
+clés du cache des rapports portent une version lue en base (nombre de
+rapports et dernière modification, `updated_at`) : une écriture validée,
+quel que soit le processus qui l'a faite, change la version et aucune
+invalidation n'est nécessaire, même avec un cache propre à chaque
+processus (LocMemCache). Une écriture hors ORM (`update()`) qui ne touche
+pas `updated_at` n'est pas vue avant l'expiration des séries.
+
+warm_rollups précalcule les fenêtres par défaut après une génération ;
+utile seulement avec un cache partagé (Redis, Memcached) entre la commande
+et les workers web.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+from .managers import UNPAID_INVOICE
+from .models import DailyFinancialReport, Invoice
+
+SERIES_CACHE_PREFIX = 'finance:series'
+SERIES_CACHE_TIMEOUT = 24 * 3600
+
+# Répartition des factures calculée sur les factures : courte durée de vie
+INVOICE_STATUS_CACHE_TIMEOUT = 300
+
+# Indicateurs cumulés par période (champs additifs des rapports journaliers)
+SERIES_FIELDS = (
+    'payments_total', 'payments_count',
+    'payments_cash', 'payments_check', 'payments_transfer', 'payments_card', 'payments_mobile',
+    'invoices_created_count', 'invoices_created_total',
+    'expenses_total', 'net_balance',
+)
+
+# Fenêtre par défaut de chaque granularité (nombre de périodes jusqu'à aujourd'hui)
+GRANULARITIES = {
+    'day': 30,
+    'week': 12,
+    'month': 12,
+    'year': 5,
+}
+
+MAX_PERIODS = 400
+
+
+def _period_start(day, granularity):
+    """Premier jour de la période contenant `day`"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _next_period(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    if granularity == 'year':
+        return date(day.year + 1, 1, 1)
+    return day + timedelta(days=1)
+
+
+def _label(day, granularity):
+    if granularity == 'week':
+        return f"S{day.isocalendar()[1]:02d} {day.isocalendar()[0]}"
+    if granularity == 'month':
+        return day.strftime('%m/%Y')
+    if granularity == 'year':
+        return str(day.year)
+    return day.strftime('%d/%m')
+
+
+def periods(start, end, granularity):
+    """Débuts des périodes couvrant [start, end]"""
+    current = _period_start(start, granularity)
+    result = []
+    while current <= end:
+        result.append(current)
+        current = _next_period(current, granularity)
+    return result
+
+
+def period_count(start, end, granularity):
+    """Nombre de périodes couvrant [start, end] (sans les énumérer)"""
+    first, last = _period_start(start, granularity), _period_start(end, granularity)
+    if granularity == 'week':
+        return (last - first).days // 7 + 1
+    if granularity == 'month':
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    if granularity == 'year':
+        return last.year - first.year + 1
+    return (last - first).days + 1
+
+
+def default_window(granularity, today=None):
+    """(début, fin) de la fenêtre par défaut : les N dernières périodes"""
+    end = today or timezone.localdate()
+    start = _period_start(end, granularity)
+    for _ in range(GRANULARITIES[granularity] - 1):
+        start = _period_start(start - timedelta(days=1), granularity)
+    return start, end
+
+
+def _bucket_expression(granularity):
+    if granularity == 'week':
+        return TruncWeek('report_date')
+    if granularity == 'month':
+        return TruncMonth('report_date')
+    if granularity == 'year':
+        return TruncYear('report_date')
+    return F('report_date')
+
+
+def _as_date(value):
+    # TruncWeek/Month/Year rendent un datetime sur certains moteurs
+    return value.date() if hasattr(value, 'date') else value
+
+
+def compute_series(start, end, granularity='day'):
+    """
+    Cumuls des rapports de start à end par période (une requête, sans cache)
+
+    Returns:
+        dict: {
+            'granularity', 'from', 'to',
+            'periods': [date ISO du début de chaque période],
+            'labels': [libellé de chaque période],
+            'series': {indicateur: [valeur par période]},
+            'days': [nombre de rapports par période],
+        }
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularité inconnue : {granularity}")
+    rows = {
+        _as_date(row['bucket']): row
+        for row in DailyFinancialReport.objects.filter(report_date__range=(start, end)).annotate(
+            bucket=_bucket_expression(granularity)
+        ).values('bucket').annotate(
+            days=Count('id'), **{field: Sum(field) for field in SERIES_FIELDS}
+        ).order_by()
+    }
+    buckets = periods(start, end, granularity)
+    series = {field: [] for field in SERIES_FIELDS}
+    for bucket in buckets:
+        row = rows.get(bucket, {})
+        for field in SERIES_FIELDS:
+            value = row.get(field) or 0
+            series[field].append(float(value) if isinstance(value, Decimal) else value)
+    return {
+        'granularity': granularity,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'periods': [bucket.isoformat() for bucket in buckets],
+        'labels': [_label(bucket, granularity) for bucket in buckets],
+        'series': series,
+        'days': [rows.get(bucket, {}).get('days', 0) for bucket in buckets],
+    }
+
+
+def _version():
+    """Version des rapports en base : nombre de rapports et dernière modification (une requête)"""
+    state = DailyFinancialReport.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    updated = state['updated'].timestamp() if state['updated'] else 0
+    return f"{state['count']}-{updated}"
+
+
+def get_series(start, end, granularity='day'):
+    """Cumuls par période, depuis le cache s'ils sont à jour (voir compute_series)"""
+    key = f'{SERIES_CACHE_PREFIX}:{_version()}:{granularity}:{start.isoformat()}:{end.isoformat()}'
+    series = cache.get(key)
+    if series is None:
+        series = compute_series(start, end, granularity)
+        cache.set(key, series, SERIES_CACHE_TIMEOUT)
+    return series
+
+
+def get_report_totals():
+    """Nombre de rapports, total et moyenne journalière des encaissements (une requête, en cache)"""
+    key = f'{SERIES_CACHE_PREFIX}:{_version()}:totals'
+    totals = cache.get(key)
+    if totals is None:
+        totals = DailyFinancialReport.objects.aggregate(
+            total_reports=Count('id'),
+            total_payments=Sum('payments_total', default=Decimal('0.00')),
+            average_daily=Avg('payments_total', default=Decimal('0.00')),
+        )
+        cache.set(key, totals, SERIES_CACHE_TIMEOUT)
+    return totals
+
+
+def get_invoice_status_counts():
+    """Répartition actuelle des factures (une requête, en cache quelques minutes)"""
+    key = f'{SERIES_CACHE_PREFIX}:invoice_status'
+    counts = cache.get(key)
+    if counts is None:
+        counts = Invoice.objects.aggregate(
+            paid=Count('id', filter=Q(status='PAID')),
+            partial=Count('id', filter=UNPAID_INVOICE & Q(amount_paid__gt=0)),
+            pending=Count('id', filter=UNPAID_INVOICE & Q(amount_paid=0)),
+            sent=Count('id', filter=Q(status='SENT')),
+        )
+        cache.set(key, counts, INVOICE_STATUS_CACHE_TIMEOUT)
+    return counts
+
+
+def warm_rollups(today=None):
+    """Précalcule les séries des fenêtres par défaut et les totaux globaux"""
+    for granularity in GRANULARITIES:
+        get_series(*default_window(granularity, today), granularity)
+    get_report_totals()
+
@@ -50,6 +50,7 @@ urlpatterns = [
     # Rapports financiers journaliers
     path('reports/daily/', views.daily_financial_report, name='daily_financial_report'),
     path('reports/daily/generate/', views.daily_financial_report_generate, name='daily_financial_report_generate'),
+    path('reports/daily/series/', views.daily_financial_series, name='daily_financial_series'),
     path('reports/daily/<str:date>/pdf/', views.daily_financial_report_export_pdf, name='daily_financial_report_export_pdf'),
     path('reports/daily/<str:date>/excel/', views.daily_financial_report_export_excel, name='daily_financial_report_export_excel'),
     
@@ -59,4 +60,5 @@ urlpatterns = [
     
     # URLs pour les dashboards
     path('invoices/generate/', views.invoice_generate, name='invoice_generate'),
+    path('invoices/generate/status/<str:job_id>/', views.invoice_generate_status, name='invoice_generate_status'),
 ]
@@ -1,5 +1,6 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
@@ -16,8 +17,13 @@ from core.decorators.permissions import (
 )
 
 from .models import Payment, Invoice, PaymentMethod, FeeType, FeeStructure, InvoiceItem
+from .timeseries import (
+    GRANULARITIES, MAX_PERIODS, default_window, get_invoice_status_counts, get_report_totals, get_series,
+    period_count,
+)
 from academic.models import Level, AcademicYear, Enrollment
 from accounts.models import Student
+from communication.notifications import notify_payment_confirmed
 
 # Vues temporaires (placeholder) - À implémenter plus tard
 
@@ -221,6 +227,8 @@ def invoice_list(request):
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
     student_filter = request.GET.get('student', '')
+    balance_filter = request.GET.get('balance', '')
+    sort = request.GET.get('sort', '')
     
     if search_query:
         invoices = invoices.filter(
@@ -236,6 +244,12 @@ def invoice_list(request):
     if student_filter and (hasattr(request.user, 'teacher_profile') or request.user.is_staff):
         invoices = invoices.filter(student_id=student_filter)
     
+    # Filtre sur le solde (colonne stockée, filtrée en SQL)
+    if balance_filter == 'outstanding':
+        invoices = invoices.outstanding()
+    elif balance_filter == 'settled':
+        invoices = invoices.settled()
+    
     # Statistiques pour le dashboard (exclure les brouillons)
     # Filtrer les factures non-brouillon pour les statistiques
     non_draft_invoices = invoices.exclude(status='DRAFT')
@@ -252,7 +266,11 @@ def invoice_list(request):
     pending_amount = non_draft_invoices.filter(status__in=['SENT', 'OVERDUE']).aggregate(Sum('total_amount'))['total_amount__sum'] or 0
     
     # Pagination
-    paginator = Paginator(invoices.order_by('-issue_date'), 15)
+    if sort in ('balance_desc', 'balance_asc'):
+        invoices = invoices.order_by_balance(descending=(sort == 'balance_desc'))
+    else:
+        invoices = invoices.order_by('-issue_date')
+    paginator = Paginator(invoices, 15)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -270,6 +288,8 @@ def invoice_list(request):
         'search_query': search_query,
         'status_filter': status_filter,
         'student_filter': student_filter,
+        'balance_filter': balance_filter,
+        'sort': sort,
         'students': students,
         'stats': {
             'total_invoices': total_invoices,
@@ -412,8 +432,8 @@ def invoice_pay(request, invoice_id):
         return redirect('finance:invoice_detail', invoice_id=invoice.id)
     
     # Calculer le montant restant
-    total_paid = sum(payment.amount for payment in invoice.payments.filter(status='COMPLETED'))
-    remaining_amount = invoice.total_amount - total_paid
+    total_paid = invoice.amount_paid
+    remaining_amount = invoice.balance_due
     
     if remaining_amount <= 0:
         messages.info(request, 'Cette facture est déjà entièrement payée.')
@@ -489,14 +509,15 @@ def payment_confirm(request, payment_id):
             if admin_notes:
                 payment.notes = f"{payment.notes}\n[Admin] {admin_notes}" if payment.notes else f"[Admin] {admin_notes}"
             payment.save()
+            notify_payment_confirmed(payment)
             
             # Vérifier si la facture est maintenant entièrement payée
             invoice = payment.invoice
-            total_paid = sum(p.amount for p in invoice.payments.filter(status='COMPLETED'))
+            total_paid = invoice.amount_paid
             
             if total_paid >= invoice.total_amount:
                 invoice.status = 'PAID'
-                invoice.save()
+                invoice.save(update_fields=['status', 'updated_at'])
                 messages.success(request, f'Paiement confirmé et facture marquée comme payée.')
             else:
                 remaining = invoice.total_amount - total_paid
@@ -849,10 +870,16 @@ def report_list(request):
 
 @finance_required  # Personnel financier et admin peuvent générer des factures
 def invoice_generate(request):
-    """Générer des factures automatiquement"""
-    from django.db.models import Q
-    from decimal import Decimal
+    """
+    Générer des factures automatiquement
+
+    Le champ `mode` du formulaire choisit l'exécution :
+    - `preview` : prévisualisation sans écriture (réponse JSON) ;
+    - `background` : génération en arrière-plan (JSON avec l'URL de suivi) ;
+    - sinon : génération immédiate puis redirection vers la liste.
+    """
     from datetime import datetime, timedelta
+    from .services import generate_invoices, get_generation_job, start_generation_job
     
     if request.method == 'POST':
         # Récupérer les paramètres du formulaire
@@ -860,15 +887,21 @@ def invoice_generate(request):
         level_id = request.POST.get('level')
         academic_year_id = request.POST.get('academic_year')
         due_date_str = request.POST.get('due_date')
+        mode = request.POST.get('mode', '')
         
         # Validation
         if not fee_type_id or not academic_year_id:
+            if mode in ('preview', 'background'):
+                return JsonResponse(
+                    {'error': 'Le type de frais et l\'année académique sont obligatoires.'}, status=400
+                )
             messages.error(request, 'Le type de frais et l\'année académique sont obligatoires.')
             return redirect('finance:invoice_generate')
         
         try:
             fee_type = FeeType.objects.get(id=fee_type_id)
             academic_year = AcademicYear.objects.get(id=academic_year_id)
+            level = Level.objects.get(id=level_id) if level_id else None
             
             # Date d'échéance
             if due_date_str:
@@ -876,96 +909,36 @@ def invoice_generate(request):
             else:
                 due_date = (timezone.now() + timedelta(days=30)).date()
             
-            # Construire la requête pour les élèves
-            students_query = Student.objects.select_related('user').filter(
-                enrollments__academic_year=academic_year,
-                enrollments__is_active=True
-            )
+            if mode == 'preview':
+                plan = generate_invoices(fee_type, academic_year, level, due_date, dry_run=True)
+                return JsonResponse(plan.as_dict())
             
-            # Filtrer par niveau si spécifié
-            if level_id:
-                level = Level.objects.get(id=level_id)
-                students_query = students_query.filter(
-                    enrollments__classroom__level=level
+            if mode == 'background':
+                job_id = start_generation_job(
+                    fee_type, academic_year, level, due_date, user=request.user
                 )
+                # Job exécuté pendant la requête (cache non partagé) : état final renvoyé
+                state = get_generation_job(job_id) or {}
+                finished = state.get('status') in ('done', 'failed')
+                return JsonResponse({
+                    **(state if finished else {}),
+                    'job_id': job_id,
+                    'status_url': reverse('finance:invoice_generate_status', args=[job_id]),
+                }, status=200 if finished else 202)
             
-            students = students_query.distinct()
+            plan = generate_invoices(
+                fee_type, academic_year, level, due_date, user=request.user
+            )
             
-            if not students.exists():
+            if not plan.eligible_count:
                 messages.warning(request, 'Aucun élève trouvé avec les critères spécifiés.')
                 return redirect('finance:invoice_generate')
             
-            # Compter les factures créées
-            created_count = 0
-            errors = []
-            
-            for student in students:
-                try:
-                    # Récupérer la structure de frais pour le niveau de l'élève
-                    enrollment = student.enrollments.filter(
-                        academic_year=academic_year,
-                        is_active=True
-                    ).first()
-                    
-                    if not enrollment:
-                        errors.append(f"Pas d'inscription active pour {student.user.get_full_name()}")
-                        continue
-                    
-                    fee_structure = FeeStructure.objects.filter(
-                        fee_type=fee_type,
-                        level=enrollment.classroom.level,
-                        academic_year=academic_year
-                    ).first()
-                    
-                    if not fee_structure:
-                        errors.append(f"Pas de structure de frais pour {fee_type.name} - {enrollment.classroom.level.name}")
-                        continue
-                    
-                    # Vérifier si une facture similaire existe déjà
-                    existing_invoice = Invoice.objects.filter(
-                        student=student,
-                        items__fee_type=fee_type,
-                        status__in=['DRAFT', 'PENDING']
-                    ).first()
-                    
-                    if existing_invoice:
-                        errors.append(f"Facture en cours déjà existante pour {student.user.get_full_name()}")
-                        continue
-                    
-                    # Récupérer le parent responsable (premier parent)
-                    parent = student.parents.first()
-                    
-                    # Créer la facture
-                    invoice = Invoice.objects.create(
-                        student=student,
-                        parent=parent,
-                        due_date=due_date,
-                        status='DRAFT'
-                    )
-                    
-                    # Créer l'élément de facture
-                    InvoiceItem.objects.create(
-                        invoice=invoice,
-                        fee_type=fee_type,
-                        description=f"{fee_type.name} - {enrollment.classroom.level.name}",
-                        quantity=1,
-                        unit_price=fee_structure.amount
-                    )
-                    
-                    # Mettre à jour les totaux de la facture
-                    invoice.subtotal = fee_structure.amount
-                    invoice.total_amount = fee_structure.amount
-                    invoice.save()
-                    
-                    created_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Erreur pour {student.user.get_full_name()}: {str(e)}")
-            
             # Messages de résultat
-            if created_count > 0:
-                messages.success(request, f'{created_count} facture(s) créée(s) avec succès.')
+            if plan.created_count > 0:
+                messages.success(request, f'{plan.created_count} facture(s) créée(s) avec succès.')
             
+            errors = plan.errors
             if errors:
                 for error in errors[:5]:  # Limiter à 5 erreurs affichées
                     messages.warning(request, error)
@@ -975,6 +948,8 @@ def invoice_generate(request):
             return redirect('finance:invoice_list')
             
         except Exception as e:
+            if mode in ('preview', 'background'):
+                return JsonResponse({'error': str(e)}, status=400)
             messages.error(request, f'Erreur lors de la génération: {str(e)}')
             return redirect('finance:invoice_generate')
     
@@ -990,6 +965,17 @@ def invoice_generate(request):
     return render(request, 'finance/invoice_generate.html', context)
 
 
+@finance_required
+def invoice_generate_status(request, job_id):
+    """Progression d'une génération de factures en arrière-plan (JSON)"""
+    from .services import get_generation_job
+    
+    state = get_generation_job(job_id)
+    if state is None:
+        return JsonResponse({'error': 'Génération inconnue ou expirée.'}, status=404)
+    return JsonResponse(state)
+
+
 # ===========================
 # RAPPORTS FINANCIERS
 # ===========================
@@ -1039,6 +1025,8 @@ def daily_financial_report(request):
     # Préparer les données pour les graphiques
     chart_data = None
     if report:
+        invoice_counts = get_invoice_status_counts()
+        trend = get_series(selected_date - timedelta(days=6), selected_date, 'day')
         chart_data = {
             # Données pour le graphique des paiements par méthode
             'payment_methods': {
@@ -1056,17 +1044,17 @@ def daily_financial_report(request):
             'invoice_status': {
                 'labels': ['Payées (toutes)', 'Partielles', 'En attente', 'Envoyées'],
                 'data': [
-                    Invoice.objects.filter(status='PAID').count(),
-                    Invoice.objects.filter(status='PARTIAL').count(),
-                    Invoice.objects.filter(status='PENDING').count(),
-                    Invoice.objects.filter(status='SENT').count(),
+                    invoice_counts['paid'],
+                    invoice_counts['partial'],
+                    invoice_counts['pending'],
+                    invoice_counts['sent'],
                 ],
                 'colors': ['#10b981', '#f97316', '#fbbf24', '#3b82f6']
             },
             # Données pour l'historique des paiements (7 derniers jours)
             'payments_trend': {
-                'labels': [],
-                'data': []
+                'labels': trend['labels'],
+                'data': trend['series']['payments_total']
             }
         }
         
@@ -1076,23 +1064,9 @@ def daily_financial_report(request):
             if data['amount'] > 0:
                 chart_data['payment_methods']['labels'].append(method)
                 chart_data['payment_methods']['data'].append(data['amount'])
-        
-        # Historique des 7 derniers jours
-        for i in range(6, -1, -1):
-            date = selected_date - timedelta(days=i)
-            day_report = DailyFinancialReport.objects.filter(report_date=date).first()
-            chart_data['payments_trend']['labels'].append(date.strftime('%d/%m'))
-            chart_data['payments_trend']['data'].append(
-                float(day_report.payments_total) if day_report else 0
-            )
     
-    # Statistiques globales (tous les rapports)
-    all_reports = DailyFinancialReport.objects.all()
-    global_stats = {
-        'total_reports': all_reports.count(),
-        'total_payments': sum(r.payments_total for r in all_reports),
-        'average_daily': (sum(r.payments_total for r in all_reports) / all_reports.count()) if all_reports.count() > 0 else 0,
-    }
+    # Statistiques globales (tous les rapports, agrégées en SQL et en cache)
+    global_stats = get_report_totals()
     
     context = {
         'report': report,
@@ -1106,6 +1080,43 @@ def daily_financial_report(request):
     return render(request, 'finance/daily_financial_report.html', context)
 
 
+@finance_required  # Personnel financier et admin peuvent consulter les rapports
+def daily_financial_series(request):
+    """
+    Séries des rapports journaliers pour les graphiques (JSON)
+
+    Paramètres GET : granularity (day, week, month, year), from et to
+    (YYYY-MM-DD, par défaut les dernières périodes jusqu'à aujourd'hui).
+    """
+    from datetime import datetime
+    
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return JsonResponse(
+            {'error': f"Granularité invalide. Valeurs possibles : {', '.join(GRANULARITIES)}."}, status=400
+        )
+    
+    start, end = default_window(granularity)
+    try:
+        if request.GET.get('to'):
+            end = datetime.strptime(request.GET['to'], '%Y-%m-%d').date()
+            start = default_window(granularity, end)[0]
+        if request.GET.get('from'):
+            start = datetime.strptime(request.GET['from'], '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'Format de date invalide. Utilisez YYYY-MM-DD.'}, status=400)
+    
+    if start > end:
+        return JsonResponse({'error': 'La date de début doit précéder la date de fin.'}, status=400)
+    if period_count(start, end, granularity) > MAX_PERIODS:
+        return JsonResponse(
+            {'error': f'Fenêtre trop longue ({MAX_PERIODS} périodes au plus) : choisissez une granularité plus large.'},
+            status=400
+        )
+    
+    return JsonResponse(get_series(start, end, granularity))
+
+
 @finance_required  # Personnel financier et admin peuvent générer les rapports
 def daily_financial_report_generate(request):
     """
@@ -1235,20 +1246,12 @@ def student_fees_csv_export(request):
     Exporte un rapport CSV avec les élèves, leur classe et tous les frais
     Format: Student, Class, [Fee Type 1], [Fee Type 2], ..., Total
     Supporte les filtres: classes, fee_types, students
+
+    Le fichier est envoyé en streaming : les montants sont calculés par lots
+    d'élèves avec des agrégats groupés (voir finance.exports).
     """
-    import csv
-    from django.db.models import Sum, Q
-    from collections import defaultdict
-    from academic.models import ClassRoom
-    
-    # Créer la réponse HTTP CSV
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="student_fees_report.csv"'
-    
-    # Ajouter BOM pour Excel UTF-8
-    response.write('\ufeff')
-    
-    writer = csv.writer(response)
+    from core.exports import csv_response
+    from .exports import iter_student_fee_rows
     
     # Récupérer l'année académique actuelle (ou filtrer selon les paramètres)
     academic_year_id = request.GET.get('academic_year')
@@ -1272,99 +1275,10 @@ def student_fees_csv_export(request):
     else:
         fee_types = FeeType.objects.all().order_by('name')
     
-    # Construire l'en-tête
-    headers = ['Matricule', 'Étudiant', 'Classe']
-    fee_type_headers = [fee_type.name for fee_type in fee_types]
-    headers.extend(fee_type_headers)
-    headers.extend(['Total Facturé', 'Total Payé', 'Solde Restant'])
-    
-    writer.writerow(headers)
-    
-    # Récupérer tous les étudiants actifs (avec filtres)
-    students_query = Student.objects.filter(user__is_active=True)
-    
-    # Filtrer par classes
-    if selected_classes:
-        students_query = students_query.filter(current_class_id__in=selected_classes)
-    
-    # Filtrer par étudiants spécifiques
-    if selected_students:
-        students_query = students_query.filter(id__in=selected_students)
-    
-    students = students_query.select_related(
-        'user', 'current_class', 'current_class__level'
-    ).order_by('current_class__name', 'user__last_name', 'user__first_name')
-    
-    # Parcourir chaque étudiant
-    for student in students:
-        row = [
-            student.matricule,
-            student.user.full_name,
-            student.current_class.name if student.current_class else 'Non assigné'
-        ]
-        
-        # Récupérer toutes les factures de l'étudiant pour l'année
-        invoices = Invoice.objects.filter(
-            student=student,
-            issue_date__year=academic_year.start_date.year
-        ).prefetch_related('items', 'items__fee_type', 'payments')
-        
-        # Calculer les montants par type de frais
-        fee_amounts = defaultdict(Decimal)
-        for invoice in invoices:
-            for item in invoice.items.all():
-                fee_amounts[item.fee_type.id] += item.total
-        
-        # Ajouter les montants pour chaque type de frais
-        for fee_type in fee_types:
-            amount = fee_amounts.get(fee_type.id, Decimal('0.00'))
-            row.append(f"{amount:.2f}")
-        
-        # Calculer les totaux
-        total_invoiced = sum(invoice.total_amount for invoice in invoices)
-        total_paid = sum(invoice.paid_amount for invoice in invoices)
-        balance = total_invoiced - total_paid
-        
-        row.extend([
-            f"{total_invoiced:.2f}",
-            f"{total_paid:.2f}",
-            f"{balance:.2f}"
-        ])
-        
-        writer.writerow(row)
-    
-    # Ajouter une ligne de total si nécessaire
-    writer.writerow([])  # Ligne vide
-    writer.writerow([''] * len(headers))  # Ligne vide avec bon nombre de colonnes
-    
-    # Ligne de résumé
-    total_row = ['', 'TOTAL GÉNÉRAL', '']
-    
-    # Calculer les totaux par type de frais
-    for fee_type in fee_types:
-        total = InvoiceItem.objects.filter(
-            fee_type=fee_type,
-            invoice__issue_date__year=academic_year.start_date.year,
-            invoice__student__user__is_active=True
-        ).aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        total_row.append(f"{total:.2f}")
-    
-    # Totaux généraux
-    all_invoices = Invoice.objects.filter(
-        issue_date__year=academic_year.start_date.year,
-        student__user__is_active=True
+    rows = iter_student_fee_rows(
+        academic_year,
+        fee_types,
+        class_ids=selected_classes,
+        student_ids=selected_students,
     )
-    
-    total_invoiced_all = sum(invoice.total_amount for invoice in all_invoices)
-    total_paid_all = sum(invoice.paid_amount for invoice in all_invoices)
-    balance_all = total_invoiced_all - total_paid_all
-    
-    total_row.extend([
-        f"{total_invoiced_all:.2f}",
-        f"{total_paid_all:.2f}",
-        f"{balance_all:.2f}"
-    ])
-    
-    writer.writerow(total_row)
-    
-    return response
+    return csv_response(rows, 'student_fees_report.csv')